@@ -1,13 +1,119 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 from collections import defaultdict, Counter
 import json
 
+from .columnar import GroupIndex, table_columns, as_float, trend_labels, first_extreme
+
 logger = logging.getLogger(__name__)
 
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+NS_PER_DAY = 86400 * 10**9
+
+class CohortFrame:
+    """
+    Columns of a cohort event table grouped by student, with the
+    intermediates that several batch sub-analyses share (numeric columns,
+    per-student means and stds, parsed dates, daily activity) computed once
+    """
+    
+    def __init__(self, columns: Dict[str, np.ndarray], groups: GroupIndex):
+        self.columns = columns
+        self.groups = groups
+        self._cache: Dict[Any, Any] = {}
+        # Row indices grouped by student, in table order within each student
+        self.row_order = np.argsort(groups.codes, kind='stable')
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+    
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+    
+    def raw(self, name: str) -> np.ndarray:
+        return self.columns[name]
+    
+    def num(self, name: str) -> np.ndarray:
+        return self._cached(('num', name), lambda: as_float(self.columns[name]))
+    
+    def mean(self, name: str) -> np.ndarray:
+        return self._cached(('mean', name), lambda: self.groups.mean(self.num(name)))
+    
+    def std(self, name: str) -> np.ndarray:
+        return self._cached(('std', name), lambda: self.groups.std(self.num(name), self.mean(name)))
+    
+    def rows(self, student: int) -> np.ndarray:
+        start = self.groups.starts[student]
+        return self.row_order[start:start + self.groups.counts[student]]
+    
+    @property
+    def dates(self) -> np.ndarray:
+        """Event dates parsed once as naive datetime64[ns]; NaT stays NaT"""
+        def parse():
+            parsed = pd.to_datetime(pd.Series(self.columns['date']))
+            if parsed.dt.tz is not None:
+                parsed = parsed.dt.tz_localize(None)
+            return parsed.to_numpy(dtype='datetime64[ns]')
+        return self._cached('dates', parse)
+    
+    @property
+    def date_ns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(int64 nanoseconds, valid mask) of the event dates"""
+        def split():
+            values = self.dates.view(np.int64)
+            return values, ~np.isnat(self.dates)
+        return self._cached('date_ns', split)
+    
+    @property
+    def date_position(self) -> np.ndarray:
+        """Position of every row within its student when sorted by date (NaT last)"""
+        def compute():
+            values, valid = self.date_ns
+            key = np.where(valid, values, np.iinfo(np.int64).max)
+            order = np.lexsort((np.arange(len(key)), key, self.groups.codes))
+            position = np.empty(len(key), dtype=np.int64)
+            position[order] = np.arange(len(key)) - np.repeat(self.groups.starts, self.groups.counts)
+            return position
+        return self._cached('date_position', compute)
+    
+    @property
+    def daily(self) -> Dict[str, Any]:
+        """Events per (student, calendar day) and per-student stats over those counts"""
+        def compute():
+            values, valid = self.date_ns
+            days = np.floor_divide(values, NS_PER_DAY)
+            first_day = days[valid].min() if valid.any() else 0
+            pairs, student, day, _ = self.groups.pairs(days - first_day, valid)
+            per_day = pairs.counts.astype(np.float64)
+            by_student = GroupIndex(student, self.groups.size)
+            mean = by_student.mean(per_day)
+            std = by_student.std(per_day, mean)
+            return {
+                'student': student,
+                'day': day,
+                'active_days': by_student.counts,
+                'mean': mean,
+                'std': std
+            }
+        return self._cached('daily', compute)
+    
+    @property
+    def recent(self) -> np.ndarray:
+        """Rows within 7 days of their student's latest event"""
+        def compute():
+            values, valid = self.date_ns
+            latest = np.full(self.groups.size, np.iinfo(np.int64).min)
+            np.maximum.at(latest, self.groups.codes[valid], values[valid])
+            has_date = latest > np.iinfo(np.int64).min
+            cutoff = np.where(has_date, latest, 0) - 7 * NS_PER_DAY
+            return valid & has_date[self.groups.codes] & (values >= cutoff[self.groups.codes])
+        return self._cached('recent', compute)
+
 class BehaviorAnalytics:
     """Advanced behavior analytics for learning patterns"""
     
@@ -394,6 +500,492 @@ class BehaviorAnalytics:
         
         return recommendations
     
+    # Batch mode
+    def analyze_batch(self, table: Any, student_column: str = 'student_id') -> Dict[Any, Dict[str, Any]]:
+        """
+        Behavior analysis for many students from one columnar event table
+        (pyarrow Table, pandas DataFrame or dict of NumPy arrays with one row
+        per event and a student column). Each sub-analysis runs as vectorized
+        group-by passes over the whole cohort; returns student -> the same
+        structure analyze_behavior produces for that student's events.
+        """
+        columns = table_columns(table)
+        if student_column not in columns or len(columns[student_column]) == 0:
+            return {}
+        groups = GroupIndex.from_keys(columns.pop(student_column))
+        cohort = CohortFrame(columns, groups)
+        
+        sections = [
+            ('learning_patterns', self._batch_learning_patterns, dict),
+            ('engagement_metrics', self._batch_engagement, dict),
+            ('performance_trends', self._batch_performance_trends, dict),
+            ('behavioral_anomalies', self._batch_anomalies, list),
+            ('motivation_indicators', self._batch_motivation, dict),
+            ('cognitive_load_analysis', self._batch_cognitive_load, dict),
+            ('social_learning_patterns', self._batch_social_patterns, dict),
+            ('adaptive_behavior', self._batch_adaptive_behavior, dict),
+            ('risk_assessment', self._batch_learning_risks, dict)
+        ]
+        results = {}
+        for name, analyze, empty in sections:
+            try:
+                results[name] = analyze(cohort)
+            except Exception as e:
+                logger.error(f"Batch {name} analysis failed: {e}")
+                results[name] = [empty() for _ in range(groups.size)]
+        
+        analyses = {}
+        for i, student in enumerate(groups.keys.tolist()):
+            analysis = {name: results[name][i] for name, _, _ in sections}
+            analysis['recommendations'] = self._generate_behavioral_recommendations(analysis)
+            analyses[student] = analysis
+        return analyses
+    
+    def _batch_learning_patterns(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'study_time' in c and 'hour_of_day' in c:
+            hour = c.num('hour_of_day')
+            names = ['morning', 'afternoon', 'evening', 'night']
+            shares = np.stack([
+                g.fraction((hour >= low) & (hour <= high))
+                for low, high in ((6, 11), (12, 17), (18, 23), (0, 5))
+            ], axis=1)
+            preferred = np.argmax(shares, axis=1)
+            for i in range(g.size):
+                out[i]['study_time_distribution'] = dict(zip(names, shares[i].tolist()))
+                out[i]['preferred_study_time'] = names[preferred[i]]
+        
+        if 'session_duration' in c:
+            duration = c.num('session_duration')
+            mean = c.mean('session_duration')
+            median = g.quantile(duration, 0.5)
+            upper = g.quantile(duration, 0.75)
+            short = g.fraction(duration < 1800).tolist()
+            long = g.fraction(duration > 3600).tolist()
+            for i in range(g.size):
+                out[i]['session_patterns'] = {
+                    'avg_duration': mean[i],
+                    'median_duration': median[i],
+                    'short_sessions': short[i],
+                    'long_sessions': long[i],
+                    'optimal_duration': upper[i]
+                }
+        
+        if 'date' in c:
+            daily = c.daily
+            with np.errstate(invalid='ignore', divide='ignore'):
+                score = np.where(daily['mean'] > 0, daily['std'] / daily['mean'], 0)
+            consecutive = self._batch_consecutive_days(daily['student'], daily['day'], g.size)
+            preferred = self._batch_preferred_days(c)
+            for i in range(g.size):
+                out[i]['consistency'] = {
+                    'active_days': int(daily['active_days'][i]),
+                    'consecutive_days': int(consecutive[i]),
+                    'consistency_score': score[i],
+                    'preferred_days': preferred[i]
+                }
+        
+        for i in range(g.size):
+            out[i]['learning_style'] = self._analyze_learning_style(None)
+        return out
+    
+    def _batch_consecutive_days(self, student: np.ndarray, day: np.ndarray, size: int) -> np.ndarray:
+        """Longest run of back-to-back active days per student (as _calculate_consecutive_days)"""
+        result = np.zeros(size, dtype=np.int64)
+        if len(student) < 2:
+            return result
+        # Pairs are sorted by (student, day); flag adjacent pairs one day apart
+        adjacent = (student[1:] == student[:-1]) & (day[1:] - day[:-1] == 1)
+        run_id = np.cumsum(~adjacent)
+        lengths = np.bincount(run_id[adjacent])
+        run_student = np.zeros(len(lengths), dtype=np.int64)
+        run_student[run_id[adjacent]] = student[1:][adjacent]
+        has_run = lengths > 0
+        np.maximum.at(result, run_student[has_run], lengths[has_run])
+        return result
+    
+    def _batch_preferred_days(self, c: CohortFrame) -> List[List[str]]:
+        """Top three weekdays by activity per student, ties in order of first appearance"""
+        g = c.groups
+        values, valid = c.date_ns
+        weekday = (np.floor_divide(values, NS_PER_DAY) + 3) % 7  # 1970-01-01 was a Thursday
+        pairs, student, day, rows = g.pairs(weekday, valid)
+        first_seen = np.full(pairs.size, np.iinfo(np.int64).max)
+        np.minimum.at(first_seen, pairs.codes, g.position[rows])
+        order = np.lexsort((first_seen, -pairs.counts, student))
+        preferred = [[] for _ in range(g.size)]
+        for index in order:
+            top = preferred[student[index]]
+            if len(top) < 3:
+                top.append(DAY_NAMES[day[index]])
+        return preferred
+    
+    def _batch_engagement(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'completed' in c:
+            completion = c.mean('completed')
+            for i in range(g.size):
+                out[i]['completion_rate'] = completion[i]
+        
+        if 'time_spent' in c and 'expected_time' in c:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                efficiency = c.num('time_spent') / c.num('expected_time')
+            avg_efficiency = g.mean(np.where(np.isinf(efficiency), np.nan, efficiency))
+            infinite = g.count(np.isinf(efficiency)) > 0
+            if infinite.any():
+                # pandas' mean propagates inf
+                avg_efficiency = np.where(infinite, g.sum(np.where(np.isinf(efficiency), efficiency, 0.0)), avg_efficiency)
+            for i in range(g.size):
+                out[i]['time_efficiency'] = efficiency[c.rows(i)]
+                out[i]['avg_efficiency'] = avg_efficiency[i]
+        
+        if 'interactions' in c:
+            frequency = c.mean('interactions')
+            trend = trend_labels(g.slope(c.num('interactions')), g.counts)
+            for i in range(g.size):
+                out[i]['interaction_frequency'] = frequency[i]
+                out[i]['engagement_trend'] = trend[i]
+        
+        for i in range(g.size):
+            out[i]['focus_metrics'] = self._analyze_focus_patterns(None)
+        return out
+    
+    def _batch_performance_trends(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        if 'score' not in c or 'date' not in c:
+            return out
+        
+        score = c.num('score')
+        position = c.date_position.astype(np.float64)
+        trend = trend_labels(g.slope(score, position), g.counts)
+        for i in range(g.size):
+            out[i]['overall_trend'] = trend[i]
+        
+        if 'hour_of_day' in c:
+            hour = c.num('hour_of_day')
+            valid = ~np.isnan(hour)
+            hour_values, hour_codes = np.unique(hour[valid], return_inverse=True)
+            if c.raw('hour_of_day').dtype.kind in 'iu':
+                hour_values = hour_values.astype(c.raw('hour_of_day').dtype)
+            codes = np.zeros(len(hour), dtype=np.int64)
+            codes[valid] = hour_codes
+            pairs, student, key, rows = g.pairs(codes, valid)
+            mean = pairs.mean(score[rows])
+            best = first_extreme(student, mean, key, g.size, largest=True)
+            worst = first_extreme(student, mean, key, g.size, largest=False)
+            for i in range(g.size):
+                if best[i] >= 0:
+                    out[i]['best_performance_hour'] = hour_values[key[best[i]]]
+                    out[i]['worst_performance_hour'] = hour_values[key[worst[i]]]
+        
+        if 'session_duration' in c:
+            optimal = self._batch_optimal_duration(c, score)
+            for i in range(g.size):
+                if optimal[i] is not None:
+                    out[i]['optimal_session_duration'] = optimal[i]
+        
+        curves = self._batch_learning_curves(c, score, position)
+        for i in range(g.size):
+            out[i]['learning_curve'] = curves[i]
+        return out
+    
+    def _batch_optimal_duration(self, c: CohortFrame, score: np.ndarray) -> List[Optional[pd.Interval]]:
+        """Session-duration bin (pd.cut into 5 bins per student) with the best mean score"""
+        g = c.groups
+        duration = c.num('session_duration')
+        low, high = g.min(duration), g.max(duration)
+        # Bin edges as pd.cut(bins=5) builds them
+        same = low == high
+        adjust = np.where(low != 0, 0.001 * np.abs(low), 0.001)
+        start = np.where(same, low - adjust, low)
+        stop = np.where(same, high + adjust, high)
+        edges = np.linspace(np.nan_to_num(start), np.nan_to_num(stop), 6, axis=1)
+        edges[:, 0] -= np.where(same, 0, (high - low) * 0.001)
+        
+        valid = ~np.isnan(duration)
+        bins = (edges[g.codes] < duration[:, None]).sum(axis=1) - 1
+        pairs, student, key, rows = g.pairs(np.clip(bins, 0, 4), valid)
+        best = first_extreme(student, pairs.mean(score[rows]), key, g.size, largest=True)
+        
+        optimal: List[Optional[pd.Interval]] = [None] * g.size
+        for i in range(g.size):
+            if best[i] >= 0:
+                breaks = self._interval_breaks(edges[i].tolist())
+                b = int(key[best[i]])
+                optimal[i] = pd.Interval(breaks[b], breaks[b + 1], closed='right')
+        return optimal
+    
+    def _interval_breaks(self, edges: List[float], precision: int = 3) -> List[float]:
+        """Bin edges rounded the way pd.cut labels them"""
+        def round_frac(x: float, digits: int) -> float:
+            if not np.isfinite(x) or x == 0:
+                return x
+            frac, whole = np.modf(x)
+            if whole == 0:
+                digits = -int(np.floor(np.log10(abs(frac)))) - 1 + digits
+            return np.around(x, digits)
+        for digits in range(precision, 20):
+            breaks = [round_frac(x, digits) for x in edges]
+            if len(set(breaks)) == len(edges):
+                return breaks
+        return [round_frac(x, precision) for x in edges]
+    
+    def _batch_learning_curves(self, c: CohortFrame, score: np.ndarray, position: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Fit y = a * (1 - e^(-b x)) per student. For a fixed b the best a is
+        closed-form, so b is found for every student at once by a grid search
+        and golden-section refinement on the profiled sum of squares; this
+        matches curve_fit wherever curve_fit converges.
+        """
+        g = c.groups
+        counts = g.counts
+        complete = g.count(np.isnan(score)) == 0
+        fit = (counts >= 3) & complete
+        
+        rows = fit[g.codes]
+        x, y, codes = position[rows], score[rows], g.codes[rows]
+        
+        def profile(b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            f = 1 - np.exp(-b[codes] * x)
+            return (
+                np.bincount(codes, weights=y * f, minlength=g.size),
+                np.bincount(codes, weights=f * f, minlength=g.size)
+            )
+        
+        def explained(b: np.ndarray) -> np.ndarray:
+            yf, ff = profile(b)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.nan_to_num(yf * yf / ff, nan=-np.inf)
+        
+        grid = np.geomspace(1e-4, 20, 64)
+        scores = np.stack([explained(np.full(g.size, b)) for b in grid])
+        best = np.argmax(scores, axis=0)
+        low = grid[np.maximum(best - 1, 0)]
+        high = grid[np.minimum(best + 1, len(grid) - 1)]
+        ratio = (np.sqrt(5) - 1) / 2
+        for _ in range(40):
+            left = high - ratio * (high - low)
+            right = low + ratio * (high - low)
+            go_right = explained(right) > explained(left)
+            low = np.where(go_right, left, low)
+            high = np.where(go_right, high, right)
+        b = (low + high) / 2
+        yf, ff = profile(b)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a = yf / ff
+        
+        curves = []
+        for i in range(g.size):
+            if counts[i] < 3:
+                curves.append({'slope': 0, 'plateau': 0})
+            elif fit[i] and np.isfinite(a[i]):
+                curves.append({'slope': b[i], 'plateau': a[i], 'fit_quality': 'good'})
+            else:
+                curves.append({'slope': 0, 'plateau': 0, 'fit_quality': 'poor'})
+        return curves
+    
+    def _batch_anomalies(self, c: CohortFrame) -> List[List[Dict[str, Any]]]:
+        g = c.groups
+        flagged = []  # (rows, kind)
+        
+        if 'session_duration' in c:
+            duration = c.num('session_duration')
+            mean, std = c.mean('session_duration')[g.codes], c.std('session_duration')[g.codes]
+            flagged.append((np.flatnonzero(duration > mean + 2 * std), 'long_session'))
+            flagged.append((np.flatnonzero(duration < mean - 2 * std), 'short_session'))
+        if 'score' in c:
+            score = c.num('score')
+            mean, std = c.mean('score')[g.codes], c.std('score')[g.codes]
+            flagged.append((np.flatnonzero(score < mean - 2 * std), 'low_performance'))
+        
+        out = [[] for _ in range(g.size)]
+        if flagged:
+            rows = np.concatenate([r for r, _ in flagged])
+            kinds = np.concatenate([np.full(len(r), k) for k, (r, _) in enumerate(flagged)])
+            # Per student: kind by kind, rows in table order
+            order = np.lexsort((rows, kinds, g.codes[rows]))
+            has_date = 'date' in c
+            for index in order:
+                row, kind = rows[index], flagged[kinds[index]][1]
+                timestamp = pd.Timestamp(c.dates[row]) if has_date else 'unknown'
+                if kind == 'long_session':
+                    anomaly = {
+                        'type': 'long_session',
+                        'severity': 'medium',
+                        'description': f"Unusually long session: {c.num('session_duration')[row]/3600:.1f} hours",
+                        'timestamp': timestamp,
+                        'recommendation': 'Consider taking more breaks'
+                    }
+                elif kind == 'short_session':
+                    anomaly = {
+                        'type': 'short_session',
+                        'severity': 'low',
+                        'description': f"Very short session: {c.num('session_duration')[row]/60:.1f} minutes",
+                        'timestamp': timestamp,
+                        'recommendation': 'Try to maintain longer focus periods'
+                    }
+                else:
+                    anomaly = {
+                        'type': 'low_performance',
+                        'severity': 'high',
+                        'description': f"Unusually low score: {c.raw('score')[row]}%",
+                        'timestamp': timestamp,
+                        'recommendation': 'Review material and seek help'
+                    }
+                out[g.codes[row]].append(anomaly)
+        
+        if 'completed' in c:
+            completion = c.mean('completed')
+            for i in np.flatnonzero(completion < 0.3):
+                out[i].append({
+                    'type': 'low_completion',
+                    'severity': 'high',
+                    'description': f"Very low completion rate: {completion[i]:.1%}",
+                    'timestamp': 'ongoing',
+                    'recommendation': 'Focus on completing modules'
+                })
+        return out
+    
+    def _batch_motivation(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'date' in c:
+            daily = c.daily
+            with np.errstate(invalid='ignore', divide='ignore'):
+                consistency = np.where(daily['mean'] > 0, 1 - daily['std'] / daily['mean'], 0)
+            for i in range(g.size):
+                out[i]['progress_consistency'] = consistency[i]
+        
+        if 'difficulty_level' in c:
+            difficulty = c.num('difficulty_level')
+            median = g.quantile(difficulty, 0.5)
+            challenge = g.fraction(difficulty > median[g.codes]).tolist()
+            for i in range(g.size):
+                out[i]['challenge_seeking'] = challenge[i]
+        
+        if 'attempts' in c:
+            persistence = c.mean('attempts')
+            trend = trend_labels(g.slope(c.num('attempts')), g.counts)
+            for i in range(g.size):
+                out[i]['persistence'] = persistence[i]
+                out[i]['persistence_trend'] = trend[i]
+        
+        for i in range(g.size):
+            out[i]['self_directed_learning'] = self._analyze_self_directed_learning(None)
+        return out
+    
+    def _batch_cognitive_load(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'session_duration' in c and 'interactions' in c:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                intensity = c.num('interactions') / (c.num('session_duration') / 3600)
+            for i in range(g.size):
+                out[i]['session_intensity'] = intensity[c.rows(i)]
+        
+        if 'break_time' in c:
+            average = c.mean('break_time')
+            frequency = g.fraction(c.num('break_time') > 0).tolist()
+            for i in range(g.size):
+                out[i]['break_patterns'] = {
+                    'avg_break_time': average[i],
+                    'break_frequency': frequency[i],
+                    'break_efficiency': self._analyze_break_efficiency(None)
+                }
+        
+        fatigued = np.zeros(g.size, dtype=bool)
+        if 'session_duration' in c and 'score' in c:
+            fatigued = g.corr(c.num('session_duration'), c.num('score')) < -0.3
+        for i in range(g.size):
+            out[i]['fatigue_indicators'] = ["Performance decreases with longer sessions"] if fatigued[i] else []
+        return out
+    
+    def _batch_social_patterns(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'collaboration_score' in c:
+            level = c.mean('collaboration_score')
+            trend = trend_labels(g.slope(c.num('collaboration_score')), g.counts)
+            for i in range(g.size):
+                out[i]['collaboration_level'] = level[i]
+                out[i]['collaboration_trend'] = trend[i]
+        
+        if 'peer_interactions' in c:
+            peers = c.mean('peer_interactions')
+            for i in range(g.size):
+                out[i]['peer_interaction_frequency'] = peers[i]
+        
+        if 'help_requests' in c:
+            help_requests = c.mean('help_requests')
+            for i in range(g.size):
+                out[i]['help_seeking'] = {
+                    'frequency': help_requests[i],
+                    'effectiveness': self._analyze_help_effectiveness(None)
+                }
+        return out
+    
+    def _batch_adaptive_behavior(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        
+        if 'learning_strategy' in c:
+            changes = np.nan_to_num(g.diff(c.num('learning_strategy')))
+            adaptation = g.fraction(changes != 0).tolist()
+            for i in range(g.size):
+                out[i]['strategy_adaptation'] = adaptation[i]
+        
+        if 'difficulty_level' in c:
+            changes = np.nan_to_num(g.diff(c.num('difficulty_level')))
+            increases, decreases = g.count(changes > 0), g.count(changes < 0)
+            rate = g.fraction(changes != 0).tolist()
+            for i in range(g.size):
+                out[i]['difficulty_adaptation'] = {
+                    'increases': int(increases[i]),
+                    'decreases': int(decreases[i]),
+                    'adaptation_rate': rate[i]
+                }
+        
+        for i in range(g.size):
+            out[i]['resource_adaptation'] = self._analyze_resource_adaptation(None)
+        return out
+    
+    def _batch_learning_risks(self, c: CohortFrame) -> List[Dict[str, Any]]:
+        g = c.groups
+        out = [{} for _ in range(g.size)]
+        burnout = np.zeros(g.size)
+        
+        if 'date' in c:
+            recent = g.count(c.recent)
+            dropout = (1 - recent / g.counts).tolist()
+            for i in range(g.size):
+                out[i]['dropout_risk'] = dropout[i]
+            burnout += np.where(recent > 20, 0.4, 0)
+        
+        if 'score' in c:
+            performance = g.fraction(c.num('score') < 60).tolist()
+            for i in range(g.size):
+                out[i]['performance_risk'] = performance[i]
+        
+        if 'completion_rate' in c:
+            engagement = 1 - c.mean('completion_rate')
+            for i in range(g.size):
+                out[i]['engagement_risk'] = engagement[i]
+        
+        if 'session_duration' in c:
+            burnout += np.where(c.mean('session_duration') > 7200, 0.3, 0)
+        burnout = np.minimum(1.0, burnout).tolist()
+        for i in range(g.size):
+            out[i]['burnout_risk'] = burnout[i]
+        return out
+    
     # Helper methods
     def _calculate_trend(self, series: pd.Series) -> str:
         """Calculate trend direction"""
@@ -0,0 +1,170 @@
+"""
+Columnar group-by helpers for batch analytics
+A GroupIndex factorizes a key column once; every aggregate is then a
+bincount / sort over integer group codes, so statistics for all groups are
+computed in one vectorized pass instead of one pandas call per group.
+Aggregates skip NaN like their pandas counterparts.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Mapping, Optional
+
+def table_columns(table: Any) -> Dict[str, np.ndarray]:
+    """Columns of a pyarrow Table, pandas DataFrame or mapping of arrays as NumPy arrays"""
+    if hasattr(table, "column_names") and hasattr(table, "column"):  # pyarrow.Table
+        return {name: np.asarray(table.column(name).to_numpy()) for name in table.column_names}
+    if isinstance(table, pd.DataFrame):
+        return {name: table[name].to_numpy() for name in table.columns}
+    if isinstance(table, Mapping):
+        return {name: np.asarray(values) for name, values in table.items()}
+    raise TypeError(f"Unsupported table type: {type(table).__name__}")
+
+def as_float(values: np.ndarray) -> np.ndarray:
+    """Numeric view of a column; non-numeric entries become NaN"""
+    if values.dtype.kind in "biuf":
+        return values.astype(np.float64, copy=False)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+class GroupIndex:
+    """Integer group codes for a key column plus NaN-aware aggregates over them"""
+
+    def __init__(self, codes: np.ndarray, size: int, keys: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.size = size
+        self.keys = keys
+        self.counts = np.bincount(codes, minlength=size)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+        self._position: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_keys(cls, keys: np.ndarray) -> "GroupIndex":
+        uniques, codes = np.unique(keys, return_inverse=True)
+        return cls(codes.astype(np.int64), len(uniques), uniques)
+
+    @property
+    def position(self) -> np.ndarray:
+        """0-based position of every row within its group, in row order"""
+        if self._position is None:
+            order = np.argsort(self.codes, kind="stable")
+            position = np.empty(len(self.codes), dtype=np.int64)
+            position[order] = np.arange(len(self.codes)) - np.repeat(self.starts, self.counts)
+            self._position = position
+        return self._position
+
+    def sum(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self.codes, weights=values, minlength=self.size)
+
+    def count(self, mask: np.ndarray) -> np.ndarray:
+        return np.bincount(self.codes[mask], minlength=self.size)
+
+    def fraction(self, mask: np.ndarray) -> np.ndarray:
+        """Share of a group's rows (NaN rows included) where mask holds"""
+        return self.count(mask) / self.counts
+
+    def mean(self, values: np.ndarray) -> np.ndarray:
+        valid = ~np.isnan(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sum(np.where(valid, values, 0.0)) / self.count(valid)
+
+    def std(self, values: np.ndarray, mean: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sample standard deviation (ddof=1); NaN for groups with fewer than two values"""
+        valid = ~np.isnan(values)
+        mean = self.mean(values) if mean is None else mean
+        deviation = np.where(valid, values - mean[self.codes], 0.0)
+        n = self.count(valid)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 1, np.sqrt(self.sum(deviation * deviation) / (n - 1)), np.nan)
+
+    def max(self, values: np.ndarray) -> np.ndarray:
+        out = np.full(self.size, -np.inf)
+        np.fmax.at(out, self.codes, values)
+        return np.where(np.isneginf(out), np.nan, out)
+
+    def min(self, values: np.ndarray) -> np.ndarray:
+        out = np.full(self.size, np.inf)
+        np.fmin.at(out, self.codes, values)
+        return np.where(np.isposinf(out), np.nan, out)
+
+    def quantile(self, values: np.ndarray, q: float) -> np.ndarray:
+        """Linear-interpolated quantile per group (pandas' default method)"""
+        order = np.lexsort((values, self.codes))  # NaN sorts last within each group
+        ordered = values[order]
+        n = self.count(~np.isnan(values))
+        rank = (n - 1) * q
+        low = self.starts + np.floor(rank).astype(np.int64)
+        high = self.starts + np.ceil(rank).astype(np.int64)
+        low = np.clip(low, 0, max(len(ordered) - 1, 0))
+        high = np.clip(high, 0, max(len(ordered) - 1, 0))
+        if len(ordered) == 0:
+            return np.full(self.size, np.nan)
+        result = ordered[low] + (ordered[high] - ordered[low]) * (rank - np.floor(rank))
+        return np.where(n > 0, result, np.nan)
+
+    def slope(self, values: np.ndarray, x: Optional[np.ndarray] = None) -> np.ndarray:
+        """Least-squares slope of values against x (default: row position in the group)"""
+        x = self.position.astype(np.float64) if x is None else x
+        n = self.counts
+        sx, sy = self.sum(x), self.sum(values)
+        sxx, sxy = self.sum(x * x), self.sum(x * values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (n * sxy - sx * sy) / (n * sxx - sx * sx)
+
+    def corr(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Pearson correlation over rows where both columns are present"""
+        valid = ~(np.isnan(a) | np.isnan(b))
+        a = np.where(valid, a, 0.0)
+        b = np.where(valid, b, 0.0)
+        n = self.count(valid)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_a = self.sum(a) / n
+            mean_b = self.sum(b) / n
+            da = np.where(valid, a - mean_a[self.codes], 0.0)
+            db = np.where(valid, b - mean_b[self.codes], 0.0)
+            r = self.sum(da * db) / np.sqrt(self.sum(da * da) * self.sum(db * db))
+        return np.where(n > 1, r, np.nan)
+
+    def diff(self, values: np.ndarray) -> np.ndarray:
+        """Row-to-row difference within each group (first row of a group is NaN)"""
+        order = np.argsort(self.codes, kind="stable")
+        ordered = values[order]
+        delta = np.full(len(values), np.nan)
+        delta[1:] = ordered[1:] - ordered[:-1]
+        delta[self.starts[self.counts > 0]] = np.nan
+        result = np.empty(len(values))
+        result[order] = delta
+        return result
+
+    def pairs(self, sub_codes: np.ndarray, valid: Optional[np.ndarray] = None):
+        """
+        Group by (group, sub_code) for integer sub codes. Returns the pair
+        GroupIndex over the selected rows, each pair's group, each pair's sub
+        code and the selected row indices.
+        """
+        rows = np.arange(len(self.codes)) if valid is None else np.flatnonzero(valid)
+        sub = sub_codes[rows].astype(np.int64)
+        span = int(sub.max()) + 1 if len(sub) else 1
+        uniques, pair_codes = np.unique(self.codes[rows] * span + sub, return_inverse=True)
+        return GroupIndex(pair_codes.astype(np.int64), len(uniques)), uniques // span, uniques % span, rows
+
+def trend_labels(slope: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """'increasing' / 'decreasing' / 'stable' as in BehaviorAnalytics._calculate_trend"""
+    labels = np.full(len(slope), "stable", dtype=object)
+    labels[(slope > 0.01) & (counts >= 2)] = "increasing"
+    labels[(slope < -0.01) & (counts >= 2)] = "decreasing"
+    return labels
+
+def first_extreme(pair_group: np.ndarray, pair_value: np.ndarray, pair_key: np.ndarray, size: int, largest: bool = True):
+    """
+    Per group, the index of the pair with the largest (or smallest) value,
+    ties going to the smallest key (pandas idxmax/idxmin over a sorted
+    index). Groups with only NaN values get -1.
+    """
+    ranked = np.where(np.isnan(pair_value), np.inf, -pair_value if largest else pair_value)
+    order = np.lexsort((pair_key, ranked, pair_group))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_group[order][1:] != pair_group[order][:-1]
+    chosen = order[first]
+    result = np.full(size, -1, dtype=np.int64)
+    keep = ~np.isnan(pair_value[chosen])
+    result[pair_group[chosen][keep]] = chosen[keep]
+    return result
@@ -11,6 +11,8 @@ from ..models.quiz_achievement import Achievement, UserAchievement, AchievementT
 from ..models.user import User
 from ..dependencies import get_current_user, require_permission
 from ..services.ipfs_service import IPFSService
+from ..services.search_index import search_index
+from ..services.leaderboard_service import leaderboard_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/achievements", tags=["achievements"])
@@ -99,6 +101,8 @@ async def create_achievement(
         
         await achievement.insert()
         
+        search_index.index_achievement(achievement)
+        
         # Pin achievement metadata to IPFS if NFT enabled
         if request.nft_enabled:
             metadata = {
@@ -245,6 +249,7 @@ async def update_achievement(
         
         achievement.update_timestamp()
         await achievement.save()
+        search_index.index_achievement(achievement)
         
         logger.info(f"Achievement updated: {achievement_id}")
         return {
@@ -299,6 +304,9 @@ async def award_achievement(
         )
         
         await user_achievement.insert()
+        await leaderboard_service.record_achievement(
+            current_user.did, user_achievement.bonus_points, user_achievement.earned_at
+        )
         
         # Update user's total points if applicable
         # TODO: Implement user points system
@@ -5,7 +5,7 @@ Provides intelligent analysis of user's digital twin data with insights and reco
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 import json
 import logging
 from datetime import datetime, timedelta
@@ -16,35 +16,9 @@ from ..dependencies import get_current_user
 from ..services.learning_service import LearningService
 from ..models.digital_twin import DigitalTwin
 
-# Import RAG system
-try:
-    from rag.rag import LearnTwinRAGAgent
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
-    print("⚠️ RAG system not available")
-
 router = APIRouter()
 learning_service = LearningService()
 
-# Initialize RAG agent (lazy loading)
-_rag_agent = None
-
-def get_rag_agent() -> Optional["LearnTwinRAGAgent"]:
-    """Get or initialize RAG agent"""
-    global _rag_agent
-    if not RAG_AVAILABLE:
-        return None
-    
-    if _rag_agent is None:
-        try:
-            _rag_agent = LearnTwinRAGAgent(verbose=1)
-        except Exception as e:
-            print(f"Failed to initialize RAG agent: {e}")
-            return None
-    
-    return _rag_agent
-
 # Pydantic models
 class SkillAnalysis(BaseModel):
     skill_name: str
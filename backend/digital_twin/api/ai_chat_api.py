@@ -7,34 +7,15 @@ from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime
 import logging
+from contextlib import aclosing
 
 from ..models.user import User
 from ..dependencies import get_current_user
-
-# Import RAG system (shared with roadmap)
-try:
-    from rag.rag import LearnTwinRAGAgent
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
-    logging.warning("RAG system not available")
+from ..services.rag_engine import rag_engine
+from ..utils.sse_utils import sse_response
 
 router = APIRouter()
 
-_rag_agent: Optional["LearnTwinRAGAgent"] = None
-
-def get_rag_agent() -> Optional["LearnTwinRAGAgent"]:
-    global _rag_agent
-    if not RAG_AVAILABLE:
-        return None
-    if _rag_agent is None:
-        try:
-            _rag_agent = LearnTwinRAGAgent(verbose=1)
-        except Exception as e:
-            logging.error(f"Failed to initialize RAG agent: {e}")
-            return None
-    return _rag_agent
-
 
 class ChatMessage(BaseModel):
     role: str  # 'user' | 'assistant' | 'system'
@@ -54,24 +35,28 @@ class ChatResponse(BaseModel):
     generated_at: str
 
 
+def _build_question(request: ChatRequest) -> str:
+    """Concatenate history into a lightweight prompt prefix"""
+    history_text = "\n".join([
+        f"{m.role.capitalize()}: {m.content}" for m in (request.history or [])[-10:]
+    ])
+    return request.message if not history_text else f"{history_text}\nUser: {request.message}"
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def rag_chat(
     request: ChatRequest,
     current_user: User = Depends(get_current_user)
 ):
     """Chat using the backend RAG pipeline (no external Gemini quota dependency in FE)."""
-    agent = get_rag_agent()
+    agent = await rag_engine.get_agent_async()
     if agent is None:
         raise HTTPException(status_code=503, detail="RAG agent not available on server")
 
     try:
-        # Concatenate history into a lightweight prompt prefix
-        history_text = "\n".join([
-            f"{m.role.capitalize()}: {m.content}" for m in (request.history or [])[-10:]
-        ])
-        final_question = request.message if not history_text else f"{history_text}\nUser: {request.message}"
+        final_question = _build_question(request)
 
-        answer = agent.query(
+        answer = await rag_engine.query(
             question=final_question,
             context_type=request.context_type or "chat",
             max_tokens=request.max_tokens or 1200,
@@ -105,3 +90,36 @@ async def rag_chat(
         raise HTTPException(status_code=500, detail=f"RAG chat error: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def rag_chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming variant of /chat (text/event-stream).
+    Emits `sources` once retrieval finishes, `token` chunks as Gemini generates them,
+    then `done` with {reply, generated_at} (or `error`).
+    """
+    agent = await rag_engine.get_agent_async()
+    if agent is None:
+        raise HTTPException(status_code=503, detail="RAG agent not available on server")
+
+    events = await rag_engine.stream_query(
+        question=_build_question(request),
+        context_type=request.context_type or "chat",
+        max_tokens=request.max_tokens or 1200,
+        temperature=request.temperature or 0.3
+    )
+
+    async def chat_events():
+        async with aclosing(events):
+            async for event in events:
+                if event["event"] == "done":
+                    yield {"event": "done", "data": {
+                        "reply": event["data"].get("answer") or "I'm sorry, I couldn't generate a response right now. Please try again.",
+                        "generated_at": datetime.utcnow().isoformat()
+                    }}
+                else:
+                    yield event
+
+    return sse_response(chat_events())
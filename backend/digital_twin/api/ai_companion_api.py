@@ -13,38 +13,12 @@ import random
 
 from ..models.user import User
 from ..dependencies import get_current_user
+from ..services.rag_engine import rag_engine
 from ..services.learning_service import LearningService
-from ..services.redis_service import RedisService
-
-# Import RAG system
-try:
-    from rag.rag import LearnTwinRAGAgent
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
-    print("⚠️ RAG system not available")
+from ..services.redis_service import redis_service
 
 router = APIRouter()
 learning_service = LearningService()
-redis_service = RedisService()
-
-# Initialize RAG agent (lazy loading)
-_rag_agent = None
-
-def get_rag_agent() -> Optional["LearnTwinRAGAgent"]:
-    """Get or initialize RAG agent"""
-    global _rag_agent
-    if not RAG_AVAILABLE:
-        return None
-    
-    if _rag_agent is None:
-        try:
-            _rag_agent = LearnTwinRAGAgent(verbose=1)
-        except Exception as e:
-            print(f"Failed to initialize RAG agent: {e}")
-            return None
-    
-    return _rag_agent
 
 # Pydantic models
 class StudySession(BaseModel):
@@ -320,7 +294,7 @@ async def generate_adaptive_questions(
     """Generate adaptive questions based on topic and user profile"""
     
     # Get RAG agent for intelligent question generation
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     
     questions = []
     
@@ -345,7 +319,7 @@ async def generate_adaptive_questions(
         
         if rag_agent:
             try:
-                rag_response = rag_agent.query(
+                rag_response = await rag_engine.query(
                     question=question_prompt,
                     context_type="learning",
                     max_tokens=500,
@@ -9,44 +9,21 @@ from typing import List, Dict, Any, Optional
 import json
 import logging
 from datetime import datetime
+from contextlib import aclosing
 
 from ..models.user import User
 from ..dependencies import get_current_user
+from ..services.rag_engine import rag_engine
+from ..utils.sse_utils import sse_response
 from ..services.learning_service import LearningService
 from ..services.course_service import CourseService
 from ..models.course import Course
 from ..models.digital_twin import DigitalTwin
 
-# Import RAG system
-try:
-    from rag.rag import LearnTwinRAGAgent
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
-    print("⚠️ RAG system not available")
-
 router = APIRouter()
 learning_service = LearningService()
 course_service = CourseService()
 
-# Initialize RAG agent (lazy loading)
-_rag_agent = None
-
-def get_rag_agent() -> Optional["LearnTwinRAGAgent"]:
-    """Get or initialize RAG agent"""
-    global _rag_agent
-    if not RAG_AVAILABLE:
-        return None
-    
-    if _rag_agent is None:
-        try:
-            _rag_agent = LearnTwinRAGAgent(verbose=1)
-        except Exception as e:
-            print(f"Failed to initialize RAG agent: {e}")
-            return None
-    
-    return _rag_agent
-
 # Pydantic models
 class RoadmapCheckpoint(BaseModel):
     id: str
@@ -88,6 +65,46 @@ class RoadmapResponse(BaseModel):
     success: bool
     message: str
 
+def build_roadmap_prompt(request: RoadmapRequest, user_program: str, digital_twin: Optional[Dict[str, Any]]) -> str:
+    """Roadmap generation prompt (strict JSON output)"""
+    return f"""
+    Generate a comprehensive learning roadmap for a student studying {user_program}.
+    
+    Student Context:
+    - Program: {user_program}
+    - Current Level: {request.current_level}
+    - Focus Areas: {', '.join(request.focus_areas) if request.focus_areas else 'General'}
+    - Time Commitment: {request.time_commitment}
+    
+    Digital Twin Data:
+    - Completed Modules: {digital_twin.get('completed_modules', []) if digital_twin else []}
+    - Current Skills: {digital_twin.get('skills', dict()) if digital_twin else dict()}
+    - Learning Progress: {digital_twin.get('learning_progress', []) if digital_twin else []}
+    
+    IMPORTANT: Return STRICT JSON only. No markdown, no commentary. It must be valid for json.loads.
+    Exact schema:
+    {{
+      "program": string,
+      "difficulty_progression": ["beginner"|"intermediate"|"advanced", ...],
+      "steps": [
+        {{
+          "id": string,
+          "title": string,
+          "description": string,
+          "type": "skill"|"course"|"technology"|"certification",
+          "difficulty": "beginner"|"intermediate"|"advanced",
+          "estimated_hours": number,
+          "prerequisites": [string, ...],
+          "resources": [{{"type": string, "title": string, "url": string}}],
+          "is_available": boolean,
+          "course_id": string|null,
+          "status": "pending"|"in_progress"|"completed",
+          "checkpoints": [{{"id": string, "title": string, "completed": boolean}}]
+        }}
+      ]
+    }}
+    """
+
 @router.post("/roadmap/generate", response_model=RoadmapResponse)
 async def generate_learning_roadmap(
     request: RoadmapRequest,
@@ -104,49 +121,13 @@ async def generate_learning_roadmap(
         digital_twin = learning_service.get_student_twin(current_user.did)
         
         # Get RAG agent
-        rag_agent = get_rag_agent()
+        rag_agent = await rag_engine.get_agent_async()
         
         # Generate roadmap using RAG (strict JSON output)
-        roadmap_prompt = f"""
-        Generate a comprehensive learning roadmap for a student studying {user_program}.
-        
-        Student Context:
-        - Program: {user_program}
-        - Current Level: {request.current_level}
-        - Focus Areas: {', '.join(request.focus_areas) if request.focus_areas else 'General'}
-        - Time Commitment: {request.time_commitment}
-        
-        Digital Twin Data:
-        - Completed Modules: {digital_twin.get('completed_modules', []) if digital_twin else []}
-        - Current Skills: {digital_twin.get('skills', {{}}) if digital_twin else {{}}}
-        - Learning Progress: {digital_twin.get('learning_progress', []) if digital_twin else []}
-        
-        IMPORTANT: Return STRICT JSON only. No markdown, no commentary. It must be valid for json.loads.
-        Exact schema:
-        {{
-          "program": string,
-          "difficulty_progression": ["beginner"|"intermediate"|"advanced", ...],
-          "steps": [
-            {{
-              "id": string,
-              "title": string,
-              "description": string,
-              "type": "skill"|"course"|"technology"|"certification",
-              "difficulty": "beginner"|"intermediate"|"advanced",
-              "estimated_hours": number,
-              "prerequisites": [string, ...],
-              "resources": [{{"type": string, "title": string, "url": string}}],
-              "is_available": boolean,
-              "course_id": string|null,
-              "status": "pending"|"in_progress"|"completed",
-              "checkpoints": [{{"id": string, "title": string, "completed": boolean}}]
-            }}
-          ]
-        }}
-        """
+        roadmap_prompt = build_roadmap_prompt(request, user_program, digital_twin)
         
         if rag_agent:
-            rag_response = rag_agent.query(
+            rag_response = await rag_engine.query(
                 question=roadmap_prompt,
                 context_type="learning",
                 max_tokens=3000,
@@ -172,6 +153,56 @@ async def generate_learning_roadmap(
         logging.error(f"Error generating roadmap: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate roadmap: {str(e)}")
 
+@router.post("/roadmap/generate/stream")
+async def generate_learning_roadmap_stream(
+    request: RoadmapRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming variant of /roadmap/generate (text/event-stream).
+    Emits `sources`, then the raw JSON `token` chunks as they are generated, then
+    `roadmap` with the parsed RoadmapResponse. Falls back to the predefined
+    roadmap when RAG is unavailable or generation fails.
+    """
+    user_program = request.program or current_user.program or "Computer Science"
+    digital_twin = learning_service.get_student_twin(current_user.did)
+    rag_agent = await rag_engine.get_agent_async()
+
+    events = None
+    if rag_agent:
+        events = await rag_engine.stream_query(
+            question=build_roadmap_prompt(request, user_program, digital_twin),
+            context_type="learning",
+            max_tokens=3000,
+            temperature=0.3
+        )
+
+    async def roadmap_events():
+        rag_response = None
+        if events is not None:
+            async with aclosing(events):
+                async for event in events:
+                    if event["event"] == "done":
+                        rag_response = event["data"]
+                    elif event["event"] == "error":
+                        logging.warning(f"Roadmap generation failed: {event['data'].get('error')}")
+                    else:
+                        yield event
+
+        if rag_response is not None:
+            roadmap_data = parse_rag_roadmap_response(rag_response, user_program, current_user.did)
+        else:
+            roadmap_data = generate_fallback_roadmap(user_program, current_user.did)
+        roadmap_data = await enhance_roadmap_with_courses(roadmap_data, current_user.did)
+
+        yield {"event": "roadmap", "data": RoadmapResponse(
+            roadmap=roadmap_data,
+            success=True,
+            message=f"Roadmap generated successfully for {user_program}"
+        ).model_dump()}
+
+    return sse_response(roadmap_events())
+
 def parse_rag_roadmap_response(rag_response: Dict[str, Any], program: str, user_did: str) -> LearningRoadmap:
     """Parse RAG response into structured roadmap. Expects strict JSON in answer."""
     try:
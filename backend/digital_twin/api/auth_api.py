@@ -12,9 +12,11 @@ import logging
 from ..services.auth_service import AuthService
 from ..services.siwe_service import SIWEService
 from ..services.jwt_service import jwt_service
+from ..services.permission_cache import permission_cache
 from ..models.user import User
 from ..models.permission import Role, Permission, UserRoleAssignment
 from ..dependencies import get_current_user, require_permission, get_optional_user
+from ..middleware.auth_context import get_auth_context
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -346,9 +348,9 @@ async def refresh_token(request: TokenRefreshRequest):
         raise HTTPException(status_code=500, detail="Token refresh failed")
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(http_request: Request, current_user: User = Depends(get_current_user)):
     """Get current user information"""
-    permissions = await auth_service.get_user_permissions(current_user.did)
+    permissions = await get_auth_context(http_request).get_permissions(auth_service)
     wallets = await siwe_service.get_user_wallets(current_user.did)
     
     return {
@@ -754,6 +756,7 @@ async def update_user_role(
             assigned_at=datetime.now(timezone.utc)
         )
         await assignment.insert()
+        await permission_cache.invalidate_user(user_id)
         
         return {"message": f"User role updated from {old_role} to {new_role}"}
         
@@ -796,18 +799,14 @@ async def refresh_session(http_request: Request):
         if not session_id:
             raise HTTPException(status_code=401, detail="No active session")
         
-        # Get session data from Redis first
-        session_data = await auth_service.get_session_data(session_id)
-        if not session_data:
-            raise HTTPException(status_code=401, detail="Invalid session")
-        
         # Refresh session with new expiration
         session_expire_seconds = int(os.getenv("SESSION_EXPIRE_SECONDS", "10800"))
         new_expires_at = datetime.now(timezone.utc) + timedelta(seconds=session_expire_seconds)
         
-        # Update Redis session data
-        session_data["expiration_time"] = new_expires_at.isoformat()
-        await auth_service.redis_service.set_session(session_id, session_data, session_expire_seconds)
+        # Validate and extend the Redis session in one round-trip
+        session_data = await auth_service.extend_session_data(session_id, session_expire_seconds, new_expires_at)
+        if not session_data:
+            raise HTTPException(status_code=401, detail="Invalid session")
         
         # Update database session if it exists
         session = await auth_service.get_session(session_id)
@@ -837,18 +836,14 @@ async def extend_session(http_request: Request):
         if not session_id:
             raise HTTPException(status_code=401, detail="No active session")
         
-        # Get session data from Redis first
-        session_data = await auth_service.get_session_data(session_id)
-        if not session_data:
-            raise HTTPException(status_code=401, detail="Invalid session")
-        
         # Extend session
         session_expire_seconds = int(os.getenv("SESSION_EXPIRE_SECONDS", "10800"))
         new_expires_at = datetime.now(timezone.utc) + timedelta(seconds=session_expire_seconds)
         
-        # Update Redis session data
-        session_data["expiration_time"] = new_expires_at.isoformat()
-        await auth_service.redis_service.set_session(session_id, session_data, session_expire_seconds)
+        # Validate and extend the Redis session in one round-trip
+        session_data = await auth_service.extend_session_data(session_id, session_expire_seconds, new_expires_at)
+        if not session_data:
+            raise HTTPException(status_code=401, detail="Invalid session")
         
         # Update database session if it exists
         session = await auth_service.get_session(session_id)
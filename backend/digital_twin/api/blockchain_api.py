@@ -1,12 +1,17 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 from ..services.blockchain_service import BlockchainService
+from ..services.certificate_batch_service import CertificateBatchService
+from ..models.user import User
+from ..dependencies import get_current_user, require_permission
 
 router = APIRouter(prefix="/blockchain", tags=["blockchain"])
 
 # Initialize blockchain service
 blockchain_service = BlockchainService()
+certificate_batch_service = CertificateBatchService(blockchain_service)
 
 # Pydantic models
 class ModuleCompletionRequest(BaseModel):
@@ -31,6 +36,17 @@ class CourseCompletionRequest(BaseModel):
     course_name: str
     course_data: Dict[str, Any]
 
+class CohortCompletion(BaseModel):
+    student_address: str
+    student_did: str
+    course_data: Dict[str, Any] = {}
+
+class BatchCourseCompletionRequest(BaseModel):
+    course_name: str
+    course_id: Optional[str] = None
+    batch_id: Optional[str] = None  # Reuse to resume instead of creating a new batch
+    completions: List[CohortCompletion]
+
 class SkillMasteryRequest(BaseModel):
     student_address: str
     student_did: str
@@ -84,7 +100,9 @@ async def mint_module_completion_nft(request: ModuleCompletionRequest):
     if not blockchain_service.is_available():
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
-    result = blockchain_service.mint_module_completion_nft(
+    # Minting blocks on proof generation and the receipt; keep it off the event loop
+    result = await asyncio.to_thread(
+        blockchain_service.mint_module_completion_nft,
         request.student_address,
         request.student_did,
         request.module_id,
@@ -103,7 +121,8 @@ async def mint_learning_achievement_nft(request: AchievementRequest):
     if not blockchain_service.is_available():
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
-    result = blockchain_service.mint_learning_achievement_nft(
+    result = await asyncio.to_thread(
+        blockchain_service.mint_learning_achievement_nft,
         request.student_address,
         request.student_did,
         request.achievement_type,
@@ -203,7 +222,8 @@ async def mint_course_completion_certificate(request: CourseCompletionRequest):
     if not blockchain_service.is_available():
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
-    result = blockchain_service.mint_course_completion_certificate(
+    result = await asyncio.to_thread(
+        blockchain_service.mint_course_completion_certificate,
         request.student_address,
         request.student_did,
         request.course_name,
@@ -215,13 +235,54 @@ async def mint_course_completion_certificate(request: CourseCompletionRequest):
     
     return result
 
+@router.post("/mint/course-completion/batch", dependencies=[Depends(require_permission("create_achievement"))])
+async def mint_course_completion_batch(
+    request: BatchCourseCompletionRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Mint course completion certificates for a whole cohort in the background"""
+    if not blockchain_service.is_available():
+        raise HTTPException(status_code=503, detail="Blockchain service not available")
+    if not request.completions:
+        raise HTTPException(status_code=400, detail="No completions provided")
+    
+    batch = await certificate_batch_service.create_batch(
+        request.course_name,
+        [c.model_dump() for c in request.completions],
+        course_id=request.course_id,
+        created_by=current_user.did,
+        batch_id=request.batch_id
+    )
+    started = certificate_batch_service.start(batch.batch_id)
+    return {**CertificateBatchService.summarize(batch), "started": started}
+
+@router.get("/mint/batch/{batch_id}", dependencies=[Depends(require_permission("create_achievement"))])
+async def get_mint_batch(batch_id: str):
+    """Per-student status of a cohort mint batch"""
+    batch = await certificate_batch_service.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return CertificateBatchService.summarize(batch)
+
+@router.post("/mint/batch/{batch_id}/resume", dependencies=[Depends(require_permission("create_achievement"))])
+async def resume_mint_batch(batch_id: str):
+    """Resume a batch: minted items are skipped, submitted ones re-checked by tx hash"""
+    if not blockchain_service.is_available():
+        raise HTTPException(status_code=503, detail="Blockchain service not available")
+    batch = await certificate_batch_service.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    started = certificate_batch_service.start(batch_id)
+    return {**CertificateBatchService.summarize(batch), "started": started}
+
 @router.post("/mint/skill-mastery")
 async def mint_skill_mastery_certificate(request: SkillMasteryRequest):
     """Mint skill mastery certificate"""
     if not blockchain_service.is_available():
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
-    result = blockchain_service.mint_skill_mastery_certificate(
+    result = await asyncio.to_thread(
+        blockchain_service.mint_skill_mastery_certificate,
         request.student_address,
         request.student_did,
         request.skill_name,
@@ -241,7 +302,7 @@ async def get_student_blockchain_data(student_address: str, student_did: str):
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
     try:
-        result = blockchain_service.get_student_blockchain_data(student_address, student_did)
+        result = await asyncio.to_thread(blockchain_service.get_student_blockchain_data, student_address, student_did)
         
         if "error" in result:
             # Return empty data instead of error for missing student data
@@ -279,7 +340,8 @@ async def register_learning_checkpoint(request: CheckpointRequest):
     if not blockchain_service.is_available():
         raise HTTPException(status_code=503, detail="Blockchain service not available")
     
-    result = blockchain_service.register_learning_checkpoint(
+    result = await asyncio.to_thread(
+        blockchain_service.register_learning_checkpoint,
         request.student_did,
         request.module_id,
         request.score,
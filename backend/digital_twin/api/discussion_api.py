@@ -2,9 +2,12 @@
 Discussion API endpoints for video learning platform
 """
 import uuid
+import json
+import base64
+import binascii
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from typing import List, Optional, Dict, Any, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
 from fastapi.responses import JSONResponse
 import logging
 
@@ -22,6 +25,54 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# ============ THREAD LOADING HELPERS ============
+
+def encode_cursor(sort_value: datetime, item_id: str) -> str:
+    """Opaque keyset cursor: the sort timestamp plus the ID that breaks ties"""
+    payload = json.dumps([sort_value.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, item_id = json.loads(payload)
+        return datetime.fromisoformat(sort_value), str(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_filter(cursor: str, sort_field: str, id_field: str, descending: bool) -> Dict[str, Any]:
+    """Mongo filter for the items after a cursor in (sort_field, id_field) order"""
+    sort_value, item_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, id_field: {op: item_id}}
+    ]}
+
+async def liked_ids(model, id_field: str, ids: List[str], user_id: str) -> Set[str]:
+    """IDs among `ids` the user has liked, in one query"""
+    if not ids:
+        return set()
+    likes = await model.find({id_field: {"$in": ids}, "user_id": user_id}).to_list()
+    return {getattr(like, id_field) for like in likes}
+
+def build_comment_tree(comments: List[Comment], replies: List[Comment], liked: Set[str]) -> List[CommentResponse]:
+    """Attach replies (already sorted by created_at) to their top-level comments"""
+    replies_by_parent: Dict[str, List[CommentResponse]] = {}
+    for reply in replies:
+        reply_dict = reply.to_dict()
+        reply_dict["is_liked_by_user"] = reply.comment_id in liked
+        reply_dict["replies"] = []  # No nested replies for now
+        replies_by_parent.setdefault(reply.parent_comment_id, []).append(CommentResponse(**reply_dict))
+
+    comment_responses = []
+    for comment in comments:
+        comment_dict = comment.to_dict()
+        comment_dict["is_liked_by_user"] = comment.comment_id in liked
+        comment_dict["replies"] = replies_by_parent.get(comment.comment_id, [])
+        comment_responses.append(CommentResponse(**comment_dict))
+    return comment_responses
+
 # ============ DISCUSSION ENDPOINTS ============
 
 @router.get("/discussions/", response_model=Dict[str, Any])
@@ -32,11 +83,12 @@ async def get_discussions(
     discussion_type: Optional[DiscussionType] = Query(None, description="Filter by discussion type"),
     status: Optional[DiscussionStatus] = Query(None, description="Filter by status"),
     search: Optional[str] = Query(None, description="Search in title and content"),
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    skip: int = Query(0, ge=0, description="Number of records to skip (ignored with cursor)"),
     limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     current_user: User = Depends(get_current_user)
 ):
-    """Get discussions with filtering and pagination"""
+    """Get discussions with filtering and keyset (cursor) or skip pagination"""
     try:
         # Build filter query
         filter_query = {}
@@ -62,32 +114,40 @@ async def get_discussions(
                 {"content": {"$regex": search, "$options": "i"}}
             ]
         
-        # Get discussions with pagination and sorting
-        discussions = await Discussion.find(filter_query).sort("-last_activity_at").skip(skip).limit(limit).to_list()
-        
         # Get total count
         total = await Discussion.find(filter_query).count()
         
-        # Convert to response format and check if user liked each discussion
+        # Get discussions with pagination and sorting; one extra row tells whether a next page exists
+        page_query = filter_query
+        if cursor:
+            page_query = {"$and": [filter_query, cursor_filter(cursor, "last_activity_at", "discussion_id", descending=True)]}
+        query = Discussion.find(page_query).sort("-last_activity_at", "-discussion_id")
+        if not cursor:
+            query = query.skip(skip)
+        discussions = await query.limit(limit + 1).to_list()
+        has_more = len(discussions) > limit
+        discussions = discussions[:limit]
+        
+        # Resolve the user's likes for the whole page at once
+        liked = await liked_ids(DiscussionLike, "discussion_id", [d.discussion_id for d in discussions], current_user.did)
+        
         discussion_responses = []
         for discussion in discussions:
-            # Check if user liked this discussion
-            user_like = await DiscussionLike.find_one({
-                "discussion_id": discussion.discussion_id,
-                "user_id": current_user.did
-            })
-            
             discussion_dict = discussion.to_dict()
-            discussion_dict["is_liked_by_user"] = user_like is not None
+            discussion_dict["is_liked_by_user"] = discussion.discussion_id in liked
             discussion_responses.append(DiscussionResponse(**discussion_dict))
         
+        last = discussions[-1] if discussions else None
         return {
             "discussions": discussion_responses,
             "total": total,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": encode_cursor(last.last_activity_at, last.discussion_id) if has_more else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get discussions: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve discussions")
@@ -296,11 +356,18 @@ async def toggle_discussion_like(
 @router.get("/discussions/{discussion_id}/comments", response_model=List[CommentResponse])
 async def get_discussion_comments(
     discussion_id: str,
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of records to skip (ignored with cursor)"),
     limit: int = Query(50, ge=1, le=100, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
     current_user: User = Depends(get_current_user)
 ):
-    """Get comments for a discussion"""
+    """Get comments for a discussion
+    
+    The page of top-level comments, all of their replies and the user's likes
+    are loaded in three queries; the next page's cursor is returned in the
+    X-Next-Cursor header.
+    """
     try:
         # Verify discussion exists
         discussion = await Discussion.find_one({"discussion_id": discussion_id})
@@ -308,48 +375,36 @@ async def get_discussion_comments(
             raise HTTPException(status_code=404, detail="Discussion not found")
         
         # Get top-level comments (no parent)
-        comments = await Comment.find({
+        comment_query = {
             "discussion_id": discussion_id,
             "parent_comment_id": None,
             "status": CommentStatus.PUBLISHED
-        }).sort("created_at").skip(skip).limit(limit).to_list()
-        
-        # Build comment tree with replies
-        comment_responses = []
-        for comment in comments:
-            comment_dict = comment.to_dict()
-            
-            # Check if user liked this comment
-            user_like = await CommentLike.find_one({
-                "comment_id": comment.comment_id,
-                "user_id": current_user.did
-            })
-            comment_dict["is_liked_by_user"] = user_like is not None
-            
-            # Get replies
+        }
+        if cursor:
+            comment_query.update(cursor_filter(cursor, "created_at", "comment_id", descending=False))
+        query = Comment.find(comment_query).sort("created_at", "comment_id")
+        if not cursor:
+            query = query.skip(skip)
+        comments = await query.limit(limit + 1).to_list()
+        has_more = len(comments) > limit
+        comments = comments[:limit]
+        
+        # Replies of every comment on the page
+        comment_ids = [comment.comment_id for comment in comments]
+        replies = []
+        if comment_ids:
             replies = await Comment.find({
-                "parent_comment_id": comment.comment_id,
+                "parent_comment_id": {"$in": comment_ids},
                 "status": CommentStatus.PUBLISHED
-            }).sort("created_at").to_list()
-            
-            reply_responses = []
-            for reply in replies:
-                reply_dict = reply.to_dict()
-                
-                # Check if user liked this reply
-                reply_user_like = await CommentLike.find_one({
-                    "comment_id": reply.comment_id,
-                    "user_id": current_user.did
-                })
-                reply_dict["is_liked_by_user"] = reply_user_like is not None
-                reply_dict["replies"] = []  # No nested replies for now
-                
-                reply_responses.append(CommentResponse(**reply_dict))
-            
-            comment_dict["replies"] = reply_responses
-            comment_responses.append(CommentResponse(**comment_dict))
+            }).sort("created_at", "comment_id").to_list()
+        
+        liked = await liked_ids(
+            CommentLike, "comment_id", comment_ids + [reply.comment_id for reply in replies], current_user.did
+        )
         
-        return comment_responses
+        if has_more:
+            response.headers["X-Next-Cursor"] = encode_cursor(comments[-1].created_at, comments[-1].comment_id)
+        return build_comment_tree(comments, replies, liked)
         
     except HTTPException:
         raise
@@ -95,4 +95,12 @@ async def upload_did_document(did_document: Dict[str, Any] = Body(...), did: str
             "name": name
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"DID upload failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"DID upload failed: {str(e)}") 
+
+@router.get("/cache/stats")
+async def get_ipfs_cache_stats():
+    """Get local CID cache hit/miss/eviction counters"""
+    return {
+        "status": "success",
+        "cache": ipfs_service.cache_stats()
+    }
@@ -4,10 +4,15 @@ from ..services.blockchain_service import BlockchainService
 from ..utils.vc_utils import create_vc
 from ..services.ipfs_service import IPFSService
 from ..models.user import User
-from ..dependencies import get_current_user
+from ..dependencies import get_current_user, get_entitlements
+from ..services.entitlement_cache import Entitlements
+from ..services.rag_engine import rag_engine
+from ..utils.sse_utils import sse_response
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
+from typing import Optional, List, Dict, Any
+from contextlib import aclosing
 import os
+import re
 import json
 import tempfile
 import shutil
@@ -16,39 +21,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Import RAG system
-if TYPE_CHECKING:
-    from rag.rag import LearnTwinRAGAgent
-
-try:
-    from rag.rag import LearnTwinRAGAgent
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
-    print("⚠️ RAG system not available")
-
 router = APIRouter()
 learning_service = LearningService()
 blockchain_service = BlockchainService()
 
-# Initialize RAG agent (lazy loading)
-_rag_agent = None
-
-def get_rag_agent() -> Optional["LearnTwinRAGAgent"]:
-    """Get or initialize RAG agent"""
-    global _rag_agent
-    if not RAG_AVAILABLE:
-        return None
-    
-    if _rag_agent is None:
-        try:
-            _rag_agent = LearnTwinRAGAgent(verbose=1)
-        except Exception as e:
-            print(f"Failed to initialize RAG agent: {e}")
-            return None
-    
-    return _rag_agent
-
 # Pydantic models for RAG endpoints
 class RAGQueryRequest(BaseModel):
     question: str
@@ -114,27 +90,26 @@ def _split_into_subqueries(question: str, max_subqueries: int = MAX_SUBQUERIES)
     return variants[:max_subqueries]
 
 async def _run_subquery(
-    rag_agent,
     subquery: str,
     request: RAGQueryRequest,
     semaphore: asyncio.Semaphore
 ) -> Dict[str, Any]:
     """
-    Run a single subquery against rag_agent safely:
+    Run a single subquery against the shared RAG engine safely:
     - Use semaphore to bound concurrency
-    - Use asyncio.to_thread to avoid blocking if rag_agent.query is synchronous
+    - The engine runs the synchronous agent on its own executor
     - Wrap with timeout and catch exceptions
     """
     async with semaphore:
         try:
             async with asyncio.timeout(SUBQUERY_TIMEOUT):
-                result = await asyncio.to_thread(
-                    rag_agent.query,
+                result = await rag_engine.query(
                     question=subquery,
                     context_type=request.context_type,
                     max_tokens=request.max_tokens,
                     temperature=request.temperature,
-                    top_k=request.top_k
+                    top_k=request.top_k,
+                    use_cache=True
                 )
                 return {"subquery": subquery, "result": result, "error": None}
         except asyncio.TimeoutError:
@@ -146,7 +121,7 @@ async def _run_subquery(
 
 def _extract_text_from_result(result: Any) -> str:
     """
-    Best-effort extraction of human-readable text from rag_agent.query result.
+    Best-effort extraction of human-readable text from rag_engine.query result.
     Adjust keys according to your agent output shape if needed.
     """
     if result is None:
@@ -163,14 +138,13 @@ def _extract_text_from_result(result: Any) -> str:
     return str(result)
 
 async def _synthesize_results(
-    rag_agent,
     original_question: str,
     partial_results: List[Any],
     request: RAGQueryRequest
 ) -> Any:
     """
     Synthesize partial_results into a single final rag-like result by
-    asking rag_agent to perform the synthesis. Returns whatever rag_agent.query returns.
+    asking the RAG engine to perform the synthesis. Returns whatever rag_engine.query returns.
     """
     # Build synthesis prompt text from partial_results
     prompt = SYNTHESIS_PROMPT_HEADER
@@ -179,11 +153,10 @@ async def _synthesize_results(
         text = _extract_text_from_result(pr)
         prompt += f"{i}) {text}\n\n"
 
-    # Call rag_agent.query with the synthesis prompt (use a slightly smaller max_tokens maybe)
+    # Call rag_engine.query with the synthesis prompt (use a slightly smaller max_tokens maybe)
     try:
         async with asyncio.timeout(SYNTHESIS_TIMEOUT):
-            synthesis_result = await asyncio.to_thread(
-                rag_agent.query,
+            synthesis_result = await rag_engine.query(
                 question=prompt,
                 context_type=request.context_type,
                 max_tokens=request.max_tokens,    # keep same contract; tune if needed
@@ -503,27 +476,38 @@ def update_did_data(student_did: str = Body(...), student_address: str = Body(..
 @router.post("/ai-tutor/query", response_model=RAGQueryResponse)
 async def query_ai_tutor(
     request: RAGQueryRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    entitlements: Entitlements = Depends(get_entitlements)
 ):
     """
     Query the AI Tutor with RAG (Retrieval-Augmented Generation).
     Multi-query interpolation: split question -> run sub-queries -> synthesize results -> return final RAGQueryResponse.
     The input/output contract remains the same as before.
     """
-    # Check AI query limit
+    # Reserve one AI query against the daily limit (given back if the query fails)
     from ..services.subscription_service import subscription_service
+    reserved = False
     try:
         # Overall safety timeout for the whole orchestration
         async with asyncio.timeout(OVERALL_TIMEOUT):
-            # 1) Check limit and load RAG agent in parallel
-            limit_task = subscription_service.check_ai_query_limit(current_user.did)
-            agent_task = asyncio.to_thread(get_rag_agent)
+            # 1) Load the RAG agent first, so a failed load never holds a reservation
             try:
-                limit_info, rag_agent = await asyncio.gather(limit_task, agent_task)
+                rag_agent = await rag_engine.get_agent_async()
             except Exception:
-                logger.exception("Failed during limit check or agent load.")
+                logger.exception("Failed during agent load.")
                 raise HTTPException(status_code=503, detail="Failed to initialize AI Tutor service.")
 
+            if rag_agent is None:
+                raise HTTPException(status_code=503, detail="AI Tutor service is unavailable. Check RAG configuration.")
+
+            # Reserve a query; any failure from here on gives it back in the finally below
+            try:
+                limit_info = await subscription_service.reserve_ai_query(current_user.did, entitlements)
+            except Exception:
+                logger.exception("Failed during limit check.")
+                raise HTTPException(status_code=503, detail="Failed to initialize AI Tutor service.")
+
+            reserved = limit_info.get("can_query", False) and not limit_info.get("unlimited", False)
             if not limit_info.get("can_query", False):
                 raise HTTPException(
                     status_code=429,
@@ -534,16 +518,13 @@ async def query_ai_tutor(
                     )
                 )
 
-            if rag_agent is None:
-                raise HTTPException(status_code=503, detail="AI Tutor service is unavailable. Check RAG configuration.")
-
             # 2) Build sub-queries
             subqueries = _split_into_subqueries(request.question, max_subqueries=MAX_SUBQUERIES)
             logger.info("Decomposed into %d subqueries for user %s", len(subqueries), current_user.did)
 
             # 3) Run sub-queries concurrently with bounded concurrency
             semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
-            tasks = [_run_subquery(rag_agent, sq, request, semaphore) for sq in subqueries]
+            tasks = [_run_subquery(sq, request, semaphore) for sq in subqueries]
             sub_results = await asyncio.gather(*tasks)
 
             # collect successful partial results
@@ -554,7 +535,7 @@ async def query_ai_tutor(
             if successful:
                 # 4) Try synthesis using the agent (preferred: preserves response schema)
                 try:
-                    final_result = await _synthesize_results(rag_agent, request.question, successful, request)
+                    final_result = await _synthesize_results(request.question, successful, request)
                     logger.info("Synthesis successful for user %s", current_user.did)
                 except Exception:
                     logger.warning("Synthesis failed; falling back to single-query for user %s", current_user.did)
@@ -563,13 +544,13 @@ async def query_ai_tutor(
                 # 5) Fallback: run a single original query (guarantees compatible output shape)
                 try:
                     async with asyncio.timeout(SUBQUERY_TIMEOUT + SYNTHESIS_TIMEOUT):
-                        final_result = await asyncio.to_thread(
-                            rag_agent.query,
+                        final_result = await rag_engine.query(
                             question=request.question,
                             context_type=request.context_type,
                             max_tokens=request.max_tokens,
                             temperature=request.temperature,
-                            top_k=request.top_k
+                            top_k=request.top_k,
+                            use_cache=True
                         )
                     logger.info("Fallback single query succeeded for user %s", current_user.did)
                 except asyncio.TimeoutError:
@@ -579,14 +560,10 @@ async def query_ai_tutor(
                     logger.exception("Fallback single query failed for user %s", current_user.did)
                     raise HTTPException(status_code=500, detail="AI Tutor query failed: internal error")
 
-            # 6) Increment usage asynchronously (do not delay response)
-            try:
-                asyncio.create_task(subscription_service.increment_ai_query_usage(current_user.did))
-            except Exception:
-                logger.exception("Failed to schedule increment_ai_query_usage task (non-fatal).")
-
-            # 7) Return final result (must match RAGQueryResponse schema)
-            return RAGQueryResponse(**final_result)
+            # 6) Return final result (must match RAGQueryResponse schema); usage was counted by the reservation
+            response = RAGQueryResponse(**final_result)
+            reserved = False
+            return response
 
     except asyncio.TimeoutError:
         logger.warning("Overall AI Tutor orchestration timed out for user %s", getattr(current_user, "did", "<unknown>"))
@@ -596,6 +573,71 @@ async def query_ai_tutor(
     except Exception:
         logger.exception("Unexpected error during AI Tutor multi-query flow.")
         raise HTTPException(status_code=500, detail="AI Tutor query failed: internal error")
+    finally:
+        if reserved:
+            await subscription_service.release_ai_query(current_user.did)
+
+@router.post("/ai-tutor/query/stream")
+async def query_ai_tutor_stream(
+    request: RAGQueryRequest,
+    current_user: User = Depends(get_current_user),
+    entitlements: Entitlements = Depends(get_entitlements)
+):
+    """
+    Streaming AI Tutor query (text/event-stream).
+    Emits `sources` as soon as retrieval finishes, then `token` chunks as they are
+    generated, then `done` with a RAGQueryResponse payload (or `error`).
+    The question is answered in a single pass: the multi-query synthesis of
+    /ai-tutor/query cannot emit anything before every sub-query has finished.
+    """
+    from ..services.subscription_service import subscription_service
+    # Load the agent before reserving, so a busy or failed load holds no reservation
+    rag_agent = await rag_engine.get_agent_async()
+    if rag_agent is None:
+        raise HTTPException(status_code=503, detail="AI Tutor service is unavailable. Check RAG configuration.")
+
+    reserved = False
+    try:
+        limit_info = await subscription_service.reserve_ai_query(current_user.did, entitlements)
+        reserved = limit_info.get("can_query", False) and not limit_info.get("unlimited", False)
+        if not limit_info.get("can_query", False):
+            raise HTTPException(
+                status_code=429,
+                detail=(
+                    f"AI Query Limit Reached. "
+                    f"You have used {limit_info['queries_used']}/{limit_info['daily_limit']} queries today. "
+                    f"Upgrade to {limit_info['plan_name']} for more queries."
+                )
+            )
+
+        events = await rag_engine.stream_query(
+            question=request.question,
+            context_type=request.context_type,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            top_k=request.top_k,
+            use_cache=True
+        )
+    except BaseException:
+        if reserved:
+            await subscription_service.release_ai_query(current_user.did)
+        raise
+
+    async def tutor_events():
+        # The reserved query is given back unless the answer completes
+        completed = False
+        try:
+            async with aclosing(events):
+                async for event in events:
+                    if event["event"] == "done":
+                        completed = True
+                        event = {"event": "done", "data": RAGQueryResponse(**event["data"]).model_dump()}
+                    yield event
+        finally:
+            if reserved and not completed:
+                asyncio.create_task(subscription_service.release_ai_query(current_user.did))
+
+    return sse_response(tutor_events())
 
 @router.post("/ai-tutor/upload-document")
 async def upload_document_to_knowledge_base(
@@ -607,7 +649,7 @@ async def upload_document_to_knowledge_base(
     
     Supports: PDF, TXT, CSV, DOCX, JSON files
     """
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     if not rag_agent:
         raise HTTPException(
             status_code=503, 
@@ -648,7 +690,7 @@ async def upload_document_to_knowledge_base(
             })
             
             # Upload to knowledge base
-            success = rag_agent.upload_document(temp_path, doc_metadata)
+            success = await rag_engine.upload_document(temp_path, doc_metadata)
             
             if success:
                 return {
@@ -674,7 +716,7 @@ async def search_documents_in_knowledge_base(request: DocumentSearchRequest):
     """
     Search for documents in the AI Tutor's knowledge base
     """
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     if not rag_agent:
         raise HTTPException(
             status_code=503, 
@@ -682,7 +724,7 @@ async def search_documents_in_knowledge_base(request: DocumentSearchRequest):
         )
     
     try:
-        results = rag_agent.search_documents(
+        results = await rag_engine.search_documents(
             query=request.query,
             k=request.k,
             document_type=request.document_type
@@ -703,7 +745,7 @@ async def get_knowledge_base_stats():
     """
     Get statistics about the AI Tutor's knowledge base
     """
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     if not rag_agent:
         raise HTTPException(
             status_code=503, 
@@ -711,18 +753,25 @@ async def get_knowledge_base_stats():
         )
     
     try:
-        stats = rag_agent.get_knowledge_base_stats()
+        stats = await rag_engine.get_knowledge_base_stats()
         return stats
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get knowledge base stats: {str(e)}")
 
+@router.get("/ai-tutor/engine/metrics")
+async def get_rag_engine_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Queue depth, in-flight jobs and per-operation latency of the shared RAG engine
+    """
+    return rag_engine.metrics()
+
 @router.get("/ai-tutor/document-types")
 async def list_document_types():
     """
     List available document types in the knowledge base
     """
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     if not rag_agent:
         raise HTTPException(
             status_code=503, 
@@ -730,7 +779,7 @@ async def list_document_types():
         )
     
     try:
-        types = rag_agent.list_document_types()
+        types = await rag_engine.list_document_types()
         return {
             "document_types": types,
             "total_types": len(types),
@@ -754,7 +803,7 @@ async def get_learning_assistance(
     This endpoint combines the student's learning profile with RAG to provide
     personalized educational assistance.
     """
-    rag_agent = get_rag_agent()
+    rag_agent = await rag_engine.get_agent_async()
     if not rag_agent:
         raise HTTPException(
             status_code=503, 
@@ -781,7 +830,7 @@ Please provide personalized assistance considering the student's current level a
 """
         
         # Query RAG with enhanced context
-        result = rag_agent.query(
+        result = await rag_engine.query(
             question=enhanced_question,
             context_type=context_type,
             max_tokens=2048,
@@ -11,6 +11,8 @@ from ..models.course import Lesson, Module, Course
 from ..models.user import User
 from ..dependencies import get_current_user, require_permission
 from ..services.ipfs_service import IPFSService
+from ..services.search_index import search_index
+from ..services.leaderboard_service import leaderboard_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/lessons", tags=["lessons"])
@@ -109,6 +111,8 @@ async def create_lesson(
         
         await lesson.insert()
         
+        search_index.index_lesson(lesson)
+        
         logger.info(f"Lesson created: {lesson_id}")
         return {
             "message": "Lesson created successfully",
@@ -244,6 +248,7 @@ async def update_lesson(
         
         lesson.update_timestamp()
         await lesson.save()
+        search_index.index_lesson(lesson)
         
         logger.info(f"Lesson updated: {lesson_id}")
         return {
@@ -280,6 +285,7 @@ async def delete_lesson(
         lesson.status = "archived"
         lesson.update_timestamp()
         await lesson.save()
+        search_index.index_lesson(lesson)
         
         logger.info(f"Lesson deleted: {lesson_id}")
         return {"message": "Lesson deleted successfully"}
@@ -313,6 +319,7 @@ async def publish_lesson(
         lesson.status = "published"
         lesson.update_timestamp()
         await lesson.save()
+        search_index.index_lesson(lesson)
         
         logger.info(f"Lesson published: {lesson_id}")
         return {
@@ -431,6 +438,9 @@ async def update_lesson_progress(
                             bonus_points=ach.points_reward
                         )
                         await ua.insert()
+                        await leaderboard_service.record_achievement(
+                            module_progress.user_id, ua.bonus_points, ua.earned_at
+                        )
                     except Exception:
                         continue
         except Exception:
@@ -11,6 +11,7 @@ from ..models.quiz_achievement import Quiz, QuizAttempt, QuizQuestion, QuizType,
 from ..models.user import User
 from ..dependencies import get_current_user, require_permission
 from ..services.ipfs_service import IPFSService
+from ..services.search_index import search_index
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
@@ -115,6 +116,8 @@ async def create_quiz(
         
         await quiz.insert()
         
+        search_index.index_quiz(quiz)
+        
         logger.info(f"Quiz created: {quiz_id}")
         return {
             "message": "Quiz created successfully",
@@ -260,6 +263,7 @@ async def update_quiz(
         
         quiz.update_timestamp()
         await quiz.save()
+        search_index.index_quiz(quiz)
         
         logger.info(f"Quiz updated: {quiz_id}")
         return {
@@ -291,6 +295,7 @@ async def publish_quiz(
         quiz.status = "published"
         quiz.update_timestamp()
         await quiz.save()
+        search_index.index_quiz(quiz)
         
         logger.info(f"Quiz published: {quiz_id}")
         return {
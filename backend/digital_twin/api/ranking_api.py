@@ -8,135 +8,203 @@ from fastapi import APIRouter, HTTPException, Query, Depends
 from datetime import datetime, timezone, timedelta
 from ..models.user import User
 from ..models.course import Enrollment
-from ..models.quiz_achievement import UserAchievement, Achievement
+from ..models.quiz_achievement import UserAchievement
 from ..models.nft import NFTRecord
-from ..dependencies import get_current_user
+from ..services.leaderboard_service import (
+    leaderboard_service, BOARDS, CERTIFICATE_NFT_TYPES, ACHIEVEMENT_NFT_TYPES
+)
+from ..dependencies import get_current_user, require_admin
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/ranking", tags=["ranking"])
 
+TIMEFRAME_DAYS = {"week": 7, "month": 30, "year": 365}
+
+def _time_filter(field: str, timeframe: str) -> Dict[str, Any]:
+    """Mongo filter for documents inside a leaderboard timeframe"""
+    if timeframe not in TIMEFRAME_DAYS:
+        return {}
+    return {field: {"$gte": datetime.now(timezone.utc) - timedelta(days=TIMEFRAME_DAYS[timeframe])}}
+
 class RankingService:
-    """Service for handling ranking and leaderboard operations"""
+    """Service for handling ranking and leaderboard operations
+    
+    Ranks come from the materialized leaderboards in leaderboard_service; only
+    the users on the requested page are loaded from MongoDB for their details.
+    """
+    
+    @staticmethod
+    async def _user_profiles(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        users = await User.find({"did": {"$in": user_ids}}).to_list()
+        return {
+            user.did: {
+                "user_id": user.did,
+                "user_name": getattr(user, 'name', 'Anonymous'),
+                "user_email": getattr(user, 'email', None),
+                "avatar_url": getattr(user, 'avatar_url', None)
+            }
+            for user in users
+        }
+    
+    @staticmethod
+    async def _certificate_details(user_ids: List[str], timeframe: str) -> Dict[str, Dict[str, Any]]:
+        """Certificate counts and lists for a page of users"""
+        details = {
+            user_id: {
+                "certificate_count": 0,
+                "nft_certificate_count": 0,
+                "total_certificates": 0,
+                "latest_certificate": None,
+                "courses": [],
+                "nfts": []
+            }
+            for user_id in user_ids
+        }
+        
+        try:
+            enrollments = await Enrollment.find({
+                "user_id": {"$in": user_ids},
+                "status": "completed",
+                "certificate_issued": True,
+                **_time_filter("completed_at", timeframe)
+            }).to_list()
+            for enrollment in enrollments:
+                entry = details[enrollment.user_id]
+                entry["certificate_count"] += 1
+                entry["total_certificates"] += 1
+                entry["courses"].append({
+                    "course_id": enrollment.course_id,
+                    "completed_at": enrollment.completed_at,
+                    "final_grade": getattr(enrollment, 'final_grade', None)
+                })
+                if not entry["latest_certificate"] or enrollment.completed_at > entry["latest_certificate"]:
+                    entry["latest_certificate"] = enrollment.completed_at
+        except Exception as e:
+            logger.warning(f"Enrollment query failed: {e}")
+        
+        try:
+            nft_records = await NFTRecord.find({
+                "owner_address": {"$in": user_ids},
+                "achievement_type": {"$in": CERTIFICATE_NFT_TYPES},
+                **_time_filter("created_at", timeframe)
+            }).to_list()
+            for nft in nft_records:
+                entry = details[nft.owner_address]
+                entry["nft_certificate_count"] += 1
+                entry["total_certificates"] += 1
+                entry["nfts"].append({
+                    "token_id": nft.token_id,
+                    "achievement_type": nft.achievement_type,
+                    "title": getattr(nft.metadata, 'name', 'Certificate') if hasattr(nft, 'metadata') and nft.metadata else 'Certificate',
+                    "created_at": nft.created_at
+                })
+                if not entry["latest_certificate"] or nft.created_at > entry["latest_certificate"]:
+                    entry["latest_certificate"] = nft.created_at
+        except Exception as e:
+            logger.warning(f"NFT certificate query failed: {e}")
+        
+        return details
+    
+    @staticmethod
+    async def _achievement_details(user_ids: List[str], timeframe: str) -> Dict[str, Dict[str, Any]]:
+        """Achievement counts, points and lists for a page of users"""
+        details = {
+            user_id: {
+                "achievement_count": 0,
+                "nft_achievement_count": 0,
+                "total_achievements": 0,
+                "total_points": 0,
+                "latest_achievement": None,
+                "achievements": [],
+                "nfts": []
+            }
+            for user_id in user_ids
+        }
+        
+        try:
+            user_achievements = await UserAchievement.find({
+                "user_id": {"$in": user_ids},
+                **_time_filter("earned_at", timeframe)
+            }).to_list()
+            for ua in user_achievements:
+                entry = details[ua.user_id]
+                entry["achievement_count"] += 1
+                entry["total_achievements"] += 1
+                entry["total_points"] += getattr(ua, 'bonus_points', 0)
+                entry["achievements"].append({
+                    "achievement_id": ua.achievement_id,
+                    "title": "Achievement",  # We'll get this from the achievement lookup if needed
+                    "tier": "bronze",  # Default tier
+                    "points": getattr(ua, 'bonus_points', 0),
+                    "earned_at": ua.earned_at
+                })
+                if not entry["latest_achievement"] or ua.earned_at > entry["latest_achievement"]:
+                    entry["latest_achievement"] = ua.earned_at
+        except Exception as e:
+            logger.warning(f"UserAchievement query failed: {e}")
+        
+        try:
+            nft_records = await NFTRecord.find({
+                "owner_address": {"$in": user_ids},
+                "achievement_type": {"$in": ACHIEVEMENT_NFT_TYPES},
+                **_time_filter("created_at", timeframe)
+            }).to_list()
+            for nft in nft_records:
+                entry = details[nft.owner_address]
+                entry["nft_achievement_count"] += 1
+                entry["total_achievements"] += 1
+                entry["nfts"].append({
+                    "token_id": nft.token_id,
+                    "achievement_type": nft.achievement_type,
+                    "title": getattr(nft.metadata, 'name', 'Achievement') if hasattr(nft, 'metadata') and nft.metadata else 'Achievement',
+                    "created_at": nft.created_at
+                })
+                if not entry["latest_achievement"] or nft.created_at > entry["latest_achievement"]:
+                    entry["latest_achievement"] = nft.created_at
+        except Exception as e:
+            logger.warning(f"NFT achievement query failed: {e}")
+        
+        return details
+    
+    @staticmethod
+    async def _leaderboard(board: str, timeframe: str, skip: int, limit: int) -> Dict[str, Any]:
+        page = await leaderboard_service.get_page(board, timeframe, skip, limit)
+        user_ids = [entry["user_id"] for entry in page["entries"]]
+        if user_ids:
+            profiles = await RankingService._user_profiles(user_ids)
+            if board == "certificates":
+                details = await RankingService._certificate_details(user_ids, timeframe)
+            else:
+                details = await RankingService._achievement_details(user_ids, timeframe)
+        else:
+            profiles, details = {}, {}
+        
+        rankings = []
+        for entry in page["entries"]:
+            profile = profiles.get(entry["user_id"])
+            if not profile:
+                # Deleted user still on the board until the next rebuild
+                continue
+            rankings.append({**profile, **details[entry["user_id"]], "rank": entry["rank"]})
+        
+        return {
+            "success": True,
+            "leaderboard": rankings,
+            "timeframe": timeframe,
+            "total_users": len(rankings),
+            "ranked_users": page["ranked_users"],
+            "skip": skip
+        }
     
     @staticmethod
     async def get_certificate_leaderboard(
         timeframe: str = "all",
-        limit: int = 50
+        limit: int = 50,
+        skip: int = 0
     ) -> Dict[str, Any]:
         """Get certificate leaderboard ranked by number of certificates"""
         try:
-            # Build time filter
-            time_filter = {}
-            if timeframe != "all":
-                now = datetime.now(timezone.utc)
-                if timeframe == "week":
-                    time_filter = {"completed_at": {"$gte": now - timedelta(weeks=1)}}
-                elif timeframe == "month":
-                    time_filter = {"completed_at": {"$gte": now - timedelta(days=30)}}
-                elif timeframe == "year":
-                    time_filter = {"completed_at": {"$gte": now - timedelta(days=365)}}
-            
-            # Get all users first to ensure everyone is included
-            all_users = await User.find().to_list()
-            user_rankings = {}
-            
-            # Initialize all users with 0 certificates
-            for user in all_users:
-                user_rankings[user.did] = {
-                    "user_id": user.did,
-                    "user_name": getattr(user, 'name', 'Anonymous'),
-                    "user_email": getattr(user, 'email', None),
-                    "avatar_url": getattr(user, 'avatar_url', None),
-                    "certificate_count": 0,
-                    "nft_certificate_count": 0,
-                    "total_certificates": 0,
-                    "latest_certificate": None,
-                    "courses": [],
-                    "nfts": []
-                }
-            
-            # Get course completion certificates from enrollments
-            try:
-                enrollment_filter = {
-                    "status": "completed",
-                    "certificate_issued": True,
-                    **time_filter
-                }
-                enrollments = await Enrollment.find(enrollment_filter).to_list()
-                
-                # Process enrollment results
-                for enrollment in enrollments:
-                    user_id = enrollment.user_id
-                    if user_id in user_rankings:
-                        user_rankings[user_id]["certificate_count"] += 1
-                        user_rankings[user_id]["total_certificates"] += 1
-                        user_rankings[user_id]["courses"].append({
-                            "course_id": enrollment.course_id,
-                            "completed_at": enrollment.completed_at,
-                            "final_grade": getattr(enrollment, 'final_grade', None)
-                        })
-                        if not user_rankings[user_id]["latest_certificate"] or enrollment.completed_at > user_rankings[user_id]["latest_certificate"]:
-                            user_rankings[user_id]["latest_certificate"] = enrollment.completed_at
-                            
-            except Exception as e:
-                logger.warning(f"Enrollment query failed: {e}")
-            
-            # Get NFT certificates
-            try:
-                nft_time_filter = {}
-                if timeframe != "all":
-                    now = datetime.now(timezone.utc)
-                    if timeframe == "week":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(weeks=1)}}
-                    elif timeframe == "month":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(days=30)}}
-                    elif timeframe == "year":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(days=365)}}
-                
-                nft_filter = {
-                    "achievement_type": {"$in": ["course_completion", "skill_mastery", "certification"]},
-                    **nft_time_filter
-                }
-                nft_records = await NFTRecord.find(nft_filter).to_list()
-                
-                # Process NFT results
-                for nft in nft_records:
-                    user_id = nft.owner_address
-                    if user_id in user_rankings:
-                        user_rankings[user_id]["nft_certificate_count"] += 1
-                        user_rankings[user_id]["total_certificates"] += 1
-                        user_rankings[user_id]["nfts"].append({
-                            "token_id": nft.token_id,
-                            "achievement_type": nft.achievement_type,
-                            "title": getattr(nft.metadata, 'name', 'Certificate') if hasattr(nft, 'metadata') and nft.metadata else 'Certificate',
-                            "created_at": nft.created_at
-                        })
-                        if not user_rankings[user_id]["latest_certificate"] or nft.created_at > user_rankings[user_id]["latest_certificate"]:
-                            user_rankings[user_id]["latest_certificate"] = nft.created_at
-                            
-            except Exception as e:
-                logger.warning(f"NFT certificate query failed: {e}")
-            
-            # Sort by total certificates (descending), then by latest certificate
-            sorted_rankings = sorted(
-                user_rankings.values(),
-                key=lambda x: (x["total_certificates"], x["latest_certificate"] or datetime.min.replace(tzinfo=timezone.utc)),
-                reverse=True
-            )
-            
-            # Add rank numbers and limit results
-            enhanced_rankings = []
-            for i, ranking in enumerate(sorted_rankings[:limit]):
-                ranking["rank"] = i + 1
-                enhanced_rankings.append(ranking)
-            
-            return {
-                "success": True,
-                "leaderboard": enhanced_rankings,
-                "timeframe": timeframe,
-                "total_users": len(enhanced_rankings)
-            }
-            
+            return await RankingService._leaderboard("certificates", timeframe, skip, limit)
         except Exception as e:
             logger.error(f"Certificate leaderboard retrieval failed: {e}")
             raise HTTPException(status_code=500, detail="Certificate leaderboard retrieval failed")
@@ -144,185 +212,50 @@ class RankingService:
     @staticmethod
     async def get_achievement_leaderboard(
         timeframe: str = "all",
-        limit: int = 50
+        limit: int = 50,
+        skip: int = 0
     ) -> Dict[str, Any]:
-        """Get achievement leaderboard ranked by number of achievements"""
+        """Get achievement leaderboard ranked by number of achievements, then points"""
         try:
-            # Build time filter
-            time_filter = {}
-            if timeframe != "all":
-                now = datetime.now(timezone.utc)
-                if timeframe == "week":
-                    time_filter = {"earned_at": {"$gte": now - timedelta(weeks=1)}}
-                elif timeframe == "month":
-                    time_filter = {"earned_at": {"$gte": now - timedelta(days=30)}}
-                elif timeframe == "year":
-                    time_filter = {"earned_at": {"$gte": now - timedelta(days=365)}}
-            
-            # Get all users first to ensure everyone is included
-            all_users = await User.find().to_list()
-            user_rankings = {}
-            
-            # Initialize all users with 0 achievements
-            for user in all_users:
-                user_rankings[user.did] = {
-                    "user_id": user.did,
-                    "user_name": getattr(user, 'name', 'Anonymous'),
-                    "user_email": getattr(user, 'email', None),
-                    "avatar_url": getattr(user, 'avatar_url', None),
-                    "achievement_count": 0,
-                    "nft_achievement_count": 0,
-                    "total_achievements": 0,
-                    "total_points": 0,
-                    "latest_achievement": None,
-                    "achievements": [],
-                    "nfts": []
-                }
-            
-            # Get achievements from UserAchievement collection
-            try:
-                user_achievements = await UserAchievement.find(time_filter).to_list()
-                
-                # Process achievement results
-                for ua in user_achievements:
-                    user_id = ua.user_id
-                    if user_id in user_rankings:
-                        user_rankings[user_id]["achievement_count"] += 1
-                        user_rankings[user_id]["total_achievements"] += 1
-                        user_rankings[user_id]["total_points"] += getattr(ua, 'bonus_points', 0)
-                        user_rankings[user_id]["achievements"].append({
-                            "achievement_id": ua.achievement_id,
-                            "title": "Achievement",  # We'll get this from the achievement lookup if needed
-                            "tier": "bronze",  # Default tier
-                            "points": getattr(ua, 'bonus_points', 0),
-                            "earned_at": ua.earned_at
-                        })
-                        if not user_rankings[user_id]["latest_achievement"] or ua.earned_at > user_rankings[user_id]["latest_achievement"]:
-                            user_rankings[user_id]["latest_achievement"] = ua.earned_at
-                            
-            except Exception as e:
-                logger.warning(f"UserAchievement query failed: {e}")
-            
-            # Get NFT achievements
-            try:
-                nft_time_filter = {}
-                if timeframe != "all":
-                    now = datetime.now(timezone.utc)
-                    if timeframe == "week":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(weeks=1)}}
-                    elif timeframe == "month":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(days=30)}}
-                    elif timeframe == "year":
-                        nft_time_filter = {"created_at": {"$gte": now - timedelta(days=365)}}
-                
-                nft_filter = {
-                    "achievement_type": {"$in": ["achievement", "learning_milestone", "excellence_award"]},
-                    **nft_time_filter
-                }
-                nft_records = await NFTRecord.find(nft_filter).to_list()
-                
-                # Process NFT results
-                for nft in nft_records:
-                    user_id = nft.owner_address
-                    if user_id in user_rankings:
-                        user_rankings[user_id]["nft_achievement_count"] += 1
-                        user_rankings[user_id]["total_achievements"] += 1
-                        user_rankings[user_id]["nfts"].append({
-                            "token_id": nft.token_id,
-                            "achievement_type": nft.achievement_type,
-                            "title": getattr(nft.metadata, 'name', 'Achievement') if hasattr(nft, 'metadata') and nft.metadata else 'Achievement',
-                            "created_at": nft.created_at
-                        })
-                        if not user_rankings[user_id]["latest_achievement"] or nft.created_at > user_rankings[user_id]["latest_achievement"]:
-                            user_rankings[user_id]["latest_achievement"] = nft.created_at
-                            
-            except Exception as e:
-                logger.warning(f"NFT achievement query failed: {e}")
-            
-            # Sort by total achievements (descending), then by total points, then by latest achievement
-            sorted_rankings = sorted(
-                user_rankings.values(),
-                key=lambda x: (
-                    x["total_achievements"], 
-                    x["total_points"], 
-                    x["latest_achievement"] or datetime.min.replace(tzinfo=timezone.utc)
-                ),
-                reverse=True
-            )
-            
-            # Add rank numbers and limit results
-            enhanced_rankings = []
-            for i, ranking in enumerate(sorted_rankings[:limit]):
-                ranking["rank"] = i + 1
-                enhanced_rankings.append(ranking)
-            
-            return {
-                "success": True,
-                "leaderboard": enhanced_rankings,
-                "timeframe": timeframe,
-                "total_users": len(enhanced_rankings)
-            }
-            
+            return await RankingService._leaderboard("achievements", timeframe, skip, limit)
         except Exception as e:
             logger.error(f"Achievement leaderboard retrieval failed: {e}")
             raise HTTPException(status_code=500, detail="Achievement leaderboard retrieval failed")
     
     @staticmethod
-    async def get_user_ranking_position(user_id: str, ranking_type: str) -> Dict[str, Any]:
+    async def get_user_ranking_position(user_id: str, ranking_type: str, timeframe: str = "all") -> Dict[str, Any]:
         """Get user's ranking position in leaderboards"""
+        if ranking_type not in BOARDS:
+            raise HTTPException(status_code=400, detail="Invalid ranking type")
         try:
-            if ranking_type == "certificates":
-                # Get all certificate rankings
-                all_rankings = await RankingService.get_certificate_leaderboard(timeframe="all", limit=10000)
-                leaderboard = all_rankings.get("leaderboard", [])
-            elif ranking_type == "achievements":
-                # Get all achievement rankings
-                all_rankings = await RankingService.get_achievement_leaderboard(timeframe="all", limit=10000)
-                leaderboard = all_rankings.get("leaderboard", [])
-            else:
-                raise HTTPException(status_code=400, detail="Invalid ranking type")
-            
-            # Find user's position
-            user_position = None
-            for ranking in leaderboard:
-                if ranking["user_id"] == user_id:
-                    user_position = ranking
-                    break
+            position = await leaderboard_service.get_position(ranking_type, user_id, timeframe)
+            total_users = await User.get_pymongo_collection().estimated_document_count()
             
-            if not user_position:
-                # User not found in rankings, they have 0 certificates/achievements
-                return {
-                    "success": True,
-                    "user_id": user_id,
-                    "ranking_type": ranking_type,
-                    "rank": len(leaderboard) + 1,  # Last position
-                    "total_users": len(leaderboard),
-                    "user_stats": {
-                        "certificate_count": 0,
-                        "nft_certificate_count": 0,
-                        "total_certificates": 0,
-                        "achievement_count": 0,
-                        "nft_achievement_count": 0,
-                        "total_achievements": 0,
-                        "total_points": 0
-                    }
-                }
+            user_stats = {
+                "certificate_count": 0,
+                "nft_certificate_count": 0,
+                "total_certificates": 0,
+                "achievement_count": 0,
+                "nft_achievement_count": 0,
+                "total_achievements": 0,
+                "total_points": 0
+            }
+            if position["rank"] is not None:
+                if ranking_type == "certificates":
+                    details = await RankingService._certificate_details([user_id], timeframe)
+                else:
+                    details = await RankingService._achievement_details([user_id], timeframe)
+                for key in user_stats:
+                    user_stats[key] = details[user_id].get(key, 0)
             
             return {
                 "success": True,
                 "user_id": user_id,
                 "ranking_type": ranking_type,
-                "rank": user_position["rank"],
-                "total_users": len(leaderboard),
-                "user_stats": {
-                    "certificate_count": user_position.get("certificate_count", 0),
-                    "nft_certificate_count": user_position.get("nft_certificate_count", 0),
-                    "total_certificates": user_position.get("total_certificates", 0),
-                    "achievement_count": user_position.get("achievement_count", 0),
-                    "nft_achievement_count": user_position.get("nft_achievement_count", 0),
-                    "total_achievements": user_position.get("total_achievements", 0),
-                    "total_points": user_position.get("total_points", 0)
-                }
+                # Users with nothing on the board share the last position
+                "rank": position["rank"] or position["ranked_users"] + 1,
+                "total_users": max(total_users, position["ranked_users"]),
+                "user_stats": user_stats
             }
             
         except Exception as e:
@@ -335,27 +268,30 @@ class RankingService:
 async def get_certificate_leaderboard(
     timeframe: str = Query("all", regex="^(week|month|year|all)$"),
     limit: int = Query(50, ge=1, le=100),
+    skip: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user)
 ):
     """Get certificate leaderboard ranked by number of certificates"""
-    return await RankingService.get_certificate_leaderboard(timeframe, limit)
+    return await RankingService.get_certificate_leaderboard(timeframe, limit, skip)
 
 @router.get("/achievements")
 async def get_achievement_leaderboard(
     timeframe: str = Query("all", regex="^(week|month|year|all)$"),
     limit: int = Query(50, ge=1, le=100),
+    skip: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user)
 ):
     """Get achievement leaderboard ranked by number of achievements"""
-    return await RankingService.get_achievement_leaderboard(timeframe, limit)
+    return await RankingService.get_achievement_leaderboard(timeframe, limit, skip)
 
 @router.get("/my-position")
 async def get_my_ranking_position(
     ranking_type: str = Query(..., regex="^(certificates|achievements)$"),
+    timeframe: str = Query("all", regex="^(week|month|year|all)$"),
     current_user: User = Depends(get_current_user)
 ):
     """Get current user's ranking position"""
-    return await RankingService.get_user_ranking_position(current_user.did, ranking_type)
+    return await RankingService.get_user_ranking_position(current_user.did, ranking_type, timeframe)
 
 @router.get("/stats")
 async def get_ranking_stats(
@@ -363,32 +299,10 @@ async def get_ranking_stats(
 ):
     """Get overall ranking statistics"""
     try:
-        # Get certificate stats
-        cert_rankings = await RankingService.get_certificate_leaderboard(timeframe="all", limit=10000)
-        cert_leaderboard = cert_rankings.get("leaderboard", [])
-        
-        # Get achievement stats
-        achievement_rankings = await RankingService.get_achievement_leaderboard(timeframe="all", limit=10000)
-        achievement_leaderboard = achievement_rankings.get("leaderboard", [])
-        
-        # Calculate statistics
-        total_certificates = sum(user.get("total_certificates", 0) for user in cert_leaderboard)
-        total_achievements = sum(user.get("total_achievements", 0) for user in achievement_leaderboard)
-        total_points = sum(user.get("total_points", 0) for user in achievement_leaderboard)
-        
-        # Get user's positions
-        user_cert_position = None
-        user_achievement_position = None
-        
-        for user in cert_leaderboard:
-            if user["user_id"] == current_user.did:
-                user_cert_position = user.get("rank")
-                break
-        
-        for user in achievement_leaderboard:
-            if user["user_id"] == current_user.did:
-                user_achievement_position = user.get("rank")
-                break
+        certificate_totals = await leaderboard_service.get_totals("certificates")
+        achievement_totals = await leaderboard_service.get_totals("achievements")
+        certificate_position = await leaderboard_service.get_position("certificates", current_user.did)
+        achievement_position = await leaderboard_service.get_position("achievements", current_user.did)
         
         # Get total active users (users who have logged in recently or have any activity)
         total_active_users = await User.find({"is_active": True}).count()
@@ -396,15 +310,15 @@ async def get_ranking_stats(
         return {
             "success": True,
             "stats": {
-                "total_users_with_certificates": len([u for u in cert_leaderboard if u.get("total_certificates", 0) > 0]),
-                "total_users_with_achievements": len([u for u in achievement_leaderboard if u.get("total_achievements", 0) > 0]),
+                "total_users_with_certificates": certificate_totals["ranked_users"],
+                "total_users_with_achievements": achievement_totals["ranked_users"],
                 "total_active_users": total_active_users,
-                "total_certificates_issued": total_certificates,
-                "total_achievements_earned": total_achievements,
-                "total_points_earned": total_points,
+                "total_certificates_issued": certificate_totals["entries"],
+                "total_achievements_earned": achievement_totals["entries"],
+                "total_points_earned": achievement_totals["points"],
                 "user_rankings": {
-                    "certificate_rank": user_cert_position,
-                    "achievement_rank": user_achievement_position
+                    "certificate_rank": certificate_position["rank"],
+                    "achievement_rank": achievement_position["rank"]
                 }
             }
         }
@@ -412,3 +326,18 @@ async def get_ranking_stats(
     except Exception as e:
         logger.error(f"Ranking stats retrieval failed: {e}")
         raise HTTPException(status_code=500, detail="Ranking stats retrieval failed")
+
+@router.post("/rebuild")
+async def rebuild_leaderboards(
+    current_user: User = Depends(require_admin)
+):
+    """Backfill the materialized leaderboards from MongoDB"""
+    try:
+        if not await leaderboard_service.rebuild():
+            raise HTTPException(status_code=409, detail="Leaderboard rebuild already in progress")
+        return {"success": True, "message": "Leaderboards rebuilt"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Leaderboard rebuild failed: {e}")
+        raise HTTPException(status_code=500, detail="Leaderboard rebuild failed")
@@ -15,7 +15,8 @@ from ..models.subscription import (
     SubscriptionPlan, PaymentMethod, SubscriptionStatus, 
     PaymentStatus
 )
-from ..dependencies import get_current_user, get_optional_user
+from ..services.entitlement_cache import Entitlements
+from ..dependencies import get_current_user, get_optional_user, get_entitlements
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/subscription", tags=["subscription"])
@@ -74,10 +75,10 @@ async def get_subscription_plans():
         raise HTTPException(status_code=500, detail="Failed to get subscription plans")
 
 @router.get("/current")
-async def get_current_subscription(current_user: User = Depends(get_current_user)):
+async def get_current_subscription(entitlements: Entitlements = Depends(get_entitlements)):
     """Get user's current subscription"""
     try:
-        subscription_info = await subscription_service.get_user_plan_info(current_user.did)
+        subscription_info = entitlements.to_plan_info()
         
         return {
             "success": True,
@@ -456,10 +457,10 @@ async def cancel_subscription(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Failed to cancel subscription")
 
 @router.get("/features")
-async def get_user_features(current_user: User = Depends(get_current_user)):
+async def get_user_features(entitlements: Entitlements = Depends(get_entitlements)):
     """Get user's available features based on subscription"""
     try:
-        subscription_info = await subscription_service.get_user_plan_info(current_user.did)
+        subscription_info = entitlements.to_plan_info()
         
         return {
             "success": True,
@@ -476,13 +477,15 @@ async def get_user_features(current_user: User = Depends(get_current_user)):
 @router.get("/check-access/{course_id}")
 async def check_course_access(
     course_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    entitlements: Entitlements = Depends(get_entitlements)
 ):
     """Check if user can access a specific course"""
     try:
         has_access = await subscription_service.check_course_access(
             user_id=current_user.did,
-            course_id=course_id
+            course_id=course_id,
+            entitlements=entitlements
         )
         
         return {
@@ -496,10 +499,13 @@ async def check_course_access(
         raise HTTPException(status_code=500, detail="Failed to check course access")
 
 @router.get("/ai-query-limit")
-async def check_ai_query_limit(current_user: User = Depends(get_current_user)):
+async def check_ai_query_limit(
+    current_user: User = Depends(get_current_user),
+    entitlements: Entitlements = Depends(get_entitlements)
+):
     """Check user's AI query limit status"""
     try:
-        limit_info = await subscription_service.check_ai_query_limit(current_user.did)
+        limit_info = await subscription_service.check_ai_query_limit(current_user.did, entitlements)
         
         return {
             "success": True,
@@ -6,6 +6,7 @@ from ..services.digital_twin_service import DigitalTwinService, update_digital_t
 from ..services.digital_twin_storage import load_digital_twin, save_digital_twin
 from ..services.blockchain_service import BlockchainService
 from ..services.nonce_store import GLOBAL_NONCE_STORE
+from ..services.twin_anchor_worker import twin_anchor_worker
 from ..utils.date_utils import get_current_vietnam_time_iso
 import json
 
@@ -111,6 +112,15 @@ def complete_module_and_pin(
         raise HTTPException(status_code=500, detail=str(e)) 
 
 
+@router.get("/twins/{twin_id}/anchor-proof")
+async def get_anchor_proof(twin_id: str, version: int = None):
+    """Merkle inclusion proof for the latest (or given) anchored twin version."""
+    proof = await twin_anchor_worker.get_proof(twin_id, version)
+    if not proof:
+        raise HTTPException(status_code=404, detail="No anchored version found")
+    return proof
+
+
 @router.post("/twins/{twin_id}/challenge")
 def get_update_challenge(twin_id: str):
     """Issue a nonce for client to sign the next DT update."""
@@ -3,13 +3,14 @@ Video content management API endpoints
 """
 import os
 import uuid
+import asyncio
 import hashlib
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timezone, timedelta
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, BackgroundTasks
 from fastapi.responses import StreamingResponse
-import boto3
 from botocore.exceptions import ClientError
+from pymongo import ReturnDocument
 import logging
 
 from ..models.video_content import (
@@ -20,26 +21,23 @@ from ..models.video_content import (
 from ..models.video_settings import VideoLearningSettings, VideoQuality as PrefQuality
 from ..models.user import User
 from ..dependencies import get_current_user, require_permission
-from ..services.video_processing_service import VideoProcessingService
+from ..services.video_transcode_queue import video_transcode_queue
+from ..services.video_upload_storage import VideoUploadStorage, create_s3_client, MIN_PART_SIZE, MAX_PARTS
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/videos", tags=["videos"])
 
-# Initialize services
-video_processing_service = VideoProcessingService()
-
 # AWS S3 configuration (you can also use Google Cloud Storage)
 S3_BUCKET = os.getenv("S3_BUCKET_NAME", "learn-twin-videos")
 S3_REGION = os.getenv("S3_REGION", "us-east-1")
 CDN_BASE_URL = os.getenv("CDN_BASE_URL")
 
 # Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    region_name=S3_REGION,
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-)
+s3_client = create_s3_client()
+upload_storage = VideoUploadStorage(s3_client, S3_BUCKET)
+
+def _final_storage_key(upload_session: VideoUploadSession) -> str:
+    return f"videos/{upload_session.lesson_id}/{upload_session.filename}"
 
 @router.post("/upload/initiate", response_model=VideoUploadResponse)
 async def initiate_video_upload(
@@ -62,12 +60,18 @@ async def initiate_video_upload(
         session_id = str(uuid.uuid4())
         total_chunks = (request.file_size + request.chunk_size - 1) // request.chunk_size
         
+        # Chunks are stored as S3 multipart parts, which S3 requires to be at least 5MB (except the last)
+        if total_chunks > 1 and request.chunk_size < MIN_PART_SIZE:
+            raise HTTPException(status_code=400, detail="Chunk size must be at least 5MB")
+        if total_chunks > MAX_PARTS:
+            raise HTTPException(status_code=400, detail=f"Too many chunks. Maximum {MAX_PARTS} allowed.")
+        
         # Create temporary storage path
         temp_path = f"uploads/temp/{session_id}/{request.filename}"
         
         upload_session = VideoUploadSession(
             session_id=session_id,
-            user_id=current_user.user_id,
+            user_id=current_user.did,
             lesson_id=request.lesson_id,
             filename=request.filename,
             file_size=request.file_size,
@@ -77,6 +81,11 @@ async def initiate_video_upload(
             expires_at=datetime.now(timezone.utc) + timedelta(hours=24)  # 24 hour expiry
         )
         
+        # Open the multipart upload on the final key; chunks are uploaded straight into it
+        upload_session.multipart_upload_id = await asyncio.to_thread(
+            upload_storage.start, _final_storage_key(upload_session), 'video/mp4'
+        )
+        
         await upload_session.insert()
         
         # Generate presigned URL for upload
@@ -98,6 +107,8 @@ async def initiate_video_upload(
             expires_at=upload_session.expires_at
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to initiate video upload: {e}")
         raise HTTPException(status_code=500, detail="Failed to initiate video upload")
@@ -105,6 +116,7 @@ async def initiate_video_upload(
 @router.post("/upload/chunk/{session_id}")
 async def upload_chunk(
     session_id: str,
+    background_tasks: BackgroundTasks,
     chunk_number: int = Form(...),
     chunk_data: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
@@ -117,7 +129,7 @@ async def upload_chunk(
             raise HTTPException(status_code=404, detail="Upload session not found")
         
         # Verify user ownership
-        if upload_session.user_id != current_user.user_id:
+        if upload_session.user_id != current_user.did:
             raise HTTPException(status_code=403, detail="Access denied")
         
         # Check if session is expired
@@ -132,67 +144,146 @@ async def upload_chunk(
         if chunk_number in upload_session.uploaded_chunks:
             return {"message": "Chunk already uploaded", "chunk_number": chunk_number}
         
-        # Upload chunk to S3
-        chunk_key = f"{upload_session.temp_storage_path}.chunk_{chunk_number}"
-        
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=chunk_key,
-            Body=chunk_data.file.read(),
-            ContentType='application/octet-stream'
+        if upload_session.status != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload session is {upload_session.status}")
+        
+        if upload_session.multipart_upload_id:
+            # Stream the spooled chunk into its multipart part without reading it into memory
+            part_number = chunk_number + 1
+            etag = await asyncio.to_thread(
+                upload_storage.put_part,
+                _final_storage_key(upload_session),
+                upload_session.multipart_upload_id,
+                part_number,
+                chunk_data.file
+            )
+            part_update = {f"upload_parts.{part_number}": etag}
+        else:
+            # Sessions opened before multipart uploads keep one object per chunk
+            chunk_key = f"{upload_session.temp_storage_path}.chunk_{chunk_number}"
+            await asyncio.to_thread(
+                s3_client.upload_fileobj,
+                chunk_data.file, S3_BUCKET, chunk_key,
+                ExtraArgs={'ContentType': 'application/octet-stream'}
+            )
+            part_update = {}
+        
+        # Record the chunk atomically; parallel chunk requests must not overwrite each other
+        sessions = VideoUploadSession.get_pymongo_collection()
+        updated = await sessions.find_one_and_update(
+            {"session_id": session_id, "status": "uploading"},
+            {
+                "$addToSet": {"uploaded_chunks": chunk_number},
+                "$set": {**part_update, "updated_at": datetime.now(timezone.utc)}
+            },
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Update session
-        upload_session.uploaded_chunks.append(chunk_number)
-        upload_session.progress = (len(upload_session.uploaded_chunks) / upload_session.total_chunks) * 100
-        upload_session.updated_at = datetime.now(timezone.utc)
-        
-        # Check if all chunks uploaded
-        if len(upload_session.uploaded_chunks) == upload_session.total_chunks:
-            upload_session.status = "completed"
-            # Trigger video processing
-            await process_uploaded_video(upload_session)
-        
-        await upload_session.save()
+        if not updated:
+            raise HTTPException(status_code=409, detail="Upload session is no longer accepting chunks")
+        
+        progress = (len(updated["uploaded_chunks"]) / upload_session.total_chunks) * 100
+        status = "uploading"
+        await sessions.update_one({"session_id": session_id}, {"$max": {"progress": progress}})
+        
+        # Check if all chunks uploaded; only the request that flips the status schedules assembly
+        if len(updated["uploaded_chunks"]) == upload_session.total_chunks:
+            claimed = await sessions.update_one(
+                {"session_id": session_id, "status": "uploading"},
+                {"$set": {"status": "assembling"}}
+            )
+            if claimed.modified_count:
+                background_tasks.add_task(process_uploaded_video, session_id)
+            status = "assembling"
         
         return {
             "message": "Chunk uploaded successfully",
             "chunk_number": chunk_number,
-            "progress": upload_session.progress,
-            "status": upload_session.status
+            "progress": progress,
+            "status": status
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to upload chunk: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload chunk")
 
-async def process_uploaded_video(upload_session: VideoUploadSession):
-    """Process uploaded video after all chunks are received"""
+@router.delete("/upload/{session_id}")
+async def cancel_video_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Cancel an unfinished upload and discard the chunks stored for it"""
     try:
-        # Combine chunks into final video file
-        final_key = f"videos/{upload_session.lesson_id}/{upload_session.filename}"
+        upload_session = await VideoUploadSession.find_one({"session_id": session_id})
+        if not upload_session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
         
-        # Download and combine chunks
-        combined_data = b""
-        for chunk_number in range(upload_session.total_chunks):
-            chunk_key = f"{upload_session.temp_storage_path}.chunk_{chunk_number}"
-            
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=chunk_key)
-            combined_data += response['Body'].read()
-        
-        # Upload final video
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=final_key,
-            Body=combined_data,
-            ContentType='video/mp4'
-        )
+        if upload_session.user_id != current_user.did:
+            raise HTTPException(status_code=403, detail="Access denied")
         
-        # Clean up chunks
-        for chunk_number in range(upload_session.total_chunks):
-            chunk_key = f"{upload_session.temp_storage_path}.chunk_{chunk_number}"
-            s3_client.delete_object(Bucket=S3_BUCKET, Key=chunk_key)
+        if upload_session.status != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload session is {upload_session.status}")
+        
+        upload_session.status = "cancelled"
+        upload_session.updated_at = datetime.now(timezone.utc)
+        await upload_session.save()
+        
+        if upload_session.multipart_upload_id:
+            await asyncio.to_thread(
+                upload_storage.abort, _final_storage_key(upload_session), upload_session.multipart_upload_id
+            )
+        else:
+            await asyncio.to_thread(
+                upload_storage.delete_objects,
+                [f"{upload_session.temp_storage_path}.chunk_{n}" for n in upload_session.uploaded_chunks]
+            )
+        
+        return {"message": "Upload cancelled", "session_id": session_id}
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to cancel video upload: {e}")
+        raise HTTPException(status_code=500, detail="Failed to cancel video upload")
+
+async def process_uploaded_video(session_id: str):
+    """Assemble the uploaded chunks into the final video and start processing (background task)"""
+    upload_session = await VideoUploadSession.find_one({"session_id": session_id})
+    if not upload_session:
+        logger.error(f"Upload session {session_id} disappeared before assembly")
+        return
+    
+    final_key = _final_storage_key(upload_session)
+    try:
+        if upload_session.multipart_upload_id:
+            # S3 concatenates the parts server-side
+            parts = {int(number): etag for number, etag in upload_session.upload_parts.items()}
+            await asyncio.to_thread(upload_storage.complete, final_key, upload_session.multipart_upload_id, parts)
+        else:
+            chunk_keys = [
+                f"{upload_session.temp_storage_path}.chunk_{chunk_number}"
+                for chunk_number in range(upload_session.total_chunks)
+            ]
+            await asyncio.to_thread(
+                upload_storage.assemble_from_objects, chunk_keys, final_key, 'video/mp4', upload_session.chunk_size
+            )
+    except Exception as e:
+        logger.error(f"Failed to assemble uploaded video {session_id}: {e}")
+        upload_session.status = "failed"
+        upload_session.error_message = str(e)
+        upload_session.updated_at = datetime.now(timezone.utc)
+        await upload_session.save()
+        return
+    
+    # Update upload session
+    upload_session.status = "completed"
+    upload_session.progress = 100.0
+    upload_session.final_storage_path = final_key
+    upload_session.updated_at = datetime.now(timezone.utc)
+    await upload_session.save()
+    
+    try:
         # Create video content record
         video_id = str(uuid.uuid4())
         video_content = VideoContent(
@@ -209,20 +300,15 @@ async def process_uploaded_video(upload_session: VideoUploadSession):
             bucket_name=S3_BUCKET,
             storage_path=final_key,
             processing_status=VideoProcessingStatus(
-                status="processing",
-                progress=0.0,
-                started_at=datetime.now(timezone.utc)
+                status="queued",
+                progress=0.0
             )
         )
         
         await video_content.insert()
         
-        # Update upload session
-        upload_session.final_storage_path = final_key
-        await upload_session.save()
-        
-        # Start video processing
-        await video_processing_service.process_video(video_content)
+        # Transcoding runs on the transcode worker pool
+        await video_transcode_queue.enqueue(video_content.video_id)
         
     except Exception as e:
         logger.error(f"Failed to process uploaded video: {e}")
@@ -340,6 +426,7 @@ async def get_video_streaming_url(
         return VideoStreamingUrlResponse(
             video_id=video_id,
             streaming_url=streaming_url,
+            hls_manifest_url=video_content.hls_manifest_url,
             thumbnail_url=video_content.thumbnail_url,
             subtitles=video_content.subtitles,
             qualities=[q.dict() for q in video_content.qualities],
@@ -408,6 +495,32 @@ async def update_video_metadata(
         logger.error(f"Failed to update video metadata: {e}")
         raise HTTPException(status_code=500, detail="Failed to update video metadata")
 
+def _delete_video_objects(video_content: VideoContent):
+    """Delete the original, every rendition, thumbnail and subtitle of a video from S3"""
+    # Delete original file
+    s3_client.delete_object(Bucket=S3_BUCKET, Key=video_content.storage_path)
+    
+    # Delete all quality variants (HLS playlists and their segments)
+    hls_prefix = f"videos/{video_content.lesson_id}/{video_content.video_id}/hls/"
+    paginator = s3_client.get_paginator('list_objects_v2')
+    hls_keys = [
+        obj['Key']
+        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=hls_prefix)
+        for obj in page.get('Contents', [])
+    ]
+    upload_storage.delete_objects(hls_keys)
+    for quality in video_content.qualities:
+        if not quality.storage_path.startswith(hls_prefix):
+            s3_client.delete_object(Bucket=S3_BUCKET, Key=quality.storage_path)
+    
+    # Delete thumbnails
+    for thumbnail in video_content.thumbnails:
+        s3_client.delete_object(Bucket=S3_BUCKET, Key=thumbnail.url)
+    
+    # Delete subtitles
+    for subtitle in video_content.subtitles:
+        s3_client.delete_object(Bucket=S3_BUCKET, Key=subtitle.url)
+
 @router.delete("/{video_id}")
 async def delete_video(
     video_id: str,
@@ -419,23 +532,9 @@ async def delete_video(
         if not video_content:
             raise HTTPException(status_code=404, detail="Video not found")
         
-        # Delete from S3
+        # Delete from S3 (blocking boto3 calls, kept off the event loop)
         try:
-            # Delete original file
-            s3_client.delete_object(Bucket=S3_BUCKET, Key=video_content.storage_path)
-            
-            # Delete all quality variants
-            for quality in video_content.qualities:
-                s3_client.delete_object(Bucket=S3_BUCKET, Key=quality.storage_path)
-            
-            # Delete thumbnails
-            for thumbnail in video_content.thumbnails:
-                s3_client.delete_object(Bucket=S3_BUCKET, Key=thumbnail.url)
-            
-            # Delete subtitles
-            for subtitle in video_content.subtitles:
-                s3_client.delete_object(Bucket=S3_BUCKET, Key=subtitle.url)
-                
+            await asyncio.to_thread(_delete_video_objects, video_content)
         except ClientError as e:
             logger.warning(f"Failed to delete some files from S3: {e}")
         
@@ -444,6 +543,8 @@ async def delete_video(
         
         return {"message": "Video deleted successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to delete video: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete video")
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
@@ -11,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from digital_twin.services.blockchain_service import BlockchainService
 from ..services.zkp_service import ZKPService
+from ..services.prover_pool import prover_pool
 
 router = APIRouter(prefix="/zkp", tags=["ZKP"])
 
@@ -78,7 +80,8 @@ async def generate_learning_proof(
 ):
     """Generate ZK-SNARK proof for learning achievement"""
     try:
-        result = blockchain_service.generate_zkp_learning_proof(
+        result = await asyncio.to_thread(
+            blockchain_service.generate_zkp_learning_proof,
             student_address=request.student_address,
             module_id=request.module_id,
             score=request.score,
@@ -106,7 +109,8 @@ async def generate_skill_proof(
 ):
     """Generate ZK-SNARK proof for skill verification"""
     try:
-        result = blockchain_service.generate_zkp_skill_proof(
+        result = await asyncio.to_thread(
+            blockchain_service.generate_zkp_skill_proof,
             student_address=request.student_address,
             skill_type=request.skill_type,
             total_modules=request.total_modules,
@@ -135,7 +139,8 @@ async def verify_proof(
 ):
     """Verify a ZK-SNARK proof"""
     try:
-        result = blockchain_service.verify_zkp_proof(
+        result = await asyncio.to_thread(
+            blockchain_service.verify_zkp_proof,
             proof=request.proof,
             public_inputs=request.public_inputs,
             circuit_type=request.circuit_type
@@ -226,7 +231,8 @@ async def batch_verify_proofs(
 ):
     """Batch verify multiple learning achievement proofs on-chain"""
     try:
-        result = blockchain_service.batch_verify_learning_proofs(
+        result = await asyncio.to_thread(
+            blockchain_service.batch_verify_learning_proofs,
             proofs=request.proofs,
             public_inputs_list=request.public_inputs_list,
             metadata_uris=request.metadata_uris,
@@ -274,7 +280,8 @@ async def create_zkp_certificate(
 ):
     """Create ZKP certificate for student"""
     try:
-        result = blockchain_service.create_zkp_certificate(
+        result = await asyncio.to_thread(
+            blockchain_service.create_zkp_certificate,
             student_did=student_did,
             student_address=student_address,
             twin_data=twin_data
@@ -308,5 +315,6 @@ async def get_zkp_status():
         "circuits": [
             "learning_achievement.circom",
             "skill_verification.circom"
-        ]
+        ],
+        "prover_pool": prover_pool.metrics()
     } 
\ No newline at end of file
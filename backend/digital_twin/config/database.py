@@ -13,9 +13,9 @@ load_dotenv()
 
 from ..models.user import User, UserProfile
 from ..models.user_settings import UserSettings
-from ..models.digital_twin import DigitalTwin, DigitalTwinVersion
+from ..models.digital_twin import DigitalTwin, DigitalTwinVersion, TwinAnchorProof
 from ..models.course import Course, Module, Enrollment, ModuleProgress, Lesson
-from ..models.nft import NFTRecord
+from ..models.nft import NFTRecord, CertificateMintBatch
 from ..models.session import UserSession, RefreshToken
 from ..models.wallet import WalletLink, SIWENonce
 from ..models.permission import Role, Permission, UserRoleAssignment
@@ -24,6 +24,7 @@ from ..models.discussion import Discussion, Comment, DiscussionLike, CommentLike
 from ..models.video_settings import VideoLearningSettings, VideoSession
 from ..models.video_content import VideoContent, VideoUploadSession
 from ..models.subscription import UserSubscription, PaymentTransaction, SubscriptionFeature, SubscriptionPlanConfig
+from ..models.notification import NotificationOutbox
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +59,7 @@ async def connect_to_mongo():
                 UserSettings,
                 DigitalTwin,
                 DigitalTwinVersion,
+                TwinAnchorProof,
                 Course,
                 Module,
                 Lesson,
@@ -68,6 +70,7 @@ async def connect_to_mongo():
                 Achievement,
                 UserAchievement,
                 NFTRecord,
+                CertificateMintBatch,
                 UserSession,
                 RefreshToken,
                 WalletLink,
@@ -86,7 +89,8 @@ async def connect_to_mongo():
                 UserSubscription,
                 PaymentTransaction,
                 SubscriptionFeature,
-                SubscriptionPlanConfig
+                SubscriptionPlanConfig,
+                NotificationOutbox
             ]
         )
         
@@ -7,7 +7,9 @@ from fastapi.security import HTTPBearer
 import logging
 
 from .services.auth_service import AuthService
+from .services.entitlement_cache import Entitlements, entitlement_cache
 from .models.user import User
+from .middleware.auth_context import get_auth_context
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer(auto_error=False)
@@ -22,7 +24,7 @@ async def get_current_user(request: Request) -> User:
         auth_header = request.headers.get("Authorization", "")
         logger.debug(f"Auth attempt - Session: {'✅' if session_id else '❌'}, Bearer: {'✅' if auth_header.startswith('Bearer ') else '❌'}")
         
-        user = await auth_service.get_current_user(request)
+        user = await get_auth_context(request).get_user(auth_service, request)
         if not user:
             logger.warning("Authentication failed: No user found")
             raise HTTPException(
@@ -46,7 +48,7 @@ async def get_current_user(request: Request) -> User:
 async def get_optional_user(request: Request) -> Optional[User]:
     """Get current user if authenticated, None otherwise"""
     try:
-        return await auth_service.get_current_user(request)
+        return await get_auth_context(request).get_user(auth_service, request)
     except Exception as e:
         logger.debug(f"Optional user retrieval error: {e}")
         return None
@@ -54,10 +56,11 @@ async def get_optional_user(request: Request) -> Optional[User]:
 async def get_current_user_optional(request: Request) -> Optional[Dict[str, Any]]:
     """Get current user dict if authenticated, None otherwise"""
     try:
-        user = await auth_service.get_current_user(request)
+        auth_context = get_auth_context(request)
+        user = await auth_context.get_user(auth_service, request)
         if user:
             try:
-                permissions = await auth_service.get_user_permissions(user.did)
+                permissions = await auth_context.get_permissions(auth_service)
             except Exception as perm_error:
                 logger.warning(f"Failed to get user permissions: {perm_error}")
                 permissions = ["read_own_profile", "read_courses", "read_modules"]  # Default permissions
@@ -75,9 +78,14 @@ async def get_current_user_optional(request: Request) -> Optional[Dict[str, Any]
 
 def require_permission(permission: str):
     """Dependency factory for permission-based authorization"""
-    async def permission_checker(current_user: User = Depends(get_current_user)) -> User:
+    async def permission_checker(request: Request, current_user: User = Depends(get_current_user)) -> User:
         logger.debug(f"Checking permission '{permission}' for user: {current_user.email}")
-        has_permission = await auth_service.check_permission(current_user.did, permission)
+        try:
+            has_permission = await get_auth_context(request).has_permission(auth_service, permission)
+        except Exception as e:
+            logger.error(f"Permission check failed for user {current_user.did}, permission '{permission}': {e}")
+            # Same fallback as AuthService.check_permission for critical learning permissions
+            has_permission = permission in ["read_lessons", "read_courses", "read_modules"]
         if not has_permission:
             logger.warning(f"Permission denied: User {current_user.email} lacks '{permission}'")
             raise HTTPException(
@@ -125,9 +133,18 @@ def require_wallet_connected():
         return current_user
     return wallet_connected_checker
 
-async def get_user_permissions(current_user: User = Depends(get_current_user)) -> list[str]:
+async def get_user_permissions(request: Request, current_user: User = Depends(get_current_user)) -> list[str]:
     """Get current user's permissions"""
-    return await auth_service.get_user_permissions(current_user.did)
+    return await get_auth_context(request).get_permissions(auth_service)
+
+async def get_entitlements(current_user: User = Depends(get_current_user)) -> Entitlements:
+    """Get current user's subscription entitlements (resolved once per request)"""
+    try:
+        return await entitlement_cache.resolve(current_user.did)
+    except Exception as e:
+        logger.error(f"Failed to resolve entitlements: {e}")
+        # Free tier without caching it
+        return Entitlements(user_id=current_user.did)
 
 # Custom dependency combinations
 async def require_student(current_user: User = Depends(require_role("student"))) -> User:
@@ -167,9 +184,8 @@ async def require_connected_student(
 # Rate limiting dependency
 async def rate_limit_auth(request: Request):
     """Rate limiting for authentication endpoints"""
-    from .services.redis_service import RedisService
+    from .services.redis_service import redis_service
     
-    redis_service = RedisService()
     client_ip = request.client.host if request.client else "unknown"
     
     # Allow 10 auth requests per minute per IP
@@ -2,6 +2,7 @@
 Enhanced LearnTwinChain main application with complete authentication and RBAC
 """
 import os
+import asyncio
 import uvicorn
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
@@ -43,8 +44,19 @@ from digital_twin.api.ai_chat_api import router as ai_chat_router
 from .config.config import config
 from .config.database import connect_to_mongo, close_mongo_connection
 from .services.auth_service import AuthService
-from .services.redis_service import RedisService
+from .services.redis_service import redis_service
 from .services.subscription_service import SubscriptionService
+from .services.permission_cache import permission_cache
+from .services.entitlement_cache import entitlement_cache
+from .services.ipfs_service import ipfs_http_pool
+from .services.twin_update_buffer import twin_update_buffer
+from .services.digital_twin_service import DigitalTwinService
+from .services.twin_anchor_worker import twin_anchor_worker
+from .services.notification_outbox import notification_outbox
+from .services.video_transcode_queue import video_transcode_queue
+from .services.prover_pool import prover_pool
+from .services.search_index import search_index
+from .services.rag_engine import rag_engine, RAGEngineBusy
 from .middleware import SessionMiddleware
 from .utils import Logger
 
@@ -60,12 +72,13 @@ logger = Logger("main")
 
 # Initialize services
 auth_service = AuthService()
-redis_service = RedisService()
 subscription_service = SubscriptionService()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
+    # Fire-and-forget startup work, cancelled on shutdown if still running
+    background_tasks = []
     try:
         # Startup
         logger.info("Starting LearnTwinChain application...")
@@ -74,7 +87,7 @@ async def lifespan(app: FastAPI):
         await connect_to_mongo()
         logger.info("MongoDB connected")
         
-        # Connect to Redis
+        # Connect the Redis pool shared by every service
         await redis_service.connect()
         logger.info("Redis connected")
         
@@ -82,10 +95,38 @@ async def lifespan(app: FastAPI):
         await auth_service.create_default_roles()
         logger.info("Default roles and permissions created")
         
+        # Compile the role -> permission graph for the permission cache
+        await permission_cache.load_roles()
+        permission_cache.start()
+        logger.info("Permission cache warmed")
+        
+        # Build the catalog search index without delaying startup
+        background_tasks.append(asyncio.create_task(search_index.ensure_ready()))
+        
+        # Load the shared RAG agent (embedding model + Milvus) in the background
+        if os.getenv("RAG_WARMUP_ENABLED", "true").lower() == "true":
+            background_tasks.append(asyncio.create_task(rag_engine.warm_up()))
+        
         # Initialize subscription plans
         await subscription_service.initialize_default_plans()
+        entitlement_cache.start()
         logger.info("Subscription plans initialized")
         
+        # Start batched blockchain anchoring of digital twin versions
+        if os.getenv("ANCHOR_WORKER_ENABLED", "true").lower() == "true":
+            twin_anchor_worker.start()
+        
+        # Pin digital twin snapshots lost with a worker that stopped mid-window
+        background_tasks.append(asyncio.create_task(DigitalTwinService().recover_unpinned_updates()))
+        
+        # Deliver queued notification emails in the background
+        if os.getenv("NOTIFY_OUTBOX_ENABLED", "true").lower() == "true":
+            notification_outbox.start()
+        
+        # Resume queued or interrupted video transcodes
+        if os.getenv("VIDEO_TRANSCODE_ENABLED", "true").lower() == "true":
+            video_transcode_queue.start()
+        
         logger.info("Application startup completed successfully")
         
         yield
@@ -97,6 +138,42 @@ async def lifespan(app: FastAPI):
         # Shutdown
         logger.info("Shutting down application...")
         
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        
+        try:
+            # Persist coalesced digital twin updates
+            await twin_update_buffer.flush_all()
+            logger.info("Pending digital twin updates flushed")
+        except Exception as e:
+            logger.error(f"Digital twin update flush error: {e}")
+        
+        try:
+            await permission_cache.stop()
+        except Exception as e:
+            logger.error(f"Permission cache listener shutdown error: {e}")
+        
+        try:
+            await entitlement_cache.stop()
+        except Exception as e:
+            logger.error(f"Entitlement cache listener shutdown error: {e}")
+        
+        try:
+            await twin_anchor_worker.stop()
+        except Exception as e:
+            logger.error(f"Twin anchor worker shutdown error: {e}")
+        
+        try:
+            await notification_outbox.stop()
+        except Exception as e:
+            logger.error(f"Notification outbox shutdown error: {e}")
+        
+        try:
+            await video_transcode_queue.stop()
+        except Exception as e:
+            logger.error(f"Video transcode queue shutdown error: {e}")
+        
         try:
             # Close MongoDB connection
             await close_mongo_connection()
@@ -111,6 +188,26 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Redis shutdown error: {e}")
         
+        try:
+            # Close pooled IPFS HTTP connections
+            await ipfs_http_pool.aclose()
+            logger.info("IPFS connection pool closed")
+        except Exception as e:
+            logger.error(f"IPFS pool shutdown error: {e}")
+        
+        try:
+            # Stop persistent snarkjs prover workers
+            await asyncio.to_thread(prover_pool.close)
+            logger.info("Prover workers stopped")
+        except Exception as e:
+            logger.error(f"Prover pool shutdown error: {e}")
+        
+        try:
+            rag_engine.shutdown()
+            logger.info("RAG executor stopped")
+        except Exception as e:
+            logger.error(f"RAG engine shutdown error: {e}")
+        
         logger.info("Application shutdown completed")
 
 # Initialize FastAPI app
@@ -132,7 +229,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    expose_headers=["*", "X-Next-Cursor"]
 )
 
 # Add Session middleware to automatically attach session data to req.user
@@ -335,6 +432,18 @@ async def not_found_handler(request: Request, exc):
         }
     )
 
+@app.exception_handler(RAGEngineBusy)
+async def rag_busy_handler(request: Request, exc: RAGEngineBusy):
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "Service Unavailable",
+            "message": "The AI service is busy, please retry shortly",
+            "status_code": 503
+        },
+        headers={"Retry-After": "5"}
+    )
+
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc):
     logger.error(f"Internal server error: {exc}")
@@ -10,6 +10,7 @@ from .session_middleware import (
     require_session_auth,
     require_csrf_token
 )
+from .auth_context import AuthContext, get_auth_context
 
 __all__ = [
     "SessionMiddleware",
@@ -17,5 +18,7 @@ __all__ = [
     "get_session_data",
     "get_csrf_token",
     "require_session_auth",
-    "require_csrf_token"
+    "require_csrf_token",
+    "AuthContext",
+    "get_auth_context"
 ]
@@ -0,0 +1,154 @@
+"""
+Request-scoped authentication context
+Resolves session, user and permissions at most once per request:
+1. SessionMiddleware reads the session from Redis and stores it on the context
+2. The first dependency that needs the user loads it. Permissions come from
+   the in-process cache, then the Redis tier shared by all workers; on a miss
+   in both the user's active role assignments come back in the same
+   aggregation as the user and are compiled against the in-memory role graph
+3. Every later dependency in the same request reuses the memoized result
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Set
+
+from fastapi import Request
+
+from ..models.user import User
+from ..services.permission_cache import permission_cache
+
+logger = logging.getLogger(__name__)
+
+class AuthContext:
+    """Authentication state resolved once and shared by all dependencies of a request"""
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.session_data: Optional[Dict[str, Any]] = None
+        self.user: Optional[User] = None
+        self.permissions: Optional[Set[str]] = None
+        self._session_loaded = False
+        self._user_loaded = False
+        # Per-request counter of auth round-trips, e.g. {"redis": 1, "mongo": 1}
+        self.round_trips: Dict[str, int] = {"redis": 0, "mongo": 0}
+
+    @property
+    def user_id(self) -> Optional[str]:
+        """User DID from the loaded user or the session"""
+        if self.user:
+            return self.user.did
+        if self.session_data:
+            return self.session_data.get("userID")
+        return None
+
+    @property
+    def total_round_trips(self) -> int:
+        """Total number of auth round-trips made for this request"""
+        return sum(self.round_trips.values())
+
+    def record(self, backend: str, count: int = 1):
+        """Record auth round-trips against a backend ("redis" or "mongo")"""
+        self.round_trips[backend] = self.round_trips.get(backend, 0) + count
+
+    async def load_session(self, auth_service) -> Optional[Dict[str, Any]]:
+        """Read the session from Redis (called once by SessionMiddleware)"""
+        if not self._session_loaded:
+            self._session_loaded = True
+            if self.session_id:
+                self.record("redis")
+                self.session_data = await auth_service.get_session_data(self.session_id)
+        return self.session_data
+
+    async def get_user(self, auth_service, request: Request) -> Optional[User]:
+        """Get the authenticated user, loading it (and its permissions) on first use"""
+        if self._user_loaded:
+            return self.user
+        self._user_loaded = True
+
+        session_data = await self.load_session(auth_service)
+        user_id = session_data.get("userID") if session_data else None
+        if user_id:
+            cached = permission_cache.get_local(user_id)
+            if cached is None:
+                self.record("redis")
+                cached = await permission_cache.get(user_id)
+            self.record("mongo")
+            if cached is not None:
+                self.user = await User.find_one({"did": user_id, "is_active": True})
+                self.permissions = set(cached) if self.user else None
+            else:
+                if not permission_cache.roles_loaded:
+                    self.record("mongo")
+                    await permission_cache.ensure_roles()
+                self.user, self.permissions = await _load_user_with_permissions(user_id)
+
+        if not self.user:
+            # No valid Redis session: MongoDB session or JWT fallback (slow path)
+            self.record("mongo")
+            self.user = await auth_service.get_current_user(request, skip_redis=True)
+
+        return self.user
+
+    async def get_permissions(self, auth_service) -> List[str]:
+        """Get the authenticated user's permissions, resolving them at most once"""
+        if self.permissions is None:
+            if not self.user:
+                return []
+            self.record("mongo")
+            self.permissions = set(await auth_service.get_user_permissions(self.user.did))
+        return list(self.permissions)
+
+    async def has_permission(self, auth_service, permission: str) -> bool:
+        """Check a single permission against the resolved permission set"""
+        await self.get_permissions(auth_service)
+        return permission in self.permissions
+
+async def _load_user_with_permissions(user_id: str):
+    """Load an active user and its role assignments in one aggregation round-trip
+
+    Returns (user, permissions). Users without an active role assignment get the
+    permissions of their primary role, matching PermissionCache.resolve.
+    """
+    now = datetime.now(timezone.utc)
+    pipeline = [
+        {"$match": {"did": user_id, "is_active": True}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "user_role_assignments",
+            "let": {"did": "$did"},
+            "pipeline": [
+                {"$match": {
+                    "$expr": {"$eq": ["$user_id", "$$did"]},
+                    "is_active": True,
+                    "$or": [
+                        {"expires_at": None},
+                        {"expires_at": {"$gt": now}}
+                    ]
+                }},
+                {"$project": {"_id": 0, "role_name": 1, "expires_at": 1}}
+            ],
+            "as": "_role_assignments"
+        }}
+    ]
+
+    results = await User.aggregate(pipeline).to_list()
+    if not results:
+        return None, None
+
+    doc = results[0]
+    assignments = doc.pop("_role_assignments", [])
+    user = User.model_validate(doc)
+
+    role_names = [a["role_name"] for a in assignments] or [user.role]
+    permissions = permission_cache.compile(role_names, user.permissions)
+    ttl = permission_cache.ttl_for((a.get("expires_at") for a in assignments), permission_cache.redis_ttl)
+    await permission_cache.set(user_id, permissions, ttl)
+    return user, set(permissions)
+
+def get_auth_context(request: Request) -> AuthContext:
+    """Get the request's AuthContext, creating one if SessionMiddleware did not run"""
+    context = getattr(request.state, "auth_context", None)
+    if context is None:
+        context = AuthContext(request.cookies.get("session_id"))
+        request.state.auth_context = context
+    return context
@@ -3,6 +3,7 @@ Session middleware to automatically attach session data to req.user
 Implements the exact authentication flow:
 1. Client sends session cookie automatically with each request
 2. Server looks up the session ID in Redis and attaches session data to req.user
+3. The same lookup seeds a request-scoped AuthContext reused by every auth dependency
 """
 import logging
 from typing import Optional, Dict, Any
@@ -11,6 +12,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
 from ..services.auth_service import AuthService
+from .auth_context import AuthContext
 
 logger = logging.getLogger(__name__)
 
@@ -31,9 +33,11 @@ class SessionMiddleware(BaseHTTPMiddleware):
             
             # Check for session cookie
             session_id = request.cookies.get("session_id")
+            auth_context = AuthContext(session_id)
+            request.state.auth_context = auth_context
             if session_id:
-                # Look up session ID in Redis and get complete session data
-                session_data = await self.auth_service.get_session_data(session_id)
+                # Look up session ID in Redis once and get complete session data
+                session_data = await auth_context.load_session(self.auth_service)
                 
                 if session_data:
                     # Attach session data to req.user (following exact user requirement)
@@ -58,6 +62,9 @@ class SessionMiddleware(BaseHTTPMiddleware):
             # Process the request
             response = await call_next(request)
             
+            if auth_context.total_round_trips:
+                logger.debug(f"Auth round-trips for {request.url.path}: {auth_context.round_trips}")
+            
             return response
             
         except Exception as e:
@@ -66,6 +73,7 @@ class SessionMiddleware(BaseHTTPMiddleware):
             request.state.user = None
             request.state.session_data = None
             request.state.csrf_token = None
+            request.state.auth_context = AuthContext(request.cookies.get("session_id"))
             
             response = await call_next(request)
             return response
@@ -206,6 +206,7 @@ class Enrollment(Document):
     completed_at: Optional[datetime] = Field(default=None, description="Course completion timestamp")
     final_grade: Optional[float] = Field(default=None, description="Final grade/score")
     certificate_issued: bool = Field(default=False, description="Certificate issuance status")
+    certificate_issued_at: Optional[datetime] = Field(default=None, description="When the certificate was issued")
     certificate_nft_token_id: Optional[str] = Field(default=None, description="Certificate NFT token ID")
     
     # Metadata
@@ -87,6 +87,7 @@ class DigitalTwin(Document):
     # Version control
     version: int = Field(default=1, description="Twin version number")
     latest_cid: Optional[str] = Field(default=None, description="Latest IPFS CID")
+    unpinned_since: Optional[datetime] = Field(default=None, description="First update not yet in the pinned snapshot")
     
     # On-chain anchoring
     on_chain_tx_hash: Optional[str] = Field(default=None, description="Blockchain transaction hash")
@@ -126,6 +127,7 @@ class DigitalTwin(Document):
             IndexModel("twin_id", unique=True),
             IndexModel("owner_did"),
             IndexModel("latest_cid"),
+            IndexModel("unpinned_since"),
             IndexModel("anchor_status"),
             IndexModel("updated_at"),
             IndexModel("privacy_level"),
@@ -376,4 +378,36 @@ class DigitalTwinVersion(Document):
             IndexModel("cid"),
             IndexModel("created_at"),
             IndexModel("verified")
-        ]
\ No newline at end of file
+        ]
+
+class TwinAnchorProof(Document):
+    """Merkle inclusion proof for a twin version anchored in a batch root"""
+    
+    twin_id: Indexed(str) = Field(..., description="Digital twin identifier")
+    version: int = Field(..., description="Anchored twin version")
+    cid: str = Field(..., description="IPFS CID of the anchored state")
+    data_hash: str = Field(..., description="sha256 hex of the canonical twin payload")
+    
+    # Merkle batch
+    leaf: str = Field(..., description="Leaf hash (0x-prefixed keccak256)")
+    leaf_index: int = Field(..., description="Leaf position in the batch")
+    proof: List[str] = Field(default_factory=list, description="Sibling hashes from leaf to root")
+    merkle_root: str = Field(..., description="Batch Merkle root anchored on-chain")
+    batch_number: int = Field(..., description="Anchor batch sequence number")
+    batch_size: int = Field(..., description="Number of leaves in the batch")
+    manifest_cid: Optional[str] = Field(default=None, description="IPFS CID of the batch manifest")
+    
+    # On-chain anchor
+    tx_hash: Optional[str] = Field(default=None, description="Anchor transaction hash")
+    block_number: Optional[int] = Field(default=None, description="Anchor block number")
+    registry_address: Optional[str] = Field(default=None, description="Registry contract address")
+    anchored_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    class Settings:
+        name = "twin_anchor_proofs"
+        indexes = [
+            IndexModel([("twin_id", 1), ("version", 1)], unique=True),
+            IndexModel("cid"),
+            IndexModel("merkle_root"),
+            IndexModel("batch_number")
+        ]
@@ -141,6 +141,7 @@ class Comment(Document):
             IndexModel("parent_comment_id"),
             IndexModel("created_at"),
             [("discussion_id", 1), ("created_at", 1)],
+            [("parent_comment_id", 1), ("created_at", 1)],
         ]
     
     def to_dict(self):
@@ -249,4 +249,62 @@ class MintingQueue(Document):
             IndexModel("priority"),
             IndexModel("created_at"),
             IndexModel("assigned_worker")
-        ]
\ No newline at end of file
+        ]
+
+class CertificateMintItem(BaseModel):
+    """One student's certificate inside a cohort mint batch"""
+    index: int
+    student_address: str
+    student_did: str
+    course_data: Dict[str, Any] = {}
+    status: str = "pending"  # pending, metadata_pinned, submitted, minted, failed
+    certificate_id: Optional[str] = None
+    image_uri: Optional[str] = None
+    metadata_uri: Optional[str] = None
+    tx_hash: Optional[str] = None
+    tx_hashes: List[str] = []  # every broadcast version of the mint (fee bumps reuse the nonce)
+    nonce: Optional[int] = None
+    registry_tx_hash: Optional[str] = None
+    token_id: Optional[str] = None
+    block_number: Optional[int] = None
+    zk_proof_hash: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+class CertificateMintBatch(Document):
+    """Resumable bulk mint of course completion certificates for a cohort"""
+    
+    batch_id: Indexed(str, unique=True) = Field(..., description="Unique batch identifier")
+    course_name: str = Field(..., description="Course name printed on the certificates")
+    course_id: Optional[str] = Field(default=None, description="Related course ID")
+    created_by: Optional[str] = Field(default=None, description="DID of the user who started the batch")
+    
+    # Progress
+    status: str = Field(default="pending", description="pending, running, completed, partial, failed")
+    items: List[CertificateMintItem] = Field(default_factory=list, description="Per-student mint status")
+    image_dir_cid: Optional[str] = Field(default=None, description="IPFS directory of certificate images")
+    metadata_dir_cid: Optional[str] = Field(default=None, description="IPFS directory of certificate metadata")
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    class Settings:
+        name = "certificate_mint_batches"
+        indexes = [
+            IndexModel("batch_id", unique=True),
+            IndexModel("course_id"),
+            IndexModel("status"),
+            IndexModel("created_at")
+        ]
+    
+    def update_timestamp(self):
+        """Update the updated_at timestamp"""
+        self.updated_at = datetime.now(timezone.utc)
+    
+    def status_counts(self) -> Dict[str, int]:
+        """Number of items in each status"""
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
@@ -0,0 +1,37 @@
+"""
+Notification outbox model
+"""
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+class NotificationOutbox(Document):
+    """Queued user notification, delivered by the outbox dispatcher"""
+
+    event_key: str = Field(..., description="Deduplication key of the triggering event")
+    kind: str = Field(..., description="course_completion, achievement, certificate, milestone")
+    user_id: str = Field(..., description="Recipient DID")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Template parameters")
+
+    # Delivery
+    status: str = Field(default="pending", description="pending, sending, sent, failed, skipped")
+    attempts: int = Field(default=0, description="Delivery attempts so far")
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    claimed_by: Optional[str] = Field(default=None, description="Dispatcher claim token while sending")
+    claimed_at: Optional[datetime] = Field(default=None, description="When the current claim was taken")
+    last_error: Optional[str] = Field(default=None, description="Error of the last failed attempt")
+
+    # Timestamps
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: Optional[datetime] = Field(default=None, description="When the email was accepted by SMTP")
+
+    class Settings:
+        name = "notification_outbox"
+        indexes = [
+            IndexModel("event_key", unique=True),
+            IndexModel([("status", 1), ("next_attempt_at", 1)]),
+            IndexModel("claimed_by"),
+            IndexModel("user_id")
+        ]
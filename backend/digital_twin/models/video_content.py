@@ -34,12 +34,15 @@ class VideoSubtitle(BaseModel):
 
 class VideoProcessingStatus(BaseModel):
     """Video processing status tracking"""
-    status: str = Field(..., description="Processing status: pending, processing, completed, failed")
+    status: str = Field(..., description="Processing status: pending, queued, processing, completed, failed")
     progress: float = Field(default=0.0, ge=0.0, le=100.0, description="Processing progress percentage")
     error_message: Optional[str] = Field(None, description="Error message if failed")
     started_at: Optional[datetime] = Field(None, description="Processing start time")
     completed_at: Optional[datetime] = Field(None, description="Processing completion time")
     processing_job_id: Optional[str] = Field(None, description="External processing job ID")
+    worker_id: Optional[str] = Field(None, description="Transcode worker holding the job")
+    heartbeat_at: Optional[datetime] = Field(None, description="Last heartbeat of the transcode worker")
+    attempts: int = Field(default=0, description="Transcode attempts so far")
 
 class VideoContent(Document):
     """Video content document with comprehensive metadata"""
@@ -68,6 +71,12 @@ class VideoContent(Document):
     # Video qualities
     qualities: List[VideoQuality] = Field(default_factory=list, description="Available video qualities")
     default_quality: str = Field(default="720p", description="Default quality to serve")
+    hls_manifest_path: Optional[str] = Field(None, description="Storage path of the HLS master playlist")
+    hls_manifest_url: Optional[str] = Field(None, description="CDN URL of the HLS master playlist")
+    hls_segments: Dict[str, List[Dict[str, float]]] = Field(
+        default_factory=dict,
+        description="Transcode checkpoint: duration and size of each uploaded segment per unfinished rendition"
+    )
     
     # Thumbnails and previews
     thumbnail_url: Optional[str] = Field(None, description="Main thumbnail URL")
@@ -134,6 +143,7 @@ class VideoContent(Document):
             "storage_path": self.storage_path,
             "qualities": [q.dict() for q in self.qualities],
             "default_quality": self.default_quality,
+            "hls_manifest_url": self.hls_manifest_url,
             "thumbnail_url": self.thumbnail_url,
             "thumbnails": [t.dict() for t in self.thumbnails],
             "preview_gif_url": self.preview_gif_url,
@@ -174,13 +184,15 @@ class VideoUploadSession(Document):
     uploaded_chunks: List[int] = Field(default_factory=list, description="List of uploaded chunk numbers")
     
     # Upload status
-    status: str = Field(default="uploading", description="Upload status: uploading, completed, failed")
+    status: str = Field(default="uploading", description="Upload status: uploading, assembling, completed, failed, cancelled")
     progress: float = Field(default=0.0, ge=0.0, le=100.0, description="Upload progress percentage")
     error_message: Optional[str] = Field(None, description="Error message if failed")
     
     # Storage information
     temp_storage_path: str = Field(..., description="Temporary storage path")
     final_storage_path: Optional[str] = Field(None, description="Final storage path after completion")
+    multipart_upload_id: Optional[str] = Field(None, description="S3 multipart UploadId; chunks are its parts")
+    upload_parts: Dict[str, str] = Field(default_factory=dict, description="S3 part number -> ETag")
     
     # Timestamps
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -221,6 +233,7 @@ class VideoMetadataUpdateRequest(BaseModel):
 class VideoStreamingUrlResponse(BaseModel):
     video_id: str
     streaming_url: str
+    hls_manifest_url: Optional[str] = None
     thumbnail_url: Optional[str] = None
     subtitles: List[VideoSubtitle] = []
     qualities: List[VideoQuality] = []
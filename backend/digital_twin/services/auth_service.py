@@ -22,7 +22,8 @@ from ..models.user import User, UserProfile
 from ..models.session import UserSession, RefreshToken
 from ..models.permission import Role, Permission, UserRoleAssignment
 from .email_service import EmailService
-from .redis_service import RedisService
+from .redis_service import get_redis_service
+from .permission_cache import permission_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +47,7 @@ class AuthService:
     
     def __init__(self):
         self.email_service = EmailService()
-        self.redis_service = RedisService()
+        self.redis_service = get_redis_service()
         self.jwt_secret = os.getenv("JWT_SECRET_KEY", "your-secret-key")
         self.jwt_algorithm = os.getenv("JWT_ALGORITHM", "HS256")
         self.access_token_expire_minutes = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
@@ -547,6 +548,7 @@ class AuthService:
                     existing.assigned_by = "system"
                     existing.notes = f"Reactivated during registration"
                     await existing.save()
+                    await permission_cache.invalidate_user(user_id)
                     logger.info(f"✅ Reactivated existing role {role_name} for user: {user_id}")
                 else:
                     logger.info(f"✅ Role {role_name} already active for user: {user_id}")
@@ -592,6 +594,8 @@ class AuthService:
                 logger.error(f"Role assignment verification failed for user: {user_id}")
                 raise HTTPException(status_code=500, detail="Role assignment verification failed")
             
+            await permission_cache.invalidate_user(user_id)
+            
         except HTTPException:
             raise
         except Exception as e:
@@ -601,39 +605,9 @@ class AuthService:
             raise HTTPException(status_code=500, detail=f"Role assignment failed: {str(e)}")
     
     async def get_user_permissions(self, user_id: str) -> List[str]:
-        """Get all permissions for a user"""
+        """Get all permissions for a user (served from the compiled permission cache)"""
         try:
-            # Get user's role assignments
-            assignments = await UserRoleAssignment.find({
-                "user_id": user_id,
-                "is_active": True,
-                "$or": [
-                    {"expires_at": None},
-                    {"expires_at": {"$gt": datetime.now(timezone.utc)}}
-                ]
-            }).to_list()
-            
-            permissions = set()
-            
-            # If no role assignments, assign default student role
-            if not assignments:
-                await self.assign_default_role(user_id, "student")
-                # Get the assignment we just created
-                assignments = await UserRoleAssignment.find({
-                    "user_id": user_id,
-                    "is_active": True
-                }).to_list()
-            
-            for assignment in assignments:
-                role = await Role.find_one({"name": assignment.role_name, "is_active": True})
-                if role:
-                    permissions.update(role.permissions)
-            
-            # Get user's direct permissions
-            user = await User.find_one({"did": user_id})
-            if user and hasattr(user, 'permissions') and user.permissions:
-                permissions.update(user.permissions)
-            
+            permissions = await permission_cache.resolve(user_id)
             return list(permissions)
             
         except Exception as e:
@@ -644,10 +618,10 @@ class AuthService:
     async def check_permission(self, user_id: str, permission: str) -> bool:
         """Check if user has specific permission"""
         try:
-            permissions = await self.get_user_permissions(user_id)
+            permissions = await permission_cache.resolve(user_id)
             has_permission = permission in permissions
             if not has_permission:
-                logger.warning(f"User {user_id} missing permission '{permission}'. Has: {permissions}")
+                logger.warning(f"User {user_id} missing permission '{permission}'. Has: {sorted(permissions)}")
             return has_permission
         except Exception as e:
             logger.error(f"Permission check failed for user {user_id}, permission '{permission}': {e}")
@@ -670,11 +644,16 @@ class AuthService:
                     await permission.insert()
             
             # Create roles
+            roles_created = False
             for role_data in DEFAULT_ROLES:
                 existing = await Role.find_one({"name": role_data["name"]})
                 if not existing:
                     role = Role(**role_data)
                     await role.insert()
+                    roles_created = True
+            
+            if roles_created:
+                await permission_cache.invalidate_roles()
             
             logger.info("Default roles and permissions created")
             
@@ -700,24 +679,48 @@ class AuthService:
             logger.error(f"Session data retrieval error: {e}")
             return None
     
+    async def extend_session_data(self, session_id: str, ttl: int, expires_at: datetime) -> Optional[Dict[str, Any]]:
+        """Move a live Redis session's expiration to expires_at; returns the updated session data"""
+        try:
+            session_data = await self.redis_service.extend_session(session_id, ttl, expires_at.isoformat())
+            if not session_data:
+                return None
+            expiration_str = session_data.get("expiration_time")
+            if expiration_str:
+                previous_expiry = datetime.fromisoformat(expiration_str.replace('Z', '+00:00'))
+                if previous_expiry <= datetime.now(timezone.utc):
+                    # Session had already expired, clean up instead of reviving it
+                    await self.redis_service.delete_session(session_id)
+                    return None
+            session_data["expiration_time"] = expires_at.isoformat()
+            return session_data
+        except Exception as e:
+            logger.error(f"Session extension error: {e}")
+            return None
+    
     # User management
-    async def get_current_user(self, request: Request) -> Optional[User]:
-        """Get current user from session or token with Redis-to-MongoDB fallback"""
+    async def get_current_user(self, request: Request, skip_redis: bool = False) -> Optional[User]:
+        """Get current user from session or token with Redis-to-MongoDB fallback
+
+        skip_redis is set by the request AuthContext, which has already read the
+        Redis session for this request.
+        """
         try:
             # Try session-based auth first (Redis primary with MongoDB fallback)
             session_id = request.cookies.get("session_id")
             if session_id:
                 # Primary: Try Redis session data (fast path)
-                try:
-                    session_data = await self.get_session_data(session_id)
-                    if session_data:
-                        user_id = session_data.get("userID")
-                        if user_id:
-                            user = await User.find_one({"did": user_id, "is_active": True})
-                            if user:
-                                return user
-                except Exception as redis_error:
-                    logger.warning(f"Redis session lookup failed, trying MongoDB fallback: {redis_error}")
+                if not skip_redis:
+                    try:
+                        session_data = await self.get_session_data(session_id)
+                        if session_data:
+                            user_id = session_data.get("userID")
+                            if user_id:
+                                user = await User.find_one({"did": user_id, "is_active": True})
+                                if user:
+                                    return user
+                    except Exception as redis_error:
+                        logger.warning(f"Redis session lookup failed, trying MongoDB fallback: {redis_error}")
                 
                 # Fallback: Try MongoDB session (slow path, but reliable)
                 try:
@@ -10,7 +10,8 @@ from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
 from .zkp_service import ZKPService
 from .ipfs_service import IPFSService
-import threading
+from .tx_pipeline import get_tx_pipeline
+from .chain_read_cache import get_chain_read_cache
 
 load_dotenv()
 
@@ -21,10 +22,12 @@ class BlockchainService:
         self.contracts = {}
         self.zkp_service = ZKPService()
         self.ipfs_service = IPFSService()
-        # Transaction queue management primitives
-        self.tx_queue = []
-        self.last_nonce = None
-        self.tx_lock = threading.Lock()
+        # Shared nonce-managed transaction pipeline (set once the account is loaded)
+        self.tx_pipeline = None
+        # Shared read-through cache for contract calls and event queries
+        self.read_cache = None
+        self._health_cache = None
+        self.health_check_ttl = float(os.getenv('HEALTH_CHECK_CACHE_SECONDS', '30'))
         self._initialize_blockchain()
         # Helpers for deterministic hashing
         self._json_sort_separators = (',', ':')
@@ -42,37 +45,11 @@ class BlockchainService:
                 # If call fails, attempt to add anyway
                 pass
 
-            # Build EIP-1559 owner tx to add module
-            latest_block = self.w3.eth.get_block('latest')
-            base_fee = latest_block.get('baseFeePerGas', 0) or 0
-            try:
-                priority_fee = self.w3.eth.max_priority_fee
-            except Exception:
-                priority_fee = self.w3.to_wei(3, 'gwei')
-            max_priority_fee = int(priority_fee * 2)
-            max_fee_per_gas = int(base_fee * 5 + max_priority_fee)
-            pending_nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
-            fn_add = module_nft.functions.addValidModule(module_id)
-            gas_est = fn_add.estimate_gas({'from': self.account.address})
-            tx = fn_add.build_transaction({
-                'from': self.account.address,
-                'nonce': pending_nonce,
-                'type': 2,
-                'gas': int(gas_est * 3),
-                'maxFeePerGas': max_fee_per_gas,
-                'maxPriorityFeePerGas': max_priority_fee,
-                'chainId': self.w3.eth.chain_id
-            })
-            signed = self.w3.eth.account.sign_transaction(tx, private_key=os.getenv('BLOCKCHAIN_PRIVATE_KEY'))
-            tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-            self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+            # Owner tx to add module (EIP-1559 fees and nonce from the shared pipeline)
+            pending = self.tx_pipeline.submit(module_nft.functions.addValidModule, module_id)
+            self.tx_pipeline.wait(pending)
         except Exception as e:
             print(f"   ⚠️  Could not whitelist module '{module_id}': {e}")
-        
-        # Transaction queue management
-        self.tx_queue = []
-        self.last_nonce = None
-        self.tx_lock = threading.Lock()
     
     def _initialize_blockchain(self):
         """Initialize blockchain connection and contracts"""
@@ -87,6 +64,8 @@ class BlockchainService:
             # Initialize Web3
             self.w3 = Web3(Web3.HTTPProvider(rpc_url))
             self.account = Account.from_key(private_key)
+            self.tx_pipeline = get_tx_pipeline(self.w3, self.account, private_key, endpoint=rpc_url)
+            self.read_cache = get_chain_read_cache(self.w3, endpoint=rpc_url)
             
             # Load contract addresses from new environment variables
             learning_data_registry_address = os.getenv('LEARNING_DATA_REGISTRY')
@@ -324,16 +303,44 @@ class BlockchainService:
             return tx_result
         except Exception as e:
             return {'success': False, 'error': f'register_twin failed: {str(e)}'}
-    
-    def _send_transaction(self, contract_function, contract_address, *args):
-        """Send a transaction with proper gas estimation and error handling"""
+
+    def anchor_merkle_root(self, batch_did: str, batch_number: int, merkle_root_hex: str, manifest_cid: str) -> Dict[str, Any]:
+        """Anchor one Merkle root covering a batch of twin updates.
+
+        The root is logged through DigitalTwinRegistry.logTwinUpdate under a
+        dedicated batch DID (registered to the service account on first use),
+        with the batch number as version and the batch manifest CID.
+        """
+        if not self.is_available():
+            return {'success': False, 'error': 'Blockchain service not available'}
+        try:
+            contract = self.contracts['digital_twin_registry']
+            try:
+                controller = contract.functions.didOwner(batch_did).call()
+            except Exception:
+                controller = None
+            if not controller or int(controller, 16) == 0:
+                registered = self.register_twin(batch_did, self.account.address)
+                if not registered.get('success'):
+                    return registered
+            root_bytes32 = bytes.fromhex(merkle_root_hex[2:] if merkle_root_hex.startswith('0x') else merkle_root_hex)
+            fn = contract.functions.logTwinUpdate
+            tx_result = self._send_transaction(fn, contract.address, batch_did, int(batch_number), root_bytes32, manifest_cid)
+            if tx_result.get('success'):
+                tx_result['registry_address'] = contract.address
+            return tx_result
+        except Exception as e:
+            return {'success': False, 'error': f'anchor_merkle_root failed: {str(e)}'}
+
+    def _send_transaction(self, contract_function, contract_address, *args, gas: Optional[int] = None):
+        """Send a transaction through the shared nonce-managed pipeline and wait for its receipt"""
         max_retries = 3
         retry_count = 0
         
         while retry_count < max_retries:
             try:
-                # Check network health before sending transaction
-                health_status = self._check_network_health()
+                # Check network health before sending transaction (cached between sends)
+                health_status = self._cached_network_health()
                 
                 if not health_status.get('healthy', False):
                     if not health_status.get('sufficient_balance', False):
@@ -345,52 +352,16 @@ class BlockchainService:
                     if health_status.get('is_congested', False):
                         print(f"   ⚠️  Network is congested. Waiting 30 seconds before retry...")
                         time.sleep(30)
+                        self._health_cache = None
                         retry_count += 1
                         continue
                 
-                # Get current gas price and increase it for better success rate
-                base_fee = self.w3.eth.get_block('latest')['baseFeePerGas']
-                priority_fee = self.w3.eth.max_priority_fee
-                
-                # Increase priority fee aggressively for inclusion
-                max_priority_fee = int(priority_fee * 2)
-                max_fee_per_gas = int(base_fee * 5 + max_priority_fee)  # Higher headroom
-                
-                # Build transaction with EIP-1559 gas pricing
-                tx = contract_function(*args).build_transaction({
-                    'from': self.account.address,
-                    'nonce': self._get_next_nonce(),
-                    'gas': 0,  # Will be estimated
-                    'maxFeePerGas': max_fee_per_gas,
-                    'maxPriorityFeePerGas': max_priority_fee,
-                    'type': 2  # EIP-1559 transaction
-                })
-                
-                # Estimate gas with higher buffer
-                estimated_gas = contract_function(*args).estimate_gas({
-                    'from': self.account.address,
-                    'maxFeePerGas': max_fee_per_gas,
-                    'maxPriorityFeePerGas': max_priority_fee
-                })
-                
-                # Add larger buffer to gas estimate for complex ZK operations
-                tx['gas'] = int(estimated_gas * 3.0)
-                
-                print(f"   🔧 Transaction details:")
-                print(f"      Gas limit: {tx['gas']}")
-                print(f"      Max fee per gas: {max_fee_per_gas}")
-                print(f"      Max priority fee: {max_priority_fee}")
-                print(f"      Estimated gas: {estimated_gas}")
-                
-                # Sign and send transaction
-                signed_tx = self.w3.eth.account.sign_transaction(tx, private_key=os.getenv('BLOCKCHAIN_PRIVATE_KEY'))
-                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-                
-                print(f"   🔧 Transaction sent: {tx_hash.hex()}")
-                print(f"   🔧 Waiting for confirmation...")
-                
-                # Wait for transaction receipt with longer timeout
-                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)  # 5 minutes timeout
+                # Nonce allocation, signing and broadcast are serialized only briefly;
+                # the receipt is awaited on the pipeline's shared poller
+                pending = self.tx_pipeline.submit(contract_function, *args, gas=gas)
+                print(f"   🔧 Transaction sent: {pending.tx_hash.hex()} (nonce {pending.nonce})")
+                receipt = self.tx_pipeline.wait(pending)
+                tx_hash = receipt['transactionHash']
                 
                 if receipt.status == 1:
                     print(f"   ✅ Transaction confirmed in block {receipt.blockNumber}")
@@ -421,18 +392,24 @@ class BlockchainService:
                     wait_time = 2 ** retry_count
                     print(f"   🔄 Retrying in {wait_time} seconds...")
                     time.sleep(wait_time)
-                    
-                    # Increase gas price for retry
-                    base_fee = self.w3.eth.get_block('latest')['baseFeePerGas']
-                    priority_fee = self.w3.eth.max_priority_fee
-                    max_priority_fee = int(priority_fee * (2 + retry_count * 0.5))
-                    max_fee_per_gas = int(base_fee * (5 + retry_count * 0.8) + max_priority_fee)  # Higher gas for retries
+                    # Fetch fresh fee data for the retry
+                    self.tx_pipeline.gas.invalidate()
                 else:
                     return {
                         'success': False,
                         'error': f'Transaction failed after {max_retries} attempts: {error_msg}'
                     }
 
+    def _cached_network_health(self) -> Dict[str, Any]:
+        """Network health check result, reused for HEALTH_CHECK_CACHE_SECONDS"""
+        now = time.monotonic()
+        cached = self._health_cache
+        if cached and now - cached[0] < self.health_check_ttl and cached[1].get('healthy'):
+            return cached[1]
+        health_status = self._check_network_health()
+        self._health_cache = (now, health_status)
+        return health_status
+
     def _check_network_health(self) -> Dict[str, Any]:
         """Check network health and account balance before sending transactions"""
         try:
@@ -829,17 +806,27 @@ class BlockchainService:
             print(f"Error creating achievement metadata: {e}")
             return "ipfs://QmExampleAchievementMetadata"
 
-    def _create_course_certificate_ipfs(self, course_data: Dict[str, Any]) -> str:
-        """Create a professional course completion certificate (SVG + metadata) and upload to IPFS"""
-        try:
-            student_name = course_data.get('student_name', 'Student')
-            course_title = course_data.get('course_name', 'Course')
-            completed_at = course_data.get('completed_at', int(time.time()))
-            issuer = course_data.get('issuer', 'LearnTwinChain')
-            certificate_id = hashlib.sha256(f"{student_name}_{course_title}_{completed_at}".encode()).hexdigest()[:12]
-
-            # Elegant certificate SVG
-            svg = f'''<?xml version="1.0" encoding="UTF-8"?>
+    def submit_certificate_registration(self, student_address: str, metadata_uri: str, certificate_type: str):
+        """Broadcast ZKPCertificateRegistry.createZKPCertificate without waiting for the receipt"""
+        if 'zkp_certificate_registry' not in self.contracts:
+            raise ValueError('ZKPCertificateRegistry not loaded')
+        return self.tx_pipeline.submit(
+            self.contracts['zkp_certificate_registry'].functions.createZKPCertificate,
+            self.w3.to_checksum_address(student_address),
+            metadata_uri,
+            certificate_type
+        )
+
+    def render_course_certificate_svg(self, course_data: Dict[str, Any]):
+        """Render the course completion certificate SVG; returns (svg, certificate_id)"""
+        student_name = course_data.get('student_name', 'Student')
+        course_title = course_data.get('course_name', 'Course')
+        completed_at = course_data.get('completed_at', int(time.time()))
+        issuer = course_data.get('issuer', 'LearnTwinChain')
+        certificate_id = hashlib.sha256(f"{student_name}_{course_title}_{completed_at}".encode()).hexdigest()[:12]
+
+        # Elegant certificate SVG
+        svg = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg width="1200" height="800" xmlns="http://www.w3.org/200/svg">
   <defs>
     <linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="0%">
@@ -873,6 +860,36 @@ class BlockchainService:
     <text x="140" y="48" font-family="'Georgia', serif" font-size="18" fill="#334155" text-anchor="middle">ID: {certificate_id}</text>
   </g>
 </svg>'''
+        return svg, certificate_id
+
+    def course_certificate_metadata(self, course_data: Dict[str, Any], image_uri: str, certificate_id: str) -> Dict[str, Any]:
+        """ERC-721 metadata for a course completion certificate"""
+        student_name = course_data.get('student_name', 'Student')
+        course_title = course_data.get('course_name', 'Course')
+        completed_at = course_data.get('completed_at', int(time.time()))
+        issuer = course_data.get('issuer', 'LearnTwinChain')
+        return {
+            'name': f"Course Completion: {course_title}",
+            'description': f"Official course completion certificate for {student_name} issued by {issuer} with zero-knowledge verification.",
+            'image': image_uri,
+            'attributes': [
+                {'trait_type': 'Student', 'value': student_name},
+                {'trait_type': 'Course', 'value': course_title},
+                {'trait_type': 'Completed At', 'value': completed_at},
+                {'trait_type': 'Issuer', 'value': issuer},
+                {'trait_type': 'Verification', 'value': 'ZK-SNARK'}
+            ],
+            'properties': {
+                'certificate_id': certificate_id,
+                'type': 'course_completion',
+                'version': '1.0'
+            }
+        }
+
+    def _create_course_certificate_ipfs(self, course_data: Dict[str, Any]) -> str:
+        """Create a professional course completion certificate (SVG + metadata) and upload to IPFS"""
+        try:
+            svg, certificate_id = self.render_course_certificate_svg(course_data)
 
             import tempfile, os as _os
             with tempfile.NamedTemporaryFile(mode='w', suffix='.svg', delete=False) as f:
@@ -883,30 +900,29 @@ class BlockchainService:
             finally:
                 _os.unlink(svg_path)
 
-            metadata = {
-                'name': f"Course Completion: {course_title}",
-                'description': f"Official course completion certificate for {student_name} issued by {issuer} with zero-knowledge verification.",
-                'image': f"ipfs://{image_cid}",
-                'attributes': [
-                    {'trait_type': 'Student', 'value': student_name},
-                    {'trait_type': 'Course', 'value': course_title},
-                    {'trait_type': 'Completed At', 'value': completed_at},
-                    {'trait_type': 'Issuer', 'value': issuer},
-                    {'trait_type': 'Verification', 'value': 'ZK-SNARK'}
-                ],
-                'properties': {
-                    'certificate_id': certificate_id,
-                    'type': 'course_completion',
-                    'version': '1.0'
-                }
-            }
-
+            metadata = self.course_certificate_metadata(course_data, f"ipfs://{image_cid}", certificate_id)
             meta_cid = self.ipfs_service.upload_json(metadata, f"course_certificate_{certificate_id}")
             return f"ipfs://{meta_cid}"
         except Exception as e:
             print(f"Error creating course certificate: {e}")
             return "ipfs://QmExampleCourseCert"
 
+    def course_completion_proof_input(self, student_address: str, course_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Learning achievement circuit input for a course completion"""
+        return {
+            'achievement_type': 'course_completion',
+            'total_modules': course_data.get('total_modules', 0),
+            'average_score': course_data.get('average_score', 0),
+            'practice_hours': course_data.get('practice_hours', 0),
+            'min_modules_required': max(1, course_data.get('min_modules_required', 1)),
+            'min_average_score': course_data.get('min_average_score', 60),
+            'min_practice_hours': course_data.get('min_practice_hours', 0),
+            'student_address': student_address,
+            'student_signature': course_data.get('student_signature', ''),
+            'challenge_nonce': course_data.get('challenge_nonce', ''),
+            'timestamp': int(time.time())
+        }
+
     def mint_course_completion_certificate(
         self,
         student_address: str,
@@ -917,19 +933,7 @@ class BlockchainService:
         """Mint a professional course completion certificate as ERC-721 with ZKP and also record in ZKPCertificateRegistry"""
         try:
             # Prepare ZK proof based on course metrics
-            proof_input = {
-                'achievement_type': 'course_completion',
-                'total_modules': course_data.get('total_modules', 0),
-                'average_score': course_data.get('average_score', 0),
-                'practice_hours': course_data.get('practice_hours', 0),
-                'min_modules_required': max(1, course_data.get('min_modules_required', 1)),
-                'min_average_score': course_data.get('min_average_score', 60),
-                'min_practice_hours': course_data.get('min_practice_hours', 0),
-                'student_address': student_address,
-                'student_signature': course_data.get('student_signature', ''),
-                'challenge_nonce': course_data.get('challenge_nonce', ''),
-                'timestamp': int(time.time())
-            }
+            proof_input = self.course_completion_proof_input(student_address, course_data)
 
             zk_proof = self.zkp_service.generate_learning_achievement_proof(proof_input)
             if not zk_proof.get('success'):
@@ -1066,15 +1070,29 @@ class BlockchainService:
             
             try:
                 checksum_addr = self.w3.to_checksum_address(student_address)
-                # Query LearningAchievementNFT events
+                # One JSON-RPC batch for everything the page needs (cached until a relevant event)
+                reads = {}
                 if self.contracts and 'learning_achievement_nft' in self.contracts:
+                    reads['achievements'] = self.read_cache.event_logs(
+                        self.contracts['learning_achievement_nft'], 'AchievementMinted', {'student': checksum_addr}
+                    )
+                if self.contracts and 'module_progress_nft' in self.contracts:
+                    reads['modules'] = self.read_cache.event_logs(
+                        self.contracts['module_progress_nft'], 'ModuleCompleted', {'student': checksum_addr}
+                    )
+                if self.contracts and 'zkp_certificate_registry' in self.contracts:
+                    reads['certificate_ids'] = self.read_cache.contract_call(
+                        self.contracts['zkp_certificate_registry'], 'getStudentCertificates', checksum_addr
+                    )
+                results = dict(zip(reads, self.read_cache.read_many(list(reads.values()), return_exceptions=True)))
+
+                # LearningAchievementNFT events
+                if 'achievements' in results:
                     la = self.contracts['learning_achievement_nft']
                     try:
-                        logs = la.events.AchievementMinted().get_logs(
-                            from_block=0,
-                            to_block='latest',
-                            argument_filters={'student': checksum_addr}
-                        )
+                        logs = results['achievements']
+                        if isinstance(logs, Exception):
+                            raise logs
                         for ev in logs:
                             args = ev['args']
                             token_id = int(args['tokenId']) if 'tokenId' in args else None
@@ -1092,10 +1110,12 @@ class BlockchainService:
                     except Exception as _e:
                         print(f"Achievement event query failed: {_e}")
                 # ModuleProgressNFT events (best-effort; depends on ABI fields)
-                if self.contracts and 'module_progress_nft' in self.contracts:
+                if 'modules' in results:
                     mp = self.contracts['module_progress_nft']
                     try:
-                        logs = mp.events.ModuleCompleted().get_logs(from_block=0, to_block='latest', argument_filters={'student': checksum_addr})
+                        logs = results['modules']
+                        if isinstance(logs, Exception):
+                            raise logs
                         for ev in logs:
                             args = ev['args']
                             module_id = args.get('moduleId') if 'moduleId' in args else ''
@@ -1118,6 +1138,15 @@ class BlockchainService:
                             })
                     except Exception as _e:
                         print(f"Module event query failed: {_e}")
+                # ZKPCertificateRegistry entries
+                if 'certificate_ids' in results:
+                    try:
+                        certificate_ids = results['certificate_ids']
+                        if isinstance(certificate_ids, Exception):
+                            raise certificate_ids
+                        zkp_certificates = self._read_zkp_certificates(certificate_ids)
+                    except Exception as _e:
+                        print(f"ZKP certificate query failed: {_e}")
             except Exception as query_error:
                 print(f"Warning: Could not query blockchain data: {query_error}")
                 # Continue with empty data instead of failing
@@ -1441,23 +1470,17 @@ class BlockchainService:
                 public_inputs_int
             )
             
-            tx = self.contracts['module_progress_nft'].functions.mintWithZKProof(
+            # Send from the service account; nonce and fees come from the shared pipeline
+            pending = self.tx_pipeline.submit(
+                self.contracts['module_progress_nft'].functions.mintWithZKProof,
                 mint_params,
-                zk_proof_data
-            ).build_transaction({
-                # Use service account for sending the transaction
-                'from': self.account.address,
-                'nonce': self._get_next_nonce(),
-                'gas': 500000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Sign and send transaction
-            signed_tx = self.w3.eth.account.sign_transaction(tx, private_key=os.getenv('BLOCKCHAIN_PRIVATE_KEY'))
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                zk_proof_data,
+                gas=500000
+            )
             
-            # Wait for transaction receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+            # Wait for transaction receipt (polled by the pipeline, replaced if stuck)
+            receipt = self.tx_pipeline.wait(pending)
+            tx_hash = receipt['transactionHash']
             
             if receipt.status == 1:
                 # Extract token ID from event
@@ -1515,109 +1538,128 @@ class BlockchainService:
         Mint LearningAchievementNFT using on-chain zkSNARK proof verification
         """
         try:
-            # Extract proof components
-            a = proof.get('pi_a', [])
-            b = proof.get('pi_b', [])
-            c = proof.get('pi_c', [])
-            # Only take the first 2 elements of each proof array (snarkjs returns 3)
-            proof_a = [int(a[0]), int(a[1])] if len(a) >= 2 else [0, 0]
-            # Swap G2 coordinates to match Solidity bn128 pairing expectations
-            proof_b = [[int(b[0][1]), int(b[0][0])], [int(b[1][1]), int(b[1][0])]] if len(b) >= 2 and len(b[0]) >= 2 and len(b[1]) >= 2 else [[0, 0], [0, 0]]
-            proof_c = [int(c[0]), int(c[1])] if len(c) >= 2 else [0, 0]
-            print(f"   🔍 Proof A: {proof_a}")
-            print(f"   🔍 Proof B: {proof_b}")
-            print(f"   🔍 Proof C: {proof_c}")
-            
-            # Ensure public inputs are in the correct format (LearningAchievementNFT expects 9)
-            if len(public_inputs) != 9:
-                return {
-                    'success': False,
-                    'error': f'Invalid number of public inputs. Expected 9, got {len(public_inputs)}'
-                }
-            public_inputs_int = [int(x) for x in public_inputs]
-            
-            # Call the LearningAchievementNFT contract directly
-            if 'learning_achievement_nft' not in self.contracts:
-                return {
-                    'success': False,
-                    'error': 'LearningAchievementNFT contract not loaded'
-                }
-            
-            # Build transaction for LearningAchievementNFT.mintWithZKProof using structs
-            # Create MintParams struct
-            mint_params = (
-                achievement_type,
-                title,
-                description,
-                metadata_uri,
-                score,
-                expires_at
-            )
-            
-            # Create ZKProofData struct
-            zk_proof_data = (
-                proof_a,
-                proof_b,
-                proof_c,
-                public_inputs_int
+            pending = self.submit_learning_achievement_mint(
+                proof, public_inputs, achievement_type, title, description, metadata_uri, score, expires_at
             )
             
-            tx = self.contracts['learning_achievement_nft'].functions.mintWithZKProof(
-                mint_params,
-                zk_proof_data
-            ).build_transaction({
-                # Use service account for sending the transaction
-                'from': self.account.address,
-                'nonce': self._get_next_nonce(),
-                'gas': 500000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Sign and send transaction
-            signed_tx = self.w3.eth.account.sign_transaction(tx, private_key=os.getenv('BLOCKCHAIN_PRIVATE_KEY'))
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            
-            # Wait for transaction receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-            
-            if receipt.status == 1:
-                # Extract token ID from event
-                token_id = None
-                proof_hash = None
-                for log in receipt.logs:
-                    if log.address.lower() == self.contracts['learning_achievement_nft'].address.lower():
-                        try:
-                            event = self.contracts['learning_achievement_nft'].events.AchievementMinted().process_log(log)
-                            token_id = event['args']['tokenId']
-                            if 'proofHash' in event['args']:
-                                proof_hash = event['args']['proofHash'].hex()
-                            break
-                        except Exception as e:
-                            continue
-                
-                return {
-                    'success': True,
-                    'tx_hash': tx_hash.hex(),
-                    'verified': True,
-                    'circuit_type': 'learning_achievement',
-                    'verification_timestamp': int(time.time()),
-                    'block_number': receipt.blockNumber,
-                    'proof_hash': proof_hash or self._calculate_proof_hash(proof_a, proof_b, proof_c, public_inputs),
-                    'token_id': token_id,
-                    'etherscan_link': self._get_etherscan_link(tx_hash.hex())
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Transaction reverted'
-                }
+            # Wait for transaction receipt (polled by the pipeline, replaced if stuck)
+            receipt = self.tx_pipeline.wait(pending)
+            return self.parse_learning_achievement_receipt(receipt, proof, public_inputs)
                 
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
         except Exception as e:
             return {
                 'success': False,
                 'error': f"Error minting LearningAchievementNFT with ZK proof: {str(e)}"
             }
 
+    @staticmethod
+    def _proof_components(proof: Dict[str, Any]):
+        """Groth16 proof (snarkjs JSON) -> (a, b, c) in the verifier's calldata layout"""
+        a = proof.get('pi_a', [])
+        b = proof.get('pi_b', [])
+        c = proof.get('pi_c', [])
+        # Only take the first 2 elements of each proof array (snarkjs returns 3)
+        proof_a = [int(a[0]), int(a[1])] if len(a) >= 2 else [0, 0]
+        # Swap G2 coordinates to match Solidity bn128 pairing expectations
+        proof_b = [[int(b[0][1]), int(b[0][0])], [int(b[1][1]), int(b[1][0])]] if len(b) >= 2 and len(b[0]) >= 2 and len(b[1]) >= 2 else [[0, 0], [0, 0]]
+        proof_c = [int(c[0]), int(c[1])] if len(c) >= 2 else [0, 0]
+        return proof_a, proof_b, proof_c
+
+    def submit_learning_achievement_mint(
+        self,
+        proof: Dict[str, Any],
+        public_inputs: List[int],
+        achievement_type: int,
+        title: str,
+        description: str,
+        metadata_uri: str,
+        score: int,
+        expires_at: int
+    ):
+        """Sign and broadcast LearningAchievementNFT.mintWithZKProof without waiting for the receipt.
+
+        Returns the pipeline's PendingTransaction; raises ValueError for invalid input.
+        """
+        proof_a, proof_b, proof_c = self._proof_components(proof)
+        
+        # Ensure public inputs are in the correct format (LearningAchievementNFT expects 9)
+        if len(public_inputs) != 9:
+            raise ValueError(f'Invalid number of public inputs. Expected 9, got {len(public_inputs)}')
+        public_inputs_int = [int(x) for x in public_inputs]
+        
+        # Call the LearningAchievementNFT contract directly
+        if 'learning_achievement_nft' not in self.contracts:
+            raise ValueError('LearningAchievementNFT contract not loaded')
+        
+        # Build transaction for LearningAchievementNFT.mintWithZKProof using structs
+        # Create MintParams struct
+        mint_params = (
+            achievement_type,
+            title,
+            description,
+            metadata_uri,
+            score,
+            expires_at
+        )
+        
+        # Create ZKProofData struct
+        zk_proof_data = (
+            proof_a,
+            proof_b,
+            proof_c,
+            public_inputs_int
+        )
+        
+        # Send from the service account; nonce and fees come from the shared pipeline
+        return self.tx_pipeline.submit(
+            self.contracts['learning_achievement_nft'].functions.mintWithZKProof,
+            mint_params,
+            zk_proof_data,
+            gas=500000
+        )
+
+    def parse_learning_achievement_receipt(self, receipt, proof: Dict[str, Any], public_inputs: List[int]) -> Dict[str, Any]:
+        """Turn a LearningAchievementNFT mint receipt into the service's result dict"""
+        tx_hash = receipt['transactionHash']
+        if receipt.status != 1:
+            return {
+                'success': False,
+                'error': 'Transaction reverted',
+                'tx_hash': tx_hash.hex()
+            }
+        
+        # Extract token ID from event
+        token_id = None
+        proof_hash = None
+        for log in receipt.logs:
+            if log.address.lower() == self.contracts['learning_achievement_nft'].address.lower():
+                try:
+                    event = self.contracts['learning_achievement_nft'].events.AchievementMinted().process_log(log)
+                    token_id = event['args']['tokenId']
+                    if 'proofHash' in event['args']:
+                        proof_hash = event['args']['proofHash'].hex()
+                    break
+                except Exception as e:
+                    continue
+        
+        proof_a, proof_b, proof_c = self._proof_components(proof)
+        return {
+            'success': True,
+            'tx_hash': tx_hash.hex(),
+            'verified': True,
+            'circuit_type': 'learning_achievement',
+            'verification_timestamp': int(time.time()),
+            'block_number': receipt.blockNumber,
+            'proof_hash': proof_hash or self._calculate_proof_hash(proof_a, proof_b, proof_c, public_inputs),
+            'token_id': token_id,
+            'etherscan_link': self._get_etherscan_link(tx_hash.hex())
+        }
+
     def _calculate_proof_hash(self, a, b, c, public_inputs):
         """Calculate hash of proof for uniqueness checking"""
         import hashlib
@@ -1859,17 +1901,20 @@ class BlockchainService:
         Get all ZK-SNARK certificates for a student
         """
         try:
-            # This would query the blockchain for all ZK certificates
-            # For now, return placeholder data
-            certificates = [
-                {
-                    'certificate_id': 'cert_001',
-                    'certificate_type': 'learning_achievement',
-                    'zk_proof_hash': '0x123...',
-                    'issued_at': int(time.time()) - 86400,
-                    'expires_at': int(time.time()) + (365 * 24 * 3600)
+            if not self.is_available():
+                return {
+                    'success': True,
+                    'student_address': student_address,
+                    'certificates': [],
+                    'total_certificates': 0,
+                    'message': 'Blockchain service not available'
                 }
-            ]
+
+            registry = self.contracts['zkp_certificate_registry']
+            certificate_ids = self.read_cache.read(self.read_cache.contract_call(
+                registry, 'getStudentCertificates', self.w3.to_checksum_address(student_address)
+            ))
+            certificates = self._read_zkp_certificates(certificate_ids)
             
             return {
                 'success': True,
@@ -1884,6 +1929,25 @@ class BlockchainService:
                 'error': f"Error getting ZK certificates: {str(e)}"
             }
 
+    def _read_zkp_certificates(self, certificate_ids: List[int]) -> List[Dict[str, Any]]:
+        """Certificate records from ZKPCertificateRegistry, fetched in one batch and cached"""
+        registry = self.contracts['zkp_certificate_registry']
+        records = self.read_cache.read_many([
+            self.read_cache.contract_call(registry, 'getCertificate', int(certificate_id))
+            for certificate_id in certificate_ids
+        ])
+        return [
+            {
+                'certificate_id': int(certificate_id),
+                'student_address': student,
+                'metadata_uri': metadata_uri,
+                'certificate_type': certificate_type,
+                'issued_at': int(issued_at),
+                'contract_address': registry.address
+            }
+            for certificate_id, (student, metadata_uri, issued_at, certificate_type) in zip(certificate_ids, records)
+        ]
+
     def get_zkp_certificate_details(
         self,
         certificate_id: int
@@ -1927,19 +1991,6 @@ class BlockchainService:
         else:
             return f"https://sepolia.etherscan.io/tx/0x{tx_hash}"
 
-    def _get_next_nonce(self) -> int:
-        """Get the next nonce for transaction, ensuring sequential ordering"""
-        with self.tx_lock:
-            current_nonce = self.w3.eth.get_transaction_count(self.account.address)
-            
-            if self.last_nonce is None:
-                self.last_nonce = current_nonce
-            else:
-                # Use the next nonce after the last used one
-                self.last_nonce = max(self.last_nonce + 1, current_nonce)
-            
-            return self.last_nonce
-
     # ===== MetaMask-first helpers (return tx data for client signing) =====
     def get_contracts_meta(self) -> Dict[str, Any]:
         """Expose contract addresses and ABIs for frontend MetaMask interactions."""
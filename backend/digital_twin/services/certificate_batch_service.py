@@ -0,0 +1,329 @@
+"""
+Bulk minting of course completion certificates for a cohort
+A batch goes through three resumable stages, each persisted per item:
+1. Render every certificate SVG and its metadata, then pin all images and all
+   metadata files as two IPFS directories (two requests per cohort)
+2. Generate ZK proofs in parallel (bounded) and submit mints through the
+   shared transaction pipeline without waiting between transactions
+3. Collect receipts as they arrive and record the registry entries
+Re-running a batch skips minted items and re-checks submitted transactions
+by every hash broadcast for them instead of minting twice; a transaction
+whose nonce was used by something else was dropped and is minted again.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List
+
+from web3.exceptions import TransactionNotFound
+
+from ..models.nft import CertificateMintBatch, CertificateMintItem
+from .blockchain_service import BlockchainService
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATE_VALIDITY_SECONDS = 10 * 365 * 24 * 3600
+
+class CertificateBatchService:
+    """Creates, runs and resumes cohort certificate mint batches"""
+
+    def __init__(self, blockchain_service: Optional[BlockchainService] = None):
+        self.blockchain_service = blockchain_service or BlockchainService()
+        self.ipfs_service = self.blockchain_service.ipfs_service
+        self.proof_concurrency = int(os.getenv("BATCH_MINT_PROOF_CONCURRENCY", "4"))
+        self.hash_sync_seconds = float(os.getenv("BATCH_MINT_HASH_SYNC_SECONDS", "5"))
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def create_batch(
+        self,
+        course_name: str,
+        completions: List[Dict[str, Any]],
+        course_id: Optional[str] = None,
+        created_by: Optional[str] = None,
+        batch_id: Optional[str] = None
+    ) -> CertificateMintBatch:
+        """Create a batch (or return the existing one with the same batch_id)"""
+        if batch_id:
+            existing = await CertificateMintBatch.find_one({"batch_id": batch_id})
+            if existing:
+                return existing
+
+        items = []
+        seen = set()
+        completed_at = int(time.time())
+        for completion in completions:
+            address = completion["student_address"].lower()
+            if address in seen:
+                continue
+            seen.add(address)
+            course_data = dict(completion.get("course_data") or {})
+            # Fixed at creation so certificate IDs stay stable across resumes
+            course_data.setdefault("completed_at", completed_at)
+            items.append(CertificateMintItem(
+                index=len(items),
+                student_address=completion["student_address"],
+                student_did=completion["student_did"],
+                course_data=course_data
+            ))
+
+        batch = CertificateMintBatch(
+            batch_id=batch_id or f"batch_{uuid.uuid4().hex[:16]}",
+            course_name=course_name,
+            course_id=course_id,
+            created_by=created_by,
+            items=items
+        )
+        await batch.insert()
+        logger.info(f"Certificate batch created: {batch.batch_id} ({len(items)} students)")
+        return batch
+
+    async def get_batch(self, batch_id: str) -> Optional[CertificateMintBatch]:
+        return await CertificateMintBatch.find_one({"batch_id": batch_id})
+
+    def start(self, batch_id: str) -> bool:
+        """Run a batch in the background; False if it is already running"""
+        task = self._tasks.get(batch_id)
+        if task is not None and not task.done():
+            return False
+        task = asyncio.create_task(self._run_logged(batch_id))
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch_id, None))
+        return True
+
+    async def _run_logged(self, batch_id: str):
+        try:
+            await self.run_batch(batch_id)
+        except Exception as e:
+            logger.error(f"Certificate batch {batch_id} failed: {e}")
+
+    async def run_batch(self, batch_id: str) -> CertificateMintBatch:
+        """Run (or resume) every unfinished item of a batch"""
+        batch = await self.get_batch(batch_id)
+        if not batch:
+            raise ValueError(f"Certificate batch not found: {batch_id}")
+        if not self.blockchain_service.is_available():
+            raise ValueError("Blockchain service not available")
+
+        batch.status = "running"
+        batch.update_timestamp()
+        await self._save_batch(batch)
+
+        await self._pin_certificates(batch)
+        await self._resolve_submitted(batch)
+        await self._mint_items(batch)
+
+        counts = batch.status_counts()
+        if counts.get("minted", 0) == len(batch.items):
+            batch.status = "completed"
+        elif counts.get("minted", 0) == 0 and counts.get("submitted", 0) == 0:
+            batch.status = "failed"
+        else:
+            batch.status = "partial"
+        batch.update_timestamp()
+        await self._save_batch(batch)
+        logger.info(f"Certificate batch {batch_id} finished: {counts}")
+        return batch
+
+    async def _save_batch(self, batch: CertificateMintBatch):
+        await batch.save()
+
+    async def _save_item(self, batch: CertificateMintBatch, item: CertificateMintItem):
+        """Persist one item's status without rewriting the whole batch"""
+        await CertificateMintBatch.get_pymongo_collection().update_one(
+            {"_id": batch.id},
+            {"$set": {f"items.{item.index}": item.model_dump(), "updated_at": batch.updated_at}}
+        )
+
+    def _course_data(self, batch: CertificateMintBatch, item: CertificateMintItem) -> Dict[str, Any]:
+        return {**item.course_data, "course_name": batch.course_name}
+
+    # Stage 1: certificates
+    async def _pin_certificates(self, batch: CertificateMintBatch):
+        items = [i for i in batch.items if i.status in ("pending", "failed") and not i.metadata_uri]
+        if not items:
+            return
+
+        rendered = await asyncio.gather(*[
+            asyncio.to_thread(self.blockchain_service.render_course_certificate_svg, self._course_data(batch, item))
+            for item in items
+        ])
+        # File names carry the item index: certificate IDs repeat for students with the same name
+        names = [f"{item.index:05d}_{cert_id}" for item, (_, cert_id) in zip(items, rendered)]
+        try:
+            images = {f"{name}.svg": svg.encode("utf-8") for name, (svg, _) in zip(names, rendered)}
+            image_dir = await self.ipfs_service.pin_files(images, f"{batch.batch_id}_images", {"batch_id": batch.batch_id})
+
+            metadata_files = {}
+            for item, name, (_, cert_id) in zip(items, names, rendered):
+                metadata = self.blockchain_service.course_certificate_metadata(
+                    self._course_data(batch, item), f"ipfs://{image_dir}/{name}.svg", cert_id
+                )
+                metadata_files[f"{name}.json"] = json.dumps(metadata, sort_keys=True).encode("utf-8")
+            metadata_dir = await self.ipfs_service.pin_files(
+                metadata_files, f"{batch.batch_id}_metadata", {"batch_id": batch.batch_id}
+            )
+        except Exception as e:
+            for item in items:
+                item.status = "failed"
+                item.error = f"Certificate pinning failed: {e}"
+            await self._save_batch(batch)
+            return
+
+        batch.image_dir_cid = image_dir
+        batch.metadata_dir_cid = metadata_dir
+        for item, name, (_, cert_id) in zip(items, names, rendered):
+            item.certificate_id = cert_id
+            item.image_uri = f"ipfs://{image_dir}/{name}.svg"
+            item.metadata_uri = f"ipfs://{metadata_dir}/{name}.json"
+            item.status = "metadata_pinned"
+            item.error = None
+        batch.update_timestamp()
+        await self._save_batch(batch)
+
+    # Stage 2/3: mints
+    async def _resolve_submitted(self, batch: CertificateMintBatch):
+        """Check transactions submitted by an interrupted run before minting anything again"""
+        w3 = self.blockchain_service.w3
+        confirmed_nonce = None
+        for item in batch.items:
+            if item.status != "submitted" or not (item.tx_hashes or item.tx_hash):
+                continue
+            receipt = None
+            # Any broadcast version may have been mined; the latest is the likeliest
+            for tx_hash in reversed(item.tx_hashes or [item.tx_hash]):
+                try:
+                    receipt = await asyncio.to_thread(w3.eth.get_transaction_receipt, tx_hash)
+                except TransactionNotFound:
+                    continue
+                if receipt is not None:
+                    break
+
+            if receipt is None:
+                if item.nonce is None:
+                    continue  # Submitted before nonces were recorded; checked again on the next resume
+                if confirmed_nonce is None:
+                    confirmed_nonce = await asyncio.to_thread(
+                        w3.eth.get_transaction_count, self.blockchain_service.account.address, 'latest'
+                    )
+                if confirmed_nonce <= item.nonce:
+                    continue  # Still in the mempool
+                # The nonce was used by another transaction: this mint was dropped
+                logger.warning(f"Mint for {item.student_address} (nonce {item.nonce}) was dropped; re-queued")
+                item.status = "failed"
+                item.error = f"Transaction dropped (nonce {item.nonce} used by another transaction)"
+                await self._save_item(batch, item)
+                continue
+
+            result = self.blockchain_service.parse_learning_achievement_receipt(receipt, {}, [])
+            self._apply_result(item, result)
+            if item.status == "minted":
+                await self._register_certificate(item)
+            await self._save_item(batch, item)
+
+    def _apply_result(self, item: CertificateMintItem, result: Dict[str, Any]):
+        if result.get("success"):
+            item.status = "minted"
+            item.tx_hash = result.get("tx_hash")
+            item.block_number = result.get("block_number")
+            item.token_id = str(result["token_id"]) if result.get("token_id") is not None else None
+            item.error = None
+        else:
+            item.status = "failed"
+            item.error = result.get("error", "Minting failed")
+
+    async def _mint_items(self, batch: CertificateMintBatch):
+        items = [i for i in batch.items if i.metadata_uri and i.status in ("metadata_pinned", "failed")]
+        proof_slots = asyncio.Semaphore(self.proof_concurrency)
+        await asyncio.gather(*[self._mint_item(batch, item, proof_slots) for item in items])
+
+    async def _mint_item(self, batch: CertificateMintBatch, item: CertificateMintItem, proof_slots: asyncio.Semaphore):
+        service = self.blockchain_service
+        course_data = self._course_data(batch, item)
+        item.attempts += 1
+        try:
+            async with proof_slots:
+                zk_proof = await asyncio.to_thread(
+                    service.zkp_service.generate_learning_achievement_proof,
+                    service.course_completion_proof_input(item.student_address, course_data)
+                )
+            if not zk_proof.get("success"):
+                raise ValueError(f"ZK proof generation failed: {zk_proof.get('error', 'Unknown error')}")
+            item.zk_proof_hash = zk_proof.get("commitment_hash")
+
+            pending = await asyncio.to_thread(
+                service.submit_learning_achievement_mint,
+                zk_proof["proof"],
+                zk_proof["public_inputs"],
+                service._convert_achievement_type("course_completion"),
+                f"Course Completion: {batch.course_name}",
+                f"Successfully completed {batch.course_name}",
+                item.metadata_uri,
+                int(course_data.get("average_score", 0)),
+                int(time.time()) + CERTIFICATE_VALIDITY_SECONDS
+            )
+            # Record the nonce and hash before waiting so an interrupted run can resume from them
+            item.status = "submitted"
+            item.nonce = pending.nonce
+            item.tx_hashes = [tx_hash.hex() for tx_hash in pending.tx_hashes]
+            item.tx_hash = item.tx_hashes[-1]
+            item.error = None
+            await self._save_item(batch, item)
+
+            receipt = await self._await_receipt(batch, item, pending)
+            self._apply_result(item, service.parse_learning_achievement_receipt(
+                receipt, zk_proof["proof"], zk_proof["public_inputs"]
+            ))
+        except Exception as e:
+            if item.status != "submitted":
+                item.status = "failed"
+            item.error = str(e)
+            await self._save_item(batch, item)
+            return
+
+        if item.status == "minted":
+            await self._register_certificate(item)
+        await self._save_item(batch, item)
+
+    async def _await_receipt(self, batch: CertificateMintBatch, item: CertificateMintItem, pending):
+        """Wait for the mint receipt, persisting fee-bump replacements as the pipeline broadcasts them"""
+        receipt = asyncio.wrap_future(pending.future)
+        while True:
+            done, _ = await asyncio.wait({receipt}, timeout=self.hash_sync_seconds)
+            if len(pending.tx_hashes) > len(item.tx_hashes):
+                item.tx_hashes = [tx_hash.hex() for tx_hash in pending.tx_hashes]
+                item.tx_hash = item.tx_hashes[-1]
+                await self._save_item(batch, item)
+            if done:
+                return receipt.result()
+
+    async def _register_certificate(self, item: CertificateMintItem):
+        """Index a minted certificate in ZKPCertificateRegistry (best effort, like the single mint path)"""
+        try:
+            registry_tx = await asyncio.to_thread(
+                self.blockchain_service.submit_certificate_registration,
+                item.student_address, item.metadata_uri, "course_completion"
+            )
+            registry_receipt = await asyncio.wrap_future(registry_tx.future)
+            item.registry_tx_hash = registry_receipt["transactionHash"].hex()
+        except Exception as e:
+            logger.warning(f"Certificate registry entry failed for {item.student_address}: {e}")
+
+    @staticmethod
+    def summarize(batch: CertificateMintBatch) -> Dict[str, Any]:
+        """API view of a batch"""
+        return {
+            "batch_id": batch.batch_id,
+            "course_name": batch.course_name,
+            "course_id": batch.course_id,
+            "status": batch.status,
+            "total": len(batch.items),
+            "counts": batch.status_counts(),
+            "image_dir_cid": batch.image_dir_cid,
+            "metadata_dir_cid": batch.metadata_dir_cid,
+            "items": [item.model_dump() for item in batch.items],
+            "created_at": batch.created_at.isoformat(),
+            "updated_at": batch.updated_at.isoformat()
+        }
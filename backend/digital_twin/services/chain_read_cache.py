@@ -0,0 +1,288 @@
+"""
+Read-through cache for on-chain reads
+Decoded contract calls and event-log queries are cached per
+(contract, method, args) and shared by every BlockchainService on the same RPC
+endpoint:
+1. Misses of one request are sent to the node as a single JSON-RPC batch
+2. Concurrent identical reads wait on the same in-flight request
+3. A poller thread follows new blocks and drops the entries touched by new
+   event logs of the watched contracts (indexed arguments such as the student
+   address are matched against the cached call arguments); in "blocks" mode,
+   or when the log query fails, every new block clears the cache
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable
+
+from eth_utils.abi import get_abi_output_types, event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChainRead:
+    """One cacheable JSON-RPC read and how to decode its result"""
+    key: Tuple
+    address: str
+    method: str
+    params: List[Any]
+    decode: Callable[[Any], Any]
+    tags: Tuple[str, ...] = field(default_factory=tuple)
+
+def _tag(value: Any) -> str:
+    """Normalized form used to match call arguments against indexed log topics"""
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex().lower()
+    return str(value).lower()
+
+def _topic_tags(topic: Any) -> Tuple[str, ...]:
+    """A 32-byte topic can stand for an address, an integer or a bytes32 value"""
+    raw = HexBytes(topic)
+    return ('0x' + raw[-20:].hex().lower(), str(int.from_bytes(raw, 'big')), '0x' + raw.hex().lower())
+
+def _format_log(log: Dict[str, Any]) -> AttributeDict:
+    """Raw eth_getLogs entry into the shape web3's event decoder expects"""
+    return AttributeDict({
+        'address': log['address'],
+        'topics': [HexBytes(t) for t in log['topics']],
+        'data': HexBytes(log['data']),
+        'blockNumber': int(log['blockNumber'], 16),
+        'blockHash': HexBytes(log['blockHash']),
+        'transactionHash': HexBytes(log['transactionHash']),
+        'transactionIndex': int(log['transactionIndex'], 16),
+        'logIndex': int(log['logIndex'], 16),
+        'removed': log.get('removed', False),
+    })
+
+class ChainReadCache:
+    """Cached, coalesced and batched reads for the contracts of one endpoint"""
+
+    def __init__(self, w3, ttl_seconds: Optional[float] = None):
+        self.w3 = w3
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else float(os.getenv("CHAIN_CACHE_TTL_SECONDS", "300"))
+        )
+        self.poll_interval = float(os.getenv("CHAIN_CACHE_POLL_SECONDS", "4"))
+        self.invalidation = os.getenv("CHAIN_CACHE_INVALIDATION", "logs").lower()
+        self.poller_enabled = os.getenv("CHAIN_CACHE_POLLER", "true").lower() == "true"
+        self._entries: Dict[Tuple, Tuple[float, Any, str, Tuple[str, ...]]] = {}
+        self._inflight: Dict[Tuple, Future] = {}
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._watched: set = set()
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._last_block: Optional[int] = None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0, "batches": 0, "invalidations": 0}
+
+    # Read builders
+    def contract_call(self, contract, fn_name: str, *args) -> ChainRead:
+        """eth_call of a view function, decoded with the function's ABI outputs"""
+        output_types = get_abi_output_types(contract.get_function_by_name(fn_name).abi)
+        address = contract.address.lower()
+
+        def decode(result):
+            # Same normalization as ContractFunction.call() (checksummed addresses)
+            values = map_abi_data(BASE_RETURN_NORMALIZERS, output_types,
+                                  self.w3.codec.decode(output_types, HexBytes(result)))
+            return values[0] if len(values) == 1 else values
+
+        return ChainRead(
+            key=(address, fn_name, tuple(_tag(a) for a in args)),
+            address=address,
+            method='eth_call',
+            params=[{'to': contract.address, 'data': contract.encode_abi(fn_name, args=list(args))}, 'latest'],
+            decode=decode,
+            tags=tuple(_tag(a) for a in args)
+        )
+
+    def event_logs(self, contract, event_name: str, argument_filters: Optional[Dict[str, Any]] = None,
+                   from_block: int = 0) -> ChainRead:
+        """eth_getLogs for one event filtered on indexed arguments, decoded to EventData"""
+        argument_filters = argument_filters or {}
+        event = getattr(contract.events, event_name)
+        event_abi = event.abi
+        topics: List[Optional[str]] = ['0x' + event_abi_to_log_topic(event_abi).hex()]
+        for abi_input in event_abi['inputs']:
+            if not abi_input.get('indexed'):
+                continue
+            value = argument_filters.get(abi_input['name'])
+            topics.append(
+                None if value is None
+                else '0x' + self.w3.codec.encode([abi_input['type']], [value]).hex()
+            )
+        while topics and topics[-1] is None:
+            topics.pop()
+        processor = event()
+        filter_values = tuple(_tag(v) for _, v in sorted(argument_filters.items()))
+
+        def decode(logs):
+            return [processor.process_log(_format_log(log)) for log in logs]
+
+        return ChainRead(
+            key=(contract.address.lower(), event_name, filter_values, from_block),
+            address=contract.address.lower(),
+            method='eth_getLogs',
+            params=[{'address': contract.address, 'topics': topics, 'fromBlock': hex(from_block), 'toBlock': 'latest'}],
+            decode=decode,
+            tags=filter_values
+        )
+
+    # Reads
+    def read(self, request: ChainRead) -> Any:
+        return self.read_many([request])[0]
+
+    def read_many(self, requests: List[ChainRead], return_exceptions: bool = False) -> List[Any]:
+        """Cached values for hits; every miss goes out in one JSON-RPC batch"""
+        results: List[Any] = [None] * len(requests)
+        owned: List[Tuple[int, ChainRead, Future]] = []
+        waiting: List[Tuple[int, Future]] = []
+        now = time.monotonic()
+        with self._lock:
+            generations = {r.address: self._generations.get(r.address, 0) for r in requests}
+            epoch = self._epoch
+            for index, request in enumerate(requests):
+                self._watched.add(request.address)
+                entry = self._entries.get(request.key)
+                if entry is not None and now - entry[0] < self.ttl_seconds:
+                    self.stats["hits"] += 1
+                    results[index] = entry[1]
+                elif request.key in self._inflight:
+                    self.stats["coalesced"] += 1
+                    waiting.append((index, self._inflight[request.key]))
+                else:
+                    self.stats["misses"] += 1
+                    future = Future()
+                    self._inflight[request.key] = future
+                    owned.append((index, request, future))
+        self._ensure_poller()
+
+        if owned:
+            self._fetch(owned, generations, epoch)
+        for index, future in [(i, f) for i, _, f in owned] + waiting:
+            error = future.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            results[index] = error if error is not None else future.result()
+        return results
+
+    def _fetch(self, owned: List[Tuple[int, ChainRead, Future]], generations: Dict[str, int], epoch: int):
+        try:
+            if len(owned) == 1:
+                _, request, _ = owned[0]
+                responses = [self.w3.provider.make_request(request.method, request.params)]
+            else:
+                self.stats["batches"] += 1
+                responses = self.w3.provider.make_batch_request([(r.method, r.params) for _, r, _ in owned])
+                if not isinstance(responses, list):
+                    # The node rejected the batch as a whole
+                    raise RuntimeError(responses.get('error', responses))
+        except Exception as e:
+            self._fail(owned, e)
+            return
+
+        fetched_at = time.monotonic()
+        for (_, request, future), response in zip(owned, responses):
+            try:
+                if response.get('error'):
+                    raise RuntimeError(f"{request.method} failed: {response['error']}")
+                value = request.decode(response['result'])
+            except Exception as e:
+                self._fail([(None, request, future)], e)
+                continue
+            with self._lock:
+                self._inflight.pop(request.key, None)
+                # Only cache if nothing was invalidated while the request was in flight
+                if self._epoch == epoch and self._generations.get(request.address, 0) == generations[request.address]:
+                    self._entries[request.key] = (fetched_at, value, request.address, request.tags)
+            future.set_result(value)
+
+    def _fail(self, owned, error: Exception):
+        with self._lock:
+            for _, request, _ in owned:
+                self._inflight.pop(request.key, None)
+        for _, _, future in owned:
+            future.set_exception(error)
+
+    # Invalidation
+    def invalidate(self, address: str, topics: Optional[Iterable[Any]] = None):
+        """Drop entries of a contract; with topics, only those whose arguments match one"""
+        address = address.lower()
+        tags = set()
+        for topic in topics or ():
+            tags.update(_topic_tags(topic))
+        with self._lock:
+            self._generations[address] = self._generations.get(address, 0) + 1
+            stale = [
+                key for key, (_, _, entry_address, entry_tags) in self._entries.items()
+                if entry_address == address and (not tags or not entry_tags or tags.intersection(entry_tags))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._epoch += 1
+            self.stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def on_new_blocks(self, from_block: int, to_block: int):
+        """Apply the log-based (or block-based) invalidation for a new block range"""
+        with self._lock:
+            addresses = sorted(self._watched)
+        if not addresses:
+            return
+        if self.invalidation != "logs":
+            self.invalidate_all()
+            return
+        try:
+            logs = self.w3.eth.get_logs({'address': [self.w3.to_checksum_address(a) for a in addresses],
+                                         'fromBlock': from_block, 'toBlock': to_block})
+        except Exception as e:
+            logger.debug(f"Log poll failed for blocks {from_block}-{to_block}, clearing cache: {e}")
+            self.invalidate_all()
+            return
+        for log in logs:
+            # topics[0] is the event signature; the rest are indexed arguments
+            self.invalidate(log['address'], log['topics'][1:])
+
+    def _ensure_poller(self):
+        if not self.poller_enabled:
+            return
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name="chain-cache-poller", daemon=True)
+                self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            try:
+                latest = self.w3.eth.block_number
+                if self._last_block is not None and latest > self._last_block:
+                    self.on_new_blocks(self._last_block + 1, latest)
+                if self._last_block is None or latest > self._last_block:
+                    self._last_block = latest
+            except Exception as e:
+                logger.debug(f"Chain cache block poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+_caches: Dict[str, ChainReadCache] = {}
+_caches_lock = threading.Lock()
+
+def get_chain_read_cache(w3, endpoint: str = "") -> ChainReadCache:
+    """Shared read cache per RPC endpoint across BlockchainService instances"""
+    with _caches_lock:
+        cache = _caches.get(endpoint)
+        if cache is None:
+            cache = ChainReadCache(w3)
+            _caches[endpoint] = cache
+        return cache
@@ -10,8 +10,10 @@ import logging
 from ..models.course import Course, Module, Enrollment, ModuleProgress, CourseMetadata, ModuleContent, Assessment
 from ..models.user import User
 from ..services.ipfs_service import IPFSService
-from ..services.redis_service import RedisService
+from ..services.redis_service import get_redis_service
 from ..services.digital_twin_service import DigitalTwinService
+from ..services.search_index import search_index
+from ..services.leaderboard_service import leaderboard_service
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ class CourseService:
     
     def __init__(self):
         self.ipfs_service = IPFSService()
-        self.redis_service = RedisService()
+        self.redis_service = get_redis_service()
         try:
             self.digital_twin_service = DigitalTwinService()
         except Exception as e:
@@ -74,6 +76,7 @@ class CourseService:
             
             # Cache course data
             await self.redis_service.set_cache(f"course:{course_id}", course.dict(), 3600)
+            search_index.index_course(course)
             
             # Update course analytics
             try:
@@ -118,6 +121,7 @@ class CourseService:
             
             # Update cache
             await self.redis_service.set_cache(f"course:{course_id}", course.dict(), 3600)
+            search_index.index_course(course)
             
             logger.info(f"Course updated: {course_id}")
             return course
@@ -154,6 +158,7 @@ class CourseService:
             
             # Clear cache to force refresh
             await self.redis_service.delete_cache(f"course:{course_id}")
+            search_index.index_course(course)
             
             logger.info(f"Course published: {course_id}")
             return course
@@ -297,6 +302,7 @@ class CourseService:
             )
             
             await module.insert()
+            search_index.index_module(module)
             
             # Pin complete module content to IPFS
             await self._pin_module_content(module)
@@ -530,6 +536,7 @@ class CourseService:
             
             if not enrollment:
                 return
+            certificate_was_issued = enrollment.certificate_issued
             
             # Add completed module
             if completed_module_id not in enrollment.completed_modules:
@@ -598,6 +605,7 @@ class CourseService:
                                     logger.info(f"Course completion certificate minted successfully for {user_id}:{course_id}")
                                     # Update enrollment with certificate info
                                     enrollment.certificate_issued = True
+                                    enrollment.certificate_issued_at = datetime.now(timezone.utc)
                                     enrollment.certificate_nft_token_id = result.get('token_id')
                                     
                                     # Send notification to user about certificate
@@ -608,7 +616,8 @@ class CourseService:
                                             user_id=user_id,
                                             course_title=course_title,
                                             certificate_title=f"Course Completion: {course_title}",
-                                            certificate_type="course_completion"
+                                            certificate_type="course_completion",
+                                            event_key=f"course_completion:{user_id}:{course_id}"
                                         )
                                     except Exception as notif_err:
                                         logger.warning(f"Failed to send course completion notification: {notif_err}")
@@ -623,6 +632,11 @@ class CourseService:
             
             await enrollment.save()
             
+            if enrollment.certificate_issued and not certificate_was_issued:
+                await leaderboard_service.record_certificate(
+                    user_id, enrollment.completed_at, enrollment.certificate_issued_at
+                )
+            
         except Exception as e:
             logger.error(f"Enrollment progress update failed: {e}")
     
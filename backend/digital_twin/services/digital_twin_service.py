@@ -12,7 +12,9 @@ from ..models.digital_twin import DigitalTwin, DigitalTwinVersion, LearningProgr
 from ..models.user import User
 from ..services.ipfs_service import IPFSService
 from ..services.blockchain_service import BlockchainService
-from ..services.redis_service import RedisService
+from ..services.redis_service import get_redis_service
+from ..services.twin_update_buffer import twin_update_buffer, PendingTwinUpdate
+from ..services.twin_anchor_worker import twin_anchor_worker
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +24,8 @@ class DigitalTwinService:
     def __init__(self):
         self.ipfs_service = IPFSService()
         self.blockchain_service = BlockchainService()
-        self.redis_service = RedisService()
+        self.redis_service = get_redis_service()
+        self.update_buffer = twin_update_buffer
         
     async def create_digital_twin(self, user: User, initial_data: Dict[str, Any] = None) -> DigitalTwin:
         """Create a new digital twin for a user"""
@@ -108,7 +111,7 @@ class DigitalTwinService:
             await self.redis_service.set_cache(f"twin:{twin_id}", canonical_payload, 3600)
             
             # Schedule blockchain anchoring
-            await self._schedule_blockchain_anchor(twin_id, cid, "creation")
+            await self._schedule_blockchain_anchor(twin_id, cid, "creation", 1, canonical_payload)
             
             logger.info(f"Digital twin created: {twin_id}")
             return digital_twin
@@ -118,61 +121,30 @@ class DigitalTwinService:
             raise
     
     async def update_digital_twin(self, twin_id: str, updates: Dict[str, Any], updated_by: str, change_description: str = None) -> DigitalTwin:
-        """Update digital twin with new data"""
-        try:
-            # Get current twin
-            digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
-            if not digital_twin:
-                raise ValueError(f"Digital twin not found: {twin_id}")
-            
-            # Store previous CID in version history (handled by version records)
-            
-            # Apply updates
+        """Update digital twin with new data
+        
+        Updates are coalesced per twin by the update buffer; the returned twin
+        already carries the new logical version.
+        """
+        def apply_updates(digital_twin: DigitalTwin):
             for key, value in updates.items():
                 if hasattr(digital_twin, key):
                     setattr(digital_twin, key, value)
-            
-            # Increment version
-            digital_twin.version += 1
-            digital_twin.update_timestamp()
-            
-            # Generate new canonical payload
-            canonical_payload = digital_twin.get_canonical_payload()
-            
-            # Pin to IPFS
-            cid = await self.ipfs_service.pin_json(
-                canonical_payload,
-                name=f"digital_twin_{twin_id}_v{digital_twin.version}",
-                metadata={
-                    "twin_id": twin_id,
-                    "version": digital_twin.version,
-                    "type": "digital_twin_state",
-                    "updated_by": updated_by
-                }
-            )
-            
-            # Update CID
-            digital_twin.latest_cid = cid
-            await digital_twin.save()
-            
-            # Create version record
-            version_record = DigitalTwinVersion(
-                twin_id=twin_id,
-                version=digital_twin.version,
-                cid=cid,
-                created_by=updated_by,
-                change_description=change_description or "Digital twin update",
-                change_type="update"
+        
+        return await self._apply_update(twin_id, apply_updates, updated_by, change_description or "Digital twin update")
+    
+    async def _apply_update(self, twin_id: str, mutate, updated_by: str, change_description: str) -> DigitalTwin:
+        """Apply an in-memory update through the write-coalescing buffer"""
+        try:
+            digital_twin = await self.update_buffer.apply(
+                twin_id,
+                mutate,
+                updated_by,
+                change_description,
+                persist=self._persist_coalesced_update
             )
-            await version_record.insert()
-            
-            # Update cache
-            await self.redis_service.set_cache(f"twin:{twin_id}", canonical_payload, 3600)
-            
-            # Schedule blockchain anchoring for major updates
-            if digital_twin.version % 5 == 0:  # Anchor every 5 versions
-                await self._schedule_blockchain_anchor(twin_id, cid, "update")
-            
+            # The cached snapshot is behind MongoDB until the burst is pinned
+            await self.redis_service.delete_cache(f"twin:{twin_id}")
             logger.info(f"Digital twin updated: {twin_id} v{digital_twin.version}")
             return digital_twin
             
@@ -180,9 +152,79 @@ class DigitalTwinService:
             logger.error(f"Digital twin update failed: {e}")
             raise
     
+    async def _persist_coalesced_update(self, pending: PendingTwinUpdate):
+        """Pin one snapshot and write one version record for a burst of updates"""
+        digital_twin = pending.twin
+        twin_id = digital_twin.twin_id
+        
+        # Generate new canonical payload
+        canonical_payload = digital_twin.get_canonical_payload()
+        
+        # Pin to IPFS
+        cid = await self.ipfs_service.pin_json(
+            canonical_payload,
+            name=f"digital_twin_{twin_id}_v{digital_twin.version}",
+            metadata={
+                "twin_id": twin_id,
+                "version": digital_twin.version,
+                "type": "digital_twin_state",
+                "updated_by": pending.updated_by
+            }
+        )
+        
+        # Point the twin at the snapshot unless another worker has written a
+        # newer version (its own flush pins that) or already pinned this one
+        pinned = await DigitalTwin.get_pymongo_collection().update_one(
+            {"twin_id": twin_id, "version": digital_twin.version, "unpinned_since": {"$ne": None}},
+            {"$set": {"latest_cid": cid, "unpinned_since": None}}
+        )
+        if not pinned.modified_count:
+            logger.debug(f"Snapshot v{digital_twin.version} of {twin_id} superseded; not recorded")
+            return
+        digital_twin.latest_cid = cid
+        digital_twin.unpinned_since = None
+        
+        # Create version record
+        if pending.update_count > 1:
+            change_description = f"{pending.update_count} coalesced updates: " + "; ".join(pending.change_descriptions)
+        else:
+            change_description = pending.change_descriptions[0]
+        version_record = DigitalTwinVersion(
+            twin_id=twin_id,
+            version=digital_twin.version,
+            cid=cid,
+            created_by=pending.updated_by,
+            change_description=change_description,
+            change_type="update"
+        )
+        await version_record.insert()
+        
+        # Update cache
+        await self.redis_service.set_cache(f"twin:{twin_id}", canonical_payload, 3600)
+        
+        # Schedule blockchain anchoring for major updates (every 5 versions)
+        if digital_twin.version // 5 > pending.base_version // 5:
+            await self._schedule_blockchain_anchor(twin_id, cid, "update", digital_twin.version, canonical_payload)
+    
+    async def flush_pending_updates(self, twin_id: str = None):
+        """Persist buffered updates now (for one twin, or all twins)"""
+        if twin_id:
+            await self.update_buffer.flush(twin_id)
+        else:
+            await self.update_buffer.flush_all()
+    
+    async def recover_unpinned_updates(self) -> int:
+        """Pin twins left ahead of their snapshot by a worker that stopped mid-window"""
+        try:
+            return await self.update_buffer.recover(self._persist_coalesced_update)
+        except Exception as e:
+            logger.error(f"Unpinned twin recovery failed: {e}")
+            return 0
+    
     async def update_enrollment(self, twin_id: str, course_id: str, action: str = "enroll") -> DigitalTwin:
         """Update enrollment in digital twin"""
         try:
+            await self.update_buffer.flush(twin_id)
             digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
             if not digital_twin:
                 raise ValueError(f"Digital twin not found: {twin_id}")
@@ -211,11 +253,7 @@ class DigitalTwinService:
     
     async def update_learning_progress(self, twin_id: str, module_id: str, course_id: str, completion_percentage: float, time_spent: int = 0, quiz_scores: List[float] = None) -> DigitalTwin:
         """Update learning progress for a specific module"""
-        try:
-            digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
-            if not digital_twin:
-                raise ValueError(f"Digital twin not found: {twin_id}")
-            
+        async def apply_progress(digital_twin: DigitalTwin):
             # Update progress
             digital_twin.update_learning_progress(module_id, course_id, completion_percentage, time_spent)
             
@@ -243,19 +281,15 @@ class DigitalTwinService:
                 )
                 
                 digital_twin.add_checkpoint(checkpoint_id, cid, "module_completion", {"module_id": module_id})
-            
-            return await self.update_digital_twin(
+        
+        try:
+            digital_twin = await self._apply_update(
                 twin_id,
-                {
-                    "learning_progress": digital_twin.learning_progress,
-                    "current_modules": digital_twin.current_modules,
-                    "completed_modules": digital_twin.completed_modules,
-                    "quiz_attempts": digital_twin.quiz_attempts,
-                    "checkpoint_history": digital_twin.checkpoint_history
-                },
-                digital_twin.owner_did,
+                apply_progress,
+                None,
                 f"Learning progress updated for module {module_id}"
             )
+            return digital_twin
             
         except Exception as e:
             logger.error(f"Learning progress update failed: {e}")
@@ -265,11 +299,7 @@ class DigitalTwinService:
                              achievement_type: str, tier: str, evidence: Dict[str, Any] = None, 
                              verified_by: str = None) -> DigitalTwin:
         """Add an achievement to the digital twin"""
-        try:
-            digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
-            if not digital_twin:
-                raise ValueError(f"Digital twin not found: {twin_id}")
-            
+        async def apply_achievement(digital_twin: DigitalTwin):
             # Add achievement
             digital_twin.add_achievement(achievement_id, title, description, achievement_type, tier, evidence)
             
@@ -295,14 +325,12 @@ class DigitalTwinService:
                 if checkpoint.checkpoint_id == f"achievement_{achievement_id}":
                     checkpoint.twin_state_cid = cid
                     break
-            
-            return await self.update_digital_twin(
+        
+        try:
+            return await self._apply_update(
                 twin_id,
-                {
-                    "achievements": digital_twin.achievements,
-                    "checkpoint_history": digital_twin.checkpoint_history
-                },
-                verified_by or digital_twin.owner_did,
+                apply_achievement,
+                verified_by,
                 f"Achievement added: {title}"
             )
             
@@ -314,6 +342,11 @@ class DigitalTwinService:
         """Get digital twin by ID and optionally specific version"""
         try:
             if version is None:
+                # This process's latest write, without a database round-trip
+                pending_twin = self.update_buffer.peek(twin_id)
+                if pending_twin:
+                    return pending_twin
+                
                 # Get latest version from cache first
                 cached_data = await self.redis_service.get_cache(f"twin:{twin_id}")
                 if cached_data:
@@ -368,6 +401,7 @@ class DigitalTwinService:
     async def create_learning_checkpoint(self, twin_id: str, trigger_event: str, metadata: Dict[str, Any] = None) -> str:
         """Create a learning checkpoint"""
         try:
+            await self.update_buffer.flush(twin_id)
             digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
             if not digital_twin:
                 raise ValueError(f"Digital twin not found: {twin_id}")
@@ -401,6 +435,7 @@ class DigitalTwinService:
     async def analyze_learning_patterns(self, twin_id: str) -> Dict[str, Any]:
         """Analyze learning patterns and generate insights"""
         try:
+            await self.update_buffer.flush(twin_id)
             digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
             if not digital_twin:
                 raise ValueError(f"Digital twin not found: {twin_id}")
@@ -484,20 +519,25 @@ class DigitalTwinService:
             logger.error(f"Learning pattern analysis failed: {e}")
             return {}
     
-    async def _schedule_blockchain_anchor(self, twin_id: str, cid: str, operation_type: str):
-        """Schedule blockchain anchoring operation"""
+    async def _schedule_blockchain_anchor(self, twin_id: str, cid: str, operation_type: str, version: int = None, payload: Dict[str, Any] = None):
+        """Schedule blockchain anchoring operation
+        
+        Queued requests are batched into one Merkle root per transaction by
+        the twin anchor worker.
+        """
         try:
-            # For now, we'll just log this. In production, this would queue a blockchain operation
             anchor_data = {
                 "twin_id": twin_id,
                 "cid": cid,
+                "version": version,
+                "data_hash": self.blockchain_service.create_data_hash_hex(payload) if payload is not None else None,
                 "operation": operation_type,
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "status": "scheduled"
             }
             
-            # Store in Redis queue for blockchain worker
-            await self.redis_service.set_cache(f"anchor_queue:{twin_id}:{cid}", anchor_data, 86400)
+            # Queue for the batching anchor worker
+            await twin_anchor_worker.enqueue(anchor_data)
             
             logger.info(f"Blockchain anchoring scheduled: {twin_id} -> {cid}")
             
@@ -507,6 +547,7 @@ class DigitalTwinService:
     async def verify_twin_integrity(self, twin_id: str) -> Dict[str, Any]:
         """Verify digital twin data integrity"""
         try:
+            await self.update_buffer.flush(twin_id)
             digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
             if not digital_twin:
                 return {"valid": False, "error": "Twin not found"}
@@ -524,7 +565,8 @@ class DigitalTwinService:
             
             # Check if latest CID is accessible
             if digital_twin.latest_cid:
-                ipfs_data = await self.ipfs_service.get_json(digital_twin.latest_cid)
+                # Ask the network, not the local cache: accessibility is what is being checked
+                ipfs_data = await self.ipfs_service.get_json(digital_twin.latest_cid, use_cache=False)
                 if ipfs_data:
                     integrity_check["checks"]["latest_cid_accessible"] = True
                     
@@ -545,6 +587,17 @@ class DigitalTwinService:
             # Check blockchain anchoring status
             if digital_twin.on_chain_tx_hash:
                 integrity_check["checks"]["blockchain_anchored"] = True
+                anchor_proof = await twin_anchor_worker.get_proof(twin_id)
+                if anchor_proof:
+                    integrity_check["checks"]["anchor_proof_valid"] = anchor_proof["valid"]
+                    integrity_check["anchor"] = {
+                        "version": anchor_proof["version"],
+                        "merkle_root": anchor_proof["merkle_root"],
+                        "tx_hash": anchor_proof["tx_hash"]
+                    }
+                    if not anchor_proof["valid"]:
+                        integrity_check["issues"].append("Anchor inclusion proof does not match its Merkle root")
+                        integrity_check["valid"] = False
             
             return integrity_check
             
@@ -575,6 +628,7 @@ class DigitalTwinService:
     async def export_twin_data(self, twin_id: str, format: str = "json") -> Dict[str, Any]:
         """Export complete twin data"""
         try:
+            await self.update_buffer.flush(twin_id)
             digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
             if not digital_twin:
                 raise ValueError(f"Digital twin not found: {twin_id}")
@@ -625,6 +679,8 @@ async def update_twin_and_pin_to_ipfs(twin_data: Dict[str, Any]) -> Dict[str, An
             updated_by="system",
             change_description="Legacy API update"
         )
+        # Legacy callers expect the new CID in the response
+        await service.flush_pending_updates(twin_id)
         
         return {
             "status": "success",
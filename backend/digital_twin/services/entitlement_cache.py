@@ -0,0 +1,378 @@
+"""
+Subscription entitlement cache
+Resolves a user's plan, limits and features into one Entitlements snapshot:
+1. Active plan configs are held in memory (they change about once a month)
+   and reloaded after SUBSCRIPTION_PLANS_TTL or initialize_default_plans
+2. Snapshots are cached per user in-process with a short TTL and in Redis
+   (shared between workers), never past the subscription's end_date
+Entries are invalidated explicitly when a subscription is created or
+cancelled and when a payment changes state; invalidations are broadcast over
+Redis pub/sub so every worker drops its in-process copy.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from ..models.subscription import UserSubscription, SubscriptionPlanConfig, SubscriptionPlan, SubscriptionStatus
+from .redis_service import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "entitlement_cache:invalidate"
+
+FREE_FEATURES = ["Basic AI tutor access", "Limited course access"]
+FREE_LIMITS = {
+    "max_courses": 5,
+    "max_ai_queries_per_day": 5,  # Limited free access
+    "video_quality": "480p",
+    "nft_tier": "none",
+    "mentoring_sessions": False,
+    "lab_access": False,
+    "early_access": False,
+    "advanced_features": False,
+    "ai_queries": True,  # Allow limited AI access
+    "advanced_ai_tutor": False,
+    "4k_video": False
+}
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+@dataclass
+class Entitlements:
+    """What a user's subscription allows, resolved once and shared by all checks"""
+    user_id: str
+    plan: Optional[str] = None  # None on the free tier
+    plan_name: str = "Free"
+    status: Optional[str] = None
+    features: List[str] = field(default_factory=lambda: list(FREE_FEATURES))
+    limits: Dict[str, Any] = field(default_factory=dict)  # plan limits as configured
+    billing_cycle: Optional[str] = None
+    price: Optional[float] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+    @property
+    def has_subscription(self) -> bool:
+        return self.plan is not None
+
+    @property
+    def daily_ai_queries(self) -> int:
+        """Daily AI query limit, -1 for unlimited"""
+        if not self.has_subscription:
+            return FREE_LIMITS["max_ai_queries_per_day"]
+        return self.limits.get("max_ai_queries_per_day", 0)
+
+    def has_feature(self, feature: str) -> bool:
+        if feature == "ai_queries":
+            return self.daily_ai_queries != 0
+        if not self.has_subscription:
+            return False
+        return self.limits.get(feature, False)
+
+    def can_access_course(self, course_found: bool, difficulty: Optional[str]) -> bool:
+        """Course access by plan: free -> beginner, basic -> up to intermediate, premium -> all"""
+        if self.plan == SubscriptionPlan.PREMIUM.value:
+            return True
+        if not course_found:
+            return False
+        if self.plan == SubscriptionPlan.BASIC.value:
+            return (difficulty or "beginner") in ["beginner", "intermediate"]
+        if not self.has_subscription:
+            return difficulty == "beginner"
+        return False
+
+    def computed_limits(self) -> Dict[str, Any]:
+        """Plan limits plus the derived feature flags the frontend reads"""
+        if not self.has_subscription:
+            return dict(FREE_LIMITS)
+        limits = dict(self.limits)
+        if "max_ai_queries_per_day" in limits:
+            limits["ai_queries"] = limits["max_ai_queries_per_day"] != 0
+        limits["advanced_ai_tutor"] = self.limits.get("advanced_features", False)
+        limits["4k_video"] = self.limits.get("video_quality") == "4K"
+        limits["mentoring_sessions"] = self.limits.get("mentoring_sessions", 0) > 0
+        limits["lab_access"] = self.limits.get("lab_access", False)
+        limits["early_access"] = self.limits.get("early_access", False)
+        return limits
+
+    def days_remaining(self) -> int:
+        if not self.end_date:
+            return 0
+        return max(0, (self.end_date - datetime.now(timezone.utc)).days)
+
+    def to_plan_info(self) -> Dict[str, Any]:
+        """Response shape of SubscriptionService.get_user_plan_info"""
+        if not self.has_subscription:
+            return {
+                "has_subscription": False,
+                "plan": None,
+                "status": None,
+                "features": list(self.features),
+                "limits": self.computed_limits(),
+                "days_remaining": 0
+            }
+        return {
+            "has_subscription": True,
+            "plan": self.plan,
+            "plan_name": self.plan_name,
+            "status": self.status,
+            "features": list(self.features),
+            "limits": self.computed_limits(),
+            "days_remaining": self.days_remaining(),
+            "billing_cycle": self.billing_cycle,
+            "price": self.price,
+            "start_date": self.start_date,
+            "end_date": self.end_date
+        }
+
+    def to_cache(self) -> Dict[str, Any]:
+        data = dict(self.__dict__)
+        data["start_date"] = self.start_date.isoformat() if self.start_date else None
+        data["end_date"] = self.end_date.isoformat() if self.end_date else None
+        return data
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "Entitlements":
+        data = dict(data)
+        data["start_date"] = _parse_datetime(data.get("start_date"))
+        data["end_date"] = _parse_datetime(data.get("end_date"))
+        return cls(**data)
+
+class EntitlementCache:
+    """Per-user entitlement snapshots backed by an in-memory plan table"""
+
+    def __init__(self, redis_service: Optional[RedisService] = None):
+        self.redis_service = redis_service or get_redis_service()
+        self.local_ttl = int(os.getenv("ENTITLEMENT_CACHE_LOCAL_TTL", "30"))
+        self.redis_ttl = int(os.getenv("ENTITLEMENT_CACHE_TTL", "300"))
+        self.plans_ttl = int(os.getenv("SUBSCRIPTION_PLANS_TTL", "3600"))
+        self.course_ttl = int(os.getenv("ENTITLEMENT_COURSE_TTL", "600"))
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._plans_loaded_at: Optional[float] = None
+        # user_id -> (entitlements, monotonic expiry)
+        self._entries: Dict[str, Tuple[Entitlements, float]] = {}
+        # course_id -> ((found, difficulty), monotonic expiry)
+        self._course_levels: Dict[str, Tuple[Tuple[bool, Optional[str]], float]] = {}
+        self.retry_seconds = float(os.getenv("ENTITLEMENT_CACHE_RETRY_SECONDS", "5"))
+        self._task: Optional[asyncio.Task] = None
+
+    # Plan table
+    @property
+    def plans_loaded(self) -> bool:
+        return (
+            self._plans_loaded_at is not None
+            and time.monotonic() - self._plans_loaded_at < self.plans_ttl
+        )
+
+    async def load_plans(self):
+        """Load active plan configs from MongoDB"""
+        try:
+            configs = await SubscriptionPlanConfig.find({"is_active": True}).to_list()
+        except Exception as e:
+            logger.error(f"Failed to load subscription plans for entitlement cache: {e}")
+            return
+        self.use_plans(
+            {"plan": c.plan, "name": c.name, "features": c.features, "limits": c.limits}
+            for c in configs
+        )
+
+    def use_plans(self, plan_data: Iterable[Dict[str, Any]]):
+        """Replace the plan table with plan definitions (plan, name, features, limits)"""
+        self._plans = {}
+        for plan in plan_data:
+            key = plan["plan"].value if isinstance(plan["plan"], SubscriptionPlan) else plan["plan"]
+            self._plans[key] = {
+                "name": plan["name"],
+                "features": list(plan.get("features") or []),
+                "limits": dict(plan.get("limits") or {})
+            }
+        self._plans_loaded_at = time.monotonic()
+        logger.debug(f"Entitlement cache loaded {len(self._plans)} plans")
+
+    async def ensure_plans(self):
+        if not self.plans_loaded:
+            await self.load_plans()
+
+    def build(self, user_id: str, subscription: Optional[UserSubscription]) -> Entitlements:
+        """Combine a subscription with its plan from the plan table"""
+        if not subscription or not subscription.is_active():
+            return Entitlements(user_id=user_id)
+        plan = subscription.plan.value if isinstance(subscription.plan, SubscriptionPlan) else subscription.plan
+        config = self._plans.get(plan) or {}
+        status = subscription.status
+        return Entitlements(
+            user_id=user_id,
+            plan=plan,
+            plan_name=config.get("name", plan),
+            status=status.value if isinstance(status, SubscriptionStatus) else status,
+            features=list(config.get("features", [])),
+            limits=dict(config.get("limits", {})),
+            billing_cycle=subscription.billing_cycle,
+            price=subscription.price,
+            start_date=_parse_datetime(subscription.start_date),
+            end_date=_parse_datetime(subscription.end_date)
+        )
+
+    def ttl_for(self, entitlements: Entitlements, ttl: int) -> int:
+        """Cap a TTL so a snapshot never outlives the subscription it describes"""
+        if entitlements.end_date:
+            ttl = min(ttl, int((entitlements.end_date - datetime.now(timezone.utc)).total_seconds()))
+        return max(ttl, 0)
+
+    # Per-user entries
+    def get_local(self, user_id: str) -> Optional[Entitlements]:
+        entry = self._entries.get(user_id)
+        if not entry:
+            return None
+        entitlements, expires = entry
+        if time.monotonic() >= expires:
+            self._entries.pop(user_id, None)
+            return None
+        return entitlements
+
+    async def get(self, user_id: str) -> Optional[Entitlements]:
+        """Get a cached snapshot, checking the in-process tier then Redis"""
+        entitlements = self.get_local(user_id)
+        if entitlements is not None:
+            return entitlements
+
+        cached = await self.redis_service.get_cache(f"entitlements:{user_id}")
+        if isinstance(cached, dict) and "user_id" in cached:
+            entitlements = Entitlements.from_cache(cached)
+            ttl = min(self.local_ttl, self.ttl_for(entitlements, self.local_ttl))
+            if ttl > 0:
+                self._entries[user_id] = (entitlements, time.monotonic() + ttl)
+                return entitlements
+        return None
+
+    async def set(self, entitlements: Entitlements):
+        """Store a snapshot in both tiers"""
+        ttl = self.ttl_for(entitlements, self.redis_ttl)
+        if ttl <= 0:
+            return
+        self._entries[entitlements.user_id] = (entitlements, time.monotonic() + min(ttl, self.local_ttl))
+        await self.redis_service.set_cache(f"entitlements:{entitlements.user_id}", entitlements.to_cache(), ttl)
+
+    async def _load_subscription(self, user_id: str) -> Optional[UserSubscription]:
+        return await UserSubscription.find_one(
+            UserSubscription.user_id == user_id,
+            UserSubscription.status == SubscriptionStatus.ACTIVE
+        )
+
+    async def resolve(self, user_id: str) -> Entitlements:
+        """Get a user's entitlements, building them from MongoDB on a cache miss"""
+        entitlements = await self.get(user_id)
+        if entitlements is not None:
+            return entitlements
+
+        await self.ensure_plans()
+        entitlements = self.build(user_id, await self._load_subscription(user_id))
+        # A paid snapshot built without its plan definition lacks the plan's
+        # features and limits; serve it, but let the next request rebuild it
+        if entitlements.has_subscription and not (self.plans_loaded and entitlements.plan in self._plans):
+            logger.warning(f"Plan table unavailable for {entitlements.plan}; entitlements for {user_id} not cached")
+            return entitlements
+        await self.set(entitlements)
+        return entitlements
+
+    # Course difficulty (course metadata rarely changes)
+    async def _load_course_level(self, course_id: str) -> Tuple[bool, Optional[str]]:
+        from ..models.course import Course
+        course = await Course.find_one(Course.course_id == course_id)
+        if not course:
+            return False, None
+        return True, course.metadata.get("difficulty_level")
+
+    async def course_level(self, course_id: str) -> Tuple[bool, Optional[str]]:
+        """(course exists, difficulty_level) for a course"""
+        entry = self._course_levels.get(course_id)
+        if entry and time.monotonic() < entry[1]:
+            return entry[0]
+        level = await self._load_course_level(course_id)
+        self._course_levels[course_id] = (level, time.monotonic() + self.course_ttl)
+        return level
+
+    # Invalidation
+    def drop_local(self, user_id: Optional[str] = None):
+        """Drop in-process entries: one user's, or every entry and the plan table"""
+        if user_id is None:
+            self._plans_loaded_at = None
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    async def invalidate_user(self, user_id: str):
+        """Drop a user's snapshot after their subscription or payments change"""
+        self.drop_local(user_id)
+        await self.redis_service.delete_cache(f"entitlements:{user_id}")
+        await self.redis_service.publish(INVALIDATION_CHANNEL, {"user_id": user_id})
+        logger.debug(f"Entitlement cache invalidated for user: {user_id}")
+
+    async def invalidate_plans(self):
+        """Drop the plan table and every cached snapshot after a plan config changes"""
+        self.drop_local()
+        await self.redis_service.clear_cache_pattern("entitlements:*")
+        await self.redis_service.publish(INVALIDATION_CHANNEL, {"all": True})
+        logger.info("Entitlement cache invalidated for all users")
+
+    def handle_invalidation(self, message: Dict[str, Any]):
+        """Apply an invalidation broadcast by another worker"""
+        if message.get("all"):
+            self.drop_local()
+        elif message.get("user_id"):
+            self.drop_local(message["user_id"])
+
+    # Background listener
+    async def _listen(self):
+        reconnecting = False
+        while True:
+            pubsub = await self.redis_service.subscribe(INVALIDATION_CHANNEL)
+            try:
+                if pubsub is not None:
+                    # Snapshots cached while unsubscribed may have missed a broadcast
+                    if reconnecting:
+                        self.drop_local()
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.handle_invalidation(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Entitlement invalidation listener failed: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            reconnecting = True
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        """Start listening for invalidations from other workers (called from main.lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+entitlement_cache = EntitlementCache()
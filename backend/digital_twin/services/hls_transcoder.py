@@ -0,0 +1,216 @@
+"""
+ffmpeg helpers for HLS rendition ladders
+All renditions of a video are encoded from one decode pass: the source is
+decoded once, split with the `split` filter and scaled per rendition, and
+the HLS muxer writes one segmented playlist per rendition (var_stream_map).
+Keyframes are forced on segment boundaries so every rendition switches
+cleanly, which also lets an interrupted pass restart at a segment boundary
+(start_segment) and append to the segments already uploaded. Media
+playlists are rebuilt from the segment durations for the same reason.
+Progress is read from ffmpeg's `-progress` output.
+"""
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+Rendition = Tuple[str, Dict[str, str]]  # (quality name, quality config)
+
+def rendition_height(config: Dict[str, str]) -> int:
+    return int(config["resolution"].lower().split("x")[1])
+
+def select_renditions(quality_configs: Dict[str, Dict[str, str]], source_height: int = 0) -> List[Rendition]:
+    """Ladder entries that do not upscale the source (always at least the smallest one)"""
+    ladder = sorted(quality_configs.items(), key=lambda item: rendition_height(item[1]), reverse=True)
+    if source_height <= 0:
+        return ladder
+    fitting = [item for item in ladder if rendition_height(item[1]) <= source_height]
+    return fitting or ladder[-1:]
+
+def build_hls_command(
+    ffmpeg_path: str,
+    input_path: str,
+    output_dir: str,
+    renditions: List[Rendition],
+    has_audio: bool = True,
+    segment_seconds: int = 6,
+    threads: int = 0,
+    preset: str = "medium",
+    start_segment: int = 0
+) -> List[str]:
+    """One ffmpeg invocation writing output_dir/<quality>/index.m3u8 for every rendition
+
+    With start_segment > 0 the pass starts at that segment boundary: the input
+    is seeked, timestamps keep their original offset and segment numbering
+    continues from start_segment.
+    """
+    count = len(renditions)
+    filters = [f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+    for i, (_, config) in enumerate(renditions):
+        width, height = config["resolution"].lower().split("x")
+        filters.append(
+            f"[s{i}]scale=w={width}:h={height}:force_original_aspect_ratio=decrease:force_divisible_by=2[v{i}]"
+        )
+
+    start_seconds = start_segment * segment_seconds
+    cmd = [ffmpeg_path, "-hide_banner", "-nostats", "-progress", "pipe:1", "-y"]
+    if start_segment:
+        cmd += ["-ss", str(start_seconds)]
+    cmd += [
+        "-i", input_path,
+        "-filter_complex", ";".join(filters)
+    ]
+    for i, (_, config) in enumerate(renditions):
+        cmd += [
+            "-map", f"[v{i}]",
+            f"-c:v:{i}", "libx264",
+            f"-maxrate:v:{i}", config["max_bitrate"],
+            f"-bufsize:v:{i}", config["bufsize"]
+        ]
+        if has_audio:
+            cmd += ["-map", "0:a:0"]
+    cmd += [
+        "-preset", preset,
+        "-crf", "23",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+        "-sc_threshold", "0",
+        "-threads", str(threads)
+    ]
+    if has_audio:
+        cmd += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+    if start_segment:
+        cmd += ["-output_ts_offset", str(start_seconds), "-start_number", str(start_segment)]
+    stream_map = " ".join(
+        f"v:{i},a:{i},name:{name}" if has_audio else f"v:{i},name:{name}"
+        for i, (name, _) in enumerate(renditions)
+    )
+    cmd += [
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        # temp_file: a playlist on disk only ever lists complete segments
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", f"{output_dir}/%v/segment_%05d.ts",
+        "-var_stream_map", stream_map,
+        f"{output_dir}/%v/index.m3u8"
+    ]
+    return cmd
+
+def segment_filename(index: int) -> str:
+    return f"segment_{index:05d}.ts"
+
+def parse_media_playlist(text: str) -> List[Tuple[str, float]]:
+    """(segment filename, duration) for every segment listed in a media playlist"""
+    segments = []
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((line, duration))
+            duration = None
+    return segments
+
+def build_media_playlist(durations: List[float]) -> str:
+    """VOD media playlist over segment_00000.ts .. in order, from their durations"""
+    target = max((math.ceil(d) for d in durations), default=1)
+    lines = [
+        "#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD", "#EXT-X-INDEPENDENT-SEGMENTS"
+    ]
+    for index, duration in enumerate(durations):
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(segment_filename(index))
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+def build_master_playlist(renditions: List[Dict[str, Any]]) -> str:
+    """
+    Master playlist over finished renditions (dicts with quality, resolution,
+    bandwidth in bits/s). Written by us rather than ffmpeg because renditions
+    resumed after a crash come from different passes.
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for rendition in sorted(renditions, key=lambda r: r["bandwidth"], reverse=True):
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={rendition['bandwidth']},RESOLUTION={rendition['resolution']}")
+        lines.append(f"{rendition['quality']}/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+def bitrate_to_bps(value: str) -> int:
+    """'5000k' -> 5000000"""
+    value = value.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+def parse_progress_seconds(line: str) -> Optional[float]:
+    """Encoded position from an ffmpeg -progress line (out_time_us / out_time_ms are both microseconds)"""
+    key, _, value = line.strip().partition("=")
+    if key in ("out_time_us", "out_time_ms") and value.isdigit():
+        return int(value) / 1000000
+    return None
+
+class ThrottledProgress:
+    """Forwards progress at most every `min_interval` seconds and only when it moved `min_delta` points"""
+
+    def __init__(
+        self,
+        callback: Callable[[float], Awaitable[Any]],
+        min_interval: float = 5.0,
+        min_delta: float = 1.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.clock = clock
+        self.reported: Optional[float] = None
+        self._last_at = 0.0
+
+    async def update(self, progress: float, force: bool = False):
+        progress = round(min(100.0, max(0.0, progress)), 1)
+        if self.reported is not None and not force:
+            if progress - self.reported < self.min_delta or self.clock() - self._last_at < self.min_interval:
+                return
+        self.reported = progress
+        self._last_at = self.clock()
+        await self.callback(progress)
+
+async def run_ffmpeg(
+    cmd: List[str],
+    duration: float = 0.0,
+    on_progress: Optional[Callable[[float], Awaitable[Any]]] = None
+):
+    """Run ffmpeg, reporting the encoded fraction (0..1) of `duration` as it goes"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr concurrently so a chatty encoder never blocks on a full pipe
+    stderr_tail: deque = deque(maxlen=20)
+
+    async def read_stderr():
+        async for line in process.stderr:
+            stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    stderr_task = asyncio.create_task(read_stderr())
+    try:
+        async for line in process.stdout:
+            seconds = parse_progress_seconds(line.decode(errors="replace"))
+            if seconds is not None and duration > 0 and on_progress:
+                await on_progress(min(1.0, seconds / duration))
+        await process.wait()
+        await stderr_task
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+        raise
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg failed: {' | '.join(stderr_tail)}")
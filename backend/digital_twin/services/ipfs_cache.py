@@ -0,0 +1,253 @@
+"""
+Content-addressed local cache for IPFS reads
+CIDs are immutable, so any content fetched (or pinned) once can be served
+locally forever. Two tiers:
+1. Bounded in-memory LRU (entry count and total bytes)
+2. On-disk store sharded by CID, evicted least-recently-used by total size
+The lock only guards the in-memory indexes; file reads and writes happen
+outside it, so event-loop callers never wait on disk I/O.
+
+Caching policy (see cacheable()): content is cached unless it provably does
+not hash to its CID. Raw-leaf CIDv1s are checked locally; CIDv0 and dag-pb
+CIDs cannot be, and are trusted because every write path uploads the exact
+bytes it caches and gateways verify blocks before serving them.
+"""
+import os
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# CIDv1 header for a single raw block hashed with sha2-256 (version, raw codec, sha2-256, 32 bytes)
+RAW_SHA256_CID_PREFIX = bytes([0x01, 0x55, 0x12, 0x20])
+
+def compute_raw_cid(content: bytes) -> str:
+    """CIDv1 (raw codec, sha2-256, base32) of content stored as a single block"""
+    digest = RAW_SHA256_CID_PREFIX + hashlib.sha256(content).digest()
+    return "b" + base64.b32encode(digest).decode("ascii").lower().rstrip("=")
+
+def verify_cid(cid: str, content: bytes) -> Optional[bool]:
+    """
+    Whether content hashes to cid. Only raw-codec sha2-256 CIDv1s can be
+    checked locally; None for anything else (CIDv0, dag-pb, chunked files).
+    """
+    if not cid or not cid.startswith("b"):
+        return None
+    encoded = cid[1:].upper()
+    try:
+        decoded = base64.b32decode(encoded + "=" * (-len(encoded) % 8))
+    except (ValueError, TypeError):
+        return None
+    if not decoded.startswith(RAW_SHA256_CID_PREFIX) or len(decoded) != len(RAW_SHA256_CID_PREFIX) + 32:
+        return None
+    return decoded[len(RAW_SHA256_CID_PREFIX):] == hashlib.sha256(content).digest()
+
+def cacheable(cid: str, content: bytes) -> bool:
+    """Whether content may be cached under cid: anything but a proven mismatch"""
+    return verify_cid(cid, content) is not False
+
+class CIDCache:
+    """Two-tier (memory LRU + sharded disk) cache keyed by CID"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_max_items: Optional[int] = None,
+        memory_max_bytes: Optional[int] = None,
+        disk_max_bytes: Optional[int] = None
+    ):
+        self.cache_dir = Path(cache_dir or os.getenv("IPFS_CACHE_DIR", "data/ipfs_cache"))
+        self.memory_max_items = memory_max_items or int(os.getenv("IPFS_CACHE_MEMORY_ITEMS", "1024"))
+        self.memory_max_bytes = memory_max_bytes or int(os.getenv("IPFS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+        self.disk_max_bytes = disk_max_bytes or int(os.getenv("IPFS_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+        self.disk_enabled = os.getenv("IPFS_CACHE_DISK_ENABLED", "true").lower() == "true"
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # cid -> size for files on disk, in least-recently-used order
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_indexed = False
+        self._lock = threading.Lock()
+
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "puts": 0
+        }
+
+    # Paths
+    @staticmethod
+    def _valid_cid(cid: str) -> bool:
+        return bool(cid) and cid.isalnum()
+
+    def _path(self, cid: str) -> Path:
+        """Shard directory from the next-to-last two CID characters (flatfs layout)"""
+        shard = cid[-3:-1] if len(cid) >= 3 else "_"
+        return self.cache_dir / shard / cid
+
+    # Memory tier
+    def _memory_get(self, cid: str) -> Optional[bytes]:
+        content = self._memory.get(cid)
+        if content is not None:
+            self._memory.move_to_end(cid)
+        return content
+
+    def _memory_put(self, cid: str, content: bytes):
+        if len(content) > self.memory_max_bytes:
+            return
+        previous = self._memory.pop(cid, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[cid] = content
+        self._memory_bytes += len(content)
+        while self._memory and (
+            len(self._memory) > self.memory_max_items or self._memory_bytes > self.memory_max_bytes
+        ):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters["memory_evictions"] += 1
+
+    # Disk tier
+    def _index_disk(self):
+        """Build the disk index once, oldest access time first"""
+        if self._disk_indexed:
+            return
+        entries = []
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*/*"):
+                if path.is_file() and not path.name.endswith(".tmp"):
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, path.name, stat.st_size))
+        with self._lock:
+            if self._disk_indexed:
+                return
+            for _, cid, size in sorted(entries):
+                if cid not in self._disk_index:
+                    self._disk_index[cid] = size
+                    self._disk_bytes += size
+            self._disk_indexed = True
+
+    def _disk_get(self, cid: str) -> Optional[bytes]:
+        self._index_disk()
+        with self._lock:
+            if cid not in self._disk_index:
+                return None
+        path = self._path(cid)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk_index.pop(cid, 0)
+            return None
+        with self._lock:
+            if cid in self._disk_index:
+                self._disk_index.move_to_end(cid)
+        return content
+
+    def _disk_put(self, cid: str, content: bytes):
+        self._index_disk()
+        with self._lock:
+            if cid in self._disk_index or len(content) > self.disk_max_bytes:
+                return
+        path = self._path(cid)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"IPFS disk cache write failed for {cid}: {e}")
+            return
+        evicted = []
+        with self._lock:
+            if cid not in self._disk_index:
+                self._disk_index[cid] = len(content)
+                self._disk_bytes += len(content)
+            while self._disk_index and self._disk_bytes > self.disk_max_bytes:
+                evicted_cid, size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                self.counters["disk_evictions"] += 1
+                evicted.append(evicted_cid)
+        for evicted_cid in evicted:
+            try:
+                self._path(evicted_cid).unlink()
+            except OSError:
+                pass
+
+    # Public API
+    def get_sync(self, cid: str) -> Optional[bytes]:
+        """Look up content by CID in memory, then on disk"""
+        if not self._valid_cid(cid):
+            return None
+        with self._lock:
+            content = self._memory_get(cid)
+            if content is not None:
+                self.counters["memory_hits"] += 1
+                return content
+        if self.disk_enabled:
+            content = self._disk_get(cid)
+            if content is not None:
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                    self._memory_put(cid, content)
+                return content
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put_sync(self, cid: str, content: bytes):
+        """Store content under its CID in both tiers"""
+        if not self._valid_cid(cid) or content is None:
+            return
+        with self._lock:
+            self.counters["puts"] += 1
+            self._memory_put(cid, content)
+        if self.disk_enabled:
+            self._disk_put(cid, content)
+
+    async def get(self, cid: str) -> Optional[bytes]:
+        """Async lookup; the disk tier is read in a worker thread"""
+        with self._lock:
+            content = self._memory_get(cid) if self._valid_cid(cid) else None
+            if content is not None:
+                self.counters["memory_hits"] += 1
+                return content
+        return await asyncio.to_thread(self.get_sync, cid)
+
+    async def put(self, cid: str, content: bytes):
+        """Async store; disk writes run in a worker thread"""
+        await asyncio.to_thread(self.put_sync, cid, content)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and tier sizes"""
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_items": len(self._disk_index),
+                "disk_bytes": self._disk_bytes
+            }
+
+    def clear_memory(self):
+        """Drop the in-memory tier (disk entries are kept)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+# Global cache shared by all IPFSService instances
+cid_cache = CIDCache()
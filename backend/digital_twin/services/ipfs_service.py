@@ -3,16 +3,143 @@ IPFS service for decentralized content storage
 """
 import os
 import json
+import time
+import random
+import asyncio
 import hashlib
 import logging
-from typing import Dict, Any, Optional, List, BinaryIO
+import threading
+from typing import Dict, Any, Optional, List, BinaryIO, Union
 from datetime import datetime, timezone
-import requests
-from requests_toolbelt.multipart.encoder import MultipartEncoder
+from pathlib import Path
+import httpx
 import ipfshttpclient
 
+from .ipfs_cache import cid_cache, cacheable
+
 logger = logging.getLogger(__name__)
 
+# Status codes worth retrying (rate limiting and transient gateway errors)
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class IPFSHttpPool:
+    """Process-wide pooled HTTP clients shared by every IPFSService instance
+    
+    Async callers share one keep-alive httpx.AsyncClient per event loop and the
+    synchronous helpers share one httpx.Client. Each provider (pinata,
+    web3storage, gateway) gets its own concurrency limit.
+    """
+    
+    def __init__(self):
+        self.max_connections = int(os.getenv("IPFS_MAX_CONNECTIONS", "32"))
+        self.max_keepalive = int(os.getenv("IPFS_MAX_KEEPALIVE_CONNECTIONS", "16"))
+        self.provider_concurrency = int(os.getenv("IPFS_PROVIDER_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("IPFS_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("IPFS_RETRY_BACKOFF_SECONDS", "0.5"))
+        self.timeout = httpx.Timeout(float(os.getenv("IPFS_TIMEOUT_SECONDS", "30")), connect=10.0)
+        
+        self._async_clients: Dict[int, httpx.AsyncClient] = {}
+        self._async_semaphores: Dict[tuple, asyncio.Semaphore] = {}
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+    
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=30.0
+        )
+    
+    # Async side
+    def async_client(self) -> httpx.AsyncClient:
+        """Get the pooled async client for the running event loop"""
+        loop_id = id(asyncio.get_running_loop())
+        client = self._async_clients.get(loop_id)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=self._limits(), timeout=self.timeout, follow_redirects=True)
+            self._async_clients[loop_id] = client
+        return client
+    
+    def async_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the concurrency limit for a provider on the running event loop"""
+        key = (id(asyncio.get_running_loop()), provider)
+        semaphore = self._async_semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.provider_concurrency)
+            self._async_semaphores[key] = semaphore
+        return semaphore
+    
+    async def request(self, provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request with the provider's concurrency limit and retry with backoff"""
+        client = self.async_client()
+        attempt = 0
+        while True:
+            try:
+                async with self.async_semaphore(provider):
+                    response = await client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"{provider} returned {response.status_code}, retrying ({attempt + 1}/{self.max_retries})")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"{provider} transport error: {e}, retrying ({attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+    
+    # Sync side
+    def sync_client(self) -> httpx.Client:
+        """Get the pooled synchronous client"""
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(limits=self._limits(), timeout=self.timeout, follow_redirects=True)
+            return self._sync_client
+    
+    def sync_semaphore(self, provider: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._sync_semaphores.get(provider)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.provider_concurrency)
+                self._sync_semaphores[provider] = semaphore
+            return semaphore
+    
+    def request_sync(self, provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Synchronous counterpart of request() sharing the same limits and retry policy"""
+        client = self.sync_client()
+        attempt = 0
+        while True:
+            try:
+                with self.sync_semaphore(provider):
+                    response = client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"{provider} returned {response.status_code}, retrying ({attempt + 1}/{self.max_retries})")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"{provider} transport error: {e}, retrying ({attempt + 1}/{self.max_retries})")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+    
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter"""
+        delay = self.backoff_base * (2 ** attempt)
+        return delay + random.uniform(0, delay / 2)
+    
+    async def aclose(self):
+        """Close all pooled clients"""
+        for client in list(self._async_clients.values()):
+            await client.aclose()
+        self._async_clients.clear()
+        self._async_semaphores.clear()
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+# Global pool shared by all IPFSService instances
+ipfs_http_pool = IPFSHttpPool()
+
 class IPFSService:
     """IPFS service for content storage and retrieval"""
     
@@ -20,10 +147,11 @@ class IPFSService:
         # Pinata configuration
         self.pinata_api_key = os.getenv("PINATA_API_KEY")
         self.pinata_secret_key = os.getenv("PINATA_SECRET_KEY")
-        self.pinata_base_url = "https://api.pinata.cloud"
+        self.pinata_base_url = os.getenv("PINATA_API_URL", "https://api.pinata.cloud")
         
         # Web3.Storage configuration
         self.web3_storage_token = os.getenv("WEB3_STORAGE_TOKEN")
+        self.web3_storage_url = os.getenv("WEB3_STORAGE_API_URL", "https://api.web3.storage")
         
         # IPFS gateway configuration
         self.ipfs_gateway = os.getenv("IPFS_GATEWAY_URL", "https://gateway.pinata.cloud")
@@ -37,6 +165,40 @@ class IPFSService:
         self.ipfs_client = None
         self.use_local_ipfs = False
         logger.info("Using Pinata IPFS service (local node disabled)")
+        
+        # Shared connection pool and content-addressed read cache
+        self.http = ipfs_http_pool
+        self.cache = cid_cache
+    
+    def _pinata_headers(self, content_type: str = None) -> Dict[str, str]:
+        headers = {
+            "pinata_api_key": self.pinata_api_key,
+            "pinata_secret_api_key": self.pinata_secret_key
+        }
+        if content_type:
+            headers["Content-Type"] = content_type
+        return headers
+    
+    def _pinata_file_form(self, filename: str, metadata: Dict[str, Any] = None) -> Dict[str, str]:
+        return {
+            "pinataMetadata": json.dumps({
+                "name": filename,
+                "keyvalues": {
+                    "filename": filename,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    **(metadata or {})
+                }
+            }),
+            "pinataOptions": json.dumps({
+                "cidVersion": 1
+            })
+        }
+    
+    def _pinata_json_form(self, name: str = None, metadata: Dict[str, Any] = None, content_hash: str = None) -> Dict[str, str]:
+        return self._pinata_file_form(
+            name or f"json_{datetime.now(timezone.utc).isoformat()}",
+            {"content_hash": content_hash, **(metadata or {})}
+        )
     
     async def pin_json(self, data: Dict[str, Any], name: str = None, metadata: Dict[str, Any] = None) -> str:
         """Pin JSON data to IPFS and return CID"""
@@ -49,16 +211,19 @@ class IPFSService:
             content_hash = hashlib.sha256(json_bytes).hexdigest()
             
             # Use Pinata directly
+            cid = None
             if self.pinata_api_key:
                 cid = await self._pin_json_pinata(json_bytes, name, metadata, content_hash)
-                if cid:
-                    return cid
             
             # Fallback to Web3.Storage
-            if self.web3_storage_token:
+            if not cid and self.web3_storage_token:
                 cid = await self._pin_json_web3storage(json_bytes, name)
-                if cid:
-                    return cid
+            
+            if cid:
+                # Both providers store exactly these bytes, so reads of our own writes never hit a gateway
+                if cacheable(cid, json_bytes):
+                    await self.cache.put(cid, json_bytes)
+                return cid
             
             raise Exception("No IPFS service available")
             
@@ -67,35 +232,22 @@ class IPFSService:
             raise
     
     async def _pin_json_pinata(self, json_bytes: bytes, name: str = None, metadata: Dict[str, Any] = None, content_hash: str = None) -> str:
-        """Pin JSON to Pinata"""
+        """Pin JSON to Pinata
+        
+        The serialized bytes go through pinFileToIPFS rather than pinJSONToIPFS,
+        which re-serializes the document, so the CID addresses exactly json_bytes.
+        With cidVersion 1 Pinata builds raw leaves, so a single-block document
+        gets a raw CID that verify_cid can check.
+        """
         try:
-            url = f"{self.pinata_base_url}/pinning/pinJSONToIPFS"
-            
-            headers = {
-                "pinata_api_key": self.pinata_api_key,
-                "pinata_secret_api_key": self.pinata_secret_key,
-                "Content-Type": "application/json"
-            }
-            
-            # Parse JSON back for Pinata API
-            data = json.loads(json_bytes.decode('utf-8'))
-            
-            payload = {
-                "pinataContent": data,
-                "pinataMetadata": {
-                    "name": name or f"json_{datetime.now(timezone.utc).isoformat()}",
-                    "keyvalues": {
-                        "content_hash": content_hash,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        **(metadata or {})
-                    }
-                },
-                "pinataOptions": {
-                    "cidVersion": 1
-                }
-            }
+            url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = await self.http.request(
+                "pinata", "POST", url,
+                files={'file': (f"{name or 'data'}.json", json_bytes, 'application/json')},
+                data=self._pinata_json_form(name, metadata, content_hash),
+                headers=self._pinata_headers()
+            )
             response.raise_for_status()
             
             result = response.json()
@@ -111,14 +263,14 @@ class IPFSService:
     async def _pin_json_web3storage(self, json_bytes: bytes, name: str = None) -> str:
         """Pin JSON to Web3.Storage"""
         try:
-            url = "https://api.web3.storage/upload"
+            url = f"{self.web3_storage_url}/upload"
             
             headers = {
                 "Authorization": f"Bearer {self.web3_storage_token}",
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(url, data=json_bytes, headers=headers, timeout=30)
+            response = await self.http.request("web3storage", "POST", url, content=json_bytes, headers=headers)
             response.raise_for_status()
             
             result = response.json()
@@ -131,20 +283,27 @@ class IPFSService:
             logger.error(f"Web3.Storage JSON pinning failed: {e}")
             return None
     
-    async def pin_file(self, file_data: bytes, filename: str, metadata: Dict[str, Any] = None) -> str:
-        """Pin file to IPFS and return CID"""
+    async def pin_file(self, file_data: Union[bytes, BinaryIO], filename: str, metadata: Dict[str, Any] = None) -> str:
+        """Pin file to IPFS and return CID
+        
+        file_data may be bytes or an open binary file; files are streamed in
+        chunks instead of being read into memory.
+        """
         try:
             # Use Pinata directly
+            cid = None
             if self.pinata_api_key:
                 cid = await self._pin_file_pinata(file_data, filename, metadata)
-                if cid:
-                    return cid
             
             # Fallback to Web3.Storage
-            if self.web3_storage_token:
+            if not cid and self.web3_storage_token:
                 cid = await self._pin_file_web3storage(file_data, filename)
-                if cid:
-                    return cid
+            
+            if cid:
+                # The gateway serves the uploaded bytes for this CID
+                if isinstance(file_data, bytes) and cacheable(cid, file_data):
+                    await self.cache.put(cid, file_data)
+                return cid
             
             raise Exception("No IPFS service available")
             
@@ -157,29 +316,15 @@ class IPFSService:
         try:
             url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
             
-            # Create multipart form data
-            form_data = MultipartEncoder({
-                'file': (filename, file_data, 'application/octet-stream'),
-                'pinataMetadata': json.dumps({
-                    "name": filename,
-                    "keyvalues": {
-                        "filename": filename,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        **(metadata or {})
-                    }
-                }),
-                'pinataOptions': json.dumps({
-                    "cidVersion": 1
-                })
-            })
-            
-            headers = {
-                "pinata_api_key": self.pinata_api_key,
-                "pinata_secret_api_key": self.pinata_secret_key,
-                "Content-Type": form_data.content_type
-            }
-            
-            response = requests.post(url, data=form_data, headers=headers, timeout=60)
+            # Multipart body is streamed from file_data
+            self._rewind(file_data)
+            response = await self.http.request(
+                "pinata", "POST", url,
+                files={'file': (filename, file_data, 'application/octet-stream')},
+                data=self._pinata_file_form(filename, metadata),
+                headers=self._pinata_headers(),
+                timeout=60
+            )
             response.raise_for_status()
             
             result = response.json()
@@ -195,7 +340,7 @@ class IPFSService:
     async def _pin_file_web3storage(self, file_data: bytes, filename: str) -> str:
         """Pin file to Web3.Storage"""
         try:
-            url = "https://api.web3.storage/upload"
+            url = f"{self.web3_storage_url}/upload"
             
             headers = {
                 "Authorization": f"Bearer {self.web3_storage_token}",
@@ -205,7 +350,8 @@ class IPFSService:
                 'file': (filename, file_data, 'application/octet-stream')
             }
             
-            response = requests.post(url, files=files, headers=headers, timeout=60)
+            self._rewind(file_data)
+            response = await self.http.request("web3storage", "POST", url, files=files, headers=headers, timeout=60)
             response.raise_for_status()
             
             result = response.json()
@@ -218,18 +364,24 @@ class IPFSService:
             logger.error(f"Web3.Storage file pinning failed: {e}")
             return None
     
-    async def get_content(self, cid: str, use_gateway: str = "pinata") -> Optional[bytes]:
-        """Retrieve content from IPFS by CID"""
+    async def get_content(self, cid: str, use_gateway: str = "pinata", use_cache: bool = True) -> Optional[bytes]:
+        """Retrieve content from IPFS by CID (local CID cache first unless use_cache is False)"""
         try:
-            # Use gateway directly
-            if use_gateway == "cloudflare":
-                url = f"{self.cloudflare_gateway}/ipfs/{cid}"
-            else:
-                url = f"{self.ipfs_gateway}/ipfs/{cid}"
+            if use_cache:
+                cached = await self.cache.get(cid)
+                if cached is not None:
+                    logger.debug(f"Content served from local CID cache: {cid}")
+                    return cached
+            
+            url = self.get_gateway_url(cid, use_gateway)
             
-            response = requests.get(url, timeout=30)
+            response = await self.http.request("gateway", "GET", url)
             response.raise_for_status()
             
+            if cacheable(cid, response.content):
+                await self.cache.put(cid, response.content)
+            else:
+                logger.warning(f"Gateway content does not match CID {cid}; not caching")
             logger.debug(f"Content retrieved from gateway: {cid}")
             return response.content
             
@@ -237,10 +389,10 @@ class IPFSService:
             logger.error(f"Content retrieval failed for CID {cid}: {e}")
             return None
     
-    async def get_json(self, cid: str, use_gateway: str = "pinata") -> Optional[Dict[str, Any]]:
+    async def get_json(self, cid: str, use_gateway: str = "pinata", use_cache: bool = True) -> Optional[Dict[str, Any]]:
         """Retrieve JSON content from IPFS by CID"""
         try:
-            content = await self.get_content(cid, use_gateway)
+            content = await self.get_content(cid, use_gateway, use_cache)
             if content:
                 return json.loads(content.decode('utf-8'))
             return None
@@ -249,9 +401,67 @@ class IPFSService:
             logger.error(f"JSON retrieval failed for CID {cid}: {e}")
             return None
     
+    async def download_to_file(self, cid: str, file_path: str, use_gateway: str = "pinata", chunk_size: int = 65536) -> bool:
+        """Stream content from IPFS by CID straight to disk"""
+        try:
+            url = self.get_gateway_url(cid, use_gateway)
+            client = self.http.async_client()
+            async with self.http.async_semaphore("gateway"):
+                async with client.stream("GET", url, timeout=60) as response:
+                    response.raise_for_status()
+                    with open(file_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            f.write(chunk)
+            
+            logger.debug(f"Content streamed from gateway to {file_path}: {cid}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Content download failed for CID {cid}: {e}")
+            return False
+    
+    @staticmethod
+    def _rewind(file_data: Union[bytes, BinaryIO]):
+        """Rewind file objects so retries re-send the whole body"""
+        if hasattr(file_data, "seek"):
+            file_data.seek(0)
+    
+    async def pin_files(self, files: Dict[str, bytes], folder: str, metadata: Dict[str, Any] = None) -> str:
+        """Pin many small files as one directory in a single request and return the directory CID
+        
+        Each file is then addressable as ipfs://{cid}/{filename}.
+        """
+        if not self.pinata_api_key:
+            raise Exception("Directory pinning requires Pinata")
+        try:
+            url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
+            multipart = [
+                ('file', (f"{folder}/{filename}", content, 'application/octet-stream'))
+                for filename, content in files.items()
+            ]
+            response = await self.http.request(
+                "pinata", "POST", url,
+                files=multipart,
+                data=self._pinata_file_form(folder, {"file_count": len(files), **(metadata or {})}),
+                headers=self._pinata_headers(),
+                timeout=120
+            )
+            response.raise_for_status()
+            cid = response.json()["IpfsHash"]
+            logger.info(f"Directory of {len(files)} files pinned to Pinata: {cid}")
+            return cid
+        except Exception as e:
+            logger.error(f"Directory pinning failed: {e}")
+            raise
+    
     async def pin_directory(self, directory_path: str, name: str = None) -> str:
         """Pin entire directory to IPFS"""
-        raise Exception("Directory pinning not supported with Pinata-only configuration")
+        root = Path(directory_path)
+        files = {
+            str(path.relative_to(root)): path.read_bytes()
+            for path in sorted(root.rglob("*")) if path.is_file()
+        }
+        return await self.pin_files(files, name or root.name)
     
     async def unpin_content(self, cid: str) -> bool:
         """Unpin content from IPFS"""
@@ -259,12 +469,8 @@ class IPFSService:
             # For Pinata, use their unpin API
             if self.pinata_api_key:
                 url = f"{self.pinata_base_url}/pinning/unpin/{cid}"
-                headers = {
-                    "pinata_api_key": self.pinata_api_key,
-                    "pinata_secret_api_key": self.pinata_secret_key
-                }
                 
-                response = requests.delete(url, headers=headers, timeout=30)
+                response = await self.http.request("pinata", "DELETE", url, headers=self._pinata_headers())
                 if response.status_code == 200:
                     logger.info(f"Content unpinned from Pinata: {cid}")
                     return True
@@ -292,7 +498,7 @@ class IPFSService:
             for gateway_name, gateway_url in [("pinata", self.ipfs_gateway), ("cloudflare", self.cloudflare_gateway)]:
                 try:
                     url = f"{gateway_url}/ipfs/{cid}"
-                    response = requests.head(url, timeout=10)
+                    response = await self.http.request("gateway", "HEAD", url, timeout=10)
                     if response.status_code == 200:
                         status_info["gateways"].append(gateway_name)
                         if "content-length" in response.headers:
@@ -376,6 +582,10 @@ class IPFSService:
             logger.error(f"NFT image generation failed: {e}")
             raise
     
+    def cache_stats(self) -> Dict[str, Any]:
+        """Local CID cache hit/miss/eviction counters"""
+        return self.cache.stats()
+    
     def get_gateway_url(self, cid: str, gateway: str = "pinata") -> str:
         """Get gateway URL for CID"""
         if gateway == "cloudflare":
@@ -399,11 +609,7 @@ class IPFSService:
         if self.pinata_api_key:
             try:
                 url = f"{self.pinata_base_url}/data/testAuthentication"
-                headers = {
-                    "pinata_api_key": self.pinata_api_key,
-                    "pinata_secret_api_key": self.pinata_secret_key
-                }
-                response = requests.get(url, headers=headers, timeout=10)
+                response = await self.http.request("pinata", "GET", url, headers=self._pinata_headers(), timeout=10)
                 health["pinata"] = response.status_code == 200
             except Exception:
                 health["pinata"] = False
@@ -411,9 +617,9 @@ class IPFSService:
         # Check Web3.Storage
         if self.web3_storage_token:
             try:
-                url = "https://api.web3.storage/"
+                url = f"{self.web3_storage_url}/"
                 headers = {"Authorization": f"Bearer {self.web3_storage_token}"}
-                response = requests.get(url, headers=headers, timeout=10)
+                response = await self.http.request("web3storage", "GET", url, headers=headers, timeout=10)
                 health["web3_storage"] = response.status_code == 200
             except Exception:
                 health["web3_storage"] = False
@@ -423,54 +629,43 @@ class IPFSService:
         for gateway_name, gateway_url in [("pinata", self.ipfs_gateway), ("cloudflare", self.cloudflare_gateway)]:
             try:
                 url = f"{gateway_url}/ipfs/{test_cid}"
-                response = requests.head(url, timeout=10)
+                response = await self.http.request("gateway", "HEAD", url, timeout=10)
                 health["gateways"][gateway_name] = response.status_code == 200
             except Exception:
                 health["gateways"][gateway_name] = False
         
         return health
     
-    # Synchronous helpers (safe in FastAPI context)
+    # Synchronous helpers (share the pooled connections of ipfs_http_pool)
     def upload_file(self, file_path: str, metadata: Dict[str, Any] = None) -> str:
         """Synchronously upload a file from disk to IPFS and return CID."""
         try:
+            filename = os.path.basename(file_path)
             with open(file_path, 'rb') as f:
-                file_data = f.read()
-            # Prefer Pinata
-            if self.pinata_api_key:
-                url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
-                form_data = MultipartEncoder({
-                    'file': (os.path.basename(file_path), file_data, 'application/octet-stream'),
-                    'pinataMetadata': json.dumps({
-                        'name': os.path.basename(file_path),
-                        'keyvalues': {
-                            'filename': os.path.basename(file_path),
-                            'timestamp': datetime.now(timezone.utc).isoformat(),
-                            **(metadata or {})
-                        }
-                    }),
-                    'pinataOptions': json.dumps({'cidVersion': 1})
-                })
-                headers = {
-                    'pinata_api_key': self.pinata_api_key,
-                    'pinata_secret_api_key': self.pinata_secret_key,
-                    'Content-Type': form_data.content_type
-                }
-                resp = requests.post(url, data=form_data, headers=headers, timeout=60)
-                resp.raise_for_status()
-                cid = resp.json()['IpfsHash']
-                logger.info(f"File pinned to Pinata: {cid}")
-                return cid
-            # Fallback to Web3.Storage
-            if self.web3_storage_token:
-                url = 'https://api.web3.storage/upload'
-                headers = { 'Authorization': f'Bearer {self.web3_storage_token}' }
-                files = { 'file': (os.path.basename(file_path), file_data, 'application/octet-stream') }
-                resp = requests.post(url, files=files, headers=headers, timeout=60)
-                resp.raise_for_status()
-                cid = resp.json()['cid']
-                logger.info(f"File pinned to Web3.Storage: {cid}")
-                return cid
+                # Prefer Pinata
+                if self.pinata_api_key:
+                    url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
+                    resp = self.http.request_sync(
+                        'pinata', 'POST', url,
+                        files={'file': (filename, f, 'application/octet-stream')},
+                        data=self._pinata_file_form(filename, metadata),
+                        headers=self._pinata_headers(),
+                        timeout=60
+                    )
+                    resp.raise_for_status()
+                    cid = resp.json()['IpfsHash']
+                    logger.info(f"File pinned to Pinata: {cid}")
+                    return cid
+                # Fallback to Web3.Storage
+                if self.web3_storage_token:
+                    url = f"{self.web3_storage_url}/upload"
+                    headers = { 'Authorization': f'Bearer {self.web3_storage_token}' }
+                    files = { 'file': (filename, f, 'application/octet-stream') }
+                    resp = self.http.request_sync('web3storage', 'POST', url, files=files, headers=headers, timeout=60)
+                    resp.raise_for_status()
+                    cid = resp.json()['cid']
+                    logger.info(f"File pinned to Web3.Storage: {cid}")
+                    return cid
             raise Exception('No IPFS service available')
         except Exception as e:
             logger.error(f"Synchronous file upload failed: {e}")
@@ -480,45 +675,38 @@ class IPFSService:
         """Synchronously upload JSON to IPFS and return CID (no asyncio)."""
         try:
             json_str = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
-            content_hash = hashlib.sha256(json_str.encode('utf-8')).hexdigest()
-            # Prefer Pinata
+            json_bytes = json_str.encode('utf-8')
+            content_hash = hashlib.sha256(json_bytes).hexdigest()
+            # Prefer Pinata (exact bytes, as in _pin_json_pinata)
             if self.pinata_api_key:
-                url = f"{self.pinata_base_url}/pinning/pinJSONToIPFS"
-                headers = {
-                    'pinata_api_key': self.pinata_api_key,
-                    'pinata_secret_api_key': self.pinata_secret_key,
-                    'Content-Type': 'application/json'
-                }
-                payload = {
-                    'pinataContent': json.loads(json_str),
-                    'pinataMetadata': {
-                        'name': name or f"json_{datetime.now(timezone.utc).isoformat()}",
-                        'keyvalues': {
-                            'content_hash': content_hash,
-                            'timestamp': datetime.now(timezone.utc).isoformat(),
-                            **(metadata or {})
-                        }
-                    },
-                    'pinataOptions': { 'cidVersion': 1 }
-                }
-                resp = requests.post(url, json=payload, headers=headers, timeout=30)
+                url = f"{self.pinata_base_url}/pinning/pinFileToIPFS"
+                resp = self.http.request_sync(
+                    'pinata', 'POST', url,
+                    files={'file': (f"{name or 'data'}.json", json_bytes, 'application/json')},
+                    data=self._pinata_json_form(name, metadata, content_hash),
+                    headers=self._pinata_headers()
+                )
                 resp.raise_for_status()
                 cid = resp.json()['IpfsHash']
                 logger.info(f"JSON pinned to Pinata: {cid}")
+                if cacheable(cid, json_bytes):
+                    self.cache.put_sync(cid, json_bytes)
                 return cid
             # Fallback to Web3.Storage
             if self.web3_storage_token:
-                url = 'https://api.web3.storage/upload'
+                url = f"{self.web3_storage_url}/upload"
                 headers = {
                     'Authorization': f'Bearer {self.web3_storage_token}',
                     'Content-Type': 'application/json'
                 }
-                resp = requests.post(url, data=json_str.encode('utf-8'), headers=headers, timeout=30)
+                resp = self.http.request_sync('web3storage', 'POST', url, content=json_bytes, headers=headers)
                 resp.raise_for_status()
                 cid = resp.json()['cid']
                 logger.info(f"JSON pinned to Web3.Storage: {cid}")
+                if cacheable(cid, json_bytes):
+                    self.cache.put_sync(cid, json_bytes)
                 return cid
             raise Exception('No IPFS service available')
         except Exception as e:
             logger.error(f"Synchronous JSON upload failed: {e}")
-            raise
\ No newline at end of file
+            raise
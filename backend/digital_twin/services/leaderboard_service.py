@@ -0,0 +1,407 @@
+"""
+Materialized certificate and achievement leaderboards
+Each board is a Redis sorted set per timeframe, so a top-K page is one
+ZREVRANGE and a user's position one ZREVRANK (O(log n)) instead of loading
+every user, enrollment, achievement and NFT record per request.
+
+Layout per board (certificates, achievements):
+- leaderboard:{board}:all              all-time scores
+- leaderboard:{board}:day:{YYYYMMDD}   per-day scores, expire after a year
+- leaderboard:{board}:{week|month|year} rolling windows, incremented live and
+  re-derived from the day buckets every LEADERBOARD_WINDOW_REFRESH_SECONDS so
+  old events age out
+- leaderboard:{board}:totals           entries / points summed over all users
+
+Scores are updated by award, course-completion certificate and NFT mint
+events; rebuild() backfills everything from MongoDB. While a rebuild holds
+its lock, events are journaled instead of applied (the swap would discard
+them) and replayed once the rebuilt keys are in place. Each event carries
+the time it was written, which is what the rebuild's aggregates cut off at
+(certificate_issued_at, earned_at, created_at); the day bucket comes from
+the event's own date, such as the course completion.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+from ..models.user import User
+from ..models.course import Enrollment
+from ..models.quiz_achievement import UserAchievement
+from ..models.nft import NFTRecord
+from .redis_service import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ("certificates", "achievements")
+TIMEFRAMES = ("all", "week", "month", "year")
+WINDOW_DAYS = {"week": 7, "month": 30, "year": 365}
+DAY_BUCKET_TTL = (366 + 7) * 86400
+
+CERTIFICATE_NFT_TYPES = ["course_completion", "skill_mastery", "certification"]
+ACHIEVEMENT_NFT_TYPES = ["achievement", "learning_milestone", "excellence_award"]
+
+REBUILD_LOCK_KEY = "leaderboard:rebuild_lock"
+REBUILD_JOURNAL_KEY = "leaderboard:rebuild_journal"
+
+# Achievement scores pack (count, points) into one double: count * 2^32 + points.
+# Both parts add independently, so ZINCRBY and ZUNIONSTORE(SUM) stay exact.
+POINTS_SCALE = 2 ** 32
+
+def encode_score(board: str, count: int, points: int = 0) -> float:
+    if board == "achievements":
+        return float(count * POINTS_SCALE + max(points, 0))
+    return float(count)
+
+def decode_score(board: str, score: float) -> Tuple[int, int]:
+    """(entries, points) of a board score"""
+    score = int(score)
+    if board == "achievements":
+        return score // POINTS_SCALE, score % POINTS_SCALE
+    return score, 0
+
+def day_bucket(moment: Optional[datetime]) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y%m%d")
+
+class LeaderboardService:
+    """Redis sorted-set leaderboards kept current by write events"""
+
+    def __init__(self, redis_service: Optional[RedisService] = None):
+        self.redis_service = redis_service or get_redis_service()
+        self.window_refresh_seconds = int(os.getenv("LEADERBOARD_WINDOW_REFRESH_SECONDS", "3600"))
+        self.rebuild_lock_seconds = int(os.getenv("LEADERBOARD_REBUILD_LOCK_SECONDS", "3600"))
+        self.check_interval = 30.0
+        self._checked_at: Optional[float] = None
+        self._background: Optional[asyncio.Task] = None
+
+    # Keys
+    @staticmethod
+    def board_key(board: str, timeframe: str = "all") -> str:
+        return f"leaderboard:{board}:{timeframe}"
+
+    @staticmethod
+    def day_key(board: str, day: str) -> str:
+        return f"leaderboard:{board}:day:{day}"
+
+    @staticmethod
+    def totals_key(board: str) -> str:
+        return f"leaderboard:{board}:totals"
+
+    # Events
+    def _queue_increment(self, pipe, board: str, user_id: str, day: str, count: int, points: int):
+        score = encode_score(board, count, points)
+        pipe.zincrby(self.board_key(board), score, user_id)
+        pipe.zincrby(self.day_key(board, day), score, user_id)
+        pipe.expire(self.day_key(board, day), DAY_BUCKET_TTL)
+        # Windows only hold events still inside them; the periodic refresh ages them out
+        age = datetime.now(timezone.utc).date() - datetime.strptime(day, "%Y%m%d").date()
+        for window, days in WINDOW_DAYS.items():
+            if age.days < days:
+                pipe.zincrby(self.board_key(board, window), score, user_id)
+        pipe.hincrby(self.totals_key(board), "entries", count)
+        pipe.hincrby(self.totals_key(board), "points", points)
+
+    @staticmethod
+    def _utc(moment: Optional[datetime]) -> datetime:
+        moment = moment or datetime.now(timezone.utc)
+        return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+    async def _record(
+        self,
+        board: str,
+        user_id: str,
+        moment: Optional[datetime],
+        count: int,
+        points: int = 0,
+        written_at: Optional[datetime] = None
+    ):
+        """Apply an event dated `moment`, written to MongoDB at `written_at` (defaults to moment)"""
+        moment = self._utc(moment)
+        written_at = self._utc(written_at or moment)
+        try:
+            entry = json.dumps({
+                "board": board, "user_id": user_id, "moment": moment.isoformat(),
+                "written_at": written_at.isoformat(), "count": count, "points": points
+            })
+            # A running rebuild replays the event after its swap
+            if await self.redis_service.run_script(
+                "journal_if_locked", [REBUILD_LOCK_KEY, REBUILD_JOURNAL_KEY], [entry]
+            ):
+                return
+            client = await self.redis_service.get_client()
+            pipe = client.pipeline(transaction=False)
+            self._queue_increment(pipe, board, user_id, day_bucket(moment), count, points)
+            await pipe.execute()
+        except Exception as e:
+            # The next rebuild repairs a missed event
+            logger.warning(f"Leaderboard update failed for {board}:{user_id}: {e}")
+
+    async def record_certificate(
+        self,
+        user_id: str,
+        completed_at: Optional[datetime] = None,
+        issued_at: Optional[datetime] = None
+    ):
+        """A course completion certificate was issued (issued_at, default now) for a
+        course completed at completed_at, which picks the day bucket"""
+        await self._record("certificates", user_id, completed_at, 1, written_at=issued_at or datetime.now(timezone.utc))
+
+    async def record_achievement(self, user_id: str, points: int = 0, earned_at: Optional[datetime] = None):
+        """A UserAchievement was awarded"""
+        await self._record("achievements", user_id, earned_at, 1, points)
+
+    async def record_nft(self, nft: NFTRecord):
+        """An NFTRecord was minted; counted on the board its achievement_type belongs to"""
+        if nft.achievement_type in CERTIFICATE_NFT_TYPES:
+            board = "certificates"
+        elif nft.achievement_type in ACHIEVEMENT_NFT_TYPES:
+            board = "achievements"
+        else:
+            return
+        # Boards rank registered users only
+        if not await User.find_one({"did": nft.owner_address}):
+            return
+        await self._record(board, nft.owner_address, nft.created_at, 1)
+
+    # Reads
+    async def ensure_fresh(self):
+        """Start a backfill when no board was ever built, and age out the rolling windows"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._background is not None and not self._background.done():
+            return
+        try:
+            client = await self.redis_service.get_client()
+            if not await client.exists("leaderboard:built"):
+                self._background = asyncio.create_task(self.rebuild())
+            elif await client.set("leaderboard:windows_refreshed", datetime.now(timezone.utc).isoformat(),
+                                  nx=True, ex=self.window_refresh_seconds):
+                self._background = asyncio.create_task(self.refresh_windows())
+        except Exception as e:
+            logger.warning(f"Leaderboard freshness check failed: {e}")
+
+    async def get_page(self, board: str, timeframe: str = "all", skip: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Top-K page: ranked (user_id, entries, points) plus the number of ranked users"""
+        await self.ensure_fresh()
+        client = await self.redis_service.get_client()
+        key = self.board_key(board, timeframe)
+        pipe = client.pipeline(transaction=False)
+        pipe.zrevrange(key, skip, skip + limit - 1, withscores=True)
+        pipe.zcard(key)
+        members, ranked = await pipe.execute()
+        entries = []
+        for offset, (user_id, score) in enumerate(members):
+            count, points = decode_score(board, score)
+            entries.append({"user_id": user_id, "rank": skip + offset + 1, "entries": count, "points": points})
+        return {"entries": entries, "ranked_users": ranked}
+
+    async def get_position(self, board: str, user_id: str, timeframe: str = "all") -> Dict[str, Any]:
+        """A user's 1-based rank, or None when they have nothing on the board"""
+        await self.ensure_fresh()
+        client = await self.redis_service.get_client()
+        key = self.board_key(board, timeframe)
+        pipe = client.pipeline(transaction=False)
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        pipe.zcard(key)
+        rank, score, ranked = await pipe.execute()
+        count, points = decode_score(board, score or 0)
+        return {
+            "rank": rank + 1 if rank is not None else None,
+            "entries": count,
+            "points": points,
+            "ranked_users": ranked
+        }
+
+    async def get_totals(self, board: str) -> Dict[str, int]:
+        await self.ensure_fresh()
+        client = await self.redis_service.get_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.hgetall(self.totals_key(board))
+        pipe.zcard(self.board_key(board))
+        totals, ranked = await pipe.execute()
+        totals = totals or {}
+        return {
+            "entries": int(totals.get("entries", 0)),
+            "points": int(totals.get("points", 0)),
+            "ranked_users": ranked
+        }
+
+    # Maintenance
+    async def refresh_windows(self, boards: Tuple[str, ...] = BOARDS):
+        """Re-derive the rolling windows from the day buckets"""
+        client = await self.redis_service.get_client()
+        today = datetime.now(timezone.utc)
+        for board in boards:
+            for window, days in WINDOW_DAYS.items():
+                sources = [self.day_key(board, day_bucket(today - timedelta(days=d))) for d in range(days)]
+                staging = f"leaderboard:staging:{board}:{window}"
+                # Readers keep the previous window until the rename
+                if await client.zunionstore(staging, sources):
+                    await client.rename(staging, self.board_key(board, window))
+                else:
+                    await client.delete(self.board_key(board, window))
+        logger.debug("Leaderboard windows refreshed")
+
+    async def _aggregate(self, model, pipeline: List[Dict[str, Any]]):
+        """Aggregate (user, day) rows and keep only registered users"""
+        pipeline = pipeline + [
+            {"$lookup": {
+                "from": User.Settings.name,
+                "localField": "_id.user",
+                "foreignField": "did",
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "user"
+            }},
+            {"$match": {"user.0": {"$exists": True}}}
+        ]
+        async for row in model.aggregate(pipeline):
+            yield row
+
+    @staticmethod
+    def _before(date_field: str, started: datetime) -> Dict[str, Any]:
+        """Rows the rebuild owns; later events come from the journal"""
+        return {"$match": {date_field: {"$not": {"$gte": started}}}}
+
+    @staticmethod
+    def _group_by_day(user_field: str, date_field: str, points: Optional[str] = None) -> Dict[str, Any]:
+        group = {
+            "_id": {
+                "user": f"${user_field}",
+                "day": {"$dateToString": {"format": "%Y%m%d", "date": f"${date_field}"}}
+            },
+            "count": {"$sum": 1}
+        }
+        if points:
+            group["points"] = {"$sum": {"$ifNull": [f"${points}", 0]}}
+        return {"$group": group}
+
+    async def rebuild(self) -> bool:
+        """Backfill every board from MongoDB and swap the results in
+
+        Returns False without doing anything when another rebuild holds the lock.
+        """
+        client = await self.redis_service.get_client()
+        token = uuid.uuid4().hex
+        if not await client.set(REBUILD_LOCK_KEY, token, nx=True, ex=self.rebuild_lock_seconds):
+            logger.info("Leaderboard rebuild already running elsewhere")
+            return False
+        started = time.monotonic()
+        # Events from here on are journaled; the aggregates stop at this instant
+        snapshot = datetime.now(timezone.utc)
+        rebuilt = False
+        try:
+            cutoff = snapshot - timedelta(days=366)
+            sources = {
+                "certificates": [
+                    (Enrollment, [
+                        {"$match": {"status": "completed", "certificate_issued": True, "completed_at": {"$ne": None}}},
+                        # Certificates issued before this field existed have none and are always included
+                        self._before("certificate_issued_at", snapshot),
+                        self._group_by_day("user_id", "completed_at")
+                    ]),
+                    (NFTRecord, [
+                        {"$match": {"achievement_type": {"$in": CERTIFICATE_NFT_TYPES}}},
+                        self._before("created_at", snapshot),
+                        self._group_by_day("owner_address", "created_at")
+                    ])
+                ],
+                "achievements": [
+                    (UserAchievement, [
+                        self._before("earned_at", snapshot),
+                        self._group_by_day("user_id", "earned_at", points="bonus_points")
+                    ]),
+                    (NFTRecord, [
+                        {"$match": {"achievement_type": {"$in": ACHIEVEMENT_NFT_TYPES}}},
+                        self._before("created_at", snapshot),
+                        self._group_by_day("owner_address", "created_at")
+                    ])
+                ]
+            }
+            for board, board_sources in sources.items():
+                staging_all = f"leaderboard:staging:{board}:all"
+                await client.delete(staging_all)
+                days = set()
+                entries = points = 0
+                for model, pipeline in board_sources:
+                    pipe = client.pipeline(transaction=False)
+                    queued = 0
+                    async for row in self._aggregate(model, pipeline):
+                        user_id, day = row["_id"]["user"], row["_id"]["day"]
+                        count, row_points = row["count"], int(row.get("points", 0))
+                        score = encode_score(board, count, row_points)
+                        entries += count
+                        points += row_points
+                        pipe.zincrby(staging_all, score, user_id)
+                        if day and datetime.strptime(day, "%Y%m%d").replace(tzinfo=timezone.utc) >= cutoff:
+                            if day not in days:
+                                days.add(day)
+                                await client.delete(f"leaderboard:staging:{board}:day:{day}")
+                            pipe.zincrby(f"leaderboard:staging:{board}:day:{day}", score, user_id)
+                        queued += 1
+                        if queued >= 1000:
+                            await pipe.execute()
+                            queued = 0
+                    await pipe.execute()
+
+                # Swap in the rebuilt keys, dropping day buckets that no longer have data
+                async for key in client.scan_iter(match=f"leaderboard:{board}:day:*"):
+                    if key.rsplit(":", 1)[-1] not in days:
+                        await client.delete(key)
+                for day in days:
+                    await client.rename(f"leaderboard:staging:{board}:day:{day}", self.day_key(board, day))
+                    await client.expire(self.day_key(board, day), DAY_BUCKET_TTL)
+                if entries:
+                    await client.rename(staging_all, self.board_key(board))
+                else:
+                    await client.delete(self.board_key(board))
+                await client.delete(self.totals_key(board))
+                await client.hset(self.totals_key(board), mapping={"entries": entries, "points": points})
+
+            await self.refresh_windows()
+            await client.set("leaderboard:built", datetime.now(timezone.utc).isoformat())
+            await client.set("leaderboard:windows_refreshed", datetime.now(timezone.utc).isoformat(),
+                             ex=self.window_refresh_seconds)
+            rebuilt = True
+            logger.info(f"Leaderboards rebuilt in {time.monotonic() - started:.2f}s")
+            return True
+        except Exception as e:
+            logger.error(f"Leaderboard rebuild failed: {e}")
+            raise
+        finally:
+            await self._replay_journal(client, token, snapshot if rebuilt else None)
+
+    async def _replay_journal(self, client, token: str, snapshot: Optional[datetime]):
+        """Release the rebuild lock and apply the events journaled while it was held.
+        After a successful rebuild, events written before the snapshot are already
+        in the aggregates and are skipped."""
+        entries = await self.redis_service.run_script(
+            "drain_and_release", [REBUILD_LOCK_KEY, REBUILD_JOURNAL_KEY], [token]
+        )
+        if not entries:
+            return
+        pipe = client.pipeline(transaction=False)
+        replayed = 0
+        for raw in entries:
+            entry = json.loads(raw)
+            moment = datetime.fromisoformat(entry["moment"])
+            written_at = datetime.fromisoformat(entry.get("written_at", entry["moment"]))
+            if snapshot is not None and written_at < snapshot:
+                continue
+            self._queue_increment(pipe, entry["board"], entry["user_id"], day_bucket(moment),
+                                  entry["count"], entry["points"])
+            replayed += 1
+        await pipe.execute()
+        logger.info(f"Replayed {replayed} leaderboard events recorded during the rebuild")
+
+# Global instance
+leaderboard_service = LeaderboardService()
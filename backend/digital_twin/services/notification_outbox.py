@@ -0,0 +1,427 @@
+"""
+Notification outbox: queued user emails delivered in the background
+NotificationService only records an outbox entry, so the request that
+completed a course or awarded an achievement never waits on SMTP. The
+dispatcher claims due entries in batches, resolves all recipients with one
+query, and sends over a small pool of SMTP connections that stay open
+between batches. Failed sends are retried with exponential backoff; repeated
+events are deduplicated by the entry's unique event_key.
+
+For local testing run the SMTP sink (test/smtp_sink.py) and point
+MAIL_SERVER/MAIL_PORT at it.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+from email.message import EmailMessage
+from email.utils import formataddr
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+import aiosmtplib
+from pymongo.errors import DuplicateKeyError
+
+from ..models.notification import NotificationOutbox
+from ..models.user import User
+from .email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+# Outbox kind -> (EmailService renderer, template parameters)
+NOTIFICATION_KINDS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "course_completion": ("render_course_completion_email", ("course_title", "certificate_title")),
+    "achievement": ("render_achievement_email", ("achievement_title", "points_earned")),
+    "certificate": ("render_certificate_email", ("certificate_title", "certificate_type", "issuer")),
+    "milestone": ("render_milestone_email", ("milestone_title", "milestone_description"))
+}
+
+def outbox_event_key(kind: str, user_id: str, *parts: Any) -> str:
+    """Deduplication key for one notification event, from the parts that identify it"""
+    digest = hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f"{kind}:{user_id}:{digest[:32]}"
+
+def is_permanent_smtp_error(error: Exception) -> bool:
+    """5xx replies (bad recipient, rejected message) will not succeed on retry"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(r.code >= 500 for r in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code >= 500
+    return False
+
+class SMTPConnectionPool:
+    """Up to `size` SMTP connections, kept open and reused across sends"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        sender: str,
+        from_name: str = "LearnTwinChain",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        size: int = 2,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.sender = sender
+        self.from_name = from_name
+        self.username = username or None
+        self.password = password or None
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.size = size
+        self.timeout = timeout
+        self._idle: List[Tuple[aiosmtplib.SMTP, float]] = []
+        self._slots = asyncio.Semaphore(size)
+        self.stats: Dict[str, int] = {"connections_opened": 0, "messages": 0}
+
+    @classmethod
+    def from_env(cls) -> "SMTPConnectionPool":
+        username = os.getenv("MAIL_USERNAME", "")
+        return cls(
+            hostname=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
+            port=int(os.getenv("MAIL_PORT", "587")),
+            sender=os.getenv("MAIL_FROM", username),
+            from_name=os.getenv("MAIL_FROM_NAME", "LearnTwinChain"),
+            username=username,
+            password=os.getenv("MAIL_PASSWORD", ""),
+            use_tls=os.getenv("MAIL_SSL_TLS", "False").lower() == "true",
+            start_tls=os.getenv("MAIL_STARTTLS", "True").lower() == "true",
+            size=int(os.getenv("NOTIFY_SMTP_POOL_SIZE", "2")),
+            timeout=float(os.getenv("NOTIFY_SMTP_TIMEOUT", "30"))
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.hostname and self.sender)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout
+        )
+        await client.connect()
+        self.stats["connections_opened"] += 1
+        return client
+
+    @staticmethod
+    async def _discard(client: aiosmtplib.SMTP):
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def send(self, message: EmailMessage):
+        async with self._slots:
+            client = self._idle.pop()[0] if self._idle else None
+            if client is None or not client.is_connected:
+                client = await self._connect()
+            try:
+                try:
+                    await client.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server dropped the idle connection; reconnect once
+                    client = await self._connect()
+                    await client.send_message(message)
+            except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+                # Rejected message; the envelope was reset and the connection is still usable
+                self._idle.append((client, time.monotonic()))
+                raise
+            except BaseException:
+                await self._discard(client)
+                raise
+            self.stats["messages"] += 1
+            self._idle.append((client, time.monotonic()))
+
+    async def close_idle(self, max_idle_seconds: float):
+        """Quit connections unused for longer than max_idle_seconds"""
+        cutoff = time.monotonic() - max_idle_seconds
+        stale = [client for client, last_used in self._idle if last_used < cutoff]
+        self._idle = [(client, last_used) for client, last_used in self._idle if last_used >= cutoff]
+        for client in stale:
+            await self._discard(client)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._discard(client)
+
+class NotificationOutboxDispatcher:
+    """Persistent email outbox with a batching background dispatcher"""
+
+    def __init__(
+        self,
+        email_service: Optional[EmailService] = None,
+        smtp_pool: Optional[SMTPConnectionPool] = None,
+        outbox_collection=None,
+        users_collection=None,
+        batch_size: Optional[int] = None,
+        interval_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        backoff_max_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None
+    ):
+        self._email_service = email_service
+        self._smtp_pool = smtp_pool
+        self._outbox_collection = outbox_collection
+        self._users_collection = users_collection
+        self.batch_size = batch_size or int(os.getenv("NOTIFY_OUTBOX_BATCH_SIZE", "50"))
+        self.interval_seconds = (
+            interval_seconds if interval_seconds is not None
+            else float(os.getenv("NOTIFY_OUTBOX_INTERVAL_SECONDS", "5"))
+        )
+        self.max_attempts = max_attempts or int(os.getenv("NOTIFY_OUTBOX_MAX_ATTEMPTS", "6"))
+        self.backoff_seconds = (
+            backoff_seconds if backoff_seconds is not None
+            else float(os.getenv("NOTIFY_OUTBOX_BACKOFF_SECONDS", "30"))
+        )
+        self.backoff_max_seconds = backoff_max_seconds or float(os.getenv("NOTIFY_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+        # A claim older than this belongs to a dispatcher that died mid-batch
+        self.lease_seconds = lease_seconds or float(os.getenv("NOTIFY_OUTBOX_LEASE_SECONDS", "300"))
+        self.smtp_idle_seconds = float(os.getenv("NOTIFY_SMTP_IDLE_SECONDS", "60"))
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.stats: Dict[str, int] = {"queued": 0, "duplicates": 0, "sent": 0, "retried": 0, "failed": 0, "skipped": 0}
+
+    # Dependencies are resolved lazily: collections exist only after init_beanie
+    @property
+    def email_service(self) -> EmailService:
+        if self._email_service is None:
+            self._email_service = EmailService()
+        return self._email_service
+
+    @property
+    def smtp_pool(self) -> SMTPConnectionPool:
+        if self._smtp_pool is None:
+            self._smtp_pool = SMTPConnectionPool.from_env()
+        return self._smtp_pool
+
+    @property
+    def outbox(self):
+        if self._outbox_collection is None:
+            return NotificationOutbox.get_pymongo_collection()
+        return self._outbox_collection
+
+    @property
+    def users(self):
+        if self._users_collection is None:
+            return User.get_pymongo_collection()
+        return self._users_collection
+
+    # Enqueue
+    async def enqueue(
+        self,
+        kind: str,
+        user_id: str,
+        params: Dict[str, Any],
+        event_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Record a notification for delivery; a repeated event_key is ignored"""
+        if kind not in NOTIFICATION_KINDS:
+            raise ValueError(f"Unknown notification kind: {kind}")
+        now = datetime.now(timezone.utc)
+        entry = {
+            "event_key": event_key or outbox_event_key(kind, user_id, json.dumps(params, sort_keys=True, default=str)),
+            "kind": kind,
+            "user_id": user_id,
+            "params": params,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "claimed_by": None,
+            "claimed_at": None,
+            "last_error": None,
+            "created_at": now,
+            "sent_at": None
+        }
+        try:
+            await self.outbox.insert_one(entry)
+        except DuplicateKeyError:
+            self.stats["duplicates"] += 1
+            return {"queued": False, "duplicate": True, "event_key": entry["event_key"]}
+        self.stats["queued"] += 1
+        if self._wake is not None:
+            self._wake.set()
+        return {"queued": True, "duplicate": False, "event_key": entry["event_key"]}
+
+    # Dispatch
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Atomically mark up to batch_size due entries as ours"""
+        now = datetime.now(timezone.utc)
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "claimed_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+        ]}
+        candidates = await self.outbox.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(self.batch_size).to_list(length=self.batch_size)
+        if not candidates:
+            return []
+        token = uuid.uuid4().hex
+        # Re-checking `due` keeps entries another dispatcher claimed in between out of this batch
+        await self.outbox.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, **due},
+            {"$set": {"status": "sending", "claimed_by": token, "claimed_at": now}}
+        )
+        return await self.outbox.find({"claimed_by": token}).to_list(length=self.batch_size)
+
+    async def _load_recipients(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        users = await self.users.find(
+            {"did": {"$in": user_ids}}, {"did": 1, "email": 1, "name": 1}
+        ).to_list(length=len(user_ids))
+        return {user["did"]: user for user in users}
+
+    def _build_message(self, entry: Dict[str, Any], user: Dict[str, Any]) -> EmailMessage:
+        renderer, param_names = NOTIFICATION_KINDS[entry["kind"]]
+        params = entry.get("params") or {}
+        user_name = user.get("name") or user["email"]
+        subject, html_content = getattr(self.email_service, renderer)(
+            user_name=user_name, **{p: params[p] for p in param_names if p in params}
+        )
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = formataddr((self.smtp_pool.from_name, self.smtp_pool.sender))
+        message["To"] = user["email"]
+        # Stable per event, so a resend after a crash shows up as the same message
+        message["Message-ID"] = f"<{hashlib.sha256(entry['event_key'].encode()).hexdigest()[:40]}@learntwinchain>"
+        message.set_content(html_content, subtype="html")
+        return message
+
+    async def _deliver(self, entry: Dict[str, Any], message: EmailMessage) -> Optional[Exception]:
+        try:
+            await self.smtp_pool.send(message)
+            return None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return e
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _finish(self, entries: List[Dict[str, Any]], status: str, error: Optional[str] = None):
+        if not entries:
+            return
+        fields: Dict[str, Any] = {"status": status, "claimed_by": None, "claimed_at": None, "last_error": error}
+        if status == "sent":
+            fields["sent_at"] = datetime.now(timezone.utc)
+        await self.outbox.update_many(
+            {"_id": {"$in": [e["_id"] for e in entries]}, "claimed_by": entries[0]["claimed_by"]},
+            {"$set": fields, "$inc": {"attempts": 1}}
+        )
+
+    async def _reschedule(self, entry: Dict[str, Any], error: Exception):
+        attempts = entry.get("attempts", 0) + 1
+        if attempts >= self.max_attempts or is_permanent_smtp_error(error):
+            self.stats["failed"] += 1
+            logger.error(f"Notification {entry['event_key']} failed after {attempts} attempts: {error}")
+            await self._finish([entry], "failed", str(error))
+            return
+        self.stats["retried"] += 1
+        await self.outbox.update_one(
+            {"_id": entry["_id"], "claimed_by": entry["claimed_by"]},
+            {"$set": {
+                "status": "pending",
+                "claimed_by": None,
+                "claimed_at": None,
+                "last_error": str(error),
+                "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=self._retry_delay(attempts))
+            }, "$inc": {"attempts": 1}}
+        )
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Claim and send one batch of due notifications"""
+        if not self.smtp_pool.configured:
+            return {"claimed": 0, "skipped": "SMTP not configured"}
+
+        batch = await self._claim_batch()
+        if not batch:
+            return {"claimed": 0}
+
+        recipients = await self._load_recipients(list({e["user_id"] for e in batch}))
+        sendable: List[Tuple[Dict[str, Any], EmailMessage]] = []
+        skipped: List[Dict[str, Any]] = []
+        for entry in batch:
+            user = recipients.get(entry["user_id"])
+            if not user or not user.get("email") or entry["kind"] not in NOTIFICATION_KINDS:
+                logger.warning(f"Skipping notification {entry['event_key']}: no deliverable recipient")
+                skipped.append(entry)
+                continue
+            try:
+                sendable.append((entry, self._build_message(entry, user)))
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Cannot render notification {entry['event_key']}: {e}")
+                await self._finish([entry], "failed", f"Render failed: {e}")
+        await self._finish(skipped, "skipped", "User not found")
+
+        errors = await asyncio.gather(*(self._deliver(entry, message) for entry, message in sendable))
+        sent = [entry for (entry, _), error in zip(sendable, errors) if error is None]
+        await self._finish(sent, "sent")
+        for (entry, _), error in zip(sendable, errors):
+            if error is not None:
+                await self._reschedule(entry, error)
+
+        self.stats["sent"] += len(sent)
+        self.stats["skipped"] += len(skipped)
+        if sent:
+            logger.info(f"Sent {len(sent)}/{len(batch)} queued notification emails")
+        return {"claimed": len(batch), "sent": len(sent), "skipped": len(skipped), "retrying": len(sendable) - len(sent)}
+
+    # Background loop
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                result = await self.run_once()
+                # Keep draining while full batches are waiting
+                if result.get("claimed", 0) >= self.batch_size:
+                    continue
+                if not result.get("claimed"):
+                    await self.smtp_pool.close_idle(self.smtp_idle_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification outbox dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the dispatch loop (called from main.lifespan)"""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Notification outbox dispatcher started (batch size {self.batch_size}, interval {self.interval_seconds}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._smtp_pool is not None:
+            await self._smtp_pool.close()
+
+# Global dispatcher
+notification_outbox = NotificationOutboxDispatcher()
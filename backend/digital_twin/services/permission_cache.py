@@ -0,0 +1,260 @@
+"""
+Compiled RBAC permission cache
+Holds the flattened role -> permission graph in memory and caches each user's
+effective permission set per DID in two tiers:
+1. In-process dict with a short TTL (no I/O on hot endpoints)
+2. Redis (shared between workers) with a TTL capped by the earliest
+   expires_at of the user's active role assignments
+Entries are invalidated explicitly when roles or role assignments change;
+invalidations are broadcast over Redis pub/sub so every worker drops its
+in-process copy, and the short local TTL bounds staleness if one is missed.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Iterable, FrozenSet, Tuple
+
+from ..models.user import User
+from ..models.permission import Role, UserRoleAssignment, DEFAULT_ROLES
+from .redis_service import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "permission_cache:invalidate"
+
+class PermissionCache:
+    """Per-user permission cache backed by an in-memory role graph"""
+
+    def __init__(self, redis_service: Optional[RedisService] = None):
+        self.redis_service = redis_service or get_redis_service()
+        self.local_ttl = int(os.getenv("PERMISSION_CACHE_LOCAL_TTL", "60"))
+        self.redis_ttl = int(os.getenv("PERMISSION_CACHE_TTL", "900"))
+        self.roles_ttl = int(os.getenv("PERMISSION_ROLES_TTL", "300"))
+        self._role_permissions: Dict[str, FrozenSet[str]] = {}
+        self._roles_loaded_at: Optional[float] = None
+        # did -> (permissions, monotonic expiry)
+        self._entries: Dict[str, Tuple[FrozenSet[str], float]] = {}
+        self.retry_seconds = float(os.getenv("PERMISSION_CACHE_RETRY_SECONDS", "5"))
+        self._task: Optional[asyncio.Task] = None
+
+    # Role graph
+    @staticmethod
+    def flatten_roles(roles: Iterable[Dict[str, Any]]) -> Dict[str, FrozenSet[str]]:
+        """Flatten role definitions into role -> permissions, following parent_role inheritance"""
+        by_name = {role["name"]: role for role in roles}
+        flattened: Dict[str, FrozenSet[str]] = {}
+
+        def resolve(name: str, seen: Tuple[str, ...] = ()) -> FrozenSet[str]:
+            if name in flattened:
+                return flattened[name]
+            role = by_name.get(name)
+            if not role or name in seen:
+                return frozenset()
+            permissions = set(role.get("permissions") or [])
+            parent = role.get("parent_role")
+            if parent:
+                permissions.update(resolve(parent, seen + (name,)))
+            flattened[name] = frozenset(permissions)
+            return flattened[name]
+
+        for name in by_name:
+            resolve(name)
+        return flattened
+
+    @property
+    def roles_loaded(self) -> bool:
+        return (
+            self._roles_loaded_at is not None
+            and time.monotonic() - self._roles_loaded_at < self.roles_ttl
+        )
+
+    async def load_roles(self):
+        """Load active roles from MongoDB and compile the role graph"""
+        try:
+            roles = await Role.find({"is_active": True}).to_list()
+            role_data = [
+                {"name": r.name, "permissions": r.permissions, "parent_role": r.parent_role}
+                for r in roles
+            ]
+        except Exception as e:
+            logger.error(f"Failed to load roles for permission cache: {e}")
+            role_data = []
+
+        self.use_roles(role_data or DEFAULT_ROLES)
+
+    def use_roles(self, role_data: Iterable[Dict[str, Any]]):
+        """Compile the role graph from role definitions"""
+        self._role_permissions = self.flatten_roles(role_data)
+        self._roles_loaded_at = time.monotonic()
+        logger.debug(f"Permission cache compiled {len(self._role_permissions)} roles")
+
+    async def ensure_roles(self):
+        """Load the role graph if it has not been loaded yet or is stale"""
+        if not self.roles_loaded:
+            await self.load_roles()
+
+    def compile(self, role_names: Iterable[str], direct_permissions: Iterable[str] = ()) -> FrozenSet[str]:
+        """Compile the effective permission set for a list of role names"""
+        permissions = set(direct_permissions or [])
+        for name in role_names:
+            permissions.update(self._role_permissions.get(name, ()))
+        return frozenset(permissions)
+
+    def ttl_for(self, expirations: Iterable[Optional[datetime]], ttl: int) -> int:
+        """Cap a TTL so a cached entry never outlives a role assignment"""
+        now = datetime.now(timezone.utc)
+        for expires_at in expirations:
+            if expires_at is None:
+                continue
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            ttl = min(ttl, int((expires_at - now).total_seconds()))
+        return max(ttl, 0)
+
+    # Per-user entries
+    def get_local(self, user_id: str) -> Optional[FrozenSet[str]]:
+        """Get cached permissions from the in-process tier only"""
+        entry = self._entries.get(user_id)
+        if not entry:
+            return None
+        permissions, expires = entry
+        if time.monotonic() >= expires:
+            self._entries.pop(user_id, None)
+            return None
+        return permissions
+
+    def set_local(self, user_id: str, permissions: FrozenSet[str], ttl: Optional[int] = None):
+        """Store permissions in the in-process tier"""
+        ttl = self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+        if ttl > 0:
+            self._entries[user_id] = (frozenset(permissions), time.monotonic() + ttl)
+
+    async def get(self, user_id: str) -> Optional[FrozenSet[str]]:
+        """Get cached permissions, checking the in-process tier then Redis"""
+        permissions = self.get_local(user_id)
+        if permissions is not None:
+            return permissions
+
+        cached = await self.redis_service.get_cache(f"permissions:{user_id}")
+        if isinstance(cached, dict) and "permissions" in cached:
+            permissions = frozenset(cached["permissions"])
+            self.set_local(user_id, permissions, cached.get("ttl"))
+            return permissions
+        return None
+
+    async def set(self, user_id: str, permissions: FrozenSet[str], ttl: Optional[int] = None):
+        """Store permissions in both tiers"""
+        ttl = self.redis_ttl if ttl is None else min(ttl, self.redis_ttl)
+        if ttl <= 0:
+            return
+        self.set_local(user_id, permissions, ttl)
+        await self.redis_service.set_cache(
+            f"permissions:{user_id}",
+            {"permissions": sorted(permissions), "ttl": ttl},
+            ttl
+        )
+
+    async def resolve(self, user_id: str) -> FrozenSet[str]:
+        """Get a user's permissions, compiling them from MongoDB on a cache miss
+
+        This is a pure read: users without an active role assignment get the
+        permissions of their primary role instead of a default role write.
+        """
+        permissions = await self.get(user_id)
+        if permissions is not None:
+            return permissions
+
+        await self.ensure_roles()
+        assignments = await UserRoleAssignment.find({
+            "user_id": user_id,
+            "is_active": True,
+            "$or": [
+                {"expires_at": None},
+                {"expires_at": {"$gt": datetime.now(timezone.utc)}}
+            ]
+        }).to_list()
+        user = await User.find_one({"did": user_id})
+
+        role_names: List[str] = [a.role_name for a in assignments]
+        if not role_names and user:
+            role_names = [user.role]
+        permissions = self.compile(role_names, user.permissions if user else ())
+
+        await self.set(user_id, permissions, self.ttl_for((a.expires_at for a in assignments), self.redis_ttl))
+        return permissions
+
+    # Invalidation
+    def drop_local(self, user_id: Optional[str] = None):
+        """Drop in-process entries: one user's, or every entry and the role graph"""
+        if user_id is None:
+            self._roles_loaded_at = None
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    async def invalidate_user(self, user_id: str):
+        """Drop a user's cached permissions after its role assignments change"""
+        self.drop_local(user_id)
+        await self.redis_service.delete_cache(f"permissions:{user_id}")
+        await self.redis_service.publish(INVALIDATION_CHANNEL, {"user_id": user_id})
+        logger.debug(f"Permission cache invalidated for user: {user_id}")
+
+    async def invalidate_roles(self):
+        """Drop the role graph and every cached user entry after a role definition changes"""
+        self.drop_local()
+        await self.redis_service.clear_cache_pattern("permissions:*")
+        await self.redis_service.publish(INVALIDATION_CHANNEL, {"all": True})
+        logger.info("Permission cache invalidated for all users")
+
+    def handle_invalidation(self, message: Dict[str, Any]):
+        """Apply an invalidation broadcast by another worker"""
+        if message.get("all"):
+            self.drop_local()
+        elif message.get("user_id"):
+            self.drop_local(message["user_id"])
+
+    # Background listener
+    async def _listen(self):
+        reconnecting = False
+        while True:
+            pubsub = await self.redis_service.subscribe(INVALIDATION_CHANNEL)
+            try:
+                if pubsub is not None:
+                    # Entries cached while unsubscribed may have missed a broadcast
+                    if reconnecting:
+                        self.drop_local()
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.handle_invalidation(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Permission invalidation listener failed: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            reconnecting = True
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        """Start listening for invalidations from other workers (called from main.lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+permission_cache = PermissionCache()
@@ -0,0 +1,289 @@
+"""
+Pool of long-lived snarkjs prover processes
+Each worker (scripts/prover_worker.js) keeps the circuit WASM, proving keys and
+verification keys loaded and takes newline-delimited JSON jobs over
+stdin/stdout, so a proof no longer pays Node startup, key loading or temp-file
+I/O. Workers are spawned lazily up to ZKP_PROVER_WORKERS; jobs beyond the
+workers wait in a bounded queue (ZKP_PROVER_QUEUE_SIZE) and are rejected once
+it is full. A crashed or timed-out worker is replaced on the next job.
+"""
+import os
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+WORKER_SCRIPT = BACKEND_DIR / "scripts" / "prover_worker.js"
+CIRCUITS_DIR = BACKEND_DIR / "circuits"
+
+class ProverError(Exception):
+    """A prover job failed"""
+
+class ProverUnavailable(ProverError):
+    """No prover worker could be started (node or snarkjs missing)"""
+
+class ProverQueueFull(ProverError):
+    """The bounded job queue is full"""
+
+class ProverJobError(ProverError):
+    """The worker rejected the job (invalid input, unsatisfied constraints); the worker stays usable"""
+
+def _stringify_ints(value: Any) -> Any:
+    """Field elements exceed 2^53; send them as strings so JSON.parse keeps them exact"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, dict):
+        return {k: _stringify_ints(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stringify_ints(v) for v in value]
+    return value
+
+class ProverWorker:
+    """One prover process; used by a single job at a time"""
+
+    def __init__(self, command: List[str], cwd: str, start_timeout: float):
+        self._ids = 0
+        self._responses: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        try:
+            self.process = subprocess.Popen(
+                command,
+                cwd=cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1
+            )
+        except OSError as e:
+            raise ProverUnavailable(f"Could not start prover worker: {e}")
+        self._reader = threading.Thread(target=self._read_loop, name="prover-worker-reader", daemon=True)
+        self._reader.start()
+
+        try:
+            ready = self._next_message(start_timeout)
+        except ProverError:
+            self.process.kill()
+            raise ProverUnavailable(f"Prover worker did not start within {start_timeout:.0f}s")
+        if not ready or not ready.get("ready"):
+            self.close()
+            error = (ready or {}).get("error", "worker exited during startup")
+            raise ProverUnavailable(f"Prover worker not ready: {error}")
+
+    def _read_loop(self):
+        for line in self.process.stdout:
+            try:
+                self._responses.put(json.loads(line))
+            except ValueError:
+                logger.debug(f"Prover worker output: {line.rstrip()}")
+        self._responses.put(None)  # EOF: the process exited
+
+    def _next_message(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self._responses.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            raise ProverError(f"Prover worker did not answer within {timeout:.0f}s")
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, payload: Dict[str, Any], timeout: float) -> Any:
+        self._ids += 1
+        request_id = self._ids
+        try:
+            self.process.stdin.write(json.dumps({**payload, "id": request_id}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ProverError(f"Prover worker is gone: {e}")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self._next_message(deadline - time.monotonic())
+            if message is None:
+                raise ProverError("Prover worker exited")
+            if message.get("id") != request_id:
+                continue
+            if not message.get("ok"):
+                raise ProverJobError(message.get("error", "Unknown prover error"))
+            return message.get("result")
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+class ProverPool:
+    """Bounded pool of prover workers with per-circuit latency metrics"""
+
+    def __init__(
+        self,
+        command: Optional[List[str]] = None,
+        size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.command = command or ["node", str(WORKER_SCRIPT), str(CIRCUITS_DIR)]
+        self.size = size or int(os.getenv("ZKP_PROVER_WORKERS", "2"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("ZKP_PROVER_QUEUE_SIZE", "16"))
+        self.timeout = timeout or float(os.getenv("ZKP_PROVER_TIMEOUT", "120"))
+        self.start_timeout = float(os.getenv("ZKP_PROVER_START_TIMEOUT", "30"))
+        self.retry_unavailable_seconds = float(os.getenv("ZKP_PROVER_RETRY_SECONDS", "60"))
+        self._idle: "queue.Queue[ProverWorker]" = queue.Queue()
+        self._workers: List[ProverWorker] = []
+        self._lock = threading.Lock()
+        self._admission = threading.BoundedSemaphore(self.size + self.max_queue)
+        self._unavailable_until = 0.0
+        self._in_flight = 0
+        self._latencies: Dict[str, deque] = {}
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    # Worker management
+    def available(self) -> bool:
+        return time.monotonic() >= self._unavailable_until
+
+    def _checkout(self) -> ProverWorker:
+        while True:
+            with self._lock:
+                spawn = self._idle.empty() and len(self._workers) < self.size
+                if spawn:
+                    if not self.available():
+                        raise ProverUnavailable("Prover workers unavailable")
+                    # Reserve the slot before the (slow) start so concurrent jobs do not overshoot
+                    self._workers.append(None)
+            if spawn:
+                break
+            try:
+                # Short waits so a slot freed by a crashed worker is noticed
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        try:
+            worker = ProverWorker(self.command, str(CIRCUITS_DIR), self.start_timeout)
+        except ProverError:
+            with self._lock:
+                self._workers.remove(None)
+                self._unavailable_until = time.monotonic() + self.retry_unavailable_seconds
+            raise
+        with self._lock:
+            self._workers[self._workers.index(None)] = worker
+        return worker
+
+    def _discard(self, worker: ProverWorker):
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def close(self):
+        """Stop all workers; a busy worker finishes its current job before exiting"""
+        with self._lock:
+            workers = [w for w in self._workers if w is not None]
+            self._workers = []
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in workers:
+            worker.close()
+
+    # Jobs
+    def run(self, op: str, circuit: str = "", **payload) -> Any:
+        """Run one job on a free worker, waiting in the bounded queue if all are busy"""
+        if not self._admission.acquire(blocking=False):
+            raise ProverQueueFull(f"Prover queue is full ({self.max_queue} jobs waiting)")
+        queued_at = time.monotonic()
+        try:
+            worker = self._checkout()
+            started_at = time.monotonic()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                result = worker.request({"op": op, "circuit": circuit, **_stringify_ints(payload)}, self.timeout)
+            except ProverJobError:
+                self._idle.put(worker)
+                self._record(op, circuit, queued_at, started_at, failed=True)
+                raise
+            except ProverError:
+                # Crashed or hung: replace it on a later job
+                self._discard(worker)
+                self._record(op, circuit, queued_at, started_at, failed=True)
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+            self._idle.put(worker)
+            self._record(op, circuit, queued_at, started_at)
+            return result
+        finally:
+            self._admission.release()
+
+    def prove(self, circuit: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Groth16 proof; returns {'proof': ..., 'publicSignals': [...]}"""
+        return self.run("prove", circuit, input=input_data)
+
+    def verify(self, circuit: str, proof: Dict[str, Any], public_signals: List[Any]) -> bool:
+        return bool(self.run("verify", circuit, proof=proof, publicSignals=public_signals))
+
+    def poseidon(self, inputs: List[int]) -> int:
+        return int(self.run("poseidon", inputs=inputs))
+
+    async def prove_async(self, circuit: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.prove, circuit, input_data)
+
+    async def verify_async(self, circuit: str, proof: Dict[str, Any], public_signals: List[Any]) -> bool:
+        return await asyncio.to_thread(self.verify, circuit, proof, public_signals)
+
+    async def poseidon_async(self, inputs: List[int]) -> int:
+        return await asyncio.to_thread(self.poseidon, inputs)
+
+    # Metrics
+    def _record(self, op: str, circuit: str, queued_at: float, started_at: float, failed: bool = False):
+        key = f"{op}:{circuit}" if circuit else op
+        run_ms = (time.monotonic() - started_at) * 1000
+        wait_ms = (started_at - queued_at) * 1000
+        with self._lock:
+            metric = self._metrics.setdefault(key, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_wait_ms": 0.0})
+            metric["count"] += 1
+            metric["errors"] += int(failed)
+            metric["total_ms"] += run_ms
+            metric["max_ms"] = max(metric["max_ms"], run_ms)
+            metric["queue_wait_ms"] += wait_ms
+            self._latencies.setdefault(key, deque(maxlen=200)).append(run_ms)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = {}
+            for key, metric in self._metrics.items():
+                latencies = sorted(self._latencies.get(key, ()))
+                count = metric["count"]
+                jobs[key] = {
+                    "count": count,
+                    "errors": metric["errors"],
+                    "avg_ms": round(metric["total_ms"] / count, 2) if count else 0.0,
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else 0.0,
+                    "max_ms": round(metric["max_ms"], 2),
+                    "avg_queue_wait_ms": round(metric["queue_wait_ms"] / count, 2) if count else 0.0
+                }
+            return {
+                "workers": len([w for w in self._workers if w is not None]),
+                "max_workers": self.size,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "available": self.available(),
+                "jobs": jobs
+            }
+
+# Global instance
+prover_pool = ProverPool()
@@ -0,0 +1,285 @@
+"""
+Shared RAG engine
+One LearnTwinRAGAgent per process (one embedding model, one Milvus connection)
+for every AI router. Blocking work - embedding, vector retrieval and Gemini
+generation - runs on a dedicated bounded thread pool (RAG_EXECUTOR_WORKERS)
+instead of the event loop or the default executor; at most RAG_MAX_QUEUE jobs
+wait behind it before new ones are rejected. The agent is warmed up in the
+background at startup and loading is retried at most every RAG_RETRY_SECONDS
+after a failure.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+try:
+    from rag.rag import LearnTwinRAGAgent
+    RAG_AVAILABLE = True
+except ImportError:
+    RAG_AVAILABLE = False
+    logger.warning("RAG system not available")
+
+class RAGEngineBusy(Exception):
+    """The RAG job queue is full"""
+
+class RAGEngine:
+    """Process-wide RAG agent with a bounded executor and an async facade"""
+
+    def __init__(
+        self,
+        agent_factory: Optional[Callable[[], Any]] = None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        if agent_factory is None and RAG_AVAILABLE:
+            agent_factory = lambda: LearnTwinRAGAgent(verbose=1)
+        self.agent_factory = agent_factory
+        self.max_workers = max_workers or int(os.getenv("RAG_EXECUTOR_WORKERS", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("RAG_MAX_QUEUE", "32"))
+        self.retry_seconds = float(os.getenv("RAG_RETRY_SECONDS", "60"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rag")
+        self._agent = None
+        self._agent_lock = threading.Lock()
+        self._failed_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._latencies: Dict[str, deque] = {}
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    # Agent
+    @property
+    def available(self) -> bool:
+        return self.agent_factory is not None
+
+    def get_agent(self) -> Optional["LearnTwinRAGAgent"]:
+        """Load the shared agent on first use (blocking); None when RAG is unavailable"""
+        if self._agent is not None or self.agent_factory is None:
+            return self._agent
+        with self._agent_lock:
+            if self._agent is not None:
+                return self._agent
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                return None
+            started = time.monotonic()
+            try:
+                self._agent = self.agent_factory()
+                self._failed_at = None
+                self._last_error = None
+                logger.info(f"RAG agent loaded in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                self._last_error = str(e)
+                logger.error(f"Failed to initialize RAG agent: {e}")
+        return self._agent
+
+    async def get_agent_async(self) -> Optional["LearnTwinRAGAgent"]:
+        if self._agent is not None:
+            return self._agent
+        return await self.run("load", self.get_agent)
+
+    async def warm_up(self):
+        """Load the agent in the background so the first request does not pay for it"""
+        if not self.available:
+            return
+        try:
+            agent = await self.get_agent_async()
+            if agent is not None and hasattr(agent, "prepare_retrieval"):
+                # Build the lexical index before the first query needs it
+                await self.run("warmup", agent.prepare_retrieval)
+        except Exception as e:
+            logger.warning(f"RAG warm-up failed: {e}")
+
+    # Jobs
+    def _admit(self):
+        with self._lock:
+            idle_workers = max(self.max_workers - self._in_flight, 0)
+            if self._queued >= self.max_queue + idle_workers:
+                raise RAGEngineBusy(f"RAG queue is full ({self.max_queue} jobs waiting)")
+            self._queued += 1
+
+    async def run(self, op: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the RAG executor, rejecting it when the queue is full"""
+        self._admit()
+        return await self._execute(op, fn, *args, **kwargs)
+
+    async def _execute(self, op: str, fn: Callable, *args, **kwargs) -> Any:
+        queued_at = time.monotonic()
+        timing = {}
+
+        def job():
+            with self._lock:
+                self._queued -= 1
+                self._in_flight += 1
+            timing["started_at"] = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(job)
+        try:
+            result = await asyncio.wrap_future(future, loop=loop)
+        except BaseException:
+            if future.cancel():
+                # Never started: give its queue slot back
+                with self._lock:
+                    self._queued -= 1
+            else:
+                self._record(op, queued_at, timing.get("started_at", queued_at), failed=True)
+            raise
+        self._record(op, queued_at, timing["started_at"])
+        return result
+
+    async def _agent_call(self, op: str, method: str, *args, **kwargs) -> Any:
+        def call():
+            agent = self.get_agent()
+            if agent is None:
+                return None
+            return getattr(agent, method)(*args, **kwargs)
+        return await self.run(op, call)
+
+    # Async facade over LearnTwinRAGAgent; each returns None when RAG is unavailable
+    async def query(
+        self,
+        question: str,
+        context_type: str = "learning",
+        max_tokens: int = 2048,
+        temperature: float = 0.1,
+        top_k: int = 5,
+        use_cache: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """use_cache: only for plain student questions, never for prompts carrying per-user data"""
+        return await self._agent_call(
+            "query", "query",
+            question=question, context_type=context_type,
+            max_tokens=max_tokens, temperature=temperature, top_k=top_k, use_cache=use_cache
+        )
+
+    async def search_documents(self, query: str, k: int = 10, document_type: Optional[str] = None) -> Optional[List[Dict]]:
+        return await self._agent_call("search", "search_documents", query=query, k=k, document_type=document_type)
+
+    async def upload_document(self, file_path: str, metadata: Optional[Dict] = None) -> Optional[bool]:
+        return await self._agent_call("upload", "upload_document", file_path, metadata)
+
+    async def get_knowledge_base_stats(self) -> Optional[Dict[str, Any]]:
+        return await self._agent_call("stats", "get_knowledge_base_stats")
+
+    async def list_document_types(self) -> Optional[Dict[str, int]]:
+        return await self._agent_call("document_types", "list_document_types")
+
+    async def stream_query(
+        self,
+        question: str,
+        context_type: str = "learning",
+        max_tokens: int = 2048,
+        temperature: float = 0.1,
+        top_k: int = 5,
+        use_cache: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming query: admission happens here, so a full queue raises
+        RAGEngineBusy before any response is started. The returned iterator
+        yields the agent's query_stream events; one executor worker drives the
+        stream and stops as soon as the consumer goes away.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        finished = object()
+
+        def produce():
+            try:
+                agent = self.get_agent()
+                if agent is None:
+                    loop.call_soon_threadsafe(events.put_nowait, {
+                        "event": "error",
+                        "data": {"error": "RAG agent not available", "question": question, "answer": "", "success": False}
+                    })
+                    return
+                stream = agent.query_stream(
+                    question=question, context_type=context_type,
+                    max_tokens=max_tokens, temperature=temperature, top_k=top_k, use_cache=use_cache
+                )
+                try:
+                    for event in stream:
+                        if cancelled.is_set():
+                            break
+                        loop.call_soon_threadsafe(events.put_nowait, event)
+                finally:
+                    stream.close()
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, finished)
+
+        job = asyncio.ensure_future(self._execute("stream", produce))
+        # Consumers that disconnect never await the job; keep its outcome from being reported as lost
+        job.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        async def iterate():
+            try:
+                while True:
+                    event = await events.get()
+                    if event is finished:
+                        break
+                    yield event
+                await job
+            finally:
+                cancelled.set()
+
+        return iterate()
+
+    # Metrics
+    def _record(self, op: str, queued_at: float, started_at: float, failed: bool = False):
+        run_ms = (time.monotonic() - started_at) * 1000
+        wait_ms = (started_at - queued_at) * 1000
+        with self._lock:
+            metric = self._metrics.setdefault(op, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_wait_ms": 0.0})
+            metric["count"] += 1
+            metric["errors"] += int(failed)
+            metric["total_ms"] += run_ms
+            metric["max_ms"] = max(metric["max_ms"], run_ms)
+            metric["queue_wait_ms"] += wait_ms
+            self._latencies.setdefault(op, deque(maxlen=200)).append(run_ms)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = {}
+            for op, metric in self._metrics.items():
+                latencies = sorted(self._latencies.get(op, ()))
+                count = metric["count"]
+                jobs[op] = {
+                    "count": count,
+                    "errors": metric["errors"],
+                    "avg_ms": round(metric["total_ms"] / count, 2) if count else 0.0,
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else 0.0,
+                    "max_ms": round(metric["max_ms"], 2),
+                    "avg_queue_wait_ms": round(metric["queue_wait_ms"] / count, 2) if count else 0.0
+                }
+            return {
+                "available": self.available,
+                "agent_loaded": self._agent is not None,
+                "last_error": self._last_error,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "jobs": jobs
+            }
+
+    def shutdown(self):
+        """Stop accepting jobs; running ones finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# Global instance
+rag_engine = RAGEngine()
@@ -1,73 +1,176 @@
 """
 Redis service for session management and SIWE nonces
+One process-wide client and connection pool (the global `redis_service`,
+connected in main.lifespan) is shared by every service. Multi-step
+operations go through a pipeline or a Lua script so each one is a single
+round-trip and, for the scripts, atomic.
 """
 import os
 import json
 import time
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, List
 import redis.asyncio as redis
 
 logger = logging.getLogger(__name__)
 
+# Atomic scripts, loaded once per connection pool and run with EVALSHA
+SCRIPTS = {
+    # KEYS[1] counter, ARGV[1] limit, ARGV[2] ttl -> {allowed, count}
+    "consume_quota": """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used >= tonumber(ARGV[1]) then
+    return {0, used}
+end
+used = redis.call('INCR', KEYS[1])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return {1, used}
+""",
+    # KEYS[1] session, ARGV[1] ttl, ARGV[2] new expiration_time -> previous payload
+    "extend_session": """
+local payload = redis.call('GET', KEYS[1])
+if not payload then
+    return nil
+end
+local data = cjson.decode(payload)
+data['expiration_time'] = ARGV[2]
+redis.call('SET', KEYS[1], cjson.encode(data), 'EX', ARGV[1])
+return payload
+""",
+    # KEYS[1] nonce -> payload, deleted so it can only be consumed once
+    "consume_nonce": """
+local payload = redis.call('GET', KEYS[1])
+if payload then
+    redis.call('DEL', KEYS[1])
+end
+return payload
+""",
+    # KEYS[1] lock, ARGV[1] owner token -> 1 if released; a lock that expired
+    # and was taken over by another owner is left alone
+    "release_lock": """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""",
+    # KEYS[1] lock, KEYS[2] journal, ARGV[1] entry -> 1 if the entry was
+    # journaled because the lock is held
+    "journal_if_locked": """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+""",
+    # KEYS[1] lock, KEYS[2] journal, ARGV[1] owner token -> journaled entries,
+    # drained and released together so no entry lands after the drain
+    "drain_and_release": """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {}
+end
+local entries = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2], KEYS[1])
+return entries
+"""
+}
+
 class RedisService:
     """Redis service for caching and session management"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[redis.Redis] = None):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
         self.redis_db = int(os.getenv("REDIS_DB", "0"))
-        self.redis_client: Optional[redis.Redis] = None
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.redis_client: Optional[redis.Redis] = client
+        self._scripts: Dict[str, Any] = {}
+        self._connect_lock = asyncio.Lock()
         
+    def _pool_options(self) -> Dict[str, Any]:
+        return {
+            "encoding": "utf-8",
+            "decode_responses": True,
+            "socket_timeout": 5,
+            "socket_connect_timeout": 5,
+            "retry_on_timeout": True,
+            "health_check_interval": 30,
+            "max_connections": self.max_connections
+        }
+    
     async def connect(self):
-        """Connect to Redis"""
+        """Create the shared connection pool and client"""
         try:
-            self.redis_client = redis.from_url(
-                self.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                retry_on_timeout=True
-            )
+            pool = redis.ConnectionPool.from_url(self.redis_url, **self._pool_options())
+            client = redis.Redis(connection_pool=pool)
             
             # Test connection
-            await self.redis_client.ping()
-            logger.info("Redis connection established")
+            await client.ping()
+            self.redis_client = client
+            logger.info(f"Redis connection established (pool of {self.max_connections})")
             
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             # Fallback to direct connection
             try:
-                self.redis_client = redis.Redis(
+                pool = redis.ConnectionPool(
                     host=self.redis_host,
                     port=self.redis_port,
                     db=self.redis_db,
-                    encoding="utf-8",
-                    decode_responses=True,
-                    socket_timeout=5,
-                    socket_connect_timeout=5,
-                    retry_on_timeout=True
+                    **self._pool_options()
                 )
-                await self.redis_client.ping()
+                client = redis.Redis(connection_pool=pool)
+                await client.ping()
+                self.redis_client = client
                 logger.info("Redis connection established (fallback)")
             except Exception as e2:
                 logger.error(f"Redis fallback connection failed: {e2}")
                 raise e2
+        self._scripts = {}
     
     async def disconnect(self):
-        """Disconnect from Redis"""
+        """Disconnect from Redis and close the pool"""
         if self.redis_client:
-            await self.redis_client.close()
+            client, self.redis_client = self.redis_client, None
+            self._scripts = {}
+            await client.aclose(close_connection_pool=True)
             logger.info("Redis connection closed")
     
     async def get_client(self):
-        """Get Redis client, connect if needed"""
+        """Get the shared Redis client, connect if needed"""
         if not self.redis_client:
-            await self.connect()
+            async with self._connect_lock:
+                if not self.redis_client:
+                    await self.connect()
         return self.redis_client
     
+    # Pipelines and scripts
+    async def pipeline(self, transaction: bool = True):
+        """Pipeline on the shared pool; queued commands are sent with one execute()"""
+        client = await self.get_client()
+        return client.pipeline(transaction=transaction)
+    
+    async def run_script(self, name: str, keys: List[str], args: List[Any]):
+        """Run one of SCRIPTS atomically (EVALSHA, loading the script on first use)"""
+        client = await self.get_client()
+        script = self._scripts.get(name)
+        if script is None:
+            script = client.register_script(SCRIPTS[name])
+            self._scripts[name] = script
+        return await script(keys=keys, args=args)
+    
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Delete a SET NX lock only if `token` still owns it"""
+        return bool(await self.run_script("release_lock", [key], [token]))
+    
+    async def consume_quota(self, key: str, limit: int, ttl: int) -> Tuple[bool, int]:
+        """Check-and-increment a counter in one round-trip; returns (allowed, count)"""
+        allowed, count = await self.run_script("consume_quota", [key], [limit, ttl])
+        return bool(allowed), int(count)
+    
     # Session management
     async def set_session(self, session_id: str, session_data: Dict[str, Any], ttl: int = 86400):
         """Store complete session data in Redis"""
@@ -106,15 +209,25 @@ class RedisService:
             logger.debug(f"Failed to delete session {session_id}: {e}")
             # Don't raise, just log - Redis is optional
     
-    async def extend_session(self, session_id: str, ttl: int = 86400):
-        """Extend session TTL"""
+    async def extend_session(self, session_id: str, ttl: int = 86400, expiration_time: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Extend session TTL. With expiration_time the stored expiration_time is
+        rewritten in the same atomic step; returns the session data as it was
+        before the update, or None when the session does not exist.
+        """
         try:
-            client = await self.get_client()
             key = f"session:{session_id}"
-            await client.expire(key, ttl)
+            if expiration_time is None:
+                client = await self.get_client()
+                await client.expire(key, ttl)
+                logger.debug(f"Session extended: {session_id}")
+                return None
+            previous = await self.run_script("extend_session", [key], [ttl, expiration_time])
             logger.debug(f"Session extended: {session_id}")
+            return json.loads(previous) if previous else None
         except Exception as e:
             logger.error(f"Failed to extend session {session_id}: {e}")
+            return None
     
     # SIWE nonce management
     async def set_nonce(self, nonce: str, wallet_address: str, ttl: int = 300):
@@ -155,26 +268,40 @@ class RedisService:
         except Exception as e:
             logger.error(f"Failed to delete SIWE nonce {nonce}: {e}")
     
+    async def consume_nonce(self, nonce: str) -> Optional[Dict[str, Any]]:
+        """Get and delete a SIWE nonce atomically, so it can be redeemed only once"""
+        try:
+            data = await self.run_script("consume_nonce", [f"siwe_nonce:{nonce}"], [])
+            if data:
+                logger.debug(f"SIWE nonce consumed: {nonce}")
+                return json.loads(data)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to consume SIWE nonce {nonce}: {e}")
+            return None
+    
     # Rate limiting
     async def check_rate_limit(self, key: str, limit: int, window: int) -> bool:
         """Check rate limit using sliding window"""
         try:
-            client = await self.get_client()
             current_time = int(time.time())
             window_start = current_time - window
+            key = f"rate_limit:{key}"
             
-            # Remove old entries
-            await client.zremrangebyscore(f"rate_limit:{key}", 0, window_start)
-            
-            # Count current requests
-            current_count = await client.zcard(f"rate_limit:{key}")
+            # Remove old entries and count current requests in one round-trip
+            pipe = await self.pipeline()
+            pipe.zremrangebyscore(key, 0, window_start)
+            pipe.zcard(key)
+            _, current_count = await pipe.execute()
             
             if current_count >= limit:
                 return False
             
             # Add current request
-            await client.zadd(f"rate_limit:{key}", {str(current_time): current_time})
-            await client.expire(f"rate_limit:{key}", window)
+            pipe = await self.pipeline()
+            pipe.zadd(key, {str(current_time): current_time})
+            pipe.expire(key, window)
+            await pipe.execute()
             
             return True
         except Exception as e:
@@ -260,3 +387,9 @@ class RedisService:
             logger.error(f"Redis health check failed: {e}")
             return False
 
+# Global service (connected in main.lifespan)
+redis_service = RedisService()
+
+def get_redis_service() -> RedisService:
+    """The process-wide RedisService"""
+    return redis_service
@@ -0,0 +1,502 @@
+"""
+In-process full-text index for unified search
+Courses, modules, lessons, quizzes and achievements are tokenized into an
+inverted index scored with BM25 (title, tag and description fields weighted).
+Each entry stores its search result with the course and module names already
+filled in, so a query touches only the postings of its terms plus one page of
+results. The index is built from MongoDB once, kept current by the write paths
+(index_course / index_module / ... / remove) and rebuilt in the background
+every SEARCH_INDEX_REFRESH_SECONDS so other worker processes converge.
+"""
+import os
+import re
+import math
+import time
+import bisect
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+from ..models.course import Course, Module, Lesson
+from ..models.quiz_achievement import Quiz, Achievement
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "description": 1.0}
+TYPE_PRIORITY = {"course": 5, "module": 4, "lesson": 3, "quiz": 2, "achievement": 1}
+MAX_PREFIX_EXPANSION = 50
+PREFIX_MATCH_WEIGHT = 0.7
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+class BM25Index:
+    """Inverted index with field-weighted BM25 scoring and prefix lookup"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.total_length = 0.0
+        self.vocabulary: List[str] = []  # sorted, for prefix expansion
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, key: str, fields: Dict[str, Any]):
+        """(Re)index a document; list-valued fields are joined"""
+        self.remove(key)
+        frequencies: Counter = Counter()
+        length = 0.0
+        for name, value in fields.items():
+            text = " ".join(v for v in value if v) if isinstance(value, (list, tuple)) else value
+            weight = FIELD_WEIGHTS.get(name, 1.0)
+            for token in tokenize(text):
+                frequencies[token] += weight
+                length += weight
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+            postings[key] = frequency
+        self.doc_lengths[key] = length
+        self.doc_terms[key] = list(frequencies)
+        self.total_length += length
+
+    def remove(self, key: str):
+        terms = self.doc_terms.pop(key, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(key, 0.0)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+                index = bisect.bisect_left(self.vocabulary, term)
+                if index < len(self.vocabulary) and self.vocabulary[index] == term:
+                    del self.vocabulary[index]
+
+    def terms_with_prefix(self, prefix: str, limit: int = MAX_PREFIX_EXPANSION) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:]:
+            if not term.startswith(prefix) or len(terms) >= limit:
+                break
+            terms.append(term)
+        return terms
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, prefix_last: bool = True) -> Dict[str, float]:
+        """BM25 scores of documents matching every query term (the last one as a prefix)"""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        average_length = self.total_length / len(self.doc_lengths) if self.doc_lengths else 1.0
+        scores: Optional[Dict[str, float]] = None
+        for position, term in enumerate(terms):
+            variants = [(term, 1.0)]
+            if prefix_last and position == len(terms) - 1:
+                variants += [(t, PREFIX_MATCH_WEIGHT) for t in self.terms_with_prefix(term) if t != term]
+            term_scores: Dict[str, float] = {}
+            for variant, weight in variants:
+                postings = self.postings.get(variant)
+                if not postings:
+                    continue
+                idf = self._idf(variant)
+                for key, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / average_length)
+                    score = weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    term_scores[key] = max(term_scores.get(key, 0.0), score)
+            if scores is None:
+                scores = term_scores
+            else:
+                # Every term must match
+                scores = {k: s + term_scores[k] for k, s in scores.items() if k in term_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+@dataclass
+class _Entry:
+    type: str
+    result: Dict[str, Any]
+    course_id: Optional[str] = None
+    module_id: Optional[str] = None
+    difficulty_level: Optional[str] = None
+
+@dataclass
+class _CatalogState:
+    index: BM25Index = field(default_factory=BM25Index)
+    tag_index: BM25Index = field(default_factory=BM25Index)
+    tag_refs: Counter = field(default_factory=Counter)
+    entries: Dict[str, _Entry] = field(default_factory=dict)
+    course_titles: Dict[str, str] = field(default_factory=dict)
+    module_titles: Dict[str, str] = field(default_factory=dict)
+    by_course: Dict[str, Set[str]] = field(default_factory=dict)
+    by_module: Dict[str, Set[str]] = field(default_factory=dict)
+    course_tags: Dict[str, List[str]] = field(default_factory=dict)
+
+class SearchIndex:
+    """Catalog search over a BM25 index with denormalized results"""
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = (
+            refresh_seconds if refresh_seconds is not None
+            else float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "600"))
+        )
+        self._state = _CatalogState()
+        self._built_at: Optional[float] = None
+        self._build_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._replay: Optional[List[Tuple[str, Any]]] = None
+
+    # Building
+    async def ensure_ready(self):
+        """Build on first use; refresh in the background once stale"""
+        if self._built_at is None:
+            async with self._build_lock:
+                if self._built_at is None:
+                    await self.rebuild()
+        elif time.monotonic() - self._built_at > self.refresh_seconds:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        async with self._build_lock:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Search index refresh failed: {e}")
+
+    async def rebuild(self):
+        """Load the whole catalog into a fresh index and swap it in"""
+        started = time.monotonic()
+        self._replay = []
+        try:
+            courses = await Course.find({}).to_list()
+            modules = await Module.find({}).to_list()
+            lessons = await Lesson.find({}).to_list()
+            quizzes = await Quiz.find({"status": "published"}).to_list()
+            achievements = await Achievement.find({"status": "active"}).to_list()
+
+            state = _CatalogState()
+            for course in courses:
+                self._index_course(state, course)
+            for module in modules:
+                self._index_module(state, module)
+            for lesson in lessons:
+                self._index_lesson(state, lesson)
+            for quiz in quizzes:
+                self._index_quiz(state, quiz)
+            for achievement in achievements:
+                self._index_achievement(state, achievement)
+
+            # Writes that happened while the catalog was loading
+            for method, arg in self._replay:
+                getattr(self, method)(state, *arg)
+        finally:
+            self._replay = None
+        self._state = state
+        self._built_at = time.monotonic()
+        logger.info(f"Search index built: {len(state.entries)} documents in {time.monotonic() - started:.2f}s")
+
+    def _apply(self, method: str, *args):
+        if self._replay is not None:
+            self._replay.append((method, args))
+        try:
+            getattr(self, method)(self._state, *args)
+        except Exception as e:
+            # The periodic rebuild repairs anything missed here
+            logger.warning(f"Search index update {method} failed: {e}")
+
+    # Incremental updates (called from the write paths)
+    def index_course(self, course: Course):
+        self._apply("_index_course", course)
+
+    def index_module(self, module: Module):
+        self._apply("_index_module", module)
+
+    def index_lesson(self, lesson: Lesson):
+        self._apply("_index_lesson", lesson)
+
+    def index_quiz(self, quiz: Quiz):
+        self._apply("_index_quiz", quiz)
+
+    def index_achievement(self, achievement: Achievement):
+        self._apply("_index_achievement", achievement)
+
+    def remove(self, doc_type: str, doc_id: str):
+        self._apply("_remove", f"{doc_type}:{doc_id}")
+
+    # State mutation
+    def _put(self, state: _CatalogState, key: str, entry: _Entry, fields: Dict[str, Any]):
+        self._remove(state, key)
+        state.entries[key] = entry
+        state.index.add(key, fields)
+        if entry.course_id:
+            state.by_course.setdefault(entry.course_id, set()).add(key)
+        if entry.module_id:
+            state.by_module.setdefault(entry.module_id, set()).add(key)
+
+    def _remove(self, state: _CatalogState, key: str):
+        entry = state.entries.pop(key, None)
+        if entry is None:
+            return
+        state.index.remove(key)
+        if entry.course_id:
+            state.by_course.get(entry.course_id, set()).discard(key)
+        if entry.module_id:
+            state.by_module.get(entry.module_id, set()).discard(key)
+        if entry.type == "course":
+            self._set_course_tags(state, entry.result["id"], [])
+
+    def _set_course_tags(self, state: _CatalogState, course_id: str, tags: List[str]):
+        for tag in state.course_tags.pop(course_id, []):
+            state.tag_refs[tag] -= 1
+            if state.tag_refs[tag] <= 0:
+                del state.tag_refs[tag]
+                state.tag_index.remove(tag)
+        unique = [t for t in dict.fromkeys(tags) if t]
+        for tag in unique:
+            if state.tag_refs[tag] == 0:
+                state.tag_index.add(tag, {"title": tag})
+            state.tag_refs[tag] += 1
+        if unique:
+            state.course_tags[course_id] = unique
+
+    def _index_course(self, state: _CatalogState, course: Course):
+        key = f"course:{course.course_id}"
+        if state.course_titles.get(course.course_id) != course.title:
+            state.course_titles[course.course_id] = course.title
+            for child in state.by_course.get(course.course_id, ()):
+                state.entries[child].result["course_name"] = course.title
+
+        if course.status != "published" or not course.is_public:
+            self._remove(state, key)
+            return
+        tags = getattr(course.metadata, "tags", []) or []
+        self._put(state, key, _Entry(
+            type="course",
+            difficulty_level=getattr(course.metadata, "difficulty_level", None),
+            result={
+                "id": course.course_id,
+                "type": "course",
+                "title": course.title,
+                "description": course.description,
+                "tags": tags,
+                "difficulty_level": getattr(course.metadata, "difficulty_level", None),
+                "duration_minutes": int(getattr(course.metadata, "estimated_hours", 0) or 0) * 60,
+                "url": f"/course/{course.course_id}",
+                "metadata": {
+                    "institution": course.institution,
+                    "enrollment_count": course.enrollment_count,
+                    "average_rating": course.average_rating,
+                    "total_ratings": course.total_ratings
+                }
+            }
+        ), {"title": course.title, "description": course.description, "tags": tags})
+        self._set_course_tags(state, course.course_id, tags)
+
+    def _course_name(self, state: _CatalogState, course_id: Optional[str]) -> str:
+        return state.course_titles.get(course_id, "Unknown Course")
+
+    def _index_module(self, state: _CatalogState, module: Module):
+        key = f"module:{module.module_id}"
+        if state.module_titles.get(module.module_id) != module.title:
+            state.module_titles[module.module_id] = module.title
+            for child in state.by_module.get(module.module_id, ()):
+                state.entries[child].result["module_name"] = module.title
+
+        learning_tags = getattr(module, "learning_objectives", []) or []
+        self._put(state, key, _Entry(
+            type="module",
+            course_id=module.course_id,
+            result={
+                "id": module.module_id,
+                "type": "module",
+                "title": module.title,
+                "description": module.description,
+                "course_id": module.course_id,
+                "course_name": self._course_name(state, module.course_id),
+                "tags": learning_tags,
+                "difficulty_level": None,
+                "duration_minutes": module.estimated_duration,
+                "url": f"/course/{module.course_id}/module/{module.module_id}",
+                "metadata": {
+                    "order": module.order,
+                    "is_mandatory": module.is_mandatory,
+                    "completion_criteria": module.completion_criteria
+                }
+            }
+        ), {"title": module.title, "description": module.description, "tags": learning_tags})
+
+    def _index_lesson(self, state: _CatalogState, lesson: Lesson):
+        key = f"lesson:{lesson.lesson_id}"
+        if lesson.status == "archived":
+            # Lessons are soft-deleted by archiving
+            self._remove(state, key)
+            return
+        keywords = getattr(lesson, "keywords", []) or []
+        self._put(state, key, _Entry(
+            type="lesson",
+            course_id=lesson.course_id,
+            module_id=lesson.module_id,
+            result={
+                "id": lesson.lesson_id,
+                "type": "lesson",
+                "title": lesson.title,
+                "description": lesson.description,
+                "course_id": lesson.course_id,
+                "course_name": self._course_name(state, lesson.course_id),
+                "module_id": lesson.module_id,
+                "module_name": state.module_titles.get(lesson.module_id, "Unknown Module"),
+                "tags": keywords,
+                "difficulty_level": None,
+                "duration_minutes": lesson.duration_minutes,
+                "url": f"/course/{lesson.course_id}/lesson/{lesson.lesson_id}",
+                "metadata": {
+                    "content_type": lesson.content_type,
+                    "order": lesson.order,
+                    "is_mandatory": lesson.is_mandatory,
+                    "learning_objectives": lesson.learning_objectives
+                }
+            }
+        ), {"title": lesson.title, "description": lesson.description, "tags": keywords})
+
+    def _index_quiz(self, state: _CatalogState, quiz: Quiz):
+        key = f"quiz:{quiz.quiz_id}"
+        if quiz.status != "published":
+            self._remove(state, key)
+            return
+        self._put(state, key, _Entry(
+            type="quiz",
+            course_id=quiz.course_id,
+            result={
+                "id": quiz.quiz_id,
+                "type": "quiz",
+                "title": quiz.title,
+                "description": quiz.description,
+                "course_id": quiz.course_id,
+                "course_name": self._course_name(state, quiz.course_id),
+                "module_id": quiz.module_id,
+                "tags": [],
+                "duration_minutes": quiz.time_limit_minutes,
+                "url": f"/course/{quiz.course_id}/quiz/{quiz.quiz_id}",
+                "metadata": {
+                    "quiz_type": quiz.quiz_type,
+                    "total_points": quiz.total_points,
+                    "passing_score": quiz.passing_score,
+                    "max_attempts": quiz.max_attempts
+                }
+            }
+        ), {"title": quiz.title, "description": quiz.description})
+
+    def _index_achievement(self, state: _CatalogState, achievement: Achievement):
+        key = f"achievement:{achievement.achievement_id}"
+        if achievement.status != "active":
+            self._remove(state, key)
+            return
+        self._put(state, key, _Entry(
+            type="achievement",
+            course_id=achievement.course_id,
+            result={
+                "id": achievement.achievement_id,
+                "type": "achievement",
+                "title": achievement.title,
+                "description": achievement.description,
+                "course_id": achievement.course_id,
+                "course_name": self._course_name(state, achievement.course_id),
+                "tags": achievement.tags,
+                "url": f"/achievements/{achievement.achievement_id}",
+                "achievement_type": achievement.achievement_type,
+                "tier": achievement.tier,
+                "metadata": {
+                    "achievement_type": achievement.achievement_type,
+                    "tier": achievement.tier,
+                    "points_reward": achievement.points_reward,
+                    "nft_enabled": achievement.nft_enabled,
+                    "rarity": achievement.rarity
+                }
+            }
+        ), {"title": achievement.title, "description": achievement.description, "tags": achievement.tags})
+
+    # Queries
+    def search(
+        self,
+        query: str,
+        doc_type: Optional[str] = None,
+        course_id: Optional[str] = None,
+        difficulty_level: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """Ranked, filtered and paginated hits with per-type counts"""
+        state = self._state
+        hits = []
+        type_counts: Dict[str, int] = {}
+        for key, score in state.index.search(query).items():
+            entry = state.entries[key]
+            if doc_type and entry.type != doc_type:
+                continue
+            # Same filter semantics as before: difficulty applies to courses, course_id to the rest
+            if entry.type == "course" and difficulty_level and entry.difficulty_level != difficulty_level:
+                continue
+            if entry.type != "course" and course_id and entry.course_id != course_id:
+                continue
+            type_counts[entry.type] = type_counts.get(entry.type, 0) + 1
+            hits.append((-score, -TYPE_PRIORITY.get(entry.type, 0), entry.result["title"].lower(), key))
+        hits.sort()
+        return {
+            "results": [dict(state.entries[key].result) for *_, key in hits[skip:skip + limit]],
+            "total": len(hits),
+            "type_counts": type_counts
+        }
+
+    def suggest(self, query: str, limit: int = 10) -> List[str]:
+        """Titles of the best course/module/lesson matches, then matching course tags"""
+        state = self._state
+        suggestions: List[str] = []
+        scored = state.index.search(query)
+        ranked = sorted(
+            (key for key in scored if state.entries[key].type in ("course", "module", "lesson")),
+            key=lambda k: -scored[k]
+        )
+        for key in ranked:
+            title = state.entries[key].result["title"]
+            if title not in suggestions:
+                suggestions.append(title)
+            if len(suggestions) >= limit:
+                return suggestions
+        tag_scores = state.tag_index.search(query)
+        for tag in sorted(tag_scores, key=lambda t: -tag_scores[t]):
+            if tag not in suggestions:
+                suggestions.append(tag)
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        counts = Counter(entry.type for entry in state.entries.values())
+        return {
+            "documents": len(state.entries),
+            "terms": len(state.index.postings),
+            "by_type": dict(counts),
+            "built": self._built_at is not None
+        }
+
+# Global instance
+search_index = SearchIndex()
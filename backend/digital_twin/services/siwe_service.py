@@ -14,7 +14,7 @@ import logging
 
 from ..models.wallet import WalletLink, SIWENonce
 from ..models.user import User
-from .redis_service import RedisService
+from .redis_service import get_redis_service
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +22,7 @@ class SIWEService:
     """SIWE (Sign-In with Ethereum) authentication service"""
     
     def __init__(self):
-        self.redis_service = RedisService()
+        self.redis_service = get_redis_service()
         self.domain = os.getenv("SIWE_DOMAIN", "localhost:5173")
         self.uri = os.getenv("SIWE_URI", "http://localhost:5173")
         self.nonce_ttl = 300  # 5 minutes
@@ -97,8 +97,9 @@ class SIWEService:
             if wallet_address != siwe_address:
                 raise ValueError("Wallet address mismatch")
             
-            # Verify nonce exists and is valid
-            nonce_data = await self.redis_service.get_nonce(siwe_message.nonce)
+            # Verify nonce exists and is valid; taking it out of Redis atomically
+            # means a replayed message cannot redeem the same nonce twice
+            nonce_data = await self.redis_service.consume_nonce(siwe_message.nonce)
             if not nonce_data:
                 # Check database as fallback
                 nonce_record = await SIWENonce.find_one({
@@ -149,9 +150,7 @@ class SIWEService:
     async def _consume_nonce(self, nonce: str):
         """Mark nonce as used"""
         try:
-            # Remove from Redis
-            await self.redis_service.delete_nonce(nonce)
-            
+            # Already removed from Redis by consume_nonce
             # Mark as used in database
             nonce_record = await SIWENonce.find_one({"nonce": nonce})
             if nonce_record:
@@ -13,6 +13,8 @@ from ..models.subscription import (
     PaymentStatus, PaymentMethod
 )
 from ..models.user import User
+from .redis_service import redis_service
+from .entitlement_cache import Entitlements, entitlement_cache
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +116,7 @@ class SubscriptionService:
                     await existing_plan.save()
                     logger.info(f"Updated plan: {plan_type}")
             
+            await entitlement_cache.invalidate_plans()
             logger.info("Subscription plans initialized successfully")
             
         except Exception as e:
@@ -143,128 +146,129 @@ class SubscriptionService:
             logger.error(f"Failed to get subscription history: {e}")
             return []
     
-    async def check_feature_access(self, user_id: str, feature: str) -> bool:
+    async def get_entitlements(self, user_id: str) -> Entitlements:
+        """Plan, limits and features of a user (cached; see entitlement_cache)"""
+        try:
+            return await entitlement_cache.resolve(user_id)
+        except Exception as e:
+            logger.error(f"Failed to resolve entitlements: {e}")
+            # Free tier without caching it
+            return Entitlements(user_id=user_id)
+    
+    async def check_feature_access(self, user_id: str, feature: str, entitlements: Optional[Entitlements] = None) -> bool:
         """Check if user has access to a specific feature"""
         try:
-            subscription = await self.get_user_subscription(user_id)
-            
-            if not subscription or not subscription.is_active():
-                # Check free tier access
-                if feature == "ai_queries":
-                    return True  # Allow limited free access
-                return False
-            
-            plan_config = await SubscriptionPlanConfig.find_one(
-                SubscriptionPlanConfig.plan == subscription.plan
-            )
-            
-            if not plan_config:
-                return False
-            
-            # Check feature limits
-            limits = plan_config.limits
-            
-            # Special handling for AI queries
-            if feature == "ai_queries":
-                max_queries = limits.get("max_ai_queries_per_day", 0)
-                if max_queries == -1:  # Unlimited
-                    return True
-                elif max_queries > 0:  # Limited but available
-                    return True
-                else:  # No access
-                    return False
-            
-            return limits.get(feature, False)
-            
+            entitlements = entitlements or await self.get_entitlements(user_id)
+            return entitlements.has_feature(feature)
         except Exception as e:
             logger.error(f"Failed to check feature access: {e}")
             return False
     
-    async def check_ai_query_limit(self, user_id: str) -> Dict[str, Any]:
+    def _ai_usage_key(self, user_id: str) -> str:
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        return f"ai_queries:{user_id}:{today}"
+    
+    def _seconds_until_midnight(self) -> int:
+        now = datetime.now(timezone.utc)
+        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        return max(1, int((tomorrow - now).total_seconds()))
+    
+    def _limit_info(self, daily_limit: int, queries_used: int, plan_name: str, can_query: bool) -> Dict[str, Any]:
+        if daily_limit == -1:
+            return {
+                "can_query": True,
+                "daily_limit": -1,
+                "queries_used": 0,
+                "queries_remaining": -1,
+                "plan_name": plan_name,
+                "unlimited": True
+            }
+        return {
+            "can_query": can_query,
+            "daily_limit": daily_limit,
+            "queries_used": queries_used,
+            "queries_remaining": max(0, daily_limit - queries_used),
+            "plan_name": plan_name,
+            "unlimited": False
+        }
+    
+    def _limit_error(self) -> Dict[str, Any]:
+        return {
+            "can_query": False,
+            "daily_limit": 0,
+            "queries_used": 0,
+            "queries_remaining": 0,
+            "plan_name": "Error",
+            "unlimited": False
+        }
+    
+    async def check_ai_query_limit(self, user_id: str, entitlements: Optional[Entitlements] = None) -> Dict[str, Any]:
         """Check if user can make an AI query and return limit info"""
         try:
-            from .redis_service import RedisService
-            redis_service = RedisService()
-            
-            subscription = await self.get_user_subscription(user_id)
-            
-            # Determine daily limit
-            if not subscription or not subscription.is_active():
-                daily_limit = 5  # Free tier limit
-                plan_name = "Free"
-            else:
-                plan_config = await self.get_plan_config(subscription.plan)
-                if plan_config:
-                    daily_limit = plan_config.limits.get("max_ai_queries_per_day", 0)
-                    plan_name = plan_config.name
-                else:
-                    daily_limit = 0
-                    plan_name = "Unknown"
-            
-            # Check if unlimited
+            entitlements = entitlements or await self.get_entitlements(user_id)
+            daily_limit, plan_name = entitlements.daily_ai_queries, entitlements.plan_name
             if daily_limit == -1:
-                return {
-                    "can_query": True,
-                    "daily_limit": -1,
-                    "queries_used": 0,
-                    "queries_remaining": -1,
-                    "plan_name": plan_name,
-                    "unlimited": True
-                }
+                return self._limit_info(daily_limit, 0, plan_name, True)
             
             # Check current usage
-            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            usage_key = f"ai_queries:{user_id}:{today}"
-            
             try:
                 client = await redis_service.get_client()
-                queries_used = await client.get(usage_key)
+                queries_used = await client.get(self._ai_usage_key(user_id))
                 queries_used = int(queries_used) if queries_used else 0
             except Exception as e:
                 logger.warning(f"Failed to get AI query usage from Redis: {e}")
                 queries_used = 0
             
-            can_query = queries_used < daily_limit
-            queries_remaining = max(0, daily_limit - queries_used)
-            
-            return {
-                "can_query": can_query,
-                "daily_limit": daily_limit,
-                "queries_used": queries_used,
-                "queries_remaining": queries_remaining,
-                "plan_name": plan_name,
-                "unlimited": False
-            }
+            return self._limit_info(daily_limit, queries_used, plan_name, queries_used < daily_limit)
             
         except Exception as e:
             logger.error(f"Failed to check AI query limit: {e}")
-            return {
-                "can_query": False,
-                "daily_limit": 0,
-                "queries_used": 0,
-                "queries_remaining": 0,
-                "plan_name": "Error",
-                "unlimited": False
-            }
+            return self._limit_error()
     
-    async def increment_ai_query_usage(self, user_id: str) -> bool:
-        """Increment AI query usage for the day"""
+    async def reserve_ai_query(self, user_id: str, entitlements: Optional[Entitlements] = None) -> Dict[str, Any]:
+        """
+        Check the daily limit and count the query in one atomic Redis step, so
+        concurrent requests cannot overrun the limit. Call release_ai_query if
+        the query then fails. Returns the same limit info as check_ai_query_limit.
+        """
         try:
-            from .redis_service import RedisService
-            redis_service = RedisService()
-            
-            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            usage_key = f"ai_queries:{user_id}:{today}"
+            entitlements = entitlements or await self.get_entitlements(user_id)
+            daily_limit, plan_name = entitlements.daily_ai_queries, entitlements.plan_name
+            if daily_limit == -1:
+                return self._limit_info(daily_limit, 0, plan_name, True)
             
-            client = await redis_service.get_client()
+            try:
+                allowed, queries_used = await redis_service.consume_quota(
+                    self._ai_usage_key(user_id), daily_limit, self._seconds_until_midnight()
+                )
+            except Exception as e:
+                logger.warning(f"Failed to reserve AI query in Redis: {e}")
+                allowed, queries_used = daily_limit > 0, 0
             
-            # Increment counter
-            await client.incr(usage_key)
+            return self._limit_info(daily_limit, queries_used, plan_name, allowed)
             
-            # Set expiration to end of day
-            tomorrow = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            seconds_until_midnight = int((tomorrow - datetime.now(timezone.utc)).total_seconds())
-            await client.expire(usage_key, seconds_until_midnight)
+        except Exception as e:
+            logger.error(f"Failed to reserve AI query: {e}")
+            return self._limit_error()
+    
+    async def release_ai_query(self, user_id: str):
+        """Give back a query reserved by reserve_ai_query that did not complete"""
+        try:
+            client = await redis_service.get_client()
+            key = self._ai_usage_key(user_id)
+            if int(await client.decr(key)) < 0:
+                await client.delete(key)
+        except Exception as e:
+            logger.error(f"Failed to release AI query: {e}")
+    
+    async def increment_ai_query_usage(self, user_id: str) -> bool:
+        """Increment AI query usage for the day"""
+        try:
+            # Increment counter and set expiration to end of day in one round-trip
+            pipe = await redis_service.pipeline()
+            pipe.incr(self._ai_usage_key(user_id))
+            pipe.expire(self._ai_usage_key(user_id), self._seconds_until_midnight())
+            await pipe.execute()
             
             return True
             
@@ -338,6 +342,7 @@ class SubscriptionService:
             )
             
             await subscription.save()
+            await entitlement_cache.invalidate_user(user_id)
             logger.info(f"Created subscription for user {user_id}: {plan} ({billing_cycle})")
             return subscription
             
@@ -354,6 +359,7 @@ class SubscriptionService:
                 subscription.cancelled_at = datetime.now(timezone.utc)
                 subscription.update_timestamp()
                 await subscription.save()
+                await entitlement_cache.invalidate_user(user_id)
                 logger.info(f"Cancelled subscription for user {user_id}: {reason}")
                 return True
             return False
@@ -416,6 +422,9 @@ class SubscriptionService:
                 transaction.completed_at = datetime.now(timezone.utc)
             
             await transaction.save()
+            if status != PaymentStatus.PENDING:
+                # Completed, failed or refunded payments can change what the user is entitled to
+                await entitlement_cache.invalidate_user(transaction.user_id)
             logger.info(f"Updated payment status: {transaction_id} -> {status}")
             return True
             
@@ -443,106 +452,27 @@ class SubscriptionService:
             logger.error(f"Failed to get payment history: {e}")
             return []
     
-    async def check_course_access(self, user_id: str, course_id: str) -> bool:
+    async def check_course_access(self, user_id: str, course_id: str, entitlements: Optional[Entitlements] = None) -> bool:
         """Check if user can access a specific course based on subscription"""
         try:
-            subscription = await self.get_user_subscription(user_id)
+            entitlements = entitlements or await self.get_entitlements(user_id)
             
-            # If no subscription, check if course is free/beginner
-            if not subscription or not subscription.is_active():
-                # Allow access to free beginner courses
-                from ..models.course import Course
-                course = await Course.find_one(Course.course_id == course_id)
-                if course and course.metadata.get("difficulty_level") == "beginner":
-                    return True
-                return False
-            
-            # Premium users have access to all courses
-            if subscription.plan == SubscriptionPlan.PREMIUM:
+            # Premium users have access to all courses without a course lookup
+            if entitlements.plan == SubscriptionPlan.PREMIUM.value:
                 return True
             
-            # Basic users can access beginner and some intermediate courses
-            if subscription.plan == SubscriptionPlan.BASIC:
-                from ..models.course import Course
-                course = await Course.find_one(Course.course_id == course_id)
-                if course:
-                    difficulty = course.metadata.get("difficulty_level", "beginner")
-                    return difficulty in ["beginner", "intermediate"]
-            
-            return False
+            course_found, difficulty = await entitlement_cache.course_level(course_id)
+            return entitlements.can_access_course(course_found, difficulty)
             
         except Exception as e:
             logger.error(f"Failed to check course access: {e}")
             return False
     
-    async def get_user_plan_info(self, user_id: str) -> Dict[str, Any]:
+    async def get_user_plan_info(self, user_id: str, entitlements: Optional[Entitlements] = None) -> Dict[str, Any]:
         """Get comprehensive user subscription information"""
         try:
-            subscription = await self.get_user_subscription(user_id)
-            
-            if not subscription:
-                # Free tier limits
-                free_limits = {
-                    "max_courses": 5,
-                    "max_ai_queries_per_day": 5,  # Limited free access
-                    "video_quality": "480p",
-                    "nft_tier": "none",
-                    "mentoring_sessions": 0,
-                    "lab_access": False,
-                    "early_access": False,
-                    "advanced_features": False,
-                    "ai_queries": True,  # Allow limited AI access
-                    "advanced_ai_tutor": False,
-                    "4k_video": False,
-                    "mentoring_sessions": False,
-                    "lab_access": False,
-                    "early_access": False
-                }
-                return {
-                    "has_subscription": False,
-                    "plan": None,
-                    "status": None,
-                    "features": ["Basic AI tutor access", "Limited course access"],
-                    "limits": free_limits,
-                    "days_remaining": 0
-                }
-            
-            plan_config = await self.get_plan_config(subscription.plan)
-            limits = plan_config.limits if plan_config else {}
-            
-            # Add computed features based on limits
-            computed_limits = limits.copy()
-            
-            # Add ai_queries feature based on max_ai_queries_per_day
-            if "max_ai_queries_per_day" in limits:
-                max_queries = limits["max_ai_queries_per_day"]
-                if max_queries == -1:  # Unlimited
-                    computed_limits["ai_queries"] = True
-                elif max_queries > 0:  # Limited but available
-                    computed_limits["ai_queries"] = True
-                else:  # No access
-                    computed_limits["ai_queries"] = False
-            
-            # Add other computed features
-            computed_limits["advanced_ai_tutor"] = limits.get("advanced_features", False)
-            computed_limits["4k_video"] = limits.get("video_quality") == "4K"
-            computed_limits["mentoring_sessions"] = limits.get("mentoring_sessions", 0) > 0
-            computed_limits["lab_access"] = limits.get("lab_access", False)
-            computed_limits["early_access"] = limits.get("early_access", False)
-            
-            return {
-                "has_subscription": True,
-                "plan": subscription.plan,
-                "plan_name": plan_config.name if plan_config else subscription.plan,
-                "status": subscription.status,
-                "features": plan_config.features if plan_config else [],
-                "limits": computed_limits,
-                "days_remaining": int(subscription.days_remaining()),
-                "billing_cycle": subscription.billing_cycle,
-                "price": subscription.price,
-                "start_date": subscription.start_date,
-                "end_date": subscription.end_date
-            }
+            entitlements = entitlements or await self.get_entitlements(user_id)
+            return entitlements.to_plan_info()
             
         except Exception as e:
             logger.error(f"Failed to get user plan info: {e}")
@@ -554,3 +484,6 @@ class SubscriptionService:
                 "limits": {},
                 "days_remaining": 0
             }
+
+# Global instance
+subscription_service = SubscriptionService()
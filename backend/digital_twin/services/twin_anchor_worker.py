@@ -0,0 +1,387 @@
+"""
+Batched blockchain anchoring for digital twin versions
+DigitalTwinService queues anchor requests with enqueue(): a sorted set
+(anchor_queue, scored by enqueue time) orders them and a hash
+(anchor_queue:entries) holds each request, both keyed by {twin_id}:{cid}.
+This worker drains the queue periodically, builds a Merkle tree over the
+queued (twin_id, version, cid, data_hash) leaves and anchors only the root
+in one DigitalTwinRegistry transaction per batch. Each twin version keeps an
+inclusion proof so it can be verified against the on-chain root.
+
+Leaves and nodes follow the OpenZeppelin MerkleProof convention (keccak256,
+sorted pairs), so proofs can also be checked on-chain. For local testing
+point BLOCKCHAIN_RPC_URL at an Anvil/Hardhat node (http://127.0.0.1:8545).
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List
+
+from web3 import Web3
+
+from ..models.digital_twin import DigitalTwin, DigitalTwinVersion, TwinAnchorProof
+from .redis_service import RedisService, get_redis_service
+
+logger = logging.getLogger(__name__)
+
+ANCHOR_QUEUE_KEY = "anchor_queue"
+ANCHOR_ENTRIES_KEY = "anchor_queue:entries"
+ANCHOR_LOCK_KEY = "anchor_worker:lock"
+ANCHOR_BATCH_SEQ_KEY = "anchor_batch_seq"
+
+def _to_bytes(value: str) -> bytes:
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+def _hex(value: bytes) -> str:
+    return "0x" + value.hex()
+
+class MerkleTree:
+    """Binary keccak256 Merkle tree with sorted-pair hashing"""
+
+    def __init__(self, leaves: List[bytes]):
+        if not leaves:
+            raise ValueError("Merkle tree needs at least one leaf")
+        self.leaves = list(leaves)
+        self.levels: List[List[bytes]] = [self.leaves]
+        level = self.leaves
+        while len(level) > 1:
+            parents = []
+            for i in range(0, len(level), 2):
+                if i + 1 < len(level):
+                    parents.append(self.hash_pair(level[i], level[i + 1]))
+                else:
+                    # Odd node is promoted to the next level unchanged
+                    parents.append(level[i])
+            self.levels.append(parents)
+            level = parents
+
+    @staticmethod
+    def leaf_hash(twin_id: str, version: int, cid: str, data_hash: str) -> bytes:
+        """keccak256(abi.encodePacked(twin_id, version, cid, data_hash))"""
+        return bytes(Web3.solidity_keccak(
+            ["string", "uint256", "string", "bytes32"],
+            [twin_id, int(version), cid, _to_bytes(data_hash).rjust(32, b"\0")]
+        ))
+
+    @staticmethod
+    def hash_pair(a: bytes, b: bytes) -> bytes:
+        return bytes(Web3.keccak(a + b if a <= b else b + a))
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    def proof(self, index: int) -> List[bytes]:
+        """Sibling hashes from the leaf at index up to the root"""
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+            index //= 2
+        return proof
+
+    @classmethod
+    def verify(cls, leaf: bytes, proof: List[bytes], root: bytes) -> bool:
+        computed = leaf
+        for sibling in proof:
+            computed = cls.hash_pair(computed, sibling)
+        return computed == root
+
+def verify_anchor_proof(proof: Dict[str, Any]) -> bool:
+    """Check a stored proof (dict form of TwinAnchorProof) against its Merkle root"""
+    try:
+        leaf = MerkleTree.leaf_hash(proof["twin_id"], proof["version"], proof["cid"], proof["data_hash"])
+        if _hex(leaf) != proof["leaf"]:
+            return False
+        return MerkleTree.verify(leaf, [_to_bytes(p) for p in proof["proof"]], _to_bytes(proof["merkle_root"]))
+    except Exception:
+        return False
+
+class TwinAnchorWorker:
+    """Drains the anchor queue and anchors one Merkle root per batch"""
+
+    def __init__(
+        self,
+        redis_service: Optional[RedisService] = None,
+        blockchain_service=None,
+        ipfs_service=None,
+        batch_size: Optional[int] = None,
+        interval_seconds: Optional[float] = None
+    ):
+        self.redis_service = redis_service or get_redis_service()
+        self._blockchain_service = blockchain_service
+        self._ipfs_service = ipfs_service
+        self.batch_size = batch_size or int(os.getenv("ANCHOR_BATCH_SIZE", "256"))
+        self.interval_seconds = (
+            interval_seconds if interval_seconds is not None
+            else float(os.getenv("ANCHOR_INTERVAL_SECONDS", "60"))
+        )
+        self.batch_did = os.getenv("ANCHOR_BATCH_DID", "did:learntwin:anchor-batches")
+        self.lock_ttl = int(os.getenv("ANCHOR_LOCK_TTL", "600"))
+        # Requests are dropped once this old, or after this many failed lookups
+        self.queue_ttl = int(os.getenv("ANCHOR_QUEUE_TTL", "86400"))
+        self.max_resolve_attempts = int(os.getenv("ANCHOR_MAX_RESOLVE_ATTEMPTS", "5"))
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"batches": 0, "anchored": 0, "failures": 0}
+
+    # Services are created lazily: BlockchainService connects to the RPC node on init
+    @property
+    def blockchain_service(self):
+        if self._blockchain_service is None:
+            from .blockchain_service import BlockchainService
+            self._blockchain_service = BlockchainService()
+        return self._blockchain_service
+
+    @property
+    def ipfs_service(self):
+        if self._ipfs_service is None:
+            from .ipfs_service import IPFSService
+            self._ipfs_service = IPFSService()
+        return self._ipfs_service
+
+    # Queue
+    @staticmethod
+    def queue_member(entry: Dict[str, Any]) -> str:
+        return f"{entry['twin_id']}:{entry['cid']}"
+
+    async def enqueue(self, entry: Dict[str, Any]):
+        """Queue an anchor request; re-queuing the same twin CID keeps its place"""
+        client = await self.redis_service.get_client()
+        member = self.queue_member(entry)
+        pipe = client.pipeline(transaction=True)
+        pipe.hset(ANCHOR_ENTRIES_KEY, member, json.dumps(entry))
+        pipe.zadd(ANCHOR_QUEUE_KEY, {member: time.time()}, nx=True)
+        await pipe.execute()
+
+    async def _remove(self, client, members: List[str]):
+        if not members:
+            return
+        pipe = client.pipeline(transaction=True)
+        pipe.zrem(ANCHOR_QUEUE_KEY, *members)
+        pipe.hdel(ANCHOR_ENTRIES_KEY, *members)
+        await pipe.execute()
+
+    async def _load_queue(self, client) -> List[Dict[str, Any]]:
+        """Read up to batch_size queued anchor requests, oldest first"""
+        expired = await client.zrangebyscore(ANCHOR_QUEUE_KEY, "-inf", time.time() - self.queue_ttl)
+        if expired:
+            logger.warning(f"Dropping {len(expired)} anchor requests older than {self.queue_ttl}s")
+            await self._remove(client, expired)
+
+        members = await client.zrange(ANCHOR_QUEUE_KEY, 0, self.batch_size - 1)
+        if not members:
+            return []
+        entries, dropped = [], []
+        for member, raw in zip(members, await client.hmget(ANCHOR_ENTRIES_KEY, members)):
+            try:
+                entry = json.loads(raw)
+            except (TypeError, json.JSONDecodeError):
+                logger.warning(f"Dropping malformed anchor request: {member}")
+                dropped.append(member)
+                continue
+            entry["_member"] = member
+            entries.append(entry)
+        await self._remove(client, dropped)
+        return entries
+
+    async def _defer_unresolved(self, client, entry: Dict[str, Any]):
+        """Count a failed lookup; give up on the request after max_resolve_attempts"""
+        member = entry.pop("_member")
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        if entry["attempts"] >= self.max_resolve_attempts:
+            logger.warning(f"Dropping anchor request {member} after {entry['attempts']} failed lookups")
+            await self._remove(client, [member])
+        else:
+            logger.warning(f"Cannot resolve anchor request {member} (attempt {entry['attempts']}), retrying later")
+            await client.hset(ANCHOR_ENTRIES_KEY, member, json.dumps(entry))
+
+    async def _complete_entry(self, entry: Dict[str, Any]) -> bool:
+        """Fill in version/data_hash for requests queued before they were recorded"""
+        if entry.get("version") is None:
+            version_record = await DigitalTwinVersion.find_one({"twin_id": entry["twin_id"], "cid": entry["cid"]})
+            if not version_record:
+                return False
+            entry["version"] = version_record.version
+        if not entry.get("data_hash"):
+            payload = await self.ipfs_service.get_json(entry["cid"])
+            if not payload:
+                return False
+            entry["data_hash"] = self.blockchain_service.create_data_hash_hex(payload)
+        return True
+
+    # Batch anchoring
+    async def run_once(self) -> Dict[str, Any]:
+        """Anchor one batch from the queue"""
+        if not self.blockchain_service.is_available():
+            return {"anchored": 0, "skipped": "Blockchain service not available"}
+
+        client = await self.redis_service.get_client()
+        # Only one worker process drains the queue at a time
+        token = uuid.uuid4().hex
+        if not await client.set(ANCHOR_LOCK_KEY, token, nx=True, ex=self.lock_ttl):
+            return {"anchored": 0, "skipped": "Another worker holds the anchor lock"}
+        try:
+            entries = await self._load_queue(client)
+            batch = []
+            seen = set()
+            for entry in entries:
+                if not await self._complete_entry(entry):
+                    await self._defer_unresolved(client, entry)
+                    continue
+                leaf_key = (entry["twin_id"], int(entry["version"]))
+                if leaf_key in seen:
+                    await self._remove(client, [entry["_member"]])
+                    continue
+                seen.add(leaf_key)
+                batch.append(entry)
+            if not batch:
+                return {"anchored": 0}
+            return await self._anchor_batch(client, batch)
+        finally:
+            await self.redis_service.release_lock(ANCHOR_LOCK_KEY, token)
+
+    async def _anchor_batch(self, client, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        leaves = [
+            MerkleTree.leaf_hash(e["twin_id"], e["version"], e["cid"], e["data_hash"])
+            for e in batch
+        ]
+        tree = MerkleTree(leaves)
+        merkle_root = _hex(tree.root)
+        # Claimed only once the transaction succeeds, so failures leave no gaps;
+        # the worker lock keeps two runs from picking the same number
+        batch_number = int(await client.get(ANCHOR_BATCH_SEQ_KEY) or 0) + 1
+
+        manifest = {
+            "type": "digital_twin_anchor_batch",
+            "batch_number": batch_number,
+            "merkle_root": merkle_root,
+            "leaves": [
+                {"twin_id": e["twin_id"], "version": int(e["version"]), "cid": e["cid"],
+                 "data_hash": e["data_hash"], "leaf": _hex(leaf)}
+                for e, leaf in zip(batch, leaves)
+            ]
+        }
+        try:
+            manifest_cid = await self.ipfs_service.pin_json(manifest, name=f"anchor_batch_{batch_number}")
+        except Exception as e:
+            logger.warning(f"Anchor batch manifest pin failed, anchoring root only: {e}")
+            manifest_cid = ""
+
+        # web3 calls are blocking; keep them off the event loop
+        tx = await asyncio.to_thread(
+            self.blockchain_service.anchor_merkle_root,
+            self.batch_did, batch_number, merkle_root, manifest_cid
+        )
+        if not tx.get("success"):
+            self.stats["failures"] += 1
+            logger.error(f"Anchor batch {batch_number} failed: {tx.get('error')}")
+            # Requests stay queued for the next run
+            return {"anchored": 0, "batch_number": batch_number, "error": tx.get("error")}
+
+        await client.set(ANCHOR_BATCH_SEQ_KEY, batch_number)
+
+        tx_hash = tx.get("tx_hash")
+        if tx_hash and not tx_hash.startswith("0x"):
+            tx_hash = "0x" + tx_hash
+        proofs = [
+            {
+                "twin_id": e["twin_id"],
+                "version": int(e["version"]),
+                "cid": e["cid"],
+                "data_hash": e["data_hash"],
+                "leaf": _hex(leaf),
+                "leaf_index": i,
+                "proof": [_hex(p) for p in tree.proof(i)],
+                "merkle_root": merkle_root,
+                "batch_number": batch_number,
+                "batch_size": len(batch),
+                "manifest_cid": manifest_cid or None,
+                "tx_hash": tx_hash,
+                "block_number": tx.get("block_number"),
+                "registry_address": tx.get("registry_address")
+            }
+            for i, (e, leaf) in enumerate(zip(batch, leaves))
+        ]
+        await self._store_proofs(proofs)
+        await self._remove(client, [e["_member"] for e in batch])
+
+        self.stats["batches"] += 1
+        self.stats["anchored"] += len(batch)
+        logger.info(f"Anchored {len(batch)} twin versions in batch {batch_number}: root {merkle_root} tx {tx_hash}")
+        return {
+            "anchored": len(batch),
+            "batch_number": batch_number,
+            "merkle_root": merkle_root,
+            "tx_hash": tx_hash,
+            "manifest_cid": manifest_cid or None
+        }
+
+    async def _store_proofs(self, proofs: List[Dict[str, Any]]):
+        """Persist inclusion proofs and mark the twins as anchored"""
+        latest: Dict[str, Dict[str, Any]] = {}
+        for proof in proofs:
+            existing = await TwinAnchorProof.find_one({"twin_id": proof["twin_id"], "version": proof["version"]})
+            if existing:
+                await existing.set(proof)
+            else:
+                await TwinAnchorProof(**proof).insert()
+            if proof["version"] >= latest.get(proof["twin_id"], {}).get("version", -1):
+                latest[proof["twin_id"]] = proof
+
+        for twin_id, proof in latest.items():
+            fields = {
+                "anchor_status": "anchored",
+                "on_chain_tx_hash": proof["tx_hash"],
+                "registry_address": proof["registry_address"]
+            }
+            # Buffered twin updates never write these fields, so this cannot be reverted
+            await DigitalTwin.get_pymongo_collection().update_one({"twin_id": twin_id}, {"$set": fields})
+
+    async def get_proof(self, twin_id: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Latest (or a specific version's) inclusion proof for a twin"""
+        query: Dict[str, Any] = {"twin_id": twin_id}
+        if version is not None:
+            query["version"] = int(version)
+        proof = await TwinAnchorProof.find(query).sort("-version").first_or_none()
+        if not proof:
+            return None
+        data = proof.model_dump(exclude={"id", "revision_id"})
+        data["valid"] = verify_anchor_proof(data)
+        return data
+
+    # Background loop
+    async def _run(self):
+        while True:
+            try:
+                result = await self.run_once()
+                # Keep draining while full batches are waiting
+                if result.get("anchored", 0) >= self.batch_size:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.error(f"Twin anchor worker run failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the periodic anchoring loop (called from main.lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Twin anchor worker started (batch size {self.batch_size}, interval {self.interval_seconds}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global worker
+twin_anchor_worker = TwinAnchorWorker()
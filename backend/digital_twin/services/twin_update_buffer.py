@@ -0,0 +1,194 @@
+"""
+Write-coalescing buffer for digital twin updates
+Every update is written to MongoDB straight away with a conditional update on
+the twin's version, so workers serialize through the database, never issue
+the same version twice, and a crash loses no twin state. What is coalesced
+is the expensive part: bursts of updates to the same twin (quiz answers,
+video progress, lesson completions) share one IPFS pin, one version record
+and one cache write after a short window.
+
+A twin whose state is ahead of its pinned snapshot carries `unpinned_since`,
+so a snapshot lost with a crashed worker is pinned by recover() later.
+"""
+import os
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+
+from ..models.digital_twin import DigitalTwin
+
+logger = logging.getLogger(__name__)
+
+# Fields an update never writes: latest_cid belongs to the pinned snapshot and
+# the anchor fields to the twin anchor worker
+UNOWNED_FIELDS = {"id", "revision_id", "latest_cid", "anchor_status", "on_chain_tx_hash", "registry_address"}
+
+@dataclass
+class PendingTwinUpdate:
+    """Updates written to MongoDB and waiting for their snapshot to be pinned"""
+    twin: DigitalTwin
+    base_version: int
+    persist: Callable[["PendingTwinUpdate"], Awaitable[None]]
+    updated_by: str = "system"
+    change_descriptions: List[str] = field(default_factory=list)
+    first_update_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def update_count(self) -> int:
+        return self.twin.version - self.base_version
+
+class TwinUpdateBuffer:
+    """Coalesces digital twin snapshots per twin_id over a configurable window"""
+
+    def __init__(self, window_seconds: Optional[float] = None, max_updates: Optional[int] = None):
+        self.window_seconds = (
+            window_seconds if window_seconds is not None
+            else float(os.getenv("TWIN_UPDATE_COALESCE_SECONDS", "2.0"))
+        )
+        # Flush early once a burst reaches this many updates
+        self.max_updates = max_updates or int(os.getenv("TWIN_UPDATE_COALESCE_MAX", "50"))
+        # Attempts at a versioned write before giving up on a hot twin
+        self.max_conflicts = int(os.getenv("TWIN_UPDATE_MAX_CONFLICTS", "5"))
+        self._pending: Dict[str, PendingTwinUpdate] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats: Dict[str, int] = {"updates": 0, "conflicts": 0, "flushes": 0, "flush_failures": 0}
+
+    @property
+    def collection(self):
+        return DigitalTwin.get_pymongo_collection()
+
+    def _lock(self, twin_id: str) -> asyncio.Lock:
+        lock = self._locks.get(twin_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[twin_id] = lock
+        return lock
+
+    def peek(self, twin_id: str) -> Optional[DigitalTwin]:
+        """Get the latest twin this process wrote but has not pinned yet, if any"""
+        pending = self._pending.get(twin_id)
+        return pending.twin if pending else None
+
+    @staticmethod
+    def _state(digital_twin: DigitalTwin) -> Dict[str, Any]:
+        return digital_twin.model_dump(exclude=UNOWNED_FIELDS)
+
+    async def apply(
+        self,
+        twin_id: str,
+        mutate: Callable[[DigitalTwin], Any],
+        updated_by: Optional[str],
+        change_description: str,
+        persist: Callable[[PendingTwinUpdate], Awaitable[None]]
+    ) -> DigitalTwin:
+        """Apply one update, write it to MongoDB and return the twin at its new version
+
+        mutate may be a plain function or a coroutine function; it is re-run on
+        a fresh copy when another worker wrote the twin first. persist is
+        called once per coalesced burst to pin the snapshot. updated_by
+        defaults to the twin owner.
+        """
+        async with self._lock(twin_id):
+            for _ in range(self.max_conflicts):
+                digital_twin = await DigitalTwin.find_one({"twin_id": twin_id})
+                if not digital_twin:
+                    raise ValueError(f"Digital twin not found: {twin_id}")
+                expected = digital_twin.version
+
+                result = mutate(digital_twin)
+                if inspect.isawaitable(result):
+                    await result
+                digital_twin.version = expected + 1
+                digital_twin.update_timestamp()
+                if digital_twin.unpinned_since is None:
+                    digital_twin.unpinned_since = datetime.now(timezone.utc)
+
+                written = await self.collection.update_one(
+                    {"twin_id": twin_id, "version": expected},
+                    {"$set": self._state(digital_twin)}
+                )
+                if written.modified_count:
+                    break
+                self.stats["conflicts"] += 1
+            else:
+                raise RuntimeError(f"Digital twin {twin_id} kept changing; update not applied")
+
+            pending = self._pending.get(twin_id)
+            if pending is None:
+                pending = PendingTwinUpdate(twin=digital_twin, base_version=expected, persist=persist)
+                self._pending[twin_id] = pending
+            pending.twin = digital_twin
+            pending.updated_by = updated_by or digital_twin.owner_did
+            pending.change_descriptions.append(change_description)
+            self.stats["updates"] += 1
+
+            if self.window_seconds <= 0 or pending.update_count >= self.max_updates:
+                await self._flush_locked(twin_id)
+            elif pending.flush_task is None:
+                pending.flush_task = asyncio.create_task(self._flush_after_window(twin_id))
+
+            return digital_twin
+
+    async def _flush_after_window(self, twin_id: str):
+        await asyncio.sleep(self.window_seconds)
+        await self.flush(twin_id)
+
+    async def flush(self, twin_id: str) -> Optional[DigitalTwin]:
+        """Pin pending updates for a twin now"""
+        async with self._lock(twin_id):
+            return await self._flush_locked(twin_id)
+
+    async def _flush_locked(self, twin_id: str) -> Optional[DigitalTwin]:
+        """Pin the current snapshot. A failure is logged and the entry stays
+        pending for another window; the state itself is already in MongoDB."""
+        pending = self._pending.pop(twin_id, None)
+        if pending is None:
+            return None
+        task = pending.flush_task
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        pending.flush_task = None
+
+        try:
+            await pending.persist(pending)
+            self.stats["flushes"] += 1
+            logger.debug(f"Pinned {pending.update_count} coalesced updates for {twin_id}")
+        except Exception as e:
+            self.stats["flush_failures"] += 1
+            logger.error(f"Coalesced twin update flush failed for {twin_id}: {e}")
+            self._pending[twin_id] = pending
+            if self.window_seconds > 0:
+                pending.flush_task = asyncio.create_task(self._flush_after_window(twin_id))
+        return pending.twin
+
+    async def flush_all(self):
+        """Pin every pending twin (used on shutdown)"""
+        for twin_id in list(self._pending):
+            await self.flush(twin_id)
+
+    async def recover(self, persist: Callable[[PendingTwinUpdate], Awaitable[None]], limit: int = 500) -> int:
+        """Pin twins whose snapshot was lost with another worker; returns how many were queued"""
+        stale = datetime.now(timezone.utc) - timedelta(seconds=max(self.window_seconds, 0) * 5 + 60)
+        recovered = 0
+        async for digital_twin in DigitalTwin.find({"unpinned_since": {"$lt": stale}}).limit(limit):
+            async with self._lock(digital_twin.twin_id):
+                if digital_twin.twin_id in self._pending:
+                    continue
+                self._pending[digital_twin.twin_id] = PendingTwinUpdate(
+                    twin=digital_twin,
+                    base_version=digital_twin.version - 1,
+                    persist=persist,
+                    change_descriptions=["Recovered unpinned updates"]
+                )
+                await self._flush_locked(digital_twin.twin_id)
+                recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} digital twins with unpinned updates")
+        return recovered
+
+# Global buffer shared by all DigitalTwinService instances
+twin_update_buffer = TwinUpdateBuffer()
@@ -0,0 +1,386 @@
+"""
+Transaction pipeline for the service account
+All BlockchainService instances that sign with the same account share one
+pipeline, so concurrent mints and registry writes never race on nonces:
+1. NonceManager hands out nonces locally and resyncs with the node's pending
+   count periodically and whenever the node rejects a nonce
+2. GasPriceOracle caches EIP-1559 fee data for about one block
+3. TransactionPipeline signs and broadcasts under a short lock, then hands
+   the transaction to a single receipt poller thread; callers only block on
+   their own receipt, and transactions stuck in the mempool are re-signed
+   with the same nonce and bumped fees. A transaction that times out after
+   the node dropped it has its nonce released, or filled with a no-op
+   transfer when later nonces are already waiting behind the gap
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple
+
+from web3.exceptions import TransactionNotFound, TimeExhausted
+
+logger = logging.getLogger(__name__)
+
+NONCE_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced", "nonce too high")
+
+class NonceManager:
+    """Thread-safe local nonce allocator for one account"""
+
+    def __init__(self, w3, address: str, resync_seconds: Optional[float] = None):
+        self.w3 = w3
+        self.address = address
+        self.resync_seconds = (
+            resync_seconds if resync_seconds is not None
+            else float(os.getenv("NONCE_RESYNC_SECONDS", "60"))
+        )
+        self._next: Optional[int] = None
+        self._released: List[int] = []
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def chain_nonce(self) -> int:
+        """The node's next nonce, counting transactions pending in its mempool"""
+        return self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def _sync_locked(self):
+        chain_nonce = self.chain_nonce()
+        # Never go backwards past nonces we have handed out and not released
+        self._next = chain_nonce if self._next is None else max(self._next, chain_nonce)
+        self._released = [n for n in self._released if n >= chain_nonce]
+        heapq.heapify(self._released)
+        self._synced_at = time.monotonic()
+
+    def allocate(self) -> int:
+        """Next nonce to use; released nonces are reused first to avoid gaps"""
+        with self._lock:
+            if self._next is None or time.monotonic() - self._synced_at >= self.resync_seconds:
+                self._sync_locked()
+            if self._released:
+                return heapq.heappop(self._released)
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce: int):
+        """Return a nonce whose transaction never reached the mempool"""
+        with self._lock:
+            if self._next is not None and nonce == self._next - 1:
+                self._next -= 1
+            elif nonce not in self._released:
+                heapq.heappush(self._released, nonce)
+
+    def resync(self, hard: bool = False):
+        """Realign with the node; hard drops local state (after a nonce error)"""
+        with self._lock:
+            if hard:
+                self._next = None
+                self._released = []
+            self._sync_locked()
+
+class GasPriceOracle:
+    """Caches fee data so each transaction does not re-query the node"""
+
+    def __init__(self, w3, ttl_seconds: Optional[float] = None):
+        self.w3 = w3
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else float(os.getenv("GAS_PRICE_CACHE_SECONDS", "12"))
+        )
+        self._cached: Optional[Tuple[float, Dict[str, int]]] = None
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> Dict[str, int]:
+        latest_block = self.w3.eth.get_block('latest')
+        base_fee = latest_block.get('baseFeePerGas')
+        if base_fee is None:
+            return {'gasPrice': int(self.w3.eth.gas_price)}
+        try:
+            priority_fee = self.w3.eth.max_priority_fee
+        except Exception:
+            priority_fee = self.w3.to_wei(3, 'gwei')
+        # Same headroom the service always used: 2x tip, 5x base fee
+        max_priority_fee = int(priority_fee * 2)
+        return {
+            'maxFeePerGas': int(base_fee * 5 + max_priority_fee),
+            'maxPriorityFeePerGas': max_priority_fee
+        }
+
+    def fees(self) -> Dict[str, int]:
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached[0] >= self.ttl_seconds:
+                self._cached = (now, self._fetch())
+            return dict(self._cached[1])
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+
+    @staticmethod
+    def bump(fees: Dict[str, int], percent: int) -> Dict[str, int]:
+        """Raise every fee field by percent (nodes require >= 10% to replace)"""
+        return {key: value * (100 + percent) // 100 + 1 for key, value in fees.items()}
+
+@dataclass
+class PendingTransaction:
+    """A broadcast transaction waiting for its receipt"""
+    nonce: int
+    tx: Dict[str, Any]
+    tx_hashes: List[Any]
+    submitted_at: float
+    deadline: float
+    future: Future = field(default_factory=Future)
+    replacements: int = 0
+
+    @property
+    def tx_hash(self):
+        return self.tx_hashes[-1]
+
+class TransactionPipeline:
+    """Sign/broadcast queue with a shared receipt poller for one account"""
+
+    def __init__(self, w3, account, private_key: str):
+        self.w3 = w3
+        self.account = account
+        self.private_key = private_key
+        self.nonces = NonceManager(w3, account.address)
+        self.gas = GasPriceOracle(w3)
+        self.poll_interval = float(os.getenv("TX_RECEIPT_POLL_SECONDS", "1.0"))
+        self.stuck_seconds = float(os.getenv("TX_STUCK_SECONDS", "90"))
+        self.max_replacements = int(os.getenv("TX_MAX_REPLACEMENTS", "3"))
+        self.replacement_bump_percent = int(os.getenv("TX_REPLACEMENT_BUMP_PERCENT", "25"))
+        self.receipt_timeout = float(os.getenv("TX_RECEIPT_TIMEOUT", "300"))
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, PendingTransaction] = {}
+        self._pending_lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._chain_id: Optional[int] = None
+        self.stats: Dict[str, int] = {
+            "submitted": 0, "confirmed": 0, "replaced": 0, "nonce_resyncs": 0, "nonces_released": 0, "gap_fills": 0
+        }
+
+    # Submission
+    def submit(
+        self,
+        contract_function,
+        *args,
+        gas: Optional[int] = None,
+        gas_multiplier: float = 3.0,
+        value: int = 0,
+        timeout: Optional[float] = None
+    ) -> PendingTransaction:
+        """Build, sign and broadcast; returns as soon as the node accepts the transaction"""
+        fees = self.gas.fees()
+        call = contract_function(*args)
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        params = {'from': self.account.address, 'value': value, 'chainId': self._chain_id, **fees}
+        if gas is None:
+            gas = int(call.estimate_gas(params) * gas_multiplier)
+        params['gas'] = gas
+
+        for attempt in range(3):
+            nonce = self.nonces.allocate()
+            try:
+                tx = call.build_transaction({**params, 'nonce': nonce})
+                with self._send_lock:
+                    tx_hash = self._broadcast(tx)
+            except Exception as e:
+                message = str(e).lower()
+                if any(err in message for err in NONCE_ERRORS) and attempt < 2:
+                    # Another sender used this nonce: realign with the node and retry
+                    self.stats["nonce_resyncs"] += 1
+                    logger.warning(f"Nonce {nonce} rejected ({e}); resyncing with chain")
+                    self.nonces.resync(hard=True)
+                    continue
+                self.nonces.release(nonce)
+                raise
+
+            pending = self._track(nonce, tx, tx_hash, timeout)
+            self.stats["submitted"] += 1
+            return pending
+        raise RuntimeError("Could not allocate a usable nonce")
+
+    def _track(self, nonce: int, tx: Dict[str, Any], tx_hash, timeout: Optional[float] = None) -> PendingTransaction:
+        """Hand a broadcast transaction to the receipt poller"""
+        now = time.monotonic()
+        pending = PendingTransaction(
+            nonce=nonce,
+            tx=tx,
+            tx_hashes=[tx_hash],
+            submitted_at=now,
+            deadline=now + (timeout or self.receipt_timeout)
+        )
+        with self._pending_lock:
+            self._pending[nonce] = pending
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name="tx-receipt-poller", daemon=True)
+                self._poller.start()
+        return pending
+
+    def _broadcast(self, tx: Dict[str, Any]):
+        signed = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
+        try:
+            return self.w3.eth.send_raw_transaction(signed.raw_transaction)
+        except Exception as e:
+            if "already known" in str(e).lower():
+                return signed.hash
+            raise
+
+    def wait(self, pending: PendingTransaction, timeout: Optional[float] = None):
+        """Block until the receipt of any broadcast version of the transaction is available"""
+        return pending.future.result(timeout=timeout)
+
+    def send(self, contract_function, *args, **kwargs):
+        """Submit and wait; returns (receipt, tx_hash of the mined transaction)"""
+        pending = self.submit(contract_function, *args, **kwargs)
+        receipt = self.wait(pending)
+        return receipt, receipt['transactionHash']
+
+    async def send_async(self, contract_function, *args, **kwargs):
+        """Async facade: signing runs in a worker thread, receipt is awaited without a thread"""
+        pending = await asyncio.to_thread(self.submit, contract_function, *args, **kwargs)
+        receipt = await asyncio.wrap_future(pending.future)
+        return receipt, receipt['transactionHash']
+
+    # Receipt polling
+    def _poll_loop(self):
+        """Runs while transactions are in flight; one thread polls for all callers"""
+        while True:
+            with self._pending_lock:
+                pending = list(self._pending.values())
+                if not pending:
+                    self._poller = None
+                    return
+            for tx in pending:
+                try:
+                    self._poll_one(tx)
+                except Exception as e:
+                    logger.debug(f"Receipt poll failed for nonce {tx.nonce}: {e}")
+            time.sleep(self.poll_interval)
+
+    def _finish(self, tx: PendingTransaction, receipt=None, error: Optional[Exception] = None):
+        with self._pending_lock:
+            if self._pending.get(tx.nonce) is tx:
+                del self._pending[tx.nonce]
+        if error is not None:
+            tx.future.set_exception(error)
+        else:
+            self.stats["confirmed"] += 1
+            tx.future.set_result(receipt)
+
+    def _poll_one(self, tx: PendingTransaction):
+        for tx_hash in reversed(tx.tx_hashes):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            except Exception as e:
+                # RPC hiccup: the deadline below still applies so wait() cannot hang
+                logger.warning(f"Receipt lookup for {tx_hash.hex()} failed: {e}")
+                continue
+            if receipt is not None:
+                self._finish(tx, receipt)
+                return
+
+        now = time.monotonic()
+        if now >= tx.deadline:
+            # Settle the nonce before waking the caller, who may submit again right away
+            self._close_gap(tx)
+            self._finish(tx, error=TimeExhausted(f"Transaction {tx.tx_hash.hex()} not mined before timeout"))
+        elif now - tx.submitted_at >= self.stuck_seconds * (tx.replacements + 1):
+            if tx.replacements < self.max_replacements:
+                self._replace(tx)
+
+    def _replacement_fees(self, tx: Dict[str, Any]) -> Dict[str, int]:
+        """Fees high enough to replace tx: bumped past its own, and at least the market rate"""
+        fee_keys = ('maxFeePerGas', 'maxPriorityFeePerGas') if 'maxFeePerGas' in tx else ('gasPrice',)
+        current = {key: tx[key] for key in fee_keys}
+        self.gas.invalidate()
+        market = {key: value for key, value in self.gas.fees().items() if key in current}
+        bumped = self.gas.bump(current, self.replacement_bump_percent)
+        return {key: max(bumped[key], market.get(key, 0)) for key in bumped}
+
+    def _replace(self, tx: PendingTransaction):
+        """Re-sign a stuck transaction with the same nonce and higher fees"""
+        replacement = {**tx.tx, **self._replacement_fees(tx.tx)}
+        try:
+            with self._send_lock:
+                tx_hash = self._broadcast(replacement)
+        except Exception as e:
+            message = str(e).lower()
+            if "nonce too low" in message:
+                # One of the earlier versions was mined; its receipt shows up on the next poll
+                return
+            logger.warning(f"Replacement for nonce {tx.nonce} failed: {e}")
+            return
+        tx.tx = replacement
+        tx.tx_hashes.append(tx_hash)
+        tx.replacements += 1
+        self.stats["replaced"] += 1
+        logger.info(f"Replaced stuck transaction nonce {tx.nonce} with {tx_hash.hex()}")
+
+    def _close_gap(self, tx: PendingTransaction):
+        """Keep a timed-out nonce from blocking every later transaction
+
+        Nothing to do while the node still has a version of it pending (or
+        mined it). Otherwise the nonce is released for the next submission, or,
+        when later nonces are already waiting behind it, filled right away with
+        a zero-value transfer to ourselves that the poller tracks like any
+        other transaction.
+        """
+        try:
+            if self.nonces.chain_nonce() > tx.nonce:
+                return
+        except Exception as e:
+            logger.warning(f"Could not check nonce {tx.nonce} after its timeout: {e}")
+            return
+
+        with self._pending_lock:
+            blocked = any(nonce > tx.nonce for nonce in self._pending)
+        if not blocked:
+            self.nonces.release(tx.nonce)
+            self.stats["nonces_released"] += 1
+            logger.warning(f"Nonce {tx.nonce} was dropped by the node; released for the next transaction")
+            return
+
+        filler = {
+            'to': self.account.address,
+            'value': 0,
+            'gas': 21000,
+            'nonce': tx.nonce,
+            'chainId': tx.tx['chainId'],
+            **self._replacement_fees(tx.tx)
+        }
+        try:
+            with self._send_lock:
+                tx_hash = self._broadcast(filler)
+        except Exception as e:
+            if "nonce too low" not in str(e).lower():
+                logger.error(f"Could not fill dropped nonce {tx.nonce}: {e}")
+            return
+        self._track(tx.nonce, filler, tx_hash)
+        self.stats["gap_fills"] += 1
+        logger.warning(f"Nonce {tx.nonce} was dropped by the node; filled with no-op {tx_hash.hex()}")
+
+    def in_flight(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+_pipelines: Dict[Tuple[str, str], TransactionPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+def get_tx_pipeline(w3, account, private_key: str, endpoint: str = "") -> TransactionPipeline:
+    """Shared pipeline per (RPC endpoint, account) across BlockchainService instances"""
+    key = (endpoint, account.address)
+    with _pipelines_lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            pipeline = TransactionPipeline(w3, account, private_key)
+            _pipelines[key] = pipeline
+        return pipeline
@@ -2,15 +2,22 @@
 Video processing service for transcoding and optimization
 """
 import os
-import subprocess
+import json
+import shutil
 import asyncio
 import logging
+import tempfile
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timezone
-import boto3
 from botocore.exceptions import ClientError
+from pydantic import BaseModel
 
 from ..models.video_content import VideoContent, VideoQuality, VideoThumbnail, VideoSubtitle, VideoProcessingStatus
+from .video_upload_storage import create_s3_client
+from .hls_transcoder import (
+    select_renditions, build_hls_command, build_master_playlist, build_media_playlist,
+    parse_media_playlist, segment_filename, bitrate_to_bps, run_ffmpeg, ThrottledProgress
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +25,18 @@ class VideoProcessingService:
     """Service for processing uploaded videos"""
     
     def __init__(self):
-        self.s3_client = boto3.client('s3')
+        # Same endpoint and credentials as the upload bucket (S3_ENDPOINT_URL, S3_REGION)
+        self.s3_client = create_s3_client()
         self.bucket_name = os.getenv("S3_BUCKET_NAME", "learn-twin-videos")
         self.ffmpeg_path = os.getenv("FFMPEG_PATH", "ffmpeg")
         self.ffprobe_path = os.getenv("FFPROBE_PATH", "ffprobe")
+        self.cdn_base_url = os.getenv("CDN_BASE_URL", "https://cdn.learntwin.com").rstrip("/")
+        self.hls_segment_seconds = int(os.getenv("VIDEO_HLS_SEGMENT_SECONDS", "6"))
+        self.ffmpeg_preset = os.getenv("VIDEO_FFMPEG_PRESET", "medium")
+        self.progress_interval = float(os.getenv("VIDEO_PROGRESS_INTERVAL_SECONDS", "5"))
+        self.upload_concurrency = int(os.getenv("VIDEO_UPLOAD_CONCURRENCY", "8"))
+        # How often finished segments are uploaded and checkpointed while ffmpeg runs
+        self.segment_poll_interval = float(os.getenv("VIDEO_SEGMENT_POLL_SECONDS", "5"))
         
         # Video quality configurations
         self.quality_configs = {
@@ -51,91 +66,124 @@ class VideoProcessingService:
             }
         }
     
-    async def process_video(self, video_content: VideoContent):
-        """Process uploaded video - transcode to multiple qualities and generate thumbnails"""
+    async def process_video(self, video_content: VideoContent, threads: int = 0):
+        """
+        Transcode an uploaded video into an HLS ladder and generate thumbnails.
+        
+        All missing renditions are encoded in one ffmpeg pass. While it runs,
+        every finished segment is uploaded and checkpointed per rendition
+        (hls_segments), and each rendition is recorded on the document once its
+        playlist is uploaded. A run interrupted mid-encode restarts the pass at
+        the last segment every pending rendition has uploaded; finished
+        renditions are never encoded again.
+        """
+        work_dir = tempfile.mkdtemp(prefix=f"transcode_{video_content.video_id}_")
+        progress = ThrottledProgress(
+            lambda value: self._update(video_content, {"processing_status.progress": value}),
+            min_interval=self.progress_interval
+        )
         try:
             # Update processing status
-            video_content.processing_status.status = "processing"
-            video_content.processing_status.progress = 0.0
-            video_content.processing_status.started_at = datetime.now(timezone.utc)
-            await video_content.save()
+            await self._update(video_content, {
+                "processing_status.status": "processing",
+                "processing_status.started_at": video_content.processing_status.started_at or datetime.now(timezone.utc),
+                "processing_status.error_message": None
+            })
             
             # Download original video for processing
-            temp_input_path = f"/tmp/input_{video_content.video_id}.mp4"
+            temp_input_path = os.path.join(work_dir, f"source{video_content.file_extension or '.mp4'}")
             await self._download_from_s3(video_content.storage_path, temp_input_path)
+            await progress.update(5.0, force=True)
             
             # Get video metadata
             metadata = await self._get_video_metadata(temp_input_path)
-            video_content.duration = metadata.get('duration', 0.0)
-            video_content.video_codec = metadata.get('video_codec', 'unknown')
-            video_content.audio_codec = metadata.get('audio_codec', 'unknown')
-            video_content.frame_rate = metadata.get('frame_rate', 0.0)
-            video_content.aspect_ratio = metadata.get('aspect_ratio', '16:9')
+            await self._update(video_content, {
+                "duration": metadata.get('duration', 0.0),
+                "video_codec": metadata.get('video_codec', 'unknown'),
+                "audio_codec": metadata.get('audio_codec', 'unknown'),
+                "frame_rate": metadata.get('frame_rate', 0.0),
+                "aspect_ratio": metadata.get('aspect_ratio', '16:9')
+            })
             
-            # Process video qualities
-            total_qualities = len(self.quality_configs)
-            processed_qualities = 0
+            # Renditions finished by an earlier, interrupted run are kept
+            ladder = select_renditions(self.quality_configs, metadata.get('height', 0))
+            done = {q.quality for q in video_content.qualities if q.is_processed}
+            pending = [(name, config) for name, config in ladder if name not in done]
             
-            for quality_name, config in self.quality_configs.items():
+            if pending:
+                output_dir = os.path.join(work_dir, "hls")
+                names = [name for name, _ in pending]
+                # Resume at the last segment boundary every pending rendition reached
+                start = min(len(video_content.hls_segments.get(name, [])) for name in names)
+                segments = {name: list(video_content.hls_segments.get(name, []))[:start] for name in names}
+                duration = metadata.get('duration', 0.0)
+                remaining = max(duration - start * self.hls_segment_seconds, 0.0)
+                resumed = 1 - remaining / duration if duration > 0 else 0.0
+                finished_before = len(ladder) - len(pending)
+                
+                async def on_transcode(fraction: float):
+                    encoded = resumed + fraction * (1 - resumed)
+                    await progress.update(5 + 85 * (finished_before + encoded * len(pending)) / len(ladder))
+                
+                async def upload_while_encoding():
+                    while True:
+                        await asyncio.sleep(self.segment_poll_interval)
+                        try:
+                            await self._checkpoint_segments(video_content, output_dir, segments)
+                        except Exception as e:
+                            # Retried on the next poll and once more after the pass
+                            logger.warning(f"Segment checkpoint failed for {video_content.video_id}: {e}")
+                
+                uploader = asyncio.create_task(upload_while_encoding())
                 try:
-                    # Transcode to this quality
-                    output_path = f"/tmp/{video_content.video_id}_{quality_name}.mp4"
-                    await self._transcode_video(temp_input_path, output_path, config)
-                    
-                    # Upload to S3
-                    s3_key = f"videos/{video_content.lesson_id}/{quality_name}/{video_content.video_id}.mp4"
-                    await self._upload_to_s3(output_path, s3_key)
-                    
-                    # Get file size
-                    file_size = os.path.getsize(output_path)
-                    
-                    # Create quality record
-                    quality = VideoQuality(
-                        quality=quality_name,
-                        resolution=config['resolution'],
-                        bitrate=int(config['bitrate'].replace('k', '')) * 1000,
-                        file_size=file_size,
-                        storage_path=s3_key,
-                        cdn_url=f"https://cdn.learntwin.com/{s3_key}",
-                        is_processed=True
+                    await self._transcode_video(
+                        temp_input_path, output_dir, pending,
+                        metadata.get('has_audio', True), remaining, threads, on_transcode, start
                     )
-                    
-                    video_content.qualities.append(quality)
-                    
-                    # Clean up temp file
-                    os.remove(output_path)
-                    
-                    processed_qualities += 1
-                    progress = (processed_qualities / total_qualities) * 80  # 80% for transcoding
-                    video_content.processing_status.progress = progress
-                    await video_content.save()
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process quality {quality_name}: {e}")
-                    continue
+                finally:
+                    uploader.cancel()
+                    await asyncio.gather(uploader, return_exceptions=True)
+                await self._checkpoint_segments(video_content, output_dir, segments)
+                
+                for name, config in pending:
+                    quality = await self._upload_rendition(video_content, output_dir, name, config, segments.pop(name))
+                    # Checkpoint this rendition
+                    qualities = [q for q in video_content.qualities if q.quality != name] + [quality]
+                    await self._update(video_content, {
+                        "qualities": qualities,
+                        "hls_segments": {other: list(uploaded) for other, uploaded in segments.items()}
+                    })
+                    done.add(name)
+                    await progress.update(90 + 5 * len(done) / len(ladder))
+            
+            # Master playlist over every finished rendition
+            await self._upload_master_playlist(video_content, work_dir)
             
             # Generate thumbnails
-            await self._generate_thumbnails(temp_input_path, video_content)
+            if not video_content.thumbnails:
+                await self._generate_thumbnails(temp_input_path, video_content)
             
             # Generate subtitles (optional - you can integrate with speech-to-text service)
-            await self._generate_subtitles(temp_input_path, video_content)
+            if not video_content.subtitles:
+                await self._generate_subtitles(temp_input_path, video_content)
             
             # Set default quality
             if video_content.qualities:
                 video_content.default_quality = "720p" if any(q.quality == "720p" for q in video_content.qualities) else video_content.qualities[0].quality
             
             # Update processing status to completed
-            video_content.processing_status.status = "completed"
-            video_content.processing_status.progress = 100.0
-            video_content.processing_status.completed_at = datetime.now(timezone.utc)
-            video_content.processed_at = datetime.now(timezone.utc)
-            video_content.updated_at = datetime.now(timezone.utc)
-            
-            await video_content.save()
-            
-            # Clean up temp files
-            if os.path.exists(temp_input_path):
-                os.remove(temp_input_path)
+            now = datetime.now(timezone.utc)
+            await self._update(video_content, {
+                "thumbnails": video_content.thumbnails,
+                "thumbnail_url": video_content.thumbnail_url,
+                "subtitles": video_content.subtitles,
+                "has_auto_subtitles": video_content.has_auto_subtitles,
+                "default_quality": video_content.default_quality,
+                "processing_status.status": "completed",
+                "processing_status.progress": 100.0,
+                "processing_status.completed_at": now,
+                "processed_at": now
+            })
             
             logger.info(f"Successfully processed video {video_content.video_id}")
             
@@ -143,22 +191,148 @@ class VideoProcessingService:
             logger.error(f"Failed to process video {video_content.video_id}: {e}")
             
             # Update processing status to failed
-            video_content.processing_status.status = "failed"
-            video_content.processing_status.error_message = str(e)
-            video_content.updated_at = datetime.now(timezone.utc)
-            await video_content.save()
+            await self._update(video_content, {
+                "processing_status.status": "failed",
+                "processing_status.error_message": str(e)
+            })
+            raise
+        finally:
+            # Clean up temp files
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _update(self, video_content: VideoContent, fields: Dict[str, Any]):
+        """$set the given (dotted) fields and mirror them on the in-memory document
+        
+        Partial updates keep the transcode queue's lease fields intact, which a
+        full save() of this document would overwrite.
+        """
+        fields = {**fields, "updated_at": datetime.now(timezone.utc)}
+        
+        def to_mongo(value):
+            if isinstance(value, BaseModel):
+                return value.model_dump()
+            if isinstance(value, list):
+                return [to_mongo(v) for v in value]
+            return value
+        
+        await VideoContent.get_pymongo_collection().update_one(
+            {"video_id": video_content.video_id},
+            {"$set": {path: to_mongo(value) for path, value in fields.items()}}
+        )
+        for path, value in fields.items():
+            *parents, leaf = path.split(".")
+            target = video_content
+            for parent in parents:
+                target = getattr(target, parent)
+            setattr(target, leaf, value)
+    
+    def _cdn_url(self, s3_key: str) -> str:
+        return f"{self.cdn_base_url}/{s3_key}"
+    
+    def _hls_prefix(self, video_content: VideoContent) -> str:
+        return f"videos/{video_content.lesson_id}/{video_content.video_id}/hls"
+    
+    async def _checkpoint_segments(self, video_content: VideoContent, output_dir: str, segments: Dict[str, List[Dict[str, float]]]):
+        """Upload segments ffmpeg has finished since the last call and record them per rendition"""
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+        new = {}
+        for name, uploaded in segments.items():
+            rendition_dir = os.path.join(output_dir, name)
+            try:
+                with open(os.path.join(rendition_dir, "index.m3u8")) as f:
+                    listed = parse_media_playlist(f.read())
+            except FileNotFoundError:
+                continue
+            durations = dict(listed)
+            index = len(uploaded)
+            while segment_filename(index) in durations:
+                filename = segment_filename(index)
+                new.setdefault(name, []).append({
+                    "index": index,
+                    "duration": durations[filename],
+                    "size": os.path.getsize(os.path.join(rendition_dir, filename))
+                })
+                index += 1
+        if not new:
+            return
+        
+        prefix = self._hls_prefix(video_content)
+        
+        async def upload(name: str, index: int):
+            async with semaphore:
+                await self._upload_to_s3(
+                    os.path.join(output_dir, name, segment_filename(index)),
+                    f"{prefix}/{name}/{segment_filename(index)}"
+                )
+        
+        await asyncio.gather(*(upload(name, s["index"]) for name, added in new.items() for s in added))
+        for name, added in new.items():
+            segments[name].extend({"duration": s["duration"], "size": s["size"]} for s in added)
+        await self._update(video_content, {"hls_segments": {name: list(uploaded) for name, uploaded in segments.items()}})
+    
+    async def _upload_rendition(
+        self,
+        video_content: VideoContent,
+        output_dir: str,
+        name: str,
+        config: Dict[str, str],
+        segments: List[Dict[str, float]]
+    ) -> VideoQuality:
+        """Upload one rendition's playlist over its uploaded segments"""
+        if not segments:
+            raise Exception(f"FFmpeg produced no segments for {name}")
+        
+        # Segments may come from several passes, so the playlist is rebuilt rather than taken from ffmpeg
+        playlist_path = os.path.join(output_dir, name, "playlist.m3u8")
+        with open(playlist_path, "w") as f:
+            f.write(build_media_playlist([s["duration"] for s in segments]))
+        
+        # Written last: the playlist must never reference a missing segment
+        prefix = f"{self._hls_prefix(video_content)}/{name}"
+        await self._upload_to_s3(playlist_path, f"{prefix}/index.m3u8")
+        
+        return VideoQuality(
+            quality=name,
+            resolution=config['resolution'],
+            bitrate=bitrate_to_bps(config['bitrate']),
+            file_size=int(sum(s["size"] for s in segments)) + os.path.getsize(playlist_path),
+            storage_path=f"{prefix}/index.m3u8",
+            cdn_url=self._cdn_url(f"{prefix}/index.m3u8"),
+            is_processed=True
+        )
+    
+    async def _upload_master_playlist(self, video_content: VideoContent, work_dir: str):
+        renditions = [
+            {
+                "quality": q.quality,
+                "resolution": q.resolution,
+                "bandwidth": bitrate_to_bps(self.quality_configs[q.quality]['max_bitrate']) + 128000
+                if q.quality in self.quality_configs else q.bitrate
+            }
+            for q in video_content.qualities if q.is_processed
+        ]
+        if not renditions:
+            raise Exception("No renditions were produced")
+        master_path = os.path.join(work_dir, "master.m3u8")
+        with open(master_path, "w") as f:
+            f.write(build_master_playlist(renditions))
+        s3_key = f"{self._hls_prefix(video_content)}/master.m3u8"
+        await self._upload_to_s3(master_path, s3_key)
+        await self._update(video_content, {"hls_manifest_path": s3_key, "hls_manifest_url": self._cdn_url(s3_key)})
     
     async def _download_from_s3(self, s3_key: str, local_path: str):
         """Download file from S3 to local path"""
         try:
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
+            await asyncio.to_thread(self.s3_client.download_file, self.bucket_name, s3_key, local_path)
         except ClientError as e:
             raise Exception(f"Failed to download from S3: {e}")
     
     async def _upload_to_s3(self, local_path: str, s3_key: str):
         """Upload file from local path to S3"""
+        content_types = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/MP2T", ".jpg": "image/jpeg"}
+        extra_args = {"ContentType": content_types[os.path.splitext(s3_key)[1]]} if os.path.splitext(s3_key)[1] in content_types else None
         try:
-            self.s3_client.upload_file(local_path, self.bucket_name, s3_key)
+            await asyncio.to_thread(self.s3_client.upload_file, local_path, self.bucket_name, s3_key, ExtraArgs=extra_args)
         except ClientError as e:
             raise Exception(f"Failed to upload to S3: {e}")
     
@@ -174,9 +348,15 @@ class VideoProcessingService:
                 video_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            import json
-            data = json.loads(result.stdout)
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate()
+            if process.returncode != 0:
+                raise Exception(f"ffprobe failed: {stderr.decode(errors='replace')}")
+            data = json.loads(stdout)
             
             # Extract video stream info
             video_stream = None
@@ -190,6 +370,7 @@ class VideoProcessingService:
             
             # Calculate aspect ratio
             aspect_ratio = "16:9"  # default
+            width = height = 0
             if video_stream:
                 width = int(video_stream.get('width', 1920))
                 height = int(video_stream.get('height', 1080))
@@ -201,7 +382,10 @@ class VideoProcessingService:
                 'video_codec': video_stream.get('codec_name', 'unknown') if video_stream else 'unknown',
                 'audio_codec': audio_stream.get('codec_name', 'unknown') if audio_stream else 'unknown',
                 'frame_rate': float(video_stream.get('r_frame_rate', '0/1').split('/')[0]) / float(video_stream.get('r_frame_rate', '0/1').split('/')[1]) if video_stream and '/' in video_stream.get('r_frame_rate', '0/1') else 0,
-                'aspect_ratio': aspect_ratio
+                'aspect_ratio': aspect_ratio,
+                'width': width,
+                'height': height,
+                'has_audio': audio_stream is not None
             }
             
         except Exception as e:
@@ -211,40 +395,36 @@ class VideoProcessingService:
                 'video_codec': 'unknown',
                 'audio_codec': 'unknown',
                 'frame_rate': 0.0,
-                'aspect_ratio': '16:9'
+                'aspect_ratio': '16:9',
+                'width': 0,
+                'height': 0,
+                'has_audio': True
             }
     
-    async def _transcode_video(self, input_path: str, output_path: str, config: Dict[str, str]):
-        """Transcode video to specified quality"""
+    async def _transcode_video(
+        self,
+        input_path: str,
+        output_dir: str,
+        renditions: List[tuple],
+        has_audio: bool,
+        duration: float,
+        threads: int = 0,
+        on_progress=None,
+        start_segment: int = 0
+    ):
+        """Transcode video to all given renditions as HLS in one decode pass, from start_segment on"""
         try:
-            cmd = [
-                self.ffmpeg_path,
-                '-i', input_path,
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', '23',
-                '-maxrate', config['max_bitrate'],
-                '-bufsize', config['bufsize'],
-                '-vf', f'scale={config["resolution"]}',
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                '-movflags', '+faststart',  # Optimize for streaming
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
-            # Run ffmpeg command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            for name, _ in renditions:
+                os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+            cmd = build_hls_command(
+                self.ffmpeg_path, input_path, output_dir, renditions,
+                has_audio=has_audio,
+                segment_seconds=self.hls_segment_seconds,
+                threads=threads,
+                preset=self.ffmpeg_preset,
+                start_segment=start_segment
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"FFmpeg failed: {stderr.decode()}")
-                
+            await run_ffmpeg(cmd, duration, on_progress)
         except Exception as e:
             raise Exception(f"Failed to transcode video: {e}")
     
@@ -259,12 +439,13 @@ class VideoProcessingService:
             timestamps = [duration * 0.1, duration * 0.25, duration * 0.5, duration * 0.75, duration * 0.9]
             
             for i, timestamp in enumerate(timestamps):
-                thumbnail_path = f"/tmp/thumb_{video_content.video_id}_{i}.jpg"
+                thumbnail_path = os.path.join(os.path.dirname(video_path), f"thumb_{i}.jpg")
                 
+                # Seek before -i so ffmpeg jumps to the keyframe instead of decoding up to it
                 cmd = [
                     self.ffmpeg_path,
-                    '-i', video_path,
                     '-ss', str(timestamp),
+                    '-i', video_path,
                     '-vframes', '1',
                     '-vf', 'scale=320:180',
                     '-y',
@@ -287,7 +468,7 @@ class VideoProcessingService:
                     # Create thumbnail record
                     thumbnail = VideoThumbnail(
                         timestamp=timestamp,
-                        url=f"https://cdn.learntwin.com/{s3_key}",
+                        url=self._cdn_url(s3_key),
                         width=320,
                         height=180
                     )
@@ -0,0 +1,198 @@
+"""
+Video transcoding job queue
+Jobs are VideoContent documents whose processing_status is "queued". A pool
+of worker tasks, sized to the CPU cores, claims them one at a time with an
+atomic update and keeps a heartbeat while ffmpeg runs. A job whose worker
+died (stale heartbeat) is claimed again and resumes from its checkpoint:
+finished renditions are skipped, and the single ffmpeg pass over the
+others restarts at the last segment all of them had uploaded.
+"""
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+
+from pymongo import ReturnDocument
+
+from ..models.video_content import VideoContent
+
+logger = logging.getLogger(__name__)
+
+def default_worker_count(threads_per_job: int) -> int:
+    """Concurrent jobs so that jobs x ffmpeg threads roughly matches the CPU cores"""
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_job))
+
+class VideoTranscodeQueue:
+    """Mongo-backed transcode queue with a fixed pool of worker tasks"""
+
+    def __init__(
+        self,
+        processor=None,
+        collection=None,
+        loader: Optional[Callable[[str], Awaitable[Any]]] = None,
+        workers: Optional[int] = None,
+        threads_per_job: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self._processor = processor
+        self._collection = collection
+        self._loader = loader
+        self.threads_per_job = threads_per_job or int(os.getenv("VIDEO_TRANSCODE_THREADS", "4"))
+        self.workers = workers or int(os.getenv("VIDEO_TRANSCODE_WORKERS", "0")) or default_worker_count(self.threads_per_job)
+        self.poll_interval = (
+            poll_interval if poll_interval is not None
+            else float(os.getenv("VIDEO_TRANSCODE_POLL_SECONDS", "10"))
+        )
+        self.lease_seconds = lease_seconds or float(os.getenv("VIDEO_TRANSCODE_LEASE_SECONDS", "120"))
+        self.max_attempts = max_attempts or int(os.getenv("VIDEO_TRANSCODE_MAX_ATTEMPTS", "3"))
+        self.worker_prefix = uuid.uuid4().hex[:8]
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self.stats: Dict[str, int] = {"completed": 0, "failed": 0, "resumed": 0}
+
+    # VideoProcessingService needs boto3, so it is only created when a job runs
+    @property
+    def processor(self):
+        if self._processor is None:
+            from .video_processing_service import VideoProcessingService
+            self._processor = VideoProcessingService()
+        return self._processor
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            return VideoContent.get_pymongo_collection()
+        return self._collection
+
+    async def _load(self, video_id: str):
+        if self._loader is not None:
+            return await self._loader(video_id)
+        return await VideoContent.find_one({"video_id": video_id})
+
+    async def enqueue(self, video_id: str):
+        """Queue a video for transcoding; returns immediately"""
+        await self.collection.update_one(
+            {"video_id": video_id},
+            {"$set": {
+                "processing_status.status": "queued",
+                "processing_status.progress": 0.0,
+                "processing_status.attempts": 0,
+                "processing_status.worker_id": None,
+                "processing_status.heartbeat_at": None
+            }}
+        )
+        if not self._tasks:
+            self.start()
+        self._wake.set()
+
+    async def _claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"processing_status.status": "queued"},
+                {
+                    "processing_status.status": "processing",
+                    "processing_status.heartbeat_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}
+                }
+            ]},
+            {
+                "$set": {
+                    "processing_status.status": "processing",
+                    "processing_status.worker_id": worker_id,
+                    "processing_status.heartbeat_at": now
+                },
+                "$inc": {"processing_status.attempts": 1}
+            },
+            sort=[("uploaded_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _heartbeat(self, video_id: str, worker_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"video_id": video_id, "processing_status.worker_id": worker_id},
+                    {"$set": {"processing_status.heartbeat_at": datetime.now(timezone.utc)}}
+                )
+            except Exception as e:
+                # Keep beating: one missed write is covered by the lease, a dead loop is not
+                logger.warning(f"Transcode heartbeat for video {video_id} failed: {e}")
+
+    async def run_job(self, worker_id: str) -> bool:
+        """Claim and transcode one job; False when the queue is empty"""
+        job = await self._claim(worker_id)
+        if not job:
+            return False
+        video_id = job["video_id"]
+        status = job.get("processing_status") or {}
+        if status.get("attempts", 0) > self.max_attempts:
+            logger.error(f"Giving up on video {video_id} after {self.max_attempts} attempts")
+            await self.collection.update_one(
+                {"video_id": video_id, "processing_status.worker_id": worker_id},
+                {"$set": {
+                    "processing_status.status": "failed",
+                    "processing_status.error_message": "Transcoding was interrupted too many times"
+                }}
+            )
+            self.stats["failed"] += 1
+            return True
+        if status.get("attempts", 0) > 1:
+            self.stats["resumed"] += 1
+            logger.info(f"Resuming transcode of video {video_id} (attempt {status['attempts']})")
+
+        video_content = await self._load(video_id)
+        if video_content is None:
+            return True
+        heartbeat = asyncio.create_task(self._heartbeat(video_id, worker_id))
+        try:
+            await self.processor.process_video(video_content, threads=self.threads_per_job)
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # process_video has already marked the video failed
+            self.stats["failed"] += 1
+            logger.error(f"Transcode of video {video_id} failed: {e}")
+        finally:
+            heartbeat.cancel()
+        return True
+
+    # Worker pool
+    async def _work(self, index: int):
+        worker_id = f"{self.worker_prefix}-{index}"
+        while True:
+            self._wake.clear()
+            try:
+                if await self.run_job(worker_id):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Transcode worker {worker_id} error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the worker pool (called from main.lifespan, or on first enqueue)"""
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+        logger.info(f"Video transcode queue started ({self.workers} workers, {self.threads_per_job} ffmpeg threads each)")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        # Interrupted jobs keep their checkpoints and are resumed once their heartbeat goes stale
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# Global queue
+video_transcode_queue = VideoTranscodeQueue()
@@ -0,0 +1,151 @@
+"""
+S3 multipart storage for chunked video uploads
+Each uploaded chunk becomes one part of an S3 multipart upload on the final
+object key, so assembling the video is a single CompleteMultipartUpload call:
+S3 stitches the parts server-side and the API never holds more than the chunk
+it is receiving. Sessions whose chunks were stored as separate objects are
+assembled with server-side UploadPartCopy when every chunk but the last is a
+valid part size, and otherwise downloaded and re-uploaded in MIN_PART_SIZE
+parts.
+
+Methods are blocking boto3 calls; async callers run them with asyncio.to_thread.
+Set S3_ENDPOINT_URL to use MinIO or another S3-compatible store.
+"""
+import io
+import os
+import logging
+from typing import Dict, Any, Optional, List, BinaryIO, Iterable
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+def create_s3_client():
+    """S3 client from the S3_* / AWS_* environment"""
+    return boto3.client(
+        's3',
+        region_name=os.getenv("S3_REGION", "us-east-1"),
+        endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+    )
+
+class VideoUploadStorage:
+    """Multipart upload operations on one bucket"""
+
+    def __init__(self, s3_client=None, bucket: Optional[str] = None):
+        self.s3_client = s3_client or create_s3_client()
+        self.bucket = bucket or os.getenv("S3_BUCKET_NAME", "learn-twin-videos")
+
+    def start(self, key: str, content_type: str = "video/mp4") -> str:
+        """Open a multipart upload on the final key and return its UploadId"""
+        response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        return response["UploadId"]
+
+    def put_part(self, key: str, upload_id: str, part_number: int, body: BinaryIO) -> str:
+        """Stream one chunk into the upload as part `part_number` (1-based); returns its ETag"""
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return response["ETag"]
+
+    def complete(self, key: str, upload_id: str, parts: Dict[int, str]) -> Dict[str, Any]:
+        """Assemble the parts server-side into the final object"""
+        return self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": number, "ETag": etag} for number, etag in sorted(parts.items())
+            ]}
+        )
+
+    def abort(self, key: str, upload_id: str):
+        """Discard an unfinished upload and the parts stored for it"""
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def assemble_from_objects(
+        self,
+        chunk_keys: List[str],
+        key: str,
+        content_type: str = "video/mp4",
+        chunk_size: Optional[int] = None
+    ) -> int:
+        """
+        Concatenate existing chunk objects into `key`, then delete the chunks.
+        UploadPartCopy keeps the data server-side, but S3 rejects copied parts
+        under MIN_PART_SIZE (EntityTooSmall), so smaller chunks are downloaded
+        and regrouped instead. chunk_size, when known, saves a HEAD per chunk.
+        Returns the number of parts written.
+        """
+        if chunk_size is not None:
+            smallest = chunk_size
+        else:
+            smallest = min(
+                (self.s3_client.head_object(Bucket=self.bucket, Key=k)["ContentLength"] for k in chunk_keys[:-1]),
+                default=MIN_PART_SIZE
+            )
+        upload_id = self.start(key, content_type)
+        try:
+            if smallest >= MIN_PART_SIZE:
+                parts = self._copy_parts(chunk_keys, key, upload_id)
+            else:
+                parts = self._concatenate_parts(chunk_keys, key, upload_id)
+            self.complete(key, upload_id, parts)
+        except Exception:
+            self.abort(key, upload_id)
+            raise
+        self.delete_objects(chunk_keys)
+        return len(parts)
+
+    def _copy_parts(self, chunk_keys: List[str], key: str, upload_id: str) -> Dict[int, str]:
+        parts = {}
+        for number, chunk_key in enumerate(chunk_keys, start=1):
+            response = self.s3_client.upload_part_copy(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                CopySource={"Bucket": self.bucket, "Key": chunk_key}
+            )
+            parts[number] = response["CopyPartResult"]["ETag"]
+        return parts
+
+    def _concatenate_parts(self, chunk_keys: List[str], key: str, upload_id: str) -> Dict[int, str]:
+        """Stream the chunks through a MIN_PART_SIZE buffer into parts"""
+        parts = {}
+        buffer = bytearray()
+
+        def put_buffer():
+            number = len(parts) + 1
+            parts[number] = self.put_part(key, upload_id, number, io.BytesIO(buffer))
+            buffer.clear()
+
+        for chunk_key in chunk_keys:
+            body = self.s3_client.get_object(Bucket=self.bucket, Key=chunk_key)["Body"]
+            for piece in body.iter_chunks(1024 * 1024):
+                buffer.extend(piece)
+                if len(buffer) >= MIN_PART_SIZE:
+                    put_buffer()
+        if buffer or not parts:
+            put_buffer()
+        return parts
+
+    def delete_objects(self, keys: Iterable[str]):
+        """Delete keys with batched DeleteObjects calls (1000 keys per request)"""
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[start:start + 1000]], "Quiet": True}
+            )
+            for error in response.get("Errors", []):
+                logger.warning(f"Failed to delete {error.get('Key')}: {error.get('Message')}")
@@ -1,23 +1,38 @@
 import os
 import json
+import asyncio
 import subprocess
 import tempfile
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import hashlib
 import time
 import secrets
+from .prover_pool import ProverPool, ProverUnavailable, prover_pool
 
 class PoseidonHash:
     """Poseidon hash implementation using circomlibjs via Node.js"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional[ProverPool] = None):
         self.backend_dir = Path(__file__).parent.parent.parent
+        self.pool = pool or prover_pool
     
     def hash(self, inputs: List[int]) -> int:
         """
         Calculate Poseidon hash of inputs using circomlibjs
         """
+        if self.pool.available():
+            try:
+                # Persistent worker keeps the Poseidon constants built
+                return self.pool.poseidon(inputs)
+            except ProverUnavailable:
+                pass
+            except Exception as e:
+                raise Exception(f"Poseidon hash calculation failed: {str(e)}")
+        return self._hash_with_script(inputs)
+    
+    def _hash_with_script(self, inputs: List[int]) -> int:
+        """One-shot Node process (used when no prover worker can start)"""
         try:
             # Create temporary script for Poseidon hash calculation
             script_content = f"""
@@ -100,7 +115,8 @@ class ZKPService:
         self.circuits_dir = Path(__file__).parent.parent.parent / "circuits"
         self.keys_dir = self.circuits_dir / "zkp_keys"
         self.snarkjs_path = "snarkjs"
-        self.poseidon_hash = PoseidonHash()
+        self.prover_pool = prover_pool
+        self.poseidon_hash = PoseidonHash(self.prover_pool)
 
         # Circuit paths
         self.module_progress_circuit = self.circuits_dir / "module_progress.circom"
@@ -135,6 +151,98 @@ class ZKPService:
         commitment = hash_int % p
         return commitment
 
+    def _run_cli(self, cmd: List[str], cwd: Path, step: str):
+        """Run one snarkjs/node command; raises with the tool output on failure"""
+        result = subprocess.run(
+            cmd,
+            cwd=str(cwd),
+            env=self._get_snarkjs_env(),
+            capture_output=True,
+            text=True,
+            # snarkjs is a .cmd shim on Windows
+            shell=(os.name == 'nt')
+        )
+        if result.returncode != 0:
+            error_msg = f"{step} failed. Return code: {result.returncode}"
+            if result.stderr:
+                error_msg += f". Error: {result.stderr}"
+            if result.stdout:
+                error_msg += f". Output: {result.stdout}"
+            raise Exception(error_msg)
+        return result
+
+    def _prove(self, circuit: str, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any]]:
+        """Groth16 proof on the persistent prover pool; snarkjs CLI if no worker can start"""
+        if self.prover_pool.available():
+            try:
+                result = self.prover_pool.prove(circuit, input_data)
+                return result["proof"], result["publicSignals"]
+            except ProverUnavailable as e:
+                print(f"⚠️ Prover pool unavailable, falling back to snarkjs CLI: {e}")
+            except Exception as e:
+                raise Exception(f"Proof generation failed: {e}")
+        return self._prove_with_cli(circuit, input_data)
+
+    def _prove_with_cli(self, circuit: str, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any]]:
+        wasm_file = self.circuits_dir / f"{circuit}_js" / f"{circuit}.wasm"
+        witness_script = self.circuits_dir / f"{circuit}_js" / "generate_witness.js"
+        if not wasm_file.exists():
+            raise Exception(f"WASM file not found: {wasm_file}")
+        if not witness_script.exists():
+            raise Exception(f"Witness generation script not found: {witness_script}")
+
+        # Per-call directory so concurrent proofs do not overwrite each other's files
+        with tempfile.TemporaryDirectory(prefix=f"{circuit}_") as work_dir:
+            work_dir = Path(work_dir)
+            input_file = work_dir / "input.json"
+            with open(input_file, 'w') as f:
+                # Strings keep field elements exact through JSON.parse
+                json.dump({k: str(v) for k, v in input_data.items()}, f, indent=2)
+
+            self._run_cli(
+                ["node", str(witness_script), str(wasm_file), str(input_file), str(work_dir / "witness.wtns")],
+                self.circuits_dir, "Witness generation"
+            )
+            self._run_cli(
+                [self.snarkjs_path, "groth16", "prove",
+                 str(self.keys_dir / f"{circuit}_proving_key.zkey"),
+                 "witness.wtns", "proof.json", "public.json"],
+                work_dir, "Proof generation"
+            )
+            with open(work_dir / "proof.json", 'r') as f:
+                proof_data = json.load(f)
+            with open(work_dir / "public.json", 'r') as f:
+                public_data = json.load(f)
+        return proof_data, public_data
+
+    def _verify(self, circuit_type: str, raw_proof: Dict[str, Any], public_signals: List[Any]) -> Tuple[bool, str]:
+        """Verify against the circuit's verification key; returns (valid, tool output)"""
+        circuit = "learning_achievement" if circuit_type == "learning_achievement" else "module_progress"
+        if self.prover_pool.available():
+            try:
+                valid = self.prover_pool.verify(circuit, raw_proof, public_signals)
+                return valid, "OK" if valid else "Invalid proof"
+            except ProverUnavailable as e:
+                print(f"⚠️ Prover pool unavailable, falling back to snarkjs CLI: {e}")
+
+        with tempfile.TemporaryDirectory(prefix=f"verify_{circuit}_") as work_dir:
+            work_dir = Path(work_dir)
+            with open(work_dir / "proof.json", 'w') as f:
+                json.dump(raw_proof, f, indent=2)
+            with open(work_dir / "public.json", 'w') as f:
+                json.dump(public_signals, f, indent=2)
+            result = subprocess.run(
+                [self.snarkjs_path, "groth16", "verify",
+                 str(self.keys_dir / f"{circuit}_verification_key.json"),
+                 str(work_dir / "public.json"), str(work_dir / "proof.json")],
+                cwd=str(self.circuits_dir),
+                env=self._get_snarkjs_env(),
+                capture_output=True,
+                text=True,
+                shell=(os.name == 'nt')
+            )
+        return result.returncode == 0 and "OK" in result.stdout, result.stdout
+
     def generate_module_progress_proof(self, completion_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate ZK proof for module progress using student signature verification"""
         try:
@@ -235,85 +343,7 @@ class ZKPService:
                 "learningDataHash": learning_session_hash
             }
             
-            # Save input to file
-            input_file = self.circuits_dir / "module_progress_input.json"
-            with open(input_file, 'w') as f:
-                json.dump(input_data, f, indent=2)
-            
-            public_inputs = [
-                input_data["moduleId"],
-                input_data["courseId"],  # Added missing courseId
-                input_data["studentHash"],
-                input_data["minScoreRequired"],
-                input_data["maxTimeAllowed"],
-                input_data["maxAttemptsAllowed"],
-                input_data["commitmentHash"],
-                input_data["learningDataHash"]
-            ]
-            public_inputs_file = self.circuits_dir / "module_progress_public.json"
-            with open(public_inputs_file, 'w') as f:
-                json.dump(public_inputs, f)
-            
-            # Check required files
-            wasm_file = self.circuits_dir / "module_progress_js" / "module_progress.wasm"
-            witness_script = self.circuits_dir / "module_progress_js" / "generate_witness.js"
-            if not wasm_file.exists():
-                return {"success": False, "error": f"WASM file not found: {wasm_file}"}
-            if not witness_script.exists():
-                return {"success": False, "error": f"Witness generation script not found: {witness_script}"}
-            
-            # Generate witness
-            witness_cmd = [
-                "node", str(witness_script),
-                str(wasm_file),
-                str(input_file),
-                str(self.circuits_dir / "module_progress_witness.wtns")
-            ]
-            result = subprocess.run(
-                witness_cmd,
-                cwd=str(self.circuits_dir),
-                env=self._get_snarkjs_env(),
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            if result.returncode != 0:
-                error_msg = f"Witness generation failed. Return code: {result.returncode}"
-                if result.stderr:
-                    error_msg += f". Error: {result.stderr}"
-                if result.stdout:
-                    error_msg += f". Output: {result.stdout}"
-                return {"success": False, "error": error_msg}
-            
-            # Generate proof
-            proof_cmd = [
-                self.snarkjs_path, "groth16", "prove",
-                str(self.keys_dir / "module_progress_proving_key.zkey"),
-                "module_progress_witness.wtns",
-                "module_progress_proof.json",
-                "module_progress_public.json"
-            ]
-            result = subprocess.run(
-                proof_cmd,
-                cwd=self.circuits_dir,
-                env=self._get_snarkjs_env(),
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            if result.returncode != 0:
-                error_msg = f"Proof generation failed. Return code: {result.returncode}"
-                if result.stderr:
-                    error_msg += f". Error: {result.stderr}"
-                if result.stdout:
-                    error_msg += f". Output: {result.stdout}"
-                return {"success": False, "error": error_msg}
-            
-            # Load proof and public inputs
-            with open(self.circuits_dir / "module_progress_proof.json", 'r') as f:
-                proof_data = json.load(f)
-            with open(self.circuits_dir / "module_progress_public.json", 'r') as f:
-                public_data = json.load(f)
+            proof_data, public_data = self._prove("module_progress", input_data)
             
             # Debug logging
             print(f"🔍 ZKP Debug - public_data type: {type(public_data)}")
@@ -405,88 +435,9 @@ class ZKPService:
                 "achievementLevel": achievement_level
             }
             
-            input_file = self.circuits_dir / "learning_achievement_input.json"
-            with open(input_file, 'w') as f:
-                json.dump(input_data, f, indent=2)
-            
-            # Public inputs must include the circuit's output signal (isValid) as the last element
-            # to match the verifier contract (9 public signals expected)
-            public_inputs = [
-                input_data["skillType"],
-                input_data["studentHash"],
-                input_data["minModulesRequired"],
-                input_data["minAverageScore"],
-                input_data["minPracticeHours"],
-                input_data["commitmentHash"],
-                input_data["achievementTimestamp"],
-                input_data["achievementLevel"],
-                1  # isValid output (expected to be 1 for valid proofs)
-            ]
-            public_inputs_file = self.circuits_dir / "learning_achievement_public.json"
-            with open(public_inputs_file, 'w') as f:
-                json.dump(public_inputs, f)
-
-            # Check required files
-            wasm_file = self.circuits_dir / "learning_achievement_js" / "learning_achievement.wasm"
-            witness_script = self.circuits_dir / "learning_achievement_js" / "generate_witness.js"
-            if not wasm_file.exists():
-                return {"success": False, "error": f"WASM file not found: {wasm_file}"}
-            if not witness_script.exists():
-                return {"success": False, "error": f"Witness generation script not found: {witness_script}"}
-
-            # Generate witness
-            witness_cmd = [
-                "node", str(witness_script),
-                str(wasm_file),
-                str(input_file),
-                str(self.circuits_dir / "learning_achievement_witness.wtns")
-            ]
-            result = subprocess.run(
-                witness_cmd,
-                cwd=str(self.circuits_dir),
-                env=self._get_snarkjs_env(),
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            if result.returncode != 0:
-                error_msg = f"Witness generation failed. Return code: {result.returncode}"
-                if result.stderr:
-                    error_msg += f". Error: {result.stderr}"
-                if result.stdout:
-                    error_msg += f". Output: {result.stdout}"
-                return {"success": False, "error": error_msg}
-            
-            # Generate proof
-            proof_cmd = [
-                self.snarkjs_path, "groth16", "prove",
-                str(self.keys_dir / "learning_achievement_proving_key.zkey"),
-                "learning_achievement_witness.wtns",
-                "learning_achievement_proof.json",
-                "learning_achievement_public.json"
-            ]
-            result = subprocess.run(
-                proof_cmd,
-                cwd=self.circuits_dir,
-                env=self._get_snarkjs_env(),
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            if result.returncode != 0:
-                error_msg = f"Proof generation failed. Return code: {result.returncode}"
-                if result.stderr:
-                    error_msg += f". Error: {result.stderr}"
-                if result.stdout:
-                    error_msg += f". Output: {result.stdout}"
-                return {"success": False, "error": error_msg}
-            
-            # Load proof and public inputs (snarkjs writes the computed public signals)
-            proof_file = self.circuits_dir / "learning_achievement_proof.json"
-            with open(proof_file, 'r') as f:
-                proof_data = json.load(f)
-            with open(self.circuits_dir / "learning_achievement_public.json", 'r') as f:
-                public_data = json.load(f)
+            # Public signals computed by the prover end with the circuit's output signal (isValid),
+            # matching the verifier contract (9 public signals expected)
+            proof_data, public_data = self._prove("learning_achievement", input_data)
             
             # Return enhanced proof with additional metadata
             enhanced_proof = {
@@ -563,50 +514,21 @@ class ZKPService:
             if not public_signals:
                 raise Exception("Public inputs are required for verification")
             
-            # Write proof to temporary file
-            proof_file = self.circuits_dir / f"temp_proof_{circuit_type}.json"
-            with open(proof_file, 'w') as f:
-                json.dump(raw_proof, f, indent=2)
-            
-            # Write public inputs to temporary file
-            public_file = self.circuits_dir / f"temp_public_{circuit_type}.json"
-            with open(public_file, 'w') as f:
-                json.dump(public_signals, f, indent=2)
-            
-            # Choose verification key based on circuit type
-            if circuit_type == "learning_achievement":
-                vkey_file = self.keys_dir / "learning_achievement_verification_key.json"
-            else:
-                vkey_file = self.keys_dir / "module_progress_verification_key.json"
-            
-            # Verify proof using snarkjs
-            verify_cmd = [
-                self.snarkjs_path, "groth16", "verify",
-                str(vkey_file),
-                str(public_file),
-                str(proof_file)
-            ]
-            
-            result = subprocess.run(
-                verify_cmd,
-                cwd=self.circuits_dir,
-                env=self._get_snarkjs_env(),
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            
-            # Clean up temporary files
-            try:
-                proof_file.unlink()
-                public_file.unlink()
-            except:
-                pass
-            
-            if result.returncode == 0 and "OK" in result.stdout:
+            valid, output = self._verify(circuit_type, raw_proof, public_signals)
+            if valid:
                 return {"success": True, "valid": True, "message": "Proof verification successful"}
             else:
-                return {"success": True, "valid": False, "message": f"Proof verification failed: {result.stdout}"}
+                return {"success": True, "valid": False, "message": f"Proof verification failed: {output}"}
             
         except Exception as e:
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+
+    # Async facades: proofs run on the prover pool without blocking the event loop
+    async def generate_module_progress_proof_async(self, completion_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate_module_progress_proof, completion_data)
+
+    async def generate_learning_achievement_proof_async(self, achievement_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate_learning_achievement_proof, achievement_data)
+
+    async def verify_proof_async(self, proof: Dict[str, Any], public_inputs: List[int] = None, circuit_type: str = "module_progress") -> Dict[str, Any]:
+        return await asyncio.to_thread(self.verify_proof, proof, public_inputs, circuit_type)
@@ -0,0 +1,28 @@
+"""
+Server-Sent Events helpers for streaming endpoints
+"""
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Stop nginx from buffering the stream until it completes
+    "X-Accel-Buffering": "no",
+}
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one SSE frame; data is sent as a single JSON line"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Wrap an iterator of {"event", "data"} dicts in a text/event-stream response"""
+    async def body():
+        # Closing the source on disconnect lets it stop generating
+        async with aclosing(events):
+            async for event in events:
+                yield format_sse(event["event"], event["data"])
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Sequence
+
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "embedding_cache.sqlite3"
+
+def embedding_key(kind: str, text: str) -> str:
+    """Content hash of a text; queries and documents are cached separately"""
+    return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent content-hash -> float32 vector store.
+
+    Vectors live in a SQLite blob table keyed by (model, hash), so a model change
+    never reads another model's vectors, with an in-memory LRU in front of it.
+    """
+
+    def __init__(self, model_name: str, path: Optional[str] = None, memory_entries: int = 10000):
+        self.model_name = model_name
+        self.path = str(path or DEFAULT_CACHE_PATH)
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Vectors for the keys that are cached"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.append(key)
+            # SQLite's default limit on bound parameters is 999
+            for start in range(0, len(missing), 900):
+                batch = missing[start:start + 900]
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            rows = []
+            for key, vector in items.items():
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((self.model_name, key, vector.shape[0], vector.tobytes()))
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def clear(self):
+        """Drop every vector cached for this model"""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM embeddings WHERE model = ?", (self.model_name,))
+            self._db.commit()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._db.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)).fetchone()[0]
+            return {
+                "model": self.model_name,
+                "path": self.path,
+                "stored": stored,
+                "in_memory": len(self._memory),
+                **self.stats
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingCache and
+    sends only the misses to the wrapped model, in one call.
+    """
+
+    def __init__(self, base, cache: Optional[EmbeddingCache] = None):
+        self.base = base
+        self.cache = cache
+
+    @classmethod
+    def from_env(cls, base, model_name: str) -> "CachedEmbeddings":
+        if os.getenv("RAG_EMBED_CACHE_ENABLED", "true").lower() != "true":
+            return cls(base)
+        cache = EmbeddingCache(
+            model_name,
+            path=os.getenv("RAG_EMBED_CACHE_PATH") or None,
+            memory_entries=int(os.getenv("RAG_EMBED_CACHE_MEMORY", "10000"))
+        )
+        return cls(base, cache)
+
+    def _embed(self, kind: str, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            compute = self.base.embed_query if kind == "query" else self.base.embed_documents
+            vectors = [compute(texts[0])] if kind == "query" else compute(texts)
+            return np.asarray(vectors, dtype=np.float32)
+
+        keys = [embedding_key(kind, text) for text in texts]
+        found = self.cache.get_many(keys)
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text)
+        if todo:
+            if kind == "query":
+                computed = [self.base.embed_query(text) for text in todo.values()]
+            else:
+                computed = self.base.embed_documents(list(todo.values()))
+            fresh = dict(zip(todo, np.asarray(computed, dtype=np.float32)))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """embed_documents as one float32 matrix, without the list conversion"""
+        return self._embed("document", texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("document", texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text])[0].tolist()
@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Hashable, Sequence, Tuple
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased word tokens; keeps Vietnamese diacritics and codes like cs101"""
+    return TOKEN_RE.findall((text or "").lower())
+
+@dataclass
+class RetrievalConfig:
+    """Configuration for hybrid retrieval"""
+    enabled: bool = True
+    candidates: int = 20          # hits taken from each retriever before fusion
+    rrf_k: int = 60
+    reranker_model: Optional[str] = None
+    rerank_candidates: int = 20
+    max_context_chars: int = 6000
+    nprobe: int = 16
+
+    @classmethod
+    def from_env(cls) -> "RetrievalConfig":
+        return cls(
+            enabled=os.getenv("RAG_HYBRID_ENABLED", "true").lower() == "true",
+            candidates=int(os.getenv("RAG_HYBRID_CANDIDATES", "20")),
+            rrf_k=int(os.getenv("RAG_RRF_K", "60")),
+            reranker_model=os.getenv("RAG_RERANKER_MODEL") or None,
+            rerank_candidates=int(os.getenv("RAG_RERANK_CANDIDATES", "20")),
+            max_context_chars=int(os.getenv("RAG_MAX_CONTEXT_CHARS", "6000")),
+            nprobe=int(os.getenv("RAG_MILVUS_NPROBE", "16"))
+        )
+
+@dataclass
+class RetrievedChunk:
+    id: Hashable
+    text: str
+    metadata: Dict[str, Any]
+    score: float = 0.0
+    vector_rank: Optional[int] = None
+    lexical_rank: Optional[int] = None
+
+def _like_literal(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def build_filter_expr(filters: Optional[Dict[str, Any]]) -> str:
+    """
+    Milvus boolean expression for metadata equality filters.
+
+    Chunk metadata is stored as a JSON string, so each filter becomes a LIKE on
+    its serialized `"key": value` pair; a list value matches any of its items.
+    LIKE treats `_` as a wildcard, so hits are re-checked with matches_filters.
+    """
+    clauses = []
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        options = [
+            f"metadata like '%{_like_literal(json.dumps(key))}: {_like_literal(json.dumps(v))}%'"
+            for v in values
+        ]
+        if options:
+            clauses.append(options[0] if len(options) == 1 else "(" + " or ".join(options) + ")")
+    return " and ".join(clauses)
+
+def matches_filters(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if metadata.get(key) not in values:
+            return False
+    return True
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class LexicalIndex:
+    """In-memory BM25 over chunk text; a chunk matches if it contains any query term"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.chunks: Dict[Hashable, Tuple[str, Dict[str, Any]]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, key: Hashable, text: str, metadata: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.remove(key)
+            frequencies = Counter(tokenize(text))
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, {})[key] = frequency
+            length = sum(frequencies.values())
+            self.doc_lengths[key] = length
+            self.total_length += length
+            self.chunks[key] = (text, metadata or {})
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            entry = self.chunks.pop(key, None)
+            if entry is None:
+                return
+            self.total_length -= self.doc_lengths.pop(key, 0)
+            for term in set(tokenize(entry[0])):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(key, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int = 20, filters: Optional[Dict[str, Any]] = None) -> List[RetrievedChunk]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self.doc_lengths)
+            if not terms or not n:
+                return []
+            average_length = self.total_length / n
+            scores: Dict[Hashable, float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            hits = []
+            for key, score in ranked:
+                text, metadata = self.chunks[key]
+                if not matches_filters(metadata, filters):
+                    continue
+                hits.append(RetrievedChunk(id=key, text=text, metadata=metadata, score=score, lexical_rank=len(hits) + 1))
+                if len(hits) >= k:
+                    break
+            return hits
+
+class CrossEncoderReranker:
+    """Optional CPU re-ranker (sentence-transformers CrossEncoder), loaded on first use"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return [float(s) for s in self._model.predict([(query, text) for text in texts])]
+
+class HybridRetriever:
+    """
+    Fuses Milvus vector hits with BM25 hits using reciprocal-rank fusion,
+    optionally re-ranks the fused candidates, and trims the result to a
+    character budget so prompts stay short.
+
+    Args:
+        vector_search: (query embedding, k, Milvus expr) -> ranked RetrievedChunk list
+        lexical_index: LexicalIndex over the same chunk ids
+        reranker: object with score(query, texts) -> scores, or None
+    """
+
+    def __init__(self,
+                 vector_search: Callable[[Sequence[float], int, str], List[RetrievedChunk]],
+                 lexical_index: LexicalIndex,
+                 config: Optional[RetrievalConfig] = None,
+                 reranker=None):
+        self.vector_search = vector_search
+        self.lexical_index = lexical_index
+        self.config = config or RetrievalConfig()
+        self.reranker = reranker
+
+    def retrieve(self,
+                 query: str,
+                 query_embedding: Sequence[float],
+                 top_k: int = 5,
+                 filters: Optional[Dict[str, Any]] = None,
+                 trim: bool = True) -> List[RetrievedChunk]:
+        """Best top_k chunks; with trim, cut to max_context_chars for use as a prompt context"""
+        candidates = max(self.config.candidates, top_k)
+        vector_hits = [
+            hit for hit in self.vector_search(query_embedding, candidates, build_filter_expr(filters))
+            if matches_filters(hit.metadata, filters)
+        ]
+        lexical_hits = self.lexical_index.search(query, candidates, filters)
+
+        chunks: Dict[Hashable, RetrievedChunk] = {}
+        for rank, hit in enumerate(vector_hits, start=1):
+            hit.vector_rank = rank
+            chunks[hit.id] = hit
+        for hit in lexical_hits:
+            if hit.id in chunks:
+                chunks[hit.id].lexical_rank = hit.lexical_rank
+            else:
+                chunks[hit.id] = hit
+
+        fused = reciprocal_rank_fusion(
+            [[hit.id for hit in vector_hits], [hit.id for hit in lexical_hits]],
+            k=self.config.rrf_k
+        )
+        ranked = []
+        for key, score in fused:
+            chunks[key].score = score
+            ranked.append(chunks[key])
+
+        if self.reranker is not None and ranked:
+            head = ranked[:self.config.rerank_candidates]
+            for chunk, score in zip(head, self.reranker.score(query, [c.text for c in head])):
+                chunk.score = score
+            ranked = sorted(head, key=lambda c: c.score, reverse=True) + ranked[self.config.rerank_candidates:]
+
+        return self._within_budget(ranked[:top_k]) if trim else ranked[:top_k]
+
+    def _within_budget(self, chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """Keep the best chunks up to max_context_chars (always at least one)"""
+        kept, used = [], 0
+        for chunk in chunks:
+            if kept and used + len(chunk.text) > self.config.max_context_chars:
+                break
+            kept.append(chunk)
+            used += len(chunk.text)
+        return kept
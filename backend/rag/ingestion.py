@@ -0,0 +1,199 @@
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, List, Callable, Iterable, Iterator, Sequence, Set, Tuple
+
+import numpy as np
+
+@dataclass
+class IngestionConfig:
+    """Configuration for the batched ingestion pipeline"""
+    loader_workers: int = 4
+    embed_batch_size: int = 64
+    insert_batch_size: int = 512
+    dedupe: bool = True
+
+@dataclass
+class IngestionChunk:
+    path: str
+    text: str
+    metadata: Dict[str, Any]
+    content_hash: str
+
+@dataclass
+class IngestionResult:
+    """Outcome of one ingestion run"""
+    files: int = 0
+    failed_files: int = 0
+    chunks: int = 0
+    inserted: int = 0
+    skipped_duplicates: int = 0
+    elapsed: float = 0.0
+    per_file: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "failed_files": self.failed_files,
+            "chunks": self.chunks,
+            "inserted": self.inserted,
+            "skipped_duplicates": self.skipped_duplicates,
+            "elapsed": round(self.elapsed, 3),
+            "chunks_per_sec": round(self.chunks_per_sec, 1),
+            "per_file": self.per_file,
+            "errors": self.errors
+        }
+
+def content_hash(text: str) -> str:
+    """Hash of the chunk text with whitespace normalized"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+class IngestionPipeline:
+    """
+    Streaming document ingestion.
+
+    Files are loaded and split on `loader_workers` threads; chunks are consumed
+    as each file finishes, deduplicated by content hash, embedded in fixed-size
+    micro-batches as float32 arrays and written in `insert_batch_size` batches
+    on a single writer thread, so embedding continues while a batch is being
+    inserted. `flush` is called once, after the last insert.
+
+    Args:
+        load_chunks: file path -> list of (text, metadata) chunks
+        embed: list of texts -> vectors (one per text)
+        insert: (float32 matrix, texts, metadatas) -> None
+        flush: called once at the end if anything was inserted
+        known_hashes: content hashes already in the collection; updated in place
+    """
+
+    def __init__(self,
+                 load_chunks: Callable[[str], Sequence[Tuple[str, Dict[str, Any]]]],
+                 embed: Callable[[List[str]], Any],
+                 insert: Callable[[np.ndarray, List[str], List[Dict[str, Any]]], None],
+                 flush: Optional[Callable[[], None]] = None,
+                 known_hashes: Optional[Set[str]] = None,
+                 config: Optional[IngestionConfig] = None):
+        self.load_chunks = load_chunks
+        self.embed = embed
+        self.insert = insert
+        self.flush = flush
+        self.known_hashes = known_hashes if known_hashes is not None else set()
+        self.config = config or IngestionConfig()
+        self._hash_lock = threading.Lock()
+
+    def _load(self, file_paths: Iterable[str], result: IngestionResult) -> Iterator[IngestionChunk]:
+        """Yield chunks file by file in completion order, keeping at most 2x loader_workers files in memory"""
+        paths = iter(file_paths)
+        window = self.config.loader_workers * 2
+        with ThreadPoolExecutor(max_workers=self.config.loader_workers, thread_name_prefix="ingest-load") as loaders:
+            futures: Dict[Future, str] = {}
+
+            def fill():
+                for path in paths:
+                    futures[loaders.submit(self.load_chunks, str(path))] = str(path)
+                    if len(futures) >= window:
+                        break
+
+            fill()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = futures.pop(future)
+                    result.files += 1
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        chunks = None
+                        result.errors.append(f"{path}: {e}")
+                    if not chunks:
+                        result.failed_files += 1
+                        result.per_file[path] = {"status": "failed", "chunks": 0, "inserted": 0}
+                        continue
+                    result.per_file[path] = {"status": "success", "chunks": len(chunks), "inserted": 0}
+                    for text, metadata in chunks:
+                        yield IngestionChunk(path=path, text=text, metadata=metadata, content_hash=content_hash(text))
+                fill()
+
+    def _dedupe(self, chunks: Iterable[IngestionChunk], result: IngestionResult) -> Iterator[IngestionChunk]:
+        for chunk in chunks:
+            result.chunks += 1
+            if self.config.dedupe:
+                with self._hash_lock:
+                    if chunk.content_hash in self.known_hashes:
+                        result.skipped_duplicates += 1
+                        continue
+                    self.known_hashes.add(chunk.content_hash)
+            chunk.metadata["content_hash"] = chunk.content_hash
+            yield chunk
+
+    @staticmethod
+    def _batched(items: Iterable, size: int) -> Iterator[List]:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, file_paths: Iterable[str]) -> IngestionResult:
+        result = IngestionResult()
+        started = time.perf_counter()
+        pending: List[Tuple[Future, List[IngestionChunk]]] = []
+        buffer_vectors: List[np.ndarray] = []
+        buffer_chunks: List[IngestionChunk] = []
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-write") as writer:
+            def submit():
+                vectors = np.concatenate(buffer_vectors) if len(buffer_vectors) > 1 else buffer_vectors[0]
+                batch = list(buffer_chunks)
+                future = writer.submit(self.insert, vectors, [c.text for c in batch], [c.metadata for c in batch])
+                pending.append((future, batch))
+                buffer_vectors.clear()
+                buffer_chunks.clear()
+
+            def forget(batch: List[IngestionChunk]):
+                # Not stored, so a retry must not be skipped as a duplicate
+                with self._hash_lock:
+                    self.known_hashes.difference_update(c.content_hash for c in batch)
+                for chunk in batch:
+                    result.per_file[chunk.path]["status"] = "failed"
+
+            chunks = self._dedupe(self._load(file_paths, result), result)
+            for batch in self._batched(chunks, self.config.embed_batch_size):
+                try:
+                    vectors = np.asarray(self.embed([c.text for c in batch]), dtype=np.float32)
+                except Exception as e:
+                    result.errors.append(f"embedding failed: {e}")
+                    forget(batch)
+                    continue
+                buffer_vectors.append(vectors)
+                buffer_chunks.extend(batch)
+                if len(buffer_chunks) >= self.config.insert_batch_size:
+                    submit()
+            if buffer_chunks:
+                submit()
+
+            for future, batch in pending:
+                try:
+                    future.result()
+                except Exception as e:
+                    result.errors.append(f"insert failed: {e}")
+                    forget(batch)
+                    continue
+                result.inserted += len(batch)
+                for chunk in batch:
+                    result.per_file[chunk.path]["inserted"] += 1
+
+        if result.inserted and self.flush:
+            self.flush()
+        result.elapsed = time.perf_counter() - started
+        return result
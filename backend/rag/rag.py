@@ -2,10 +2,13 @@ import os
 import json
 import time
 import re
-from typing import List, Dict, Any, Optional, Union
+import copy
+import threading
+from typing import List, Dict, Any, Optional, Union, Iterator
 from pathlib import Path
 from dataclasses import dataclass
 import traceback
+import numpy as np
 
 # LangChain imports
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -25,6 +28,17 @@ except ImportError:
     from langchain_community.vectorstores import Milvus
     MILVUS_NEW_AVAILABLE = False
 
+try:
+    from .semantic_cache import SemanticResponseCache, SemanticCacheConfig
+    from .ingestion import IngestionPipeline, IngestionConfig
+    from .embedding_cache import CachedEmbeddings
+    from .hybrid_retriever import HybridRetriever, LexicalIndex, RetrievalConfig, RetrievedChunk, CrossEncoderReranker
+except ImportError:
+    from semantic_cache import SemanticResponseCache, SemanticCacheConfig
+    from ingestion import IngestionPipeline, IngestionConfig
+    from embedding_cache import CachedEmbeddings
+    from hybrid_retriever import HybridRetriever, LexicalIndex, RetrievalConfig, RetrievedChunk, CrossEncoderReranker
+
 # Milvus imports
 import pymilvus
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
@@ -38,6 +52,13 @@ except ImportError:
     GEMINI_AVAILABLE = False
     print("⚠️ Google Generative AI not available. Install with: pip install google-generativeai")
 
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
 @dataclass
 class ChunkingConfig:
     """Configuration for chunking strategies"""
@@ -56,6 +77,8 @@ class LearnTwinRAGAgent:
                  collection_name: str = "learntwinchain",
                  embedding_model: str = "BAAI/bge-large-en-v1.5",
                  chunking_config: Optional[ChunkingConfig] = None,
+                 cache_config: Optional[SemanticCacheConfig] = None,
+                 retrieval_config: Optional[RetrievalConfig] = None,
                  verbose: int = 1):
         """
         Initialize the Learn Twin RAG Agent
@@ -64,6 +87,8 @@ class LearnTwinRAGAgent:
             collection_name: Milvus collection name (default: "learn_twin_chain")
             embedding_model: HuggingFace embedding model
             chunking_config: Document chunking configuration
+            cache_config: Semantic response cache configuration (default: from RAG_CACHE_* env)
+            retrieval_config: Hybrid retrieval configuration (default: from RAG_HYBRID_* env)
             verbose: Logging level (0: minimal, 1+: detailed)
         """
         
@@ -86,6 +111,17 @@ class LearnTwinRAGAgent:
         self.embedding_model = embedding_model
         self.verbose = verbose
         self.chunking_config = chunking_config or ChunkingConfig()
+        self.response_cache = SemanticResponseCache(cache_config or SemanticCacheConfig.from_env())
+        self._content_hashes = None
+        self._corpus_lock = threading.Lock()
+        self.retrieval_config = retrieval_config or RetrievalConfig.from_env()
+        self.lexical_index = LexicalIndex()
+        self.retriever = HybridRetriever(
+            vector_search=self._vector_search,
+            lexical_index=self.lexical_index,
+            config=self.retrieval_config,
+            reranker=CrossEncoderReranker(self.retrieval_config.reranker_model) if self.retrieval_config.reranker_model else None
+        )
         
         # Initialize components
         self.vector_store = None
@@ -124,13 +160,17 @@ class LearnTwinRAGAgent:
             print("📚 Loading embedding model...")
         
         try:
-            self.embeddings = HuggingFaceEmbeddings(
+            base_embeddings = HuggingFaceEmbeddings(
                 model_name=self.embedding_model,
                 model_kwargs={'device': 'cpu'},  # Use CPU for stability
                 encode_kwargs={'batch_size': 32}
             )
+            # Repeated chunks and questions are served from the persistent cache
+            self.embeddings = CachedEmbeddings.from_env(base_embeddings, self.embedding_model)
             if self.verbose > 0:
                 print(f"✅ Embedding model loaded: {self.embedding_model}")
+                if self.embeddings.cache is not None:
+                    print(f"   💾 Embedding cache: {self.embeddings.cache.path}")
         except Exception as e:
             if self.verbose > 0:
                 print(f"❌ Error loading embedding model: {e}")
@@ -313,46 +353,169 @@ class LearnTwinRAGAgent:
         if self.verbose > 0:
             print(f"\n📄 Uploading document: {file_path}")
         
-        start_time = time.time()
+        if self.vector_store is None:
+            if self.verbose > 0:
+                print("❌ Vector store not initialized")
+            return False
         
         try:
-            # Load document
-            documents = self._load_document(file_path)
-            if not documents:
-                return False
-            
-            # Add custom metadata
-            for doc in documents:
-                if metadata:
-                    doc.metadata.update(metadata)
-                
-                # Add learning-specific metadata
-                doc.metadata.update({
-                    'upload_timestamp': time.time(),
-                    'system': 'learn_twin_chain',
-                    'document_type': self._classify_document_type(file_path, doc.page_content)
-                })
-            
-            # Process documents
-            processed_docs = self._process_documents(documents)
-            if not processed_docs:
-                return False
-            
-            # Add to vector store
-            success = self._add_to_vector_store(processed_docs)
-            
-            elapsed_time = time.time() - start_time
-            
-            if success and self.verbose > 0:
-                print(f"✅ Document uploaded successfully in {elapsed_time:.2f}s")
-                print(f"   📊 Processed {len(processed_docs)} chunks")
-            
-            return success
-            
+            result = self.ingest_documents([file_path], metadata)
         except Exception as e:
             if self.verbose > 0:
                 print(f"❌ Error uploading document: {e}")
             return False
+        return result["failed_files"] == 0 and not result["errors"]
+    
+    def ingest_documents(self,
+                         file_paths: List[str],
+                         metadata: Optional[Dict] = None,
+                         config: Optional[IngestionConfig] = None,
+                         file_metadata: Optional[Dict[str, Dict]] = None) -> Dict[str, Any]:
+        """
+        Upload many documents through the batched ingestion pipeline
+        
+        Files are loaded and split in parallel, chunks already in the collection
+        (same content hash) are skipped, embeddings are computed in micro-batches
+        and inserted in batches with a single flush at the end.
+        
+        Args:
+            file_paths: Paths of the documents to upload
+            metadata: Additional metadata applied to every document
+            config: Pipeline configuration (workers, batch sizes, dedupe)
+            file_metadata: Per-file metadata keyed by path, applied over metadata
+            
+        Returns:
+            Dict with per-run and per-file counts and chunks_per_sec
+        """
+        collection = Collection(self.collection_name)
+        
+        def load_chunks(file_path: str):
+            return self._load_chunks(file_path, {**(metadata or {}), **(file_metadata or {}).get(file_path, {})})
+        
+        def insert(vectors: np.ndarray, texts: List[str], metadatas: List[Dict]):
+            mr = collection.insert([list(vectors), texts, [json.dumps(meta, default=str) for meta in metadatas]])
+            for pk, text, meta in zip(mr.primary_keys, texts, metadatas):
+                self.lexical_index.add(pk, text, meta)
+        
+        pipeline = IngestionPipeline(
+            load_chunks=load_chunks,
+            embed=self.embeddings.embed_documents_array,
+            insert=insert,
+            flush=collection.flush,
+            known_hashes=self._known_content_hashes(),
+            config=config
+        )
+        result = pipeline.run(file_paths)
+        
+        if result.inserted:
+            # Cached answers were built on the previous collection contents
+            self.response_cache.invalidate()
+        
+        if self.verbose > 0:
+            print(f"✅ Ingested {result.files - result.failed_files}/{result.files} files in {result.elapsed:.2f}s")
+            print(f"   📊 {result.chunks} chunks, {result.inserted} inserted, "
+                  f"{result.skipped_duplicates} unchanged ({result.chunks_per_sec:.1f} chunks/s)")
+            for error in result.errors:
+                print(f"   ❌ {error}")
+        
+        return result.to_dict()
+    
+    def _load_chunks(self, file_path: str, metadata: Optional[Dict] = None) -> List[tuple]:
+        """Load, annotate and split one document into (text, metadata) chunks"""
+        documents = self._load_document(file_path)
+        if not documents:
+            return []
+        
+        for doc in documents:
+            if metadata:
+                doc.metadata.update(metadata)
+            
+            # Add learning-specific metadata
+            doc.metadata.update({
+                'upload_timestamp': time.time(),
+                'system': 'learn_twin_chain',
+                'document_type': self._classify_document_type(file_path, doc.page_content)
+            })
+        
+        return [(doc.page_content, doc.metadata) for doc in self._process_documents(documents)]
+    
+    def _known_content_hashes(self) -> set:
+        """Content hashes of the chunks already in the collection"""
+        return self.prepare_retrieval()
+    
+    def prepare_retrieval(self) -> set:
+        """
+        Scan the collection once per agent: fills the BM25 index used by hybrid
+        retrieval and the content hashes used by ingestion dedupe. A failed
+        scan is not remembered, so the next call tries again.
+        """
+        with self._corpus_lock:
+            if self._content_hashes is not None:
+                return self._content_hashes
+            hashes = set()
+            try:
+                iterator = Collection(self.collection_name).query_iterator(
+                    batch_size=1000, expr="id >= 0", output_fields=["id", "text", "metadata"]
+                )
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    for row in rows:
+                        meta = self._parse_metadata(row.get("metadata"))
+                        if meta.get("content_hash"):
+                            hashes.add(meta["content_hash"])
+                        self.lexical_index.add(row["id"], row.get("text") or "", meta)
+                iterator.close()
+            except Exception as e:
+                # Until a scan succeeds, lexical retrieval and dedupe cover this agent's own uploads only
+                if self.verbose > 0:
+                    print(f"⚠️ Could not scan collection: {e}")
+                return hashes
+            if self.verbose > 0:
+                print(f"📇 Indexed {len(self.lexical_index)} chunks for lexical retrieval")
+            self._content_hashes = hashes
+            return hashes
+    
+    @staticmethod
+    def _parse_metadata(raw: Any) -> Dict[str, Any]:
+        if isinstance(raw, dict):
+            return raw
+        try:
+            meta = json.loads(raw or "{}")
+        except (TypeError, ValueError):
+            return {}
+        return meta if isinstance(meta, dict) else {}
+    
+    def _vector_search(self, query_embedding, k: int, expr: str = "") -> List[RetrievedChunk]:
+        """Milvus ANN search with the metadata filter pushed into the expression"""
+        collection = Collection(self.collection_name)
+        results = collection.search(
+            data=[list(query_embedding)],
+            anns_field="vector",
+            param={"metric_type": "COSINE", "params": {"nprobe": self.retrieval_config.nprobe}},
+            limit=k,
+            expr=expr or None,
+            output_fields=["text", "metadata"]
+        )
+        return [
+            RetrievedChunk(
+                id=hit.id,
+                text=hit.entity.get("text") or "",
+                metadata=self._parse_metadata(hit.entity.get("metadata")),
+                score=hit.distance
+            )
+            for hit in results[0]
+        ]
+    
+    def _retrieve(self, question: str, question_embedding, top_k: int,
+                  filters: Optional[Dict[str, Any]] = None, trim: bool = True) -> List[Document]:
+        """Hybrid (BM25 + vector, RRF, optional re-rank) retrieval, or plain vector search when disabled"""
+        if not self.retrieval_config.enabled:
+            return self.vector_store.similarity_search_by_vector(question_embedding, k=top_k)
+        self.prepare_retrieval()
+        chunks = self.retriever.retrieve(question, question_embedding, top_k=top_k, filters=filters, trim=trim)
+        return [Document(page_content=chunk.text, metadata=chunk.metadata) for chunk in chunks]
     
     def _classify_document_type(self, file_path: str, content: str) -> str:
         """Classify document type based on path and content"""
@@ -487,6 +650,9 @@ class LearnTwinRAGAgent:
             else:
                 self.vector_store.add_texts(texts=texts, metadatas=metadatas)
                 
+            # Cached answers were built on the previous collection contents
+            self.response_cache.invalidate()
+            
             if self.verbose > 0:
                 print(f"✅ Added {len(documents)} documents to vector store")
             
@@ -511,14 +677,7 @@ class LearnTwinRAGAgent:
                 print(f"   📏 Embedding dimension: {len(embeddings_list[0]) if embeddings_list else 'unknown'}")
             
             # Ensure embeddings are in correct format for Milvus
-            # Convert list of lists to proper format
-            formatted_embeddings = []
-            for emb in embeddings_list:
-                if isinstance(emb, list):
-                    # Convert to float list if needed
-                    formatted_embeddings.append([float(x) for x in emb])
-                else:
-                    formatted_embeddings.append(emb)
+            formatted_embeddings = list(np.asarray(embeddings_list, dtype=np.float32))
             
             # Prepare data for insertion - IMPORTANT: Do not include 'id' field
             entities = [
@@ -549,7 +708,8 @@ class LearnTwinRAGAgent:
               context_type: str = "learning",
               max_tokens: int = 2048,
               temperature: float = 0.1,
-              top_k: int = 5) -> Dict[str, Any]:
+              top_k: int = 5,
+              use_cache: bool = False) -> Dict[str, Any]:
         """
         Query the RAG system for educational assistance
         
@@ -559,6 +719,10 @@ class LearnTwinRAGAgent:
             max_tokens: Maximum tokens to generate
             temperature: Generation temperature
             top_k: Number of documents to retrieve
+            use_cache: Serve and store the answer in the semantic response cache.
+                Only for plain student questions: templated prompts that embed
+                per-user data are near-identical across users and would be
+                answered with someone else's response.
             
         Returns:
             Dict with response data
@@ -584,9 +748,24 @@ class LearnTwinRAGAgent:
                 print(f"🔍 Processing learning query: {question[:100]}...")
             
             start_time = time.time()
+            # Answers generated against an older knowledge base are not stored
+            kb_version = self.response_cache.kb_version
+            
+            # Same question (after normalization) answered before: skip the embedding too
+            if use_cache:
+                cached = self.response_cache.get_exact(question, context_type, top_k)
+                if cached is not None:
+                    return self._cached_response(cached, question, start_time)
+            
+            # Embed once; the vector serves both the cache lookup and retrieval
+            question_embedding = self.embeddings.embed_query(question)
+            if use_cache:
+                cached = self.response_cache.get(question_embedding, context_type, top_k)
+                if cached is not None:
+                    return self._cached_response(cached, question, start_time)
             
             # Retrieve relevant documents
-            docs = self.vector_store.similarity_search(question, k=top_k)
+            docs = self._retrieve(question, question_embedding, top_k)
             
             if not docs:
                 return {
@@ -603,22 +782,10 @@ class LearnTwinRAGAgent:
             prompt = self._create_learning_prompt(question, context, context_type)
             
             # Generate response with Gemini
-            generation_config = genai.types.GenerationConfig(
-                max_output_tokens=max_tokens,
-                temperature=temperature,
-                top_p=0.95,
-                top_k=64,
-            )
-            
             response = self.gemini_client.generate_content(
                 prompt,
-                generation_config=generation_config,
-                safety_settings=[
-                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                ]
+                generation_config=self._generation_config(max_tokens, temperature),
+                safety_settings=SAFETY_SETTINGS
             )
             
             answer = response.text if response.text else "No response generated"
@@ -628,7 +795,7 @@ class LearnTwinRAGAgent:
             if self.verbose > 0:
                 print(f"✅ Query completed in {elapsed_time:.2f}s")
             
-            return {
+            result = {
                 "question": question,
                 "answer": answer,
                 "context_type": context_type,
@@ -636,8 +803,12 @@ class LearnTwinRAGAgent:
                 "source_documents": self._format_source_docs(docs),
                 "num_sources_used": len(docs),
                 "success": True,
-                "model_used": "Gemini 2.5 Pro"
+                "model_used": "Gemini 2.5 Pro",
+                "cached": False
             }
+            if use_cache and response.text:
+                self.response_cache.put(question, question_embedding, context_type, top_k, copy.deepcopy(result), kb_version)
+            return result
             
         except Exception as e:
             return {
@@ -648,6 +819,141 @@ class LearnTwinRAGAgent:
                 "success": False
             }
     
+    def query_stream(self,
+                     question: str,
+                     context_type: str = "learning",
+                     max_tokens: int = 2048,
+                     temperature: float = 0.1,
+                     top_k: int = 5,
+                     use_cache: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of query() (same use_cache semantics)
+        
+        Yields events as dicts with "event" and "data" keys:
+            sources: retrieved source documents, as soon as retrieval finishes
+            token:   {"text": ...} for each generated chunk
+            done:    the same dict query() would have returned
+            error:   the same error dict query() would have returned
+        
+        Closing the generator stops generation.
+        """
+        if not self.gemini_client:
+            yield {"event": "error", "data": {"error": "Gemini API not available", "question": question, "answer": "", "success": False}}
+            return
+        
+        if not self.vector_store:
+            yield {"event": "error", "data": {"error": "No knowledge base available. Please upload documents first.", "question": question, "answer": "", "success": False}}
+            return
+        
+        try:
+            start_time = time.time()
+            kb_version = self.response_cache.kb_version
+            
+            cached = None
+            question_embedding = None
+            if use_cache:
+                cached = self.response_cache.get_exact(question, context_type, top_k)
+            if cached is None:
+                question_embedding = self.embeddings.embed_query(question)
+                if use_cache:
+                    cached = self.response_cache.get(question_embedding, context_type, top_k)
+            if cached is not None:
+                result = self._cached_response(cached, question, start_time)
+                yield {"event": "sources", "data": self._sources_event(result["source_documents"], context_type, True)}
+                yield {"event": "token", "data": {"text": result["answer"]}}
+                yield {"event": "done", "data": result}
+                return
+            
+            docs = self._retrieve(question, question_embedding, top_k)
+            if not docs:
+                yield {"event": "error", "data": {
+                    "error": "No relevant documents found",
+                    "question": question,
+                    "answer": "I couldn't find relevant information in the knowledge base to answer your question.",
+                    "success": False
+                }}
+                return
+            
+            source_documents = self._format_source_docs(docs)
+            yield {"event": "sources", "data": self._sources_event(source_documents, context_type, False)}
+            
+            context = "\n\n".join([doc.page_content for doc in docs])
+            prompt = self._create_learning_prompt(question, context, context_type)
+            
+            response = self.gemini_client.generate_content(
+                prompt,
+                generation_config=self._generation_config(max_tokens, temperature),
+                safety_settings=SAFETY_SETTINGS,
+                stream=True
+            )
+            
+            parts = []
+            try:
+                for chunk in response:
+                    text = getattr(chunk, "text", "")
+                    if text:
+                        parts.append(text)
+                        yield {"event": "token", "data": {"text": text}}
+            finally:
+                # Generator closed early (client went away): stop pulling from Gemini
+                if hasattr(response, "close"):
+                    response.close()
+            
+            elapsed_time = time.time() - start_time
+            
+            if self.verbose > 0:
+                print(f"✅ Streamed query completed in {elapsed_time:.2f}s")
+            
+            result = {
+                "question": question,
+                "answer": "".join(parts) or "No response generated",
+                "context_type": context_type,
+                "query_time": elapsed_time,
+                "source_documents": source_documents,
+                "num_sources_used": len(docs),
+                "success": True,
+                "model_used": "Gemini 2.5 Pro",
+                "cached": False
+            }
+            if use_cache and parts:
+                self.response_cache.put(question, question_embedding, context_type, top_k, copy.deepcopy(result), kb_version)
+            yield {"event": "done", "data": result}
+        
+        except Exception as e:
+            yield {"event": "error", "data": {
+                "error": f"Query failed: {e}",
+                "question": question,
+                "answer": "",
+                "context_type": context_type,
+                "success": False
+            }}
+    
+    def _generation_config(self, max_tokens: int, temperature: float):
+        return genai.types.GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+            top_p=0.95,
+            top_k=64,
+        )
+    
+    def _sources_event(self, source_documents: List[Dict], context_type: str, cached: bool) -> Dict[str, Any]:
+        return {
+            "source_documents": source_documents,
+            "num_sources_used": len(source_documents),
+            "context_type": context_type,
+            "cached": cached
+        }
+    
+    def _cached_response(self, cached: Dict[str, Any], question: str, start_time: float) -> Dict[str, Any]:
+        """Cached answer in the same shape as a live one, timed for this request"""
+        result = copy.deepcopy(cached)
+        result["question"] = question
+        result["query_time"] = time.time() - start_time
+        result["cached"] = True
+        if self.verbose > 0:
+            print(f"⚡ Query answered from cache in {result['query_time']:.3f}s")
+        return result
+    
     def _create_learning_prompt(self, question: str, context: str, context_type: str) -> str:
         """Create context-aware learning prompt"""
         
@@ -738,7 +1044,12 @@ RESPONSE:"""
             return []
         
         try:
-            docs = self.vector_store.similarity_search(query, k=k)
+            if self.retrieval_config.enabled:
+                # The document_type filter is pushed down into the Milvus expression
+                docs = self._retrieve(query, self.embeddings.embed_query(query), k,
+                                      filters={"document_type": document_type} if document_type else None, trim=False)
+            else:
+                docs = self.vector_store.similarity_search(query, k=k)
             
             results = []
             for doc in docs:
@@ -779,6 +1090,9 @@ RESPONSE:"""
                 "total_documents": collection.num_entities,
                 "embedding_model": self.embedding_model,
                 "gemini_available": self.gemini_client is not None,
+                "response_cache": self.response_cache.info(),
+                "embedding_cache": self.embeddings.cache.info() if self.embeddings.cache else None,
+                "lexical_index_chunks": len(self.lexical_index),
                 "status": "ready"
             }
             
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Tuple, Sequence
+
+import numpy as np
+
+@dataclass
+class SemanticCacheConfig:
+    """Configuration for the semantic response cache"""
+    enabled: bool = True
+    similarity_threshold: float = 0.95
+    ttl_seconds: float = 3600.0
+    max_entries: int = 1024
+
+    @classmethod
+    def from_env(cls) -> "SemanticCacheConfig":
+        return cls(
+            enabled=os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true",
+            similarity_threshold=float(os.getenv("RAG_CACHE_SIMILARITY", "0.95")),
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1024"))
+        )
+
+@dataclass
+class _CacheEntry:
+    text: str
+    vector: np.ndarray
+    response: Dict[str, Any]
+    expires_at: float
+    hits: int = 0
+
+def normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+class SemanticResponseCache:
+    """
+    Cache of RAG answers keyed on the normalized question embedding.
+
+    Entries are partitioned by (context_type, top_k, knowledge-base version);
+    a lookup returns the entry whose embedding has the highest cosine
+    similarity with the question, if it clears the threshold. Expired entries
+    are dropped lazily and the least recently used one is evicted when full.
+    Bumping the knowledge-base version drops every entry.
+    """
+
+    def __init__(self, config: Optional[SemanticCacheConfig] = None):
+        self.config = config or SemanticCacheConfig()
+        self.kb_version = 0
+        self._entries: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        self._by_text: Dict[Tuple, Tuple] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.stats = {"hits": 0, "exact_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_puts": 0}
+
+    def _partition(self, context_type: str, top_k: int) -> Tuple:
+        return (context_type, top_k, self.kb_version)
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._by_text.pop(key[0] + (entry.text,), None)
+
+    def _hit(self, key: Tuple, entry: _CacheEntry) -> Dict[str, Any]:
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.stats["hits"] += 1
+        return entry.response
+
+    def get_exact(self, question: str, context_type: str, top_k: int) -> Optional[Dict[str, Any]]:
+        """Hit on the normalized question text alone, before anything is embedded"""
+        if not self.config.enabled:
+            return None
+        with self._lock:
+            key = self._by_text.get(self._partition(context_type, top_k) + (normalize_question(question),))
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self.stats["exact_hits"] += 1
+            return self._hit(key, entry)
+
+    def get(self, embedding: Sequence[float], context_type: str, top_k: int) -> Optional[Dict[str, Any]]:
+        """Closest cached answer in the partition above the similarity threshold"""
+        if not self.config.enabled:
+            return None
+        query = self._unit(embedding)
+        partition = self._partition(context_type, top_k)
+        now = time.monotonic()
+        with self._lock:
+            keys: List[Tuple] = []
+            for key, entry in list(self._entries.items()):
+                if entry.expires_at <= now:
+                    self._drop(key)
+                elif key[0] == partition:
+                    keys.append(key)
+            if keys:
+                matrix = np.stack([self._entries[key].vector for key in keys])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.config.similarity_threshold:
+                    return self._hit(keys[best], self._entries[keys[best]])
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question: str, embedding: Sequence[float], context_type: str, top_k: int, response: Dict[str, Any],
+            kb_version: Optional[int] = None):
+        """
+        Store an answer. kb_version is the version read before the answer was
+        generated; if the knowledge base changed since, the answer is dropped.
+        """
+        if not self.config.enabled:
+            return
+        text = normalize_question(question)
+        with self._lock:
+            if kb_version is not None and kb_version != self.kb_version:
+                self.stats["stale_puts"] += 1
+                return
+            partition = self._partition(context_type, top_k)
+            previous = self._by_text.get(partition + (text,))
+            if previous is not None:
+                self._drop(previous)
+            key = (partition, self._next_id)
+            self._next_id += 1
+            self._entries[key] = _CacheEntry(
+                text=text,
+                vector=self._unit(embedding),
+                response=response,
+                expires_at=time.monotonic() + self.config.ttl_seconds
+            )
+            self._by_text[partition + (text,)] = key
+            while len(self._entries) > self.config.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def invalidate(self):
+        """The knowledge base changed: answers built on the old one are stale"""
+        with self._lock:
+            self.kb_version += 1
+            self._entries.clear()
+            self._by_text.clear()
+            self.stats["invalidations"] += 1
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.config.enabled,
+                "entries": len(self._entries),
+                "kb_version": self.kb_version,
+                "similarity_threshold": self.config.similarity_threshold,
+                "ttl_seconds": self.config.ttl_seconds,
+                "max_entries": self.config.max_entries,
+                **self.stats
+            }
@@ -9,6 +9,7 @@ Usage:
     python upload_docs.py /path/to/documents/folder
     python upload_docs.py /path/to/documents/folder --recursive
     python upload_docs.py /path/to/documents/folder --metadata '{"subject": "Python", "level": "beginner"}'
+    python upload_docs.py /path/to/documents/folder --max-workers 8 --batch-size 128
 """
 
 import os
@@ -32,6 +33,7 @@ load_dotenv('.env')
 
 try:
     from rag import LearnTwinRAGAgent
+    from ingestion import IngestionConfig
     RAG_AVAILABLE = True
 except ImportError as e:
     print(f"❌ Error importing RAG system: {e}")
@@ -332,6 +334,42 @@ class DocumentUploader:
         
         return results
     
+    def upload_files_pipeline(self, files: List[Path], base_metadata: Optional[Dict] = None,
+                              max_workers: int = 4, batch_size: int = 64) -> List[Dict]:
+        """
+        Upload files through the agent's batched ingestion pipeline
+        
+        Args:
+            files: List of file paths to upload
+            base_metadata: Base metadata for all files
+            max_workers: Number of parallel loader workers
+            batch_size: Embedding micro-batch size
+            
+        Returns:
+            List of upload results
+        """
+        file_metadata = {str(path): self.create_file_metadata(path, base_metadata) for path in files}
+        run = self.rag_agent.ingest_documents(
+            [str(path) for path in files],
+            file_metadata=file_metadata,
+            config=IngestionConfig(loader_workers=max_workers, embed_batch_size=batch_size)
+        )
+        self.stats['chunks_per_sec'] = run['chunks_per_sec']
+        self.stats['skipped_chunks'] = run['skipped_duplicates']
+        self.stats['errors'].extend(run['errors'])
+        
+        results = []
+        for path, outcome in run['per_file'].items():
+            self.stats['processed_files'] += 1
+            if outcome['status'] == 'success':
+                self.stats['successful_uploads'] += 1
+                results.append({'file': path, 'status': 'success', 'chunks': outcome['chunks'],
+                                'inserted': outcome['inserted'], 'metadata': file_metadata[path]})
+            else:
+                self.stats['failed_uploads'] += 1
+                results.append({'file': path, 'status': 'failed', 'error': 'Upload failed (see errors)'})
+        return results
+    
     def print_summary(self, results: List[Dict], total_time: float):
         """Print upload summary"""
         print("\n" + "=" * 60)
@@ -344,7 +382,10 @@ class DocumentUploader:
         print(f"❌ Failed uploads: {self.stats['failed_uploads']}")
         print(f"⏱️  Total time: {total_time:.2f}s")
         
-        if self.stats['successful_uploads'] > 0:
+        if 'chunks_per_sec' in self.stats:
+            print(f"📈 Throughput: {self.stats['chunks_per_sec']:.1f} chunks/s "
+                  f"({self.stats.get('skipped_chunks', 0)} unchanged chunks skipped)")
+        elif self.stats['successful_uploads'] > 0:
             avg_time = sum(r.get('time', 0) for r in results if r['status'] == 'success') / self.stats['successful_uploads']
             print(f"📈 Average time per file: {avg_time:.2f}s")
         
@@ -381,7 +422,8 @@ def main():
 Examples:
   python upload_docs.py /path/to/documents
   python upload_docs.py /path/to/documents --recursive
-  python upload_docs.py /path/to/documents --parallel --max-workers 5
+  python upload_docs.py /path/to/documents --max-workers 8 --batch-size 128
+  python upload_docs.py /path/to/documents --sequential
   python upload_docs.py /path/to/documents --metadata '{"subject": "Python", "level": "beginner"}'
         """
     )
@@ -400,14 +442,27 @@ Examples:
     parser.add_argument(
         '-p', '--parallel',
         action='store_true',
-        help='Upload files in parallel (faster but uses more resources)'
+        help='Upload files with one thread per file instead of the batched pipeline'
+    )
+    
+    parser.add_argument(
+        '-s', '--sequential',
+        action='store_true',
+        help='Upload files one at a time instead of the batched pipeline'
     )
     
     parser.add_argument(
         '--max-workers',
         type=int,
-        default=3,
-        help='Maximum number of parallel workers (default: 3)'
+        default=4,
+        help='Maximum number of parallel workers (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=64,
+        help='Embedding micro-batch size for the pipeline (default: 64)'
     )
     
     parser.add_argument(
@@ -477,10 +532,12 @@ Examples:
         print(f"\n🚀 Starting upload of {len(files)} files...")
         start_time = time.time()
         
-        if args.parallel:
+        if args.sequential:
+            results = uploader.upload_files_sequential(files, base_metadata)
+        elif args.parallel:
             results = uploader.upload_files_parallel(files, base_metadata, args.max_workers)
         else:
-            results = uploader.upload_files_sequential(files, base_metadata)
+            results = uploader.upload_files_pipeline(files, base_metadata, args.max_workers, args.batch_size)
         
         total_time = time.time() - start_time
         
@@ -0,0 +1,125 @@
+// Long-lived Groth16 prover used by digital_twin/services/prover_pool.py
+// Protocol: one JSON request per line on stdin, one JSON response per line on stdout
+//   {"id": 1, "op": "prove", "circuit": "module_progress", "input": {...}}
+//   {"id": 2, "op": "verify", "circuit": "module_progress", "proof": {...}, "publicSignals": [...]}
+//   {"id": 3, "op": "poseidon", "inputs": ["1", "2"]}
+// Responses: {"id": 1, "ok": true, "result": ...} or {"id": 1, "ok": false, "error": "..."}
+// Witness calculators, proving keys and verification keys are loaded once per circuit.
+const fs = require("fs");
+const path = require("path");
+const readline = require("readline");
+
+// Library logging must not corrupt the response stream
+console.log = console.error;
+console.info = console.error;
+
+const circuitsDir = path.resolve(process.argv[2] || path.join(__dirname, "..", "circuits"));
+const keysDir = path.join(circuitsDir, "zkp_keys");
+
+let snarkjs;
+let circomlibjs;
+try {
+    snarkjs = require("snarkjs");
+    circomlibjs = require("circomlibjs");
+} catch (error) {
+    process.stdout.write(JSON.stringify({ ready: false, error: error.message }) + "\n");
+    process.exit(1);
+}
+
+const circuits = {};
+let poseidonPromise = null;
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + "\n");
+}
+
+async function loadCircuit(name) {
+    if (!/^[a-z_]+$/.test(name)) {
+        throw new Error(`Invalid circuit name: ${name}`);
+    }
+    if (!circuits[name]) {
+        circuits[name] = (async () => {
+            const jsDir = path.join(circuitsDir, `${name}_js`);
+            const witnessCalculatorBuilder = require(path.join(jsDir, "witness_calculator.js"));
+            const wasm = fs.readFileSync(path.join(jsDir, `${name}.wasm`));
+            return {
+                witnessCalculator: await witnessCalculatorBuilder(wasm),
+                zkey: new Uint8Array(fs.readFileSync(path.join(keysDir, `${name}_proving_key.zkey`))),
+                vkey: JSON.parse(fs.readFileSync(path.join(keysDir, `${name}_verification_key.json`), "utf8")),
+            };
+        })();
+        // Let a failed load (missing files) be retried on the next job
+        circuits[name].catch(() => { delete circuits[name]; });
+    }
+    return circuits[name];
+}
+
+async function prove(circuitName, input) {
+    const circuit = await loadCircuit(circuitName);
+    const wtns = await circuit.witnessCalculator.calculateWTNSBin(input, 0);
+    const { proof, publicSignals } = await snarkjs.groth16.prove(
+        { type: "mem", data: circuit.zkey },
+        { type: "mem", data: wtns }
+    );
+    return { proof, publicSignals };
+}
+
+async function verify(circuitName, proof, publicSignals) {
+    const circuit = await loadCircuit(circuitName);
+    return await snarkjs.groth16.verify(circuit.vkey, publicSignals, proof);
+}
+
+async function poseidon(inputs) {
+    if (!poseidonPromise) {
+        poseidonPromise = circomlibjs.buildPoseidon();
+    }
+    const hasher = await poseidonPromise;
+    const hash = hasher(inputs.map((value) => BigInt(value)));
+    // Same conversion as the one-shot script this worker replaces
+    if (Array.isArray(hash) || hash instanceof Uint8Array) {
+        const hexStr = "0x" + Array.from(hash).map((b) => b.toString(16).padStart(2, "0")).join("");
+        return BigInt(hexStr).toString();
+    }
+    return hash.toString();
+}
+
+async function handle(request) {
+    switch (request.op) {
+        case "prove":
+            return prove(request.circuit, request.input);
+        case "verify":
+            return verify(request.circuit, request.proof, request.publicSignals);
+        case "poseidon":
+            return poseidon(request.inputs);
+        case "ping":
+            return "pong";
+        default:
+            throw new Error(`Unknown op: ${request.op}`);
+    }
+}
+
+// Jobs are handled one at a time; the Python pool runs several workers for parallelism
+let queue = Promise.resolve();
+const lines = readline.createInterface({ input: process.stdin });
+lines.on("line", (line) => {
+    if (!line.trim()) {
+        return;
+    }
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (error) {
+        send({ id: null, ok: false, error: `Invalid request: ${error.message}` });
+        return;
+    }
+    queue = queue.then(async () => {
+        try {
+            send({ id: request.id, ok: true, result: await handle(request) });
+        } catch (error) {
+            send({ id: request.id, ok: false, error: error && error.message ? error.message : String(error) });
+        }
+    });
+});
+lines.on("close", () => queue.then(() => process.exit(0)));
+
+send({ ready: true });
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent IPFSService.pin_json calls against a local stub gateway
+
+Starts a threaded HTTP server that mimics Pinata's pinFileToIPFS endpoint with
+a fixed artificial latency, then runs N concurrent pin_json calls while a
+ticker task measures event-loop lag. With the pooled async client the lag
+stays flat as N grows; a blocking client would stall the loop for the full
+upstream latency of every request.
+
+Usage: python test/benchmark_ipfs_pin_json.py [--latency 0.2] [--sizes 1 10 50 100]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+
+def make_stub_handler(latency: float):
+    class StubPinataHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            cid = "bafy" + hashlib.sha256(body).hexdigest()[:52]
+            payload = json.dumps({"IpfsHash": cid, "PinSize": len(body)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubPinataHandler
+
+
+async def measure(ipfs, n: int):
+    """Run n concurrent pin_json calls and report wall time and event-loop lag"""
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker(interval: float = 0.01):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    cids = await asyncio.gather(*[
+        ipfs.pin_json({"twin_id": f"did:learntwin:bench{i:05d}", "version": i}, name=f"bench_{i}")
+        for i in range(n)
+    ])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+
+    assert all(cids), "pin_json returned an empty CID"
+    lags.sort()
+    return {
+        "n": n,
+        "elapsed_s": round(elapsed, 3),
+        "pins_per_s": round(n / elapsed, 1),
+        "loop_lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2) if lags else 0.0,
+        "loop_lag_max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+    }
+
+
+async def run(latency: float, sizes):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["PINATA_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("PINATA_API_KEY", "benchmark")
+    os.environ.setdefault("PINATA_SECRET_KEY", "benchmark")
+    # Keep the local CID cache in memory only while benchmarking
+    os.environ.setdefault("IPFS_CACHE_DISK_ENABLED", "false")
+
+    from digital_twin.services.ipfs_service import IPFSService, ipfs_http_pool
+
+    ipfs = IPFSService()
+    print(f"Stub gateway latency: {latency * 1000:.0f} ms, "
+          f"provider concurrency: {ipfs_http_pool.provider_concurrency}")
+    try:
+        # Warm up: client construction loads the TLS context once per process
+        await ipfs.pin_json({"warmup": True}, name="warmup")
+        for n in sizes:
+            print(json.dumps(await measure(ipfs, n)))
+    finally:
+        await ipfs_http_pool.aclose()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.2, help="stub gateway latency in seconds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 100])
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.sizes))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for testing outgoing email
+
+Accepts every message and keeps it in memory instead of delivering it.
+Failures can be injected to exercise retries: `fail_next` answers the next
+DATA commands with a given reply code, `reject_recipients` refuses RCPT for
+some addresses, and `drop_connections` closes every open session the way a
+server drops idle clients.
+
+Usage:
+    python test/smtp_sink.py --port 1025
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=1025 MAIL_FROM=noreply@localhost MAIL_STARTTLS=false
+"""
+
+import asyncio
+import argparse
+from email import message_from_bytes, policy
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+
+@dataclass
+class SinkMessage:
+    mail_from: str
+    rcpt_tos: List[str]
+    data: bytes
+    session: int
+
+    @property
+    def message(self):
+        return message_from_bytes(self.data, policy=policy.default)
+
+
+@dataclass
+class SMTPSink:
+    host: str = "127.0.0.1"
+    port: int = 0
+    messages: List[SinkMessage] = field(default_factory=list)
+    reject_recipients: Set[str] = field(default_factory=set)
+    sessions: int = 0
+    verbose: bool = False
+
+    def __post_init__(self):
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._failures: List[int] = []
+
+    def fail_next(self, count: int = 1, code: int = 451):
+        """Answer the next `count` DATA commands with `code` instead of 250"""
+        self._failures.extend([code] * count)
+
+    def drop_connections(self):
+        for writer in list(self._writers):
+            writer.close()
+
+    async def start(self) -> "SMTPSink":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.drop_connections()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "SMTPSink":
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.sessions += 1
+        session = self.sessions
+        self._writers.add(writer)
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        mail_from, rcpt_tos = None, []
+        try:
+            await reply("220 localhost SMTP sink ready")
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                verb, _, arg = line.partition(" ")
+                verb = verb.upper()
+                if verb == "EHLO":
+                    await reply("250-localhost")
+                    await reply("250-8BITMIME")
+                    await reply("250 SMTPUTF8")
+                elif verb == "HELO":
+                    await reply("250 localhost")
+                elif verb == "MAIL":
+                    mail_from, rcpt_tos = _address(arg), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    address = _address(arg)
+                    if address in self.reject_recipients:
+                        await reply("550 No such user")
+                    else:
+                        rcpt_tos.append(address)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    if not rcpt_tos:
+                        await reply("503 No valid recipients")
+                        continue
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line in (b".\r\n", b".\n"):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    if self._failures:
+                        await reply(f"{self._failures.pop(0)} Injected failure")
+                    else:
+                        self.messages.append(SinkMessage(mail_from, list(rcpt_tos), b"".join(lines), session))
+                        if self.verbose:
+                            print(f"📨 [{session}] {mail_from} -> {', '.join(rcpt_tos)}: {self.messages[-1].message['Subject']}")
+                        await reply("250 OK: queued")
+                    mail_from, rcpt_tos = None, []
+                elif verb == "RSET":
+                    mail_from, rcpt_tos = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def _address(arg: str) -> str:
+    """Address from 'FROM:<a@b> SIZE=123' / 'TO:<a@b>'"""
+    _, _, rest = arg.partition(":")
+    return rest.strip().split(" ")[0].strip("<>")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink that prints received messages")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = await SMTPSink(host=args.host, port=args.port, verbose=True).start()
+    print(f"📭 SMTP sink listening on {sink.host}:{sink.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
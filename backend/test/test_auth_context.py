@@ -0,0 +1,132 @@
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.middleware import auth_context as auth_context_module
+from digital_twin.middleware.auth_context import AuthContext
+from digital_twin.models.permission import DEFAULT_ROLES
+from digital_twin.services.permission_cache import permission_cache
+
+
+class FakeAuthService:
+    """Stands in for AuthService and counts the calls the context makes"""
+
+    def __init__(self, session_data):
+        self.session_data = session_data
+        self.session_reads = 0
+        self.permission_reads = 0
+
+    async def get_session_data(self, session_id):
+        self.session_reads += 1
+        return self.session_data
+
+    async def get_user_permissions(self, user_id):
+        self.permission_reads += 1
+        return ["read_own_profile"]
+
+    async def get_current_user(self, request, skip_redis=False):
+        return None
+
+
+class FakeRedisService:
+    """Redis tier of the permission cache"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get_cache(self, key):
+        return self.store.get(key)
+
+    async def set_cache(self, key, value, ttl=3600):
+        self.store[key] = value
+
+
+class TestAuthContextBudget(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Role graph is compiled at startup by main.lifespan
+        permission_cache.use_roles(DEFAULT_ROLES)
+        permission_cache._entries.clear()
+        self.redis = FakeRedisService()
+        patcher = patch.object(permission_cache, "redis_service", self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_authenticated_request_budget(self):
+        user = SimpleNamespace(did="did:learntwin:student001", permissions=[])
+        auth_service = FakeAuthService({"userID": user.did})
+        loads = []
+
+        async def fake_load(user_id):
+            loads.append(user_id)
+            return user, {"read_lessons", "read_courses"}
+
+        context = AuthContext("session-abc")
+        with patch.object(auth_context_module, "_load_user_with_permissions", fake_load):
+            # Middleware read plus several dependencies in the same request
+            await context.load_session(auth_service)
+            for _ in range(3):
+                self.assertIs(await context.get_user(auth_service, request=None), user)
+                self.assertTrue(await context.has_permission(auth_service, "read_lessons"))
+            self.assertFalse(await context.has_permission(auth_service, "manage_users"))
+
+        self.assertEqual(auth_service.session_reads, 1)
+        self.assertEqual(auth_service.permission_reads, 0)
+        self.assertEqual(loads, [user.did])
+        # Session read plus the shared permission tier, then one aggregation
+        self.assertEqual(context.round_trips, {"redis": 2, "mongo": 1})
+        self.assertEqual(context.total_round_trips, 3)
+
+    async def test_redis_tier_skips_aggregation(self):
+        user = SimpleNamespace(did="did:learntwin:student003", permissions=[])
+        auth_service = FakeAuthService({"userID": user.did})
+        # Another worker compiled this user's permissions
+        self.redis.store[f"permissions:{user.did}"] = {"permissions": ["read_lessons"], "ttl": 900}
+
+        async def fail_load(user_id):
+            raise AssertionError("aggregation should not run on a Redis hit")
+
+        async def find_user(query):
+            return user
+
+        context = AuthContext("session-ghi")
+        with patch.object(auth_context_module, "_load_user_with_permissions", fail_load), \
+                patch.object(auth_context_module.User, "find_one", find_user):
+            self.assertIs(await context.get_user(auth_service, request=None), user)
+
+        self.assertTrue(await context.has_permission(auth_service, "read_lessons"))
+        self.assertEqual(permission_cache.get_local(user.did), frozenset({"read_lessons"}))
+        self.assertEqual(context.round_trips, {"redis": 2, "mongo": 1})
+
+    async def test_permissions_fall_back_when_not_loaded_with_user(self):
+        user = SimpleNamespace(did="did:learntwin:student002", permissions=[])
+        auth_service = FakeAuthService({"userID": user.did})
+
+        async def fake_load(user_id):
+            return user, None
+
+        context = AuthContext("session-def")
+        with patch.object(auth_context_module, "_load_user_with_permissions", fake_load):
+            await context.get_user(auth_service, request=None)
+            self.assertEqual(await context.get_permissions(auth_service), ["read_own_profile"])
+            await context.get_permissions(auth_service)
+
+        self.assertEqual(auth_service.permission_reads, 1)
+        self.assertEqual(context.round_trips, {"redis": 2, "mongo": 2})
+
+    async def test_anonymous_request_makes_no_redis_read(self):
+        auth_service = FakeAuthService(None)
+        context = AuthContext(None)
+        self.assertIsNone(await context.get_user(auth_service, request=None))
+        self.assertEqual(await context.get_permissions(auth_service), [])
+        self.assertEqual(context.round_trips["redis"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
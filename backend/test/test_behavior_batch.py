@@ -0,0 +1,140 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.analytics.behavior_analytics import BehaviorAnalytics
+from digital_twin.analytics.columnar import GroupIndex, first_extreme
+
+
+def _events(student, n, seed, start="2026-01-05"):
+    """Synthetic event log for one student: a learning curve plus noise"""
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.integers(0, 21, n))
+    dates = pd.Timestamp(start) + pd.to_timedelta(days, unit="D") + pd.to_timedelta(rng.integers(0, 86400, n), unit="s")
+    position = np.argsort(np.argsort(dates, kind="stable"), kind="stable")
+    scores = 90 * (1 - np.exp(-0.3 * position)) + rng.normal(0, 3, n)
+    durations = rng.integers(600, 5400, n).astype(float)
+    durations[rng.integers(0, n)] = 30000.0  # one marathon session
+    return [
+        {
+            "student_id": student,
+            "date": dates[i].isoformat(),
+            "study_time": 1,
+            "hour_of_day": int(rng.integers(0, 24)),
+            "session_duration": durations[i],
+            "score": float(round(scores[i], 1)),
+            "completed": int(rng.random() < 0.7),
+            "time_spent": float(rng.integers(10, 60)),
+            "expected_time": 30.0,
+            "interactions": int(rng.integers(0, 40)),
+            "difficulty_level": int(rng.integers(1, 5)),
+            "attempts": int(rng.integers(1, 4)),
+            "break_time": float(rng.integers(0, 3) * 300),
+            "collaboration_score": float(rng.random()),
+            "learning_strategy": int(rng.integers(0, 3)),
+        }
+        for i in rng.permutation(n)
+    ]
+
+
+class TestGroupIndex(unittest.TestCase):
+    def test_aggregates_match_pandas_groupby(self):
+        rng = np.random.default_rng(1)
+        keys = rng.choice(["a", "b", "c"], 200)
+        values = rng.normal(size=200)
+        values[::17] = np.nan
+        groups = GroupIndex.from_keys(keys)
+        expected = pd.DataFrame({"k": keys, "v": values}).groupby("k")["v"]
+
+        np.testing.assert_allclose(groups.mean(values), expected.mean().to_numpy())
+        np.testing.assert_allclose(groups.std(values), expected.std().to_numpy())
+        np.testing.assert_allclose(groups.quantile(values, 0.75), expected.quantile(0.75).to_numpy())
+        np.testing.assert_allclose(groups.max(values), expected.max().to_numpy())
+
+    def test_first_extreme_breaks_ties_on_smallest_key(self):
+        pair_group = np.array([0, 0, 0, 1])
+        pair_value = np.array([2.0, 5.0, 5.0, np.nan])
+        pair_key = np.array([3, 1, 4, 0])
+
+        self.assertEqual(first_extreme(pair_group, pair_value, pair_key, 2).tolist(), [1, -1])
+
+
+class TestAnalyzeBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.analytics = BehaviorAnalytics()
+        cls.per_student = {
+            "s1": _events("s1", 40, 11),
+            "s2": _events("s2", 25, 12),
+            "s3": _events("s3", 2, 13),
+            "s4": _events("s4", 60, 14, start="2026-02-01"),
+        }
+        rows = [row for events in cls.per_student.values() for row in events]
+        order = np.random.default_rng(0).permutation(len(rows))
+        cls.table = pd.DataFrame([rows[i] for i in order])
+        cls.batch = cls.analytics.analyze_batch(cls.table)
+
+    def assertMatches(self, batch, expected, path="analysis"):
+        if isinstance(expected, dict):
+            self.assertEqual(list(batch), list(expected), path)
+            for key in expected:
+                self.assertMatches(batch[key], expected[key], f"{path}.{key}")
+        elif isinstance(expected, list):
+            self.assertEqual(len(batch), len(expected), path)
+            for i, (b, e) in enumerate(zip(batch, expected)):
+                self.assertMatches(b, e, f"{path}[{i}]")
+        elif isinstance(expected, pd.Series):
+            np.testing.assert_allclose(batch, expected.to_numpy(), err_msg=path)
+        elif isinstance(expected, (float, np.floating)) and not isinstance(batch, str):
+            if np.isnan(expected):
+                self.assertTrue(np.isnan(batch), path)
+            else:
+                self.assertAlmostEqual(batch, expected, places=9, msg=path)
+        else:
+            self.assertEqual(batch, expected, path)
+
+    def test_matches_per_student_analysis(self):
+        self.assertEqual(sorted(self.batch), sorted(self.per_student))
+        for student in self.per_student:
+            events = self.table[self.table["student_id"] == student].drop(columns="student_id")
+            expected = self.analytics.analyze_behavior(events.to_dict("records"))
+            batch = self.batch[student]
+
+            # Least-squares fits agree to solver tolerance
+            curve = batch["performance_trends"].pop("learning_curve")
+            expected_curve = expected["performance_trends"].pop("learning_curve")
+            self.assertEqual(curve.keys(), expected_curve.keys(), student)
+            for key in ("slope", "plateau"):
+                self.assertAlmostEqual(curve[key], expected_curve[key], delta=1e-3 * max(1, abs(expected_curve[key])))
+
+            self.assertMatches(batch, expected, student)
+            batch["performance_trends"]["learning_curve"] = curve
+
+    def test_detects_anomalies_per_student(self):
+        long_sessions = [a for a in self.batch["s4"]["behavioral_anomalies"] if a["type"] == "long_session"]
+
+        self.assertEqual(len(long_sessions), 1)
+        self.assertIsInstance(long_sessions[0]["timestamp"], pd.Timestamp)
+
+    def test_accepts_mapping_of_arrays(self):
+        columns = {name: self.table[name].to_numpy() for name in ("student_id", "score", "completed")}
+        result = self.analytics.analyze_batch(columns)
+
+        self.assertEqual(
+            result["s2"]["engagement_metrics"]["completion_rate"],
+            self.batch["s2"]["engagement_metrics"]["completion_rate"]
+        )
+        self.assertEqual(result["s2"]["performance_trends"], {})
+        self.assertEqual(self.analytics.analyze_batch({"score": np.array([1.0])}), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import Future
+
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.models.nft import CertificateMintBatch, CertificateMintItem
+from digital_twin.services.blockchain_service import BlockchainService
+from digital_twin.services.certificate_batch_service import CertificateBatchService
+
+
+class FakeIPFS:
+    def __init__(self):
+        self.pins = []
+
+    async def pin_files(self, files, folder, metadata=None):
+        self.pins.append((folder, sorted(files)))
+        return f"bafydir{len(self.pins)}"
+
+
+class FakeZKP:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def generate_learning_achievement_proof(self, proof_input):
+        if proof_input["student_address"] in self.failing:
+            return {"success": False, "error": "witness generation failed"}
+        return {"success": True, "proof": {}, "public_inputs": [0] * 9, "commitment_hash": "0xabc"}
+
+
+class FakeBlockchain:
+    """Certificate rendering from BlockchainService; chain calls mined after a short delay"""
+
+    render_course_certificate_svg = BlockchainService.render_course_certificate_svg
+    course_certificate_metadata = BlockchainService.course_certificate_metadata
+    course_completion_proof_input = BlockchainService.course_completion_proof_input
+    _convert_achievement_type = BlockchainService._convert_achievement_type
+
+    def __init__(self, zkp, latency=0.1):
+        self.zkp_service = zkp
+        self.latency = latency
+        self.submitted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.unknown_hashes = set()  # hashes the node has no receipt for
+        self.confirmed_nonce = 0
+        self.registered = []
+        self.account = SimpleNamespace(address="0x" + "aa" * 20)
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(
+            get_transaction_receipt=self._receipt,
+            get_transaction_count=lambda address, block: self.confirmed_nonce
+        ))
+
+    def is_available(self):
+        return True
+
+    def _receipt(self, tx_hash):
+        if tx_hash in self.unknown_hashes:
+            raise TransactionNotFound(f"Transaction with hash: {tx_hash} not found")
+        return SimpleNamespace(status=1, transactionHash=HexBytes(tx_hash), blockNumber=7, token_id=99)
+
+    def submit_learning_achievement_mint(self, proof, public_inputs, achievement_type, title, description,
+                                         metadata_uri, score, expires_at):
+        with self.lock:
+            self.submitted.append(metadata_uri)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            tx_hash = HexBytes(len(self.submitted).to_bytes(32, "big"))
+        future = Future()
+
+        def mine():
+            with self.lock:
+                self.in_flight -= 1
+            future.set_result(SimpleNamespace(status=1, transactionHash=tx_hash, blockNumber=7, token_id=len(self.submitted)))
+
+        threading.Timer(self.latency, mine).start()
+        return SimpleNamespace(tx_hash=tx_hash, tx_hashes=[tx_hash], nonce=len(self.submitted) - 1, future=future)
+
+    def parse_learning_achievement_receipt(self, receipt, proof, public_inputs):
+        return {"success": True, "tx_hash": receipt.transactionHash.hex(), "block_number": receipt.blockNumber,
+                "token_id": receipt.token_id}
+
+    def submit_certificate_registration(self, student_address, metadata_uri, certificate_type):
+        self.registered.append(student_address)
+        future = Future()
+        future.set_result({"transactionHash": HexBytes(b"\x01" * 32)})
+        return SimpleNamespace(future=future)
+
+
+class InMemoryBatchService(CertificateBatchService):
+    def __init__(self, blockchain, ipfs, batch):
+        self.blockchain_service = blockchain
+        self.ipfs_service = ipfs
+        self.proof_concurrency = 2
+        self._tasks = {}
+        self.hash_sync_seconds = 0.01
+        self.batch = batch
+        self.item_saves = 0
+
+    async def get_batch(self, batch_id):
+        return self.batch
+
+    async def _save_batch(self, batch):
+        pass
+
+    async def _save_item(self, batch, item):
+        self.item_saves += 1
+
+
+def make_batch(n, **item_overrides):
+    items = [
+        CertificateMintItem(
+            index=i,
+            student_address=f"0x{i:040x}",
+            student_did=f"did:learntwin:student{i:03d}",
+            course_data={"student_name": "Student", "average_score": 90, "completed_at": 1700000000},
+            **item_overrides
+        )
+        for i in range(n)
+    ]
+    return CertificateMintBatch.model_construct(
+        batch_id="batch_test", course_name="Blockchain 101", status="pending",
+        items=items, image_dir_cid=None, metadata_dir_cid=None
+    )
+
+
+class TestCertificateBatchService(unittest.IsolatedAsyncioTestCase):
+    async def test_cohort_pins_once_and_pipelines_mints(self):
+        batch = make_batch(6)
+        chain = FakeBlockchain(FakeZKP(failing={"0x" + f"{3:040x}"}))
+        ipfs = FakeIPFS()
+        service = InMemoryBatchService(chain, ipfs, batch)
+
+        await service.run_batch("batch_test")
+
+        # One directory pin for images and one for metadata, for the whole cohort
+        self.assertEqual(len(ipfs.pins), 2)
+        self.assertEqual(len(ipfs.pins[0][1]), 6)
+        # Same student name on every certificate must not collide
+        self.assertEqual(len({item.metadata_uri for item in batch.items}), 6)
+        self.assertGreater(chain.max_in_flight, 1)
+        self.assertEqual(batch.status, "partial")
+        self.assertEqual(batch.status_counts(), {"minted": 5, "failed": 1})
+        self.assertIn("witness generation failed", batch.items[3].error)
+
+        # Resume: only the failed item is minted again
+        chain.zkp_service = FakeZKP()
+        await service.run_batch("batch_test")
+        self.assertEqual(len(chain.submitted), 6)
+        self.assertEqual(len(ipfs.pins), 2)
+        self.assertEqual(batch.status, "completed")
+        self.assertEqual(batch.items[3].attempts, 2)
+
+    async def test_resume_checks_submitted_transactions_instead_of_reminting(self):
+        batch = make_batch(2, status="submitted", metadata_uri="ipfs://bafydir/0.json",
+                           tx_hash="0x" + "11" * 32)
+        chain = FakeBlockchain(FakeZKP())
+        service = InMemoryBatchService(chain, FakeIPFS(), batch)
+
+        await service.run_batch("batch_test")
+
+        self.assertEqual(chain.submitted, [])
+        self.assertEqual(batch.status, "completed")
+        self.assertTrue(all(item.token_id == "99" for item in batch.items))
+        self.assertEqual(len(chain.registered), 2)
+
+    async def test_resume_finds_receipt_of_a_replacement(self):
+        original, replacement = "0x" + "11" * 32, "0x" + "22" * 32
+        batch = make_batch(1, status="submitted", metadata_uri="ipfs://bafydir/0.json",
+                           tx_hash=original, tx_hashes=[original, replacement], nonce=4)
+        chain = FakeBlockchain(FakeZKP())
+        chain.unknown_hashes = {original}
+        service = InMemoryBatchService(chain, FakeIPFS(), batch)
+
+        await service.run_batch("batch_test")
+
+        self.assertEqual(chain.submitted, [])
+        self.assertEqual(batch.items[0].status, "minted")
+        self.assertEqual(HexBytes(batch.items[0].tx_hash), HexBytes(replacement))
+
+    async def test_dropped_transaction_is_minted_again(self):
+        dropped = "0x" + "11" * 32
+        pending_hash = "0x" + "33" * 32
+        batch = make_batch(2, status="submitted", metadata_uri="ipfs://bafydir/0.json")
+        batch.items[0].tx_hashes, batch.items[0].nonce = [dropped], 4
+        batch.items[1].tx_hashes, batch.items[1].nonce = [pending_hash], 5
+        chain = FakeBlockchain(FakeZKP())
+        chain.unknown_hashes = {dropped, pending_hash}
+        chain.confirmed_nonce = 5  # nonce 4 is used up, nonce 5 is not
+        service = InMemoryBatchService(chain, FakeIPFS(), batch)
+
+        await service.run_batch("batch_test")
+
+        self.assertEqual(chain.submitted, ["ipfs://bafydir/0.json"])
+        self.assertEqual(batch.items[0].status, "minted")
+        self.assertEqual(batch.items[0].tx_hashes, [HexBytes((1).to_bytes(32, "big")).hex()])
+        self.assertEqual(batch.items[1].status, "submitted")
+        self.assertEqual(batch.status, "partial")
+
+    async def test_fee_bump_replacements_are_persisted_while_waiting(self):
+        batch = make_batch(1)
+        item = batch.items[0]
+        first, bumped = HexBytes(b"\x01" * 32), HexBytes(b"\x02" * 32)
+        pending = SimpleNamespace(nonce=3, tx_hashes=[first], future=Future())
+        item.tx_hashes = [first.hex()]
+        service = InMemoryBatchService(FakeBlockchain(FakeZKP()), FakeIPFS(), batch)
+
+        def replace_then_mine():
+            pending.tx_hashes.append(bumped)
+            threading.Timer(0.05, lambda: pending.future.set_result("receipt")).start()
+
+        threading.Timer(0.02, replace_then_mine).start()
+        self.assertEqual(await service._await_receipt(batch, item, pending), "receipt")
+        self.assertEqual(item.tx_hashes, [first.hex(), bumped.hex()])
+        self.assertEqual(item.tx_hash, bumped.hex())
+
+
+if __name__ == "__main__":
+    unittest.main()
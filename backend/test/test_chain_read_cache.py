@@ -0,0 +1,146 @@
+import sys
+import json
+import time
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils.abi import event_abi_to_log_topic
+from web3 import Web3
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.chain_read_cache import ChainReadCache
+
+ABI_DIR = BACKEND_DIR / "contracts" / "abi"
+STUDENT_A = Web3.to_checksum_address("0x" + "aa" * 20)
+STUDENT_B = Web3.to_checksum_address("0x" + "bb" * 20)
+
+def load_contract(w3, name, address):
+    with open(ABI_DIR / f"{name}.json") as f:
+        return w3.eth.contract(address=address, abi=json.load(f)["abi"])
+
+class FakeProvider:
+    """Answers eth_call / eth_getLogs from fixed data and counts round trips"""
+
+    def __init__(self, w3, registry, achievements, latency=0.0):
+        self.w3 = w3
+        self.registry = registry
+        self.achievements = achievements
+        self.latency = latency
+        self.round_trips = 0
+        self.lock = threading.Lock()
+
+    def _answer(self, method, params):
+        codec = self.w3.codec
+        if method == "eth_call":
+            fn, args = self.registry.decode_function_input(params[0]["data"])
+            if fn.fn_name == "getStudentCertificates":
+                return "0x" + codec.encode(["uint256[]"], [[1, 2] if args["student"] == STUDENT_A else []]).hex()
+            if fn.fn_name == "getCertificate":
+                return "0x" + codec.encode(
+                    ["address", "string", "uint256", "string"],
+                    [STUDENT_A, f"ipfs://cert{args['certId']}", 1700000000 + args["certId"], "course_completion"]
+                ).hex()
+        if method == "eth_getLogs":
+            event_abi = self.achievements.events.AchievementMinted.abi
+            student_topic = "0x" + codec.encode(["address"], [STUDENT_A]).hex()
+            if params[0]["topics"][2] != student_topic:
+                return []
+            data = codec.encode(
+                ["string", "string", "uint256", "uint256", "uint256", "bytes32"],
+                ["Course Completion", "Completed", 95, 1700000000, 0, b"\x01" * 32]
+            )
+            return [{
+                "address": self.achievements.address,
+                "topics": ["0x" + event_abi_to_log_topic(event_abi).hex(),
+                           "0x" + codec.encode(["uint256"], [7]).hex(),
+                           student_topic,
+                           "0x" + codec.encode(["uint8"], [1]).hex()],
+                "data": "0x" + data.hex(),
+                "blockNumber": "0x10", "blockHash": "0x" + "00" * 32,
+                "transactionHash": "0x" + "12" * 32, "transactionIndex": "0x0", "logIndex": "0x0"
+            }]
+        raise ValueError(method)
+
+    def make_request(self, method, params):
+        with self.lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+        return {"jsonrpc": "2.0", "id": 1, "result": self._answer(method, params)}
+
+    def make_batch_request(self, requests):
+        with self.lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+        return [{"jsonrpc": "2.0", "id": i, "result": self._answer(m, p)} for i, (m, p) in enumerate(requests)]
+
+
+class TestChainReadCache(unittest.TestCase):
+    def setUp(self):
+        w3 = Web3()
+        self.registry = load_contract(w3, "ZKPCertificateRegistry", "0x" + "11" * 20)
+        self.achievements = load_contract(w3, "LearningAchievementNFT", "0x" + "22" * 20)
+        self.provider = FakeProvider(w3, self.registry, self.achievements)
+        fake_w3 = SimpleNamespace(codec=w3.codec, provider=self.provider, to_checksum_address=Web3.to_checksum_address)
+        self.cache = ChainReadCache(fake_w3, ttl_seconds=60)
+        self.cache.poller_enabled = False
+
+    def test_misses_share_one_batch_and_hits_skip_rpc(self):
+        reads = [
+            self.cache.contract_call(self.registry, "getCertificate", 1),
+            self.cache.contract_call(self.registry, "getCertificate", 2),
+            self.cache.event_logs(self.achievements, "AchievementMinted", {"student": STUDENT_A}),
+        ]
+        first = self.cache.read_many(reads)
+        second = self.cache.read_many(reads)
+
+        self.assertEqual(self.provider.round_trips, 1)
+        self.assertEqual(first[0], [STUDENT_A, "ipfs://cert1", 1700000001, "course_completion"])
+        self.assertEqual(first[2][0]["args"]["tokenId"], 7)
+        self.assertEqual(first[2][0]["args"]["score"], 95)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats["hits"], 3)
+
+    def test_concurrent_identical_reads_are_coalesced(self):
+        self.provider.latency = 0.2
+        read = self.cache.contract_call(self.registry, "getStudentCertificates", STUDENT_A)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda _: self.cache.read(read), range(10)))
+
+        self.assertEqual(self.provider.round_trips, 1)
+        self.assertTrue(all(result == [1, 2] for result in results))
+
+    def test_event_log_invalidates_only_matching_entries(self):
+        read_a = self.cache.contract_call(self.registry, "getStudentCertificates", STUDENT_A)
+        read_b = self.cache.contract_call(self.registry, "getStudentCertificates", STUDENT_B)
+        self.cache.read_many([read_a, read_b])
+
+        # ZKPCertificateCreated(certId=3, student=A) seen by the log poller
+        codec = self.provider.w3.codec
+        self.cache.w3.eth = SimpleNamespace(get_logs=lambda params: [{
+            "address": self.registry.address,
+            "topics": [b"\x00" * 32, codec.encode(["uint256"], [3]), codec.encode(["address"], [STUDENT_A])]
+        }])
+        self.cache.on_new_blocks(17, 17)
+        self.cache.read_many([read_a, read_b])
+
+        self.assertEqual(self.provider.round_trips, 2)
+        self.assertEqual(self.cache.stats["invalidations"], 1)
+
+    def test_block_mode_clears_everything(self):
+        self.cache.invalidation = "blocks"
+        read = self.cache.contract_call(self.registry, "getStudentCertificates", STUDENT_B)
+        self.cache.read(read)
+        self.cache.on_new_blocks(5, 6)
+        self.cache.read(read)
+        self.assertEqual(self.provider.round_trips, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.api import discussion_api
+from digital_twin.api.discussion_api import (
+    encode_cursor, decode_cursor, cursor_filter, liked_ids, build_comment_tree, get_discussions
+)
+from digital_twin.models.discussion import Comment, CommentLike, CommentStatus
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+def make_comment(comment_id, minutes, parent=None):
+    return Comment.model_construct(
+        comment_id=comment_id, discussion_id="disc_1", content=comment_id,
+        author_id="did:author", author_name="Author", author_avatar=None,
+        parent_comment_id=parent, reply_count=0, status=CommentStatus.PUBLISHED,
+        is_edited=False, like_count=0,
+        created_at=START + timedelta(minutes=minutes), updated_at=START
+    )
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self):
+        return self.rows
+
+
+class FakeLikeModel:
+    queries = []
+
+    @classmethod
+    def find(cls, query):
+        cls.queries.append(query)
+        return FakeQuery([
+            CommentLike.model_construct(like_id="l1", comment_id="c2", user_id="did:viewer"),
+            CommentLike.model_construct(like_id="l2", comment_id="r1", user_id="did:viewer"),
+        ])
+
+
+class TestDiscussionThreads(unittest.IsolatedAsyncioTestCase):
+    def test_cursor_round_trip_and_filter(self):
+        cursor = encode_cursor(START, "comment_abc")
+        self.assertEqual(decode_cursor(cursor), (START, "comment_abc"))
+        self.assertEqual(cursor_filter(cursor, "created_at", "comment_id", descending=False), {"$or": [
+            {"created_at": {"$gt": START}},
+            {"created_at": START, "comment_id": {"$gt": "comment_abc"}}
+        ]})
+        self.assertIn("$lt", cursor_filter(cursor, "last_activity_at", "discussion_id", descending=True)["$or"][0]["last_activity_at"])
+
+        with self.assertRaises(HTTPException) as ctx:
+            decode_cursor("not-a-cursor")
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    async def test_invalid_discussion_cursor_is_a_client_error(self):
+        class CountQuery:
+            async def count(self):
+                return 0
+
+        with patch.object(discussion_api.Discussion, "find", lambda query: CountQuery()):
+            with self.assertRaises(HTTPException) as ctx:
+                await get_discussions(
+                    course_id=None, module_id=None, lesson_id=None, discussion_type=None, status=None,
+                    search=None, skip=0, limit=20, cursor="not-a-cursor",
+                    current_user=SimpleNamespace(did="did:viewer")
+                )
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    async def test_likes_are_resolved_in_one_query(self):
+        FakeLikeModel.queries = []
+        liked = await liked_ids(FakeLikeModel, "comment_id", ["c1", "c2", "r1"], "did:viewer")
+        self.assertEqual(liked, {"c2", "r1"})
+        self.assertEqual(FakeLikeModel.queries, [{"comment_id": {"$in": ["c1", "c2", "r1"]}, "user_id": "did:viewer"}])
+        self.assertEqual(await liked_ids(FakeLikeModel, "comment_id", [], "did:viewer"), set())
+        self.assertEqual(len(FakeLikeModel.queries), 1)
+
+    def test_replies_are_attached_to_their_parents_in_order(self):
+        comments = [make_comment("c1", 0), make_comment("c2", 1)]
+        replies = [make_comment("r1", 2, parent="c1"), make_comment("r2", 3, parent="c2"), make_comment("r3", 4, parent="c1")]
+        tree = build_comment_tree(comments, replies, {"c2", "r1"})
+
+        self.assertEqual([c.comment_id for c in tree], ["c1", "c2"])
+        self.assertEqual([r.comment_id for r in tree[0].replies], ["r1", "r3"])
+        self.assertEqual([r.comment_id for r in tree[1].replies], ["r2"])
+        self.assertEqual([c.is_liked_by_user for c in tree], [False, True])
+        self.assertTrue(tree[0].replies[0].is_liked_by_user)
+        self.assertEqual(tree[0].replies[0].replies, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
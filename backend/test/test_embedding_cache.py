@@ -0,0 +1,78 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingModel:
+    def __init__(self, offset=0.0):
+        self.documents = []
+        self.queries = []
+        self.offset = offset
+
+    def embed_documents(self, texts):
+        self.documents.append(list(texts))
+        return [[float(len(t)) + self.offset, 0.5] for t in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)) + self.offset, -0.5]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = str(Path(self.tmp.name) / "embeddings.sqlite3")
+
+    def make(self, model, model_name="bge", memory_entries=100):
+        cache = EmbeddingCache(model_name, path=self.path, memory_entries=memory_entries)
+        self.addCleanup(cache.close)
+        return CachedEmbeddings(model, cache)
+
+    def test_only_misses_reach_the_model(self):
+        model = CountingModel()
+        embeddings = self.make(model)
+        first = embeddings.embed_documents(["a", "bb", "a"])
+        second = embeddings.embed_documents_array(["bb", "ccc"])
+
+        self.assertEqual(model.documents, [["a", "bb"], ["ccc"]])
+        self.assertEqual(first, [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]])
+        self.assertEqual(second.dtype, np.float32)
+        self.assertEqual(second.tolist(), [[2.0, 0.5], [3.0, 0.5]])
+
+        # Queries are cached apart from documents with the same text
+        self.assertEqual(embeddings.embed_query("a"), [1.0, -0.5])
+        self.assertEqual(embeddings.embed_query("a"), [1.0, -0.5])
+        self.assertEqual(model.queries, ["a"])
+
+    def test_vectors_persist_and_are_keyed_by_model(self):
+        self.make(CountingModel()).embed_documents(["lesson one", "lesson two"])
+
+        reopened_model = CountingModel()
+        reopened = self.make(reopened_model, memory_entries=1)
+        self.assertEqual(reopened.embed_documents(["lesson two", "lesson one"]), [[10.0, 0.5], [10.0, 0.5]])
+        self.assertEqual(reopened_model.documents, [])
+        self.assertEqual(reopened.cache.info()["disk_hits"], 2)
+
+        other_model = CountingModel(offset=100.0)
+        other = self.make(other_model, model_name="minilm")
+        self.assertEqual(other.embed_documents(["lesson one"]), [[110.0, 0.5]])
+        self.assertEqual(other_model.documents, [["lesson one"]])
+
+        other.cache.clear()
+        self.assertEqual(other.cache.info()["stored"], 0)
+        self.assertEqual(reopened.cache.info()["stored"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import sys
+import json
+import asyncio
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.entitlement_cache import EntitlementCache, Entitlements
+
+PLANS = [
+    {"plan": "basic", "name": "Basic Plan", "features": ["Basic NFT certificates"],
+     "limits": {"max_ai_queries_per_day": 20, "video_quality": "720p", "lab_access": False, "mentoring_sessions": 0}},
+    {"plan": "premium", "name": "Premium Plan", "features": ["Priority support"],
+     "limits": {"max_ai_queries_per_day": -1, "video_quality": "4K", "lab_access": True, "mentoring_sessions": 4,
+                "advanced_features": True}},
+]
+
+
+class FakeRedisService:
+    """In-memory replacement for the RedisService cache helpers"""
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.subscribers = []
+
+    async def get_cache(self, key):
+        return self.store.get(key)
+
+    async def set_cache(self, key, value, ttl=3600):
+        self.store[key] = value
+        self.ttls[key] = ttl
+
+    async def delete_cache(self, key):
+        self.store.pop(key, None)
+
+    async def clear_cache_pattern(self, pattern):
+        prefix = pattern.rstrip("*")
+        for key in [k for k in self.store if k.startswith(prefix)]:
+            del self.store[key]
+
+    async def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            if subscriber.channel == channel:
+                subscriber.queue.put_nowait({"type": "message", "data": json.dumps(message)})
+
+    async def subscribe(self, channel):
+        subscriber = FakePubSub(channel)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+
+class FakePubSub:
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue = asyncio.Queue()
+        self.queue.put_nowait({"type": "subscribe", "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        pass
+
+
+class FakeSubscription:
+    def __init__(self, plan, days=30, status="active"):
+        self.plan = plan
+        self.status = status
+        self.billing_cycle = "monthly"
+        self.price = 299000
+        self.start_date = datetime.now(timezone.utc)
+        self.end_date = self.start_date + timedelta(days=days)
+
+    def is_active(self):
+        return self.status == "active" and self.end_date > datetime.now(timezone.utc)
+
+
+class CountingEntitlementCache(EntitlementCache):
+    """Serves subscriptions and courses from dicts and counts the lookups"""
+
+    def __init__(self, redis_service, subscriptions=None, courses=None):
+        super().__init__(redis_service=redis_service)
+        self.subscriptions = subscriptions or {}
+        self.courses = courses or {}
+        self.lookups = {"subscription": 0, "course": 0, "plans": 0}
+
+    async def load_plans(self):
+        self.lookups["plans"] += 1
+        self.use_plans(PLANS)
+
+    async def _load_subscription(self, user_id):
+        self.lookups["subscription"] += 1
+        return self.subscriptions.get(user_id)
+
+    async def _load_course_level(self, course_id):
+        self.lookups["course"] += 1
+        if course_id not in self.courses:
+            return False, None
+        return True, self.courses[course_id]
+
+
+class TestEntitlements(unittest.TestCase):
+    def setUp(self):
+        self.cache = EntitlementCache(redis_service=FakeRedisService())
+        self.cache.use_plans(PLANS)
+
+    def test_free_tier(self):
+        free = self.cache.build("did:1", None)
+
+        self.assertFalse(free.has_subscription)
+        self.assertEqual(free.daily_ai_queries, 5)
+        self.assertTrue(free.has_feature("ai_queries"))
+        self.assertFalse(free.has_feature("lab_access"))
+        self.assertTrue(free.can_access_course(True, "beginner"))
+        self.assertFalse(free.can_access_course(True, None))
+        self.assertEqual(free.to_plan_info()["limits"]["video_quality"], "480p")
+
+    def test_plan_limits_and_computed_features(self):
+        basic = self.cache.build("did:1", FakeSubscription("basic"))
+        premium = self.cache.build("did:2", FakeSubscription("premium"))
+
+        self.assertEqual((basic.plan_name, basic.daily_ai_queries), ("Basic Plan", 20))
+        self.assertTrue(basic.can_access_course(True, "intermediate"))
+        self.assertFalse(basic.can_access_course(True, "advanced"))
+        self.assertFalse(basic.to_plan_info()["limits"]["mentoring_sessions"])
+        self.assertEqual(premium.daily_ai_queries, -1)
+        self.assertTrue(premium.can_access_course(False, None))
+        info = premium.to_plan_info()
+        self.assertTrue(info["limits"]["4k_video"])
+        self.assertTrue(info["limits"]["advanced_ai_tutor"])
+        self.assertEqual(info["days_remaining"], 29)
+
+    def test_expired_subscription_is_free_tier(self):
+        self.assertFalse(self.cache.build("did:1", FakeSubscription("premium", days=-1)).has_subscription)
+
+    def test_cache_round_trip(self):
+        entitlements = self.cache.build("did:1", FakeSubscription("basic"))
+        self.assertEqual(Entitlements.from_cache(entitlements.to_cache()), entitlements)
+
+
+class TestEntitlementCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedisService()
+        self.subscriptions = {"did:basic": FakeSubscription("basic", days=1)}
+        self.cache = CountingEntitlementCache(self.redis, self.subscriptions, {"c1": "advanced"})
+
+    async def test_resolve_hits_mongo_once(self):
+        for _ in range(3):
+            entitlements = await self.cache.resolve("did:basic")
+
+        self.assertEqual(entitlements.plan, "basic")
+        self.assertEqual(self.cache.lookups, {"subscription": 1, "course": 0, "plans": 1})
+        # Snapshot never outlives the subscription
+        self.assertLessEqual(self.redis.ttls["entitlements:did:basic"], 300)
+
+        # A second worker only has the Redis tier
+        other = CountingEntitlementCache(self.redis)
+        self.assertEqual((await other.resolve("did:basic")).plan_name, "Basic Plan")
+        self.assertEqual(other.lookups["subscription"], 0)
+
+    async def test_invalidate_user_picks_up_new_subscription(self):
+        self.assertFalse((await self.cache.resolve("did:new")).has_subscription)
+
+        self.subscriptions["did:new"] = FakeSubscription("premium")
+        self.assertFalse((await self.cache.resolve("did:new")).has_subscription)
+        await self.cache.invalidate_user("did:new")
+
+        self.assertEqual((await self.cache.resolve("did:new")).plan, "premium")
+
+    async def test_invalidate_plans_reloads_table(self):
+        await self.cache.resolve("did:basic")
+        await self.cache.invalidate_plans()
+
+        self.assertFalse(self.cache.plans_loaded)
+        self.assertIsNone(await self.cache.get("did:basic"))
+        await self.cache.resolve("did:basic")
+        self.assertEqual(self.cache.lookups["plans"], 2)
+
+    async def test_invalidation_reaches_other_workers(self):
+        other = CountingEntitlementCache(self.redis, self.subscriptions)
+        other.start()
+        self.addAsyncCleanup(other.stop)
+        await asyncio.sleep(0)
+
+        self.assertEqual((await other.resolve("did:basic")).plan, "basic")
+        self.subscriptions["did:basic"].status = "cancelled"
+        await self.cache.invalidate_user("did:basic")
+        await asyncio.sleep(0)
+
+        self.assertIsNone(other.get_local("did:basic"))
+        self.assertFalse((await other.resolve("did:basic")).has_subscription)
+
+        await self.cache.invalidate_plans()
+        await asyncio.sleep(0)
+        self.assertIsNone(other.get_local("did:basic"))
+        self.assertFalse(other.plans_loaded)
+
+    async def test_snapshot_without_plan_table_is_not_cached(self):
+        async def failing_load_plans():
+            self.cache.lookups["plans"] += 1  # MongoDB down: load_plans logs and returns
+
+        self.cache.load_plans = failing_load_plans
+        entitlements = await self.cache.resolve("did:basic")
+
+        self.assertEqual(entitlements.plan, "basic")
+        self.assertIsNone(await self.cache.get("did:basic"))
+        # Free-tier snapshots do not depend on the plan table
+        await self.cache.resolve("did:free")
+        self.assertIsNotNone(await self.cache.get("did:free"))
+
+        del self.cache.load_plans
+        self.assertEqual((await self.cache.resolve("did:basic")).plan_name, "Basic Plan")
+        self.assertIsNotNone(await self.cache.get("did:basic"))
+
+    async def test_course_levels_are_cached(self):
+        self.assertEqual(await self.cache.course_level("c1"), (True, "advanced"))
+        self.assertEqual(await self.cache.course_level("c1"), (True, "advanced"))
+        self.assertEqual(await self.cache.course_level("missing"), (False, None))
+        self.assertEqual(self.cache.lookups["course"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
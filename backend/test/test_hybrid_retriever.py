@@ -0,0 +1,86 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.hybrid_retriever import (
+    HybridRetriever, LexicalIndex, RetrievalConfig, RetrievedChunk,
+    build_filter_expr, reciprocal_rank_fusion
+)
+
+CHUNKS = {
+    1: ("Blockchain ledgers record transactions in blocks", {"document_type": "lesson"}),
+    2: ("Course CS101 covers Python basics and loops", {"document_type": "lesson"}),
+    3: ("Hợp đồng thông minh chạy trên Ethereum", {"document_type": "general"}),
+    4: ("Quiz: which consensus does Ethereum use?", {"document_type": "assessment"}),
+}
+
+
+class FakeVectorStore:
+    """Returns a fixed semantic ranking and records the pushed-down expression"""
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+        self.exprs = []
+
+    def search(self, embedding, k, expr):
+        self.exprs.append(expr)
+        return [RetrievedChunk(id=key, text=CHUNKS[key][0], metadata=CHUNKS[key][1]) for key in self.ranking[:k]]
+
+
+class TestHybridRetriever(unittest.TestCase):
+    def setUp(self):
+        self.index = LexicalIndex()
+        for key, (text, metadata) in CHUNKS.items():
+            self.index.add(key, text, metadata)
+
+    def test_lexical_index_matches_codes_and_vietnamese_terms(self):
+        self.assertEqual([hit.id for hit in self.index.search("what is cs101")], [2])
+        self.assertEqual(self.index.search("hợp đồng")[0].id, 3)
+        self.assertEqual([hit.id for hit in self.index.search("ethereum", filters={"document_type": "assessment"})], [4])
+
+        self.index.remove(2)
+        self.assertEqual(self.index.search("cs101"), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_rrf_favours_ids_ranked_by_both_lists(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+        self.assertEqual([key for key, _ in fused], ["b", "c", "a"])
+
+    def test_filter_expression(self):
+        self.assertEqual(build_filter_expr({"document_type": "lesson"}), "metadata like '%\"document_type\": \"lesson\"%'")
+        self.assertEqual(
+            build_filter_expr({"document_type": ["lesson", "exercise"], "subject": None}),
+            "(metadata like '%\"document_type\": \"lesson\"%' or metadata like '%\"document_type\": \"exercise\"%')"
+        )
+        self.assertEqual(build_filter_expr(None), "")
+
+    def test_exact_term_hit_is_fused_into_vector_results(self):
+        vectors = FakeVectorStore([1, 4, 3])
+        retriever = HybridRetriever(vectors.search, self.index, RetrievalConfig(candidates=3))
+        chunks = retriever.retrieve("CS101 loops", [0.0], top_k=2)
+        self.assertIn(2, [chunk.id for chunk in chunks])
+        self.assertEqual(len(chunks), 2)
+
+        lessons = retriever.retrieve("ethereum", [0.0], top_k=3, filters={"document_type": "lesson"})
+        self.assertEqual({chunk.id for chunk in lessons}, {1})
+        self.assertIn("lesson", vectors.exprs[-1])
+
+    def test_reranker_and_context_budget(self):
+        class LengthReranker:
+            def score(self, query, texts):
+                return [-len(text) for text in texts]
+
+        config = RetrievalConfig(candidates=4, max_context_chars=80)
+        retriever = HybridRetriever(FakeVectorStore([1, 2, 3, 4]).search, self.index, config, reranker=LengthReranker())
+        chunks = retriever.retrieve("ethereum blockchain", [0.0], top_k=4)
+        self.assertEqual([chunk.id for chunk in chunks], [3, 4])
+        self.assertEqual(len(retriever.retrieve("ethereum blockchain", [0.0], top_k=4, trim=False)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.ingestion import IngestionPipeline, IngestionConfig, content_hash
+
+DOCS = {
+    "a.txt": ["alpha one", "alpha two", "shared chunk"],
+    "b.txt": ["beta one", "shared   chunk", "beta two", "beta three"],
+    "empty.txt": [],
+}
+
+
+class FakeSink:
+    def __init__(self, fail_first=False, fail_embed=False):
+        self.embed_calls = []
+        self.fail_embed = fail_embed
+        self.inserts = []
+        self.flushes = 0
+        self.fail_first = fail_first
+
+    def load(self, path):
+        return [(text, {"source": path}) for text in DOCS[path]]
+
+    def embed(self, texts):
+        if self.fail_embed:
+            self.fail_embed = False
+            raise RuntimeError("embedding model not loaded")
+        self.embed_calls.append(len(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def insert(self, vectors, texts, metadatas):
+        if self.fail_first:
+            self.fail_first = False
+            raise RuntimeError("milvus unavailable")
+        self.inserts.append((vectors, texts, metadatas))
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestIngestionPipeline(unittest.TestCase):
+    def make_pipeline(self, sink, known=None, **config):
+        return IngestionPipeline(sink.load, sink.embed, sink.insert, sink.flush, known_hashes=known,
+                                 config=IngestionConfig(**config))
+
+    def test_batches_dedupes_and_flushes_once(self):
+        sink = FakeSink()
+        result = self.make_pipeline(sink, loader_workers=2, embed_batch_size=2, insert_batch_size=4).run(DOCS)
+
+        self.assertEqual((result.files, result.failed_files), (3, 1))
+        self.assertEqual((result.chunks, result.inserted, result.skipped_duplicates), (7, 6, 1))
+        self.assertTrue(all(n <= 2 for n in sink.embed_calls))
+        self.assertEqual([len(texts) for _, texts, _ in sink.inserts], [4, 2])
+        self.assertTrue(all(v.dtype == np.float32 and v.shape[1] == 2 for v, _, _ in sink.inserts))
+        self.assertEqual(sink.flushes, 1)
+        self.assertEqual(result.per_file["a.txt"]["inserted"] + result.per_file["b.txt"]["inserted"], 6)
+        metadata = sink.inserts[0][2][0]
+        self.assertEqual(metadata["content_hash"], content_hash(sink.inserts[0][1][0]))
+
+    def test_reupload_skips_unchanged_chunks(self):
+        sink = FakeSink()
+        known = set()
+        self.make_pipeline(sink, known).run(["a.txt"])
+        result = self.make_pipeline(sink, known).run(["a.txt", "b.txt"])
+        self.assertEqual((result.inserted, result.skipped_duplicates), (3, 4))
+        self.assertEqual(sink.flushes, 2)
+
+        nothing_new = self.make_pipeline(sink, known).run(["b.txt"])
+        self.assertEqual(nothing_new.inserted, 0)
+        self.assertEqual(sink.flushes, 2)
+
+    def test_failed_insert_can_be_retried(self):
+        sink = FakeSink(fail_first=True)
+        known = set()
+        result = self.make_pipeline(sink, known).run(["a.txt"])
+        self.assertEqual(result.inserted, 0)
+        self.assertEqual(result.per_file["a.txt"]["status"], "failed")
+        self.assertEqual(sink.flushes, 0)
+
+        retry = self.make_pipeline(sink, known).run(["a.txt"])
+        self.assertEqual(retry.inserted, 3)
+
+    def test_failed_embedding_can_be_retried(self):
+        sink = FakeSink(fail_embed=True)
+        known = set()
+        result = self.make_pipeline(sink, known, embed_batch_size=2).run(["a.txt"])
+        self.assertEqual((result.inserted, result.skipped_duplicates), (1, 0))
+        self.assertIn("embedding failed", result.errors[0])
+        self.assertEqual(result.per_file["a.txt"]["status"], "failed")
+
+        retry = self.make_pipeline(sink, known).run(["a.txt"])
+        self.assertEqual((retry.inserted, retry.skipped_duplicates), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.ipfs_cache import CIDCache, compute_raw_cid, verify_cid
+from digital_twin.services.ipfs_service import IPFSService
+
+HELLO_CID = "bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakePool:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    async def request(self, provider, method, url, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.content)
+
+
+class FakePinata:
+    """Pinata pinFileToIPFS returning a dag-pb CIDv0, plus a gateway that must not be reached"""
+
+    def __init__(self, cid):
+        self.cid = cid
+        self.pins = []
+        self.gateway_calls = 0
+
+    async def request(self, provider, method, url, **kwargs):
+        if provider == "pinata":
+            self.pins.append((url, kwargs["files"]["file"][1]))
+            return FakeResponse(json.dumps({"IpfsHash": self.cid}).encode())
+        self.gateway_calls += 1
+        raise AssertionError(f"unexpected gateway request: {url}")
+
+
+class TestCIDCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = CIDCache(
+            cache_dir=self.tmp.name,
+            memory_max_items=2,
+            memory_max_bytes=1024,
+            disk_max_bytes=25
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_memory_then_disk_hits(self):
+        self.cache.put_sync("bafyaaa1", b"0123456789")
+        self.assertEqual(self.cache.get_sync("bafyaaa1"), b"0123456789")
+        self.assertEqual(self.cache.counters["memory_hits"], 1)
+
+        self.cache.clear_memory()
+        self.assertEqual(self.cache.get_sync("bafyaaa1"), b"0123456789")
+        self.assertEqual(self.cache.counters["disk_hits"], 1)
+        self.assertTrue((Path(self.tmp.name) / "aa" / "bafyaaa1").exists())
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get_sync("bafymissing"))
+        self.assertIsNone(self.cache.get_sync("../etc/passwd"))
+        self.assertEqual(self.cache.counters["misses"], 1)
+
+    def test_memory_lru_eviction(self):
+        for cid in ("bafy01", "bafy02", "bafy03"):
+            self.cache.put_sync(cid, b"x")
+        self.assertEqual(self.cache.stats()["memory_items"], 2)
+        self.assertEqual(self.cache.counters["memory_evictions"], 1)
+
+    def test_disk_size_eviction(self):
+        self.cache.put_sync("bafy01", b"0123456789")
+        self.cache.put_sync("bafy02", b"0123456789")
+        self.cache.get_sync("bafy01")  # bafy02 becomes least recently used on disk
+        self.cache.put_sync("bafy03", b"0123456789")
+        stats = self.cache.stats()
+        self.assertEqual(stats["disk_evictions"], 1)
+        self.assertLessEqual(stats["disk_bytes"], 25)
+
+    def test_disk_index_survives_restart(self):
+        self.cache.put_sync("bafy01", b"abc")
+        reopened = CIDCache(cache_dir=self.tmp.name)
+        self.assertEqual(reopened.get_sync("bafy01"), b"abc")
+        self.assertEqual(reopened.counters["disk_hits"], 1)
+
+
+class TestCIDVerification(unittest.TestCase):
+    def test_raw_cid_matches_ipfs(self):
+        self.assertEqual(compute_raw_cid(b"hello world"), HELLO_CID)
+
+    def test_verify_cid(self):
+        self.assertTrue(verify_cid(HELLO_CID, b"hello world"))
+        self.assertFalse(verify_cid(HELLO_CID, b"hello world!"))
+        # dag-pb CIDs cannot be checked without rebuilding the DAG
+        self.assertIsNone(verify_cid("QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG", b"hello world"))
+
+
+class TestIPFSServiceCaching(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = IPFSService.__new__(IPFSService)
+        self.service.ipfs_gateway = "https://gateway.example"
+        self.service.cache = CIDCache(cache_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_mismatched_gateway_content_is_not_cached(self):
+        self.service.http = FakePool(b"tampered")
+        self.assertEqual(asyncio.run(self.service.get_content(HELLO_CID)), b"tampered")
+        self.assertIsNone(self.service.cache.get_sync(HELLO_CID))
+
+    def test_verified_content_is_cached_and_bypass_skips_it(self):
+        self.service.http = FakePool(b"hello world")
+        asyncio.run(self.service.get_content(HELLO_CID))
+        asyncio.run(self.service.get_content(HELLO_CID))
+        self.assertEqual(self.service.http.calls, 1)
+
+        asyncio.run(self.service.get_content(HELLO_CID, use_cache=False))
+        self.assertEqual(self.service.http.calls, 2)
+
+    def test_pinned_json_is_read_back_from_cache(self):
+        cid = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+        self.service.pinata_api_key = "key"
+        self.service.pinata_secret_key = "secret"
+        self.service.pinata_base_url = "https://api.pinata.example"
+        self.service.web3_storage_token = None
+        self.service.http = FakePinata(cid)
+        data = {"twin_id": "did:learntwin:student001", "version": 3}
+
+        self.assertEqual(asyncio.run(self.service.pin_json(data, name="twin")), cid)
+        self.assertEqual(asyncio.run(self.service.get_json(cid)), data)
+
+        # The exact serialized bytes were pinned, and the read made no gateway call
+        url, pinned = self.service.http.pins[0]
+        self.assertTrue(url.endswith("/pinning/pinFileToIPFS"))
+        self.assertEqual(json.loads(pinned), data)
+        self.assertEqual(self.service.http.gateway_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
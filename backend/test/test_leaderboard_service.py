@@ -0,0 +1,271 @@
+import sys
+import fnmatch
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.leaderboard_service import LeaderboardService, day_bucket
+from digital_twin.models.course import Enrollment
+from digital_twin.models.quiz_achievement import UserAchievement
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        results = [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+class FakeRedisClient:
+    """In-memory stand-in for the sorted-set and hash commands the leaderboards use"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _ranked(self, key):
+        # Redis orders equal scores by member; ZREVRANGE reverses both
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    async def zincrby(self, key, amount, member):
+        zset = self.data.setdefault(key, {})
+        zset[member] = zset.get(member, 0.0) + amount
+        return zset[member]
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        return self._ranked(key)[start:end + 1]
+
+    async def zrevrank(self, key, member):
+        members = [m for m, _ in self._ranked(key)]
+        return members.index(member) if member in members else None
+
+    async def zscore(self, key, member):
+        return self.data.get(key, {}).get(member)
+
+    async def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    async def zunionstore(self, dest, keys):
+        union = {}
+        for key in keys:
+            for member, score in self.data.get(key, {}).items():
+                union[member] = union.get(member, 0.0) + score
+        self.data.pop(dest, None)
+        if union:
+            self.data[dest] = union
+        return len(union)
+
+    async def hincrby(self, key, field, amount):
+        values = self.data.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def rename(self, source, dest):
+        self.data[dest] = self.data.pop(source)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def expire(self, key, seconds):
+        return key in self.data
+
+    async def scan_iter(self, match=None):
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatch(key, match):
+                yield key
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.client = FakeRedisClient()
+
+    async def get_client(self):
+        return self.client
+
+    async def run_script(self, name, keys, args):
+        data = self.client.data
+        if name == "journal_if_locked":
+            if keys[0] not in data:
+                return 0
+            data.setdefault(keys[1], []).append(args[0])
+            return 1
+        if name == "drain_and_release":
+            if data.get(keys[0]) != args[0]:
+                return []
+            data.pop(keys[0])
+            return data.pop(keys[1], [])
+        raise KeyError(name)
+
+
+class TestLeaderboardService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedisService()
+        self.redis.client.data["leaderboard:built"] = "2025-01-01T00:00:00+00:00"
+        self.redis.client.data["leaderboard:windows_refreshed"] = "2025-01-01T00:00:00+00:00"
+        self.service = LeaderboardService(redis_service=self.redis)
+        self.now = datetime.now(timezone.utc)
+
+    async def test_achievements_rank_by_count_then_points(self):
+        await self.service.record_achievement("did:alice", 10)
+        await self.service.record_achievement("did:alice", 5)
+        await self.service.record_achievement("did:bob", 500)
+        await self.service.record_achievement("did:carol", 20)
+
+        page = await self.service.get_page("achievements")
+        self.assertEqual([e["user_id"] for e in page["entries"]], ["did:alice", "did:bob", "did:carol"])
+        self.assertEqual(page["entries"][0], {"user_id": "did:alice", "rank": 1, "entries": 2, "points": 15})
+        self.assertEqual(page["ranked_users"], 3)
+
+        second_page = await self.service.get_page("achievements", skip=2, limit=2)
+        self.assertEqual([(e["user_id"], e["rank"]) for e in second_page["entries"]], [("did:carol", 3)])
+
+        position = await self.service.get_position("achievements", "did:carol")
+        self.assertEqual((position["rank"], position["entries"], position["points"]), (3, 1, 20))
+        self.assertIsNone((await self.service.get_position("achievements", "did:dave"))["rank"])
+        self.assertEqual(await self.service.get_totals("achievements"), {"entries": 4, "points": 535, "ranked_users": 3})
+
+    async def test_windows_only_count_recent_events_and_refresh_ages_them_out(self):
+        await self.service.record_certificate("did:alice", self.now - timedelta(days=40))
+        await self.service.record_certificate("did:bob", self.now - timedelta(days=10))
+        await self.service.record_certificate("did:bob", self.now)
+
+        async def members(timeframe):
+            page = await self.service.get_page("certificates", timeframe)
+            return {e["user_id"]: e["entries"] for e in page["entries"]}
+
+        self.assertEqual(await members("all"), {"did:alice": 1, "did:bob": 2})
+        self.assertEqual(await members("week"), {"did:bob": 1})
+        self.assertEqual(await members("month"), {"did:bob": 2})
+        self.assertEqual(await members("year"), {"did:alice": 1, "did:bob": 2})
+
+        # The week-old bucket leaves the window once it is re-derived
+        client = self.redis.client
+        old_day = f"leaderboard:certificates:day:{day_bucket(self.now)}"
+        client.data[f"leaderboard:certificates:day:{day_bucket(self.now - timedelta(days=8))}"] = client.data.pop(old_day)
+        await self.service.refresh_windows()
+        self.assertEqual(await members("week"), {})
+        self.assertEqual(await members("month"), {"did:bob": 2})
+
+    async def test_rebuild_replaces_boards_from_aggregates(self):
+        client = self.redis.client
+        client.data["leaderboard:certificates:day:20000101"] = {"did:ghost": 3.0}
+        await self.service.record_certificate("did:ghost")
+        today = day_bucket(self.now)
+        rows = {
+            Enrollment: [{"_id": {"user": "did:alice", "day": today}, "count": 2}],
+            UserAchievement: [{"_id": {"user": "did:bob", "day": today}, "count": 1, "points": 50}],
+        }
+
+        async def aggregate(model, pipeline):
+            for row in rows.get(model, []):
+                yield row
+
+        self.service._aggregate = aggregate
+        del client.data["leaderboard:built"]
+        await self.service.rebuild()
+
+        certificates = await self.service.get_page("certificates")
+        self.assertEqual([(e["user_id"], e["entries"]) for e in certificates["entries"]], [("did:alice", 2)])
+        week = await self.service.get_page("achievements", "week")
+        self.assertEqual([(e["user_id"], e["points"]) for e in week["entries"]], [("did:bob", 50)])
+        self.assertNotIn("leaderboard:certificates:day:20000101", client.data)
+        self.assertEqual(await self.service.get_totals("certificates"), {"entries": 2, "points": 0, "ranked_users": 1})
+        self.assertIn("leaderboard:built", client.data)
+        self.assertNotIn("leaderboard:rebuild_lock", client.data)
+
+    async def test_events_during_rebuild_are_replayed_after_the_swap(self):
+        client = self.redis.client
+        earlier = self.now - timedelta(hours=1)
+
+        async def aggregate(model, pipeline):
+            if model is UserAchievement:
+                # An award lands mid-rebuild; one from before the snapshot is already aggregated
+                await self.service.record_achievement("did:alice", 10, datetime.now(timezone.utc))
+                await self.service.record_achievement("did:bob", 5, earlier)
+                yield {"_id": {"user": "did:bob", "day": day_bucket(earlier)}, "count": 1, "points": 5}
+
+        self.service._aggregate = aggregate
+        await self.service.rebuild()
+
+        page = await self.service.get_page("achievements")
+        self.assertEqual(
+            [(e["user_id"], e["entries"], e["points"]) for e in page["entries"]],
+            [("did:alice", 1, 10), ("did:bob", 1, 5)]
+        )
+        self.assertNotIn("leaderboard:rebuild_lock", client.data)
+        self.assertNotIn("leaderboard:rebuild_journal", client.data)
+
+        await self.service.record_achievement("did:carol", 1)
+        self.assertEqual((await self.service.get_position("achievements", "did:carol"))["entries"], 1)
+
+    async def test_certificate_for_an_earlier_completion_issued_mid_rebuild_is_kept(self):
+        completed = self.now - timedelta(days=3)
+
+        async def aggregate(model, pipeline):
+            if model is Enrollment:
+                # The aggregate read Enrollment before this certificate was issued
+                await self.service.record_certificate("did:alice", completed, datetime.now(timezone.utc))
+            return
+            yield
+
+        self.service._aggregate = aggregate
+        self.assertTrue(await self.service.rebuild())
+
+        position = await self.service.get_position("certificates", "did:alice")
+        self.assertEqual((position["rank"], position["entries"]), (1, 1))
+        self.assertIn(f"leaderboard:certificates:day:{day_bucket(completed)}", self.redis.client.data)
+
+    async def test_rebuild_reports_a_rebuild_already_running(self):
+        self.redis.client.data["leaderboard:rebuild_lock"] = "other-owner"
+        self.assertFalse(await self.service.rebuild())
+
+    async def test_rebuild_keeps_a_lock_taken_over_by_another_owner(self):
+        client = self.redis.client
+
+        async def aggregate(model, pipeline):
+            # Our lock expired and another rebuild acquired it
+            client.data["leaderboard:rebuild_lock"] = "other-owner"
+            return
+            yield
+
+        self.service._aggregate = aggregate
+        await self.service.rebuild()
+        self.assertEqual(client.data["leaderboard:rebuild_lock"], "other-owner")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+import sys
+import copy
+import asyncio
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from pymongo.errors import DuplicateKeyError
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+TEST_DIR = Path(__file__).resolve().parent
+if str(TEST_DIR) not in sys.path:
+    sys.path.append(str(TEST_DIR))
+
+from smtp_sink import SMTPSink
+from digital_twin.services.email_service import EmailService
+from digital_twin.services.notification_outbox import NotificationOutboxDispatcher, SMTPConnectionPool
+from digital_twin.services.notification_service import NotificationService
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, option) for option in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs, projection=None):
+        self.docs = docs
+        self.projection = projection
+
+    def sort(self, key, direction):
+        self.docs.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        docs = self.docs[:length] if length else self.docs
+        if self.projection:
+            # Projected after sort/limit, as MongoDB does
+            docs = [{k: v for k, v in d.items() if k in self.projection or k == "_id"} for d in docs]
+        return docs
+
+
+class FakeCollection:
+    """In-memory stand-in for the pymongo collection calls the dispatcher makes"""
+
+    def __init__(self, docs=None, unique=None):
+        self.docs = list(docs or [])
+        self.unique = unique
+        self.find_calls = 0
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        return FakeCursor([copy.deepcopy(d) for d in self.docs if _matches(d, query)], projection)
+
+    async def insert_one(self, doc):
+        if self.unique and any(d[self.unique] == doc[self.unique] for d in self.docs):
+            raise DuplicateKeyError("duplicate key")
+        doc = dict(doc, _id=len(self.docs) + 1)
+        self.docs.append(doc)
+
+    def _apply(self, doc, update):
+        doc.update(update.get("$set", {}))
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return
+
+    def by_key(self, event_key):
+        return next(d for d in self.docs if d["event_key"] == event_key)
+
+
+USERS = [
+    {"did": f"did:learntwin:student{i}", "email": f"student{i}@example.com", "name": f"Student {i}"}
+    for i in range(5)
+]
+
+
+class TestNotificationOutbox(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sink = await SMTPSink().start()
+        self.pool = SMTPConnectionPool("127.0.0.1", self.sink.port, "noreply@learntwinchain.local", size=1)
+        self.outbox_collection = FakeCollection(unique="event_key")
+        self.users_collection = FakeCollection(USERS)
+        self.dispatcher = NotificationOutboxDispatcher(
+            email_service=EmailService(),
+            smtp_pool=self.pool,
+            outbox_collection=self.outbox_collection,
+            users_collection=self.users_collection,
+            batch_size=10,
+            max_attempts=3,
+            backoff_seconds=60
+        )
+        self.notifications = NotificationService(outbox=self.dispatcher)
+
+    async def asyncTearDown(self):
+        await self.dispatcher.stop()
+        await self.sink.stop()
+
+    async def test_notification_is_queued_without_sending(self):
+        result = await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-1", "Quiz Master", "quiz", 50)
+
+        self.assertTrue(result["success"])
+        self.assertFalse(result["data"]["duplicate"])
+        self.assertEqual(self.sink.messages, [])
+        self.assertEqual(self.outbox_collection.by_key(result["data"]["event_key"])["status"], "pending")
+
+    async def test_repeated_event_is_queued_once(self):
+        first = await self.notifications.send_course_completion_notification(
+            USERS[0]["did"], "Python 101", "Course Completion: Python 101", "course_completion")
+        second = await self.notifications.send_course_completion_notification(
+            USERS[0]["did"], "Python 101", "Course Completion: Python 101", "course_completion")
+
+        self.assertEqual(first["data"]["event_key"], second["data"]["event_key"])
+        self.assertTrue(second["data"]["duplicate"])
+        self.assertEqual(len(self.outbox_collection.docs), 1)
+
+        await self.dispatcher.run_once()
+        self.assertEqual(len(self.sink.messages), 1)
+
+    async def test_repeated_achievement_is_a_new_event(self):
+        first = await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-streak-1", "Streak", "streak")
+        again = await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-streak-1", "Streak", "streak")
+        earned_again = await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-streak-2", "Streak", "streak")
+
+        self.assertTrue(again["data"]["duplicate"])
+        self.assertFalse(earned_again["data"]["duplicate"])
+        self.assertNotEqual(first["data"]["event_key"], earned_again["data"]["event_key"])
+        self.assertEqual(len(self.outbox_collection.docs), 2)
+
+    async def test_batch_is_sent_over_one_connection(self):
+        for user in USERS:
+            await self.notifications.send_certificate_notification(user["did"], "Blockchain Basics", "course_completion")
+
+        result = await self.dispatcher.run_once()
+
+        self.assertEqual(result["sent"], 5)
+        self.assertEqual(self.sink.sessions, 1)
+        self.assertEqual(self.pool.stats["connections_opened"], 1)
+        self.assertEqual(self.users_collection.find_calls, 1)
+        self.assertEqual(sorted(m.rcpt_tos[0] for m in self.sink.messages), sorted(u["email"] for u in USERS))
+        message = next(m.message for m in self.sink.messages if m.rcpt_tos[0] == USERS[0]["email"])
+        self.assertEqual(message["Subject"], "Certificate Earned: Blockchain Basics - LearnTwinChain")
+        self.assertIn("Blockchain Basics", message.get_content())
+        self.assertIn("Hello Student 0,", message.get_content())
+        self.assertTrue(all(d["status"] == "sent" and d["attempts"] == 1 for d in self.outbox_collection.docs))
+
+        # The connection stays open for the next batch
+        await self.notifications.send_learning_milestone_notification(USERS[0]["did"], "10 lessons", "Ten lessons done", "lessons")
+        await self.dispatcher.run_once()
+        self.assertEqual(self.sink.sessions, 1)
+        self.assertEqual(len(self.sink.messages), 6)
+
+    async def test_transient_failure_is_retried_with_backoff(self):
+        queued = await self.notifications.send_achievement_notification(USERS[1]["did"], "ua-2", "Streak", "streak")
+        self.sink.fail_next(1, code=451)
+
+        result = await self.dispatcher.run_once()
+        entry = self.outbox_collection.by_key(queued["data"]["event_key"])
+        self.assertEqual(result["retrying"], 1)
+        self.assertEqual(entry["status"], "pending")
+        self.assertEqual(entry["attempts"], 1)
+        self.assertGreater(entry["next_attempt_at"], datetime.now(timezone.utc) + timedelta(seconds=30))
+        self.assertIn("451", entry["last_error"])
+
+        # Not due yet
+        self.assertEqual((await self.dispatcher.run_once())["claimed"], 0)
+
+        entry["next_attempt_at"] = datetime.now(timezone.utc)
+        await self.dispatcher.run_once()
+        self.assertEqual(entry["status"], "sent")
+        self.assertEqual(entry["attempts"], 2)
+        self.assertEqual(len(self.sink.messages), 1)
+
+    async def test_gives_up_after_max_attempts(self):
+        queued = await self.notifications.send_achievement_notification(USERS[1]["did"], "ua-3", "Streak", "streak")
+        entry = self.outbox_collection.by_key(queued["data"]["event_key"])
+        self.sink.fail_next(3, code=421)
+
+        for _ in range(3):
+            entry["next_attempt_at"] = datetime.now(timezone.utc)
+            await self.dispatcher.run_once()
+
+        self.assertEqual(entry["status"], "failed")
+        self.assertEqual(entry["attempts"], 3)
+
+    async def test_rejected_recipient_fails_without_retry(self):
+        self.sink.reject_recipients.add(USERS[2]["email"])
+        rejected = await self.notifications.send_achievement_notification(USERS[2]["did"], "ua-4", "Streak", "streak")
+        accepted = await self.notifications.send_achievement_notification(USERS[3]["did"], "ua-5", "Streak", "streak")
+
+        await self.dispatcher.run_once()
+
+        self.assertEqual(self.outbox_collection.by_key(rejected["data"]["event_key"])["status"], "failed")
+        self.assertEqual(self.outbox_collection.by_key(accepted["data"]["event_key"])["status"], "sent")
+        self.assertEqual(self.sink.sessions, 1)
+
+    async def test_reconnects_when_server_drops_idle_connection(self):
+        await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-6", "First", "quiz")
+        await self.dispatcher.run_once()
+        self.sink.drop_connections()
+
+        await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-7", "Second", "quiz")
+        result = await self.dispatcher.run_once()
+
+        self.assertEqual(result["sent"], 1)
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.sessions, 2)
+
+    async def test_unknown_user_is_skipped(self):
+        queued = await self.notifications.send_achievement_notification("did:learntwin:ghost", "ua-8", "Streak", "streak")
+
+        result = await self.dispatcher.run_once()
+
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual(self.outbox_collection.by_key(queued["data"]["event_key"])["status"], "skipped")
+        self.assertEqual(self.sink.messages, [])
+
+    async def test_stale_claim_is_reclaimed(self):
+        queued = await self.notifications.send_achievement_notification(USERS[4]["did"], "ua-9", "Streak", "streak")
+        entry = self.outbox_collection.by_key(queued["data"]["event_key"])
+        entry.update(status="sending", claimed_by="dead-worker", claimed_at=datetime.now(timezone.utc) - timedelta(hours=1))
+
+        await self.dispatcher.run_once()
+
+        self.assertEqual(entry["status"], "sent")
+        self.assertEqual(len(self.sink.messages), 1)
+
+    async def test_background_loop_wakes_on_enqueue(self):
+        self.dispatcher.interval_seconds = 30
+        self.dispatcher.start()
+        await asyncio.sleep(0.05)
+
+        await self.notifications.send_achievement_notification(USERS[0]["did"], "ua-10", "Streak", "streak")
+        for _ in range(100):
+            if self.sink.messages:
+                break
+            await asyncio.sleep(0.02)
+
+        self.assertEqual(len(self.sink.messages), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import sys
+import json
+import asyncio
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.models.permission import DEFAULT_ROLES
+from digital_twin.services.permission_cache import PermissionCache, INVALIDATION_CHANNEL
+
+
+class FakeRedisService:
+    """In-memory replacement for the RedisService cache helpers"""
+
+    def __init__(self):
+        self.store = {}
+        self.subscribers = []
+
+    async def get_cache(self, key):
+        return self.store.get(key)
+
+    async def set_cache(self, key, value, ttl=3600):
+        self.store[key] = value
+
+    async def delete_cache(self, key):
+        self.store.pop(key, None)
+
+    async def clear_cache_pattern(self, pattern):
+        prefix = pattern.rstrip("*")
+        for key in [k for k in self.store if k.startswith(prefix)]:
+            del self.store[key]
+
+    async def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            if subscriber.channel == channel:
+                subscriber.queue.put_nowait({"type": "message", "data": json.dumps(message)})
+
+    async def subscribe(self, channel):
+        subscriber = FakePubSub(channel)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+
+class FakePubSub:
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue = asyncio.Queue()
+        self.queue.put_nowait({"type": "subscribe", "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        pass
+
+
+class TestPermissionCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedisService()
+        self.cache = PermissionCache(redis_service=self.redis)
+        self.cache.use_roles(DEFAULT_ROLES)
+
+    def test_flatten_roles_follows_parent_role(self):
+        graph = PermissionCache.flatten_roles([
+            {"name": "base", "permissions": ["read_courses"]},
+            {"name": "ta", "permissions": ["update_lesson"], "parent_role": "base"},
+            {"name": "loop", "permissions": ["a"], "parent_role": "loop"},
+        ])
+        self.assertEqual(graph["ta"], frozenset({"read_courses", "update_lesson"}))
+        self.assertEqual(graph["loop"], frozenset({"a"}))
+
+    def test_compile_merges_roles_and_direct_permissions(self):
+        permissions = self.cache.compile(["student"], ["view_analytics"])
+        self.assertIn("read_lessons", permissions)
+        self.assertIn("view_analytics", permissions)
+        self.assertNotIn("manage_users", permissions)
+
+    def test_ttl_respects_assignment_expiry(self):
+        soon = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertLessEqual(self.cache.ttl_for([None, soon], 900), 30)
+        self.assertEqual(self.cache.ttl_for([None], 900), 900)
+
+    async def test_set_get_and_invalidate(self):
+        user_id = "did:learntwin:student001"
+        await self.cache.set(user_id, frozenset({"read_lessons"}))
+        self.assertEqual(await self.cache.get(user_id), frozenset({"read_lessons"}))
+
+        # A second worker only has the Redis tier
+        other = PermissionCache(redis_service=self.redis)
+        self.assertEqual(await other.get(user_id), frozenset({"read_lessons"}))
+
+        await self.cache.invalidate_user(user_id)
+        self.assertIsNone(self.cache.get_local(user_id))
+        self.assertIsNone(await self.cache.get(user_id))
+
+    async def test_invalidate_roles_drops_graph_and_entries(self):
+        await self.cache.set("did:learntwin:student002", frozenset({"read_lessons"}))
+        await self.cache.invalidate_roles()
+        self.assertFalse(self.cache.roles_loaded)
+        self.assertIsNone(await self.cache.get("did:learntwin:student002"))
+
+    async def test_invalidation_reaches_other_workers(self):
+        user_id = "did:learntwin:student003"
+        other = PermissionCache(redis_service=self.redis)
+        other.use_roles(DEFAULT_ROLES)
+        other.start()
+        self.addAsyncCleanup(other.stop)
+        await asyncio.sleep(0)
+
+        await self.cache.set(user_id, frozenset({"read_lessons"}))
+        self.assertEqual(await other.get(user_id), frozenset({"read_lessons"}))
+
+        await self.cache.invalidate_user(user_id)
+        await asyncio.sleep(0)
+        self.assertIsNone(other.get_local(user_id))
+
+        other.set_local(user_id, frozenset({"read_lessons"}))
+        await self.cache.invalidate_roles()
+        await asyncio.sleep(0)
+        self.assertIsNone(other.get_local(user_id))
+        self.assertFalse(other.roles_loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
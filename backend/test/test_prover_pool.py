@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.prover_pool import (
+    ProverPool, ProverQueueFull, ProverJobError, ProverUnavailable, ProverError
+)
+
+# Stand-in for scripts/prover_worker.js speaking the same line protocol
+FAKE_WORKER = r'''
+import sys, json, time, os
+print(json.dumps({"ready": True}), flush=True)
+for line in sys.stdin:
+    request = json.loads(line)
+    if request["op"] == "poseidon":
+        result = str(sum(int(v) for v in request["inputs"]))
+    elif request["op"] == "prove":
+        data = request["input"]
+        if data.get("crash"):
+            os._exit(1)
+        if data.get("invalid"):
+            print(json.dumps({"id": request["id"], "ok": False, "error": "Assert Failed"}), flush=True)
+            continue
+        time.sleep(float(data.get("delay", 0)))
+        result = {"proof": {"pid": os.getpid()}, "publicSignals": [data["x"]]}
+    else:
+        result = True
+    print("library noise on stdout", flush=True)
+    print(json.dumps({"id": request["id"], "ok": True, "result": result}), flush=True)
+'''
+
+
+class TestProverPool(unittest.TestCase):
+    def setUp(self):
+        handle, self.script = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(handle, "w") as f:
+            f.write(FAKE_WORKER)
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.close()
+        os.unlink(self.script)
+
+    def make_pool(self, **kwargs):
+        pool = ProverPool(command=[sys.executable, self.script], **kwargs)
+        self.pools.append(pool)
+        return pool
+
+    def test_workers_are_reused_and_run_in_parallel(self):
+        pool = self.make_pool(size=2, max_queue=8, timeout=10)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(
+                lambda i: pool.prove("module_progress", {"x": i, "delay": 0.3}), range(4)
+            ))
+        elapsed = time.monotonic() - start
+
+        # Big field elements survive the JSON round trip as strings
+        self.assertEqual(pool.poseidon([2 ** 200, 1]), 2 ** 200 + 1)
+        self.assertEqual([r["publicSignals"] for r in results], [["0"], ["1"], ["2"], ["3"]])
+        self.assertEqual(len({r["proof"]["pid"] for r in results}), 2)
+        self.assertLess(elapsed, 1.2)
+        metrics = pool.metrics()
+        self.assertEqual(metrics["workers"], 2)
+        self.assertEqual(metrics["jobs"]["prove:module_progress"]["count"], 4)
+        self.assertGreaterEqual(metrics["jobs"]["prove:module_progress"]["avg_ms"], 300)
+
+    def test_queue_is_bounded(self):
+        pool = self.make_pool(size=1, max_queue=1, timeout=10)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(pool.prove, "module_progress", {"x": i, "delay": 0.3}) for i in range(3)]
+            errors = [f.exception() for f in futures]
+        self.assertEqual(sum(isinstance(e, ProverQueueFull) for e in errors), 1)
+
+    def test_job_error_keeps_worker_and_crash_replaces_it(self):
+        pool = self.make_pool(size=1, max_queue=0, timeout=10)
+        with self.assertRaises(ProverJobError):
+            pool.prove("learning_achievement", {"invalid": True})
+        first_pid = pool.prove("learning_achievement", {"x": 1})["proof"]["pid"]
+
+        with self.assertRaises(ProverError):
+            pool.prove("learning_achievement", {"crash": True})
+        second_pid = pool.prove("learning_achievement", {"x": 2})["proof"]["pid"]
+
+        self.assertNotEqual(first_pid, second_pid)
+        self.assertEqual(pool.metrics()["jobs"]["prove:learning_achievement"]["errors"], 2)
+
+    def test_missing_runtime_marks_pool_unavailable(self):
+        pool = ProverPool(command=["/nonexistent/node"], size=1)
+        with self.assertRaises(ProverUnavailable):
+            pool.poseidon([1, 2])
+        self.assertFalse(pool.available())
+
+
+if __name__ == "__main__":
+    unittest.main()
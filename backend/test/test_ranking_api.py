@@ -0,0 +1,42 @@
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from digital_twin.api import ranking_api
+from digital_twin.dependencies import require_admin
+
+
+class TestRebuildLeaderboards(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(ranking_api.router)
+        app.dependency_overrides[require_admin] = lambda: SimpleNamespace(did="did:learntwin:admin")
+        self.client = TestClient(app)
+
+    def _rebuild(self, ran):
+        with patch.object(ranking_api.leaderboard_service, "rebuild", AsyncMock(return_value=ran)):
+            return self.client.post("/api/v1/ranking/rebuild")
+
+    def test_rebuild_runs(self):
+        response = self._rebuild(True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "Leaderboards rebuilt")
+
+    def test_rebuild_already_in_progress_is_a_conflict(self):
+        response = self._rebuild(False)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["detail"], "Leaderboard rebuild already in progress")
+
+
+if __name__ == "__main__":
+    unittest.main()
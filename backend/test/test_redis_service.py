@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.redis_service import RedisService, SCRIPTS, redis_service, get_redis_service
+from digital_twin.services.leaderboard_service import LeaderboardService
+from digital_twin.services.permission_cache import PermissionCache
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL")
+
+
+class FakeScript:
+    """Runs the Python equivalent of a registered Lua script, counting round-trips"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    async def __call__(self, keys=None, args=None):
+        self.client.round_trips += 1
+        data = self.client.data
+        key = keys[0]
+        if self.name == "consume_quota":
+            used = int(data.get(key, 0))
+            if used >= int(args[0]):
+                return [0, used]
+            data[key] = used + 1
+            self.client.ttls.setdefault(key, int(args[1]))
+            return [1, used + 1]
+        if self.name == "extend_session":
+            payload = data.get(key)
+            if payload is None:
+                return None
+            updated = json.loads(payload)
+            updated["expiration_time"] = args[1]
+            data[key] = json.dumps(updated)
+            self.client.ttls[key] = int(args[0])
+            return payload
+        if self.name == "consume_nonce":
+            return data.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+
+    async def execute(self):
+        self.client.round_trips += 1
+        self.client.executed.append([name for name, _ in self.commands])
+        results = []
+        for name, args in self.commands:
+            if name == "incr":
+                self.client.data[args[0]] = int(self.client.data.get(args[0], 0)) + 1
+                results.append(self.client.data[args[0]])
+            elif name == "expire":
+                self.client.ttls[args[0]] = args[1]
+                results.append(True)
+            else:
+                results.append(0)
+        return results
+
+
+class FakeRedisClient:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+        self.executed = []
+        self.registered = []
+
+    def register_script(self, source):
+        name = next(name for name, lua in SCRIPTS.items() if lua == source)
+        self.registered.append(name)
+        return FakeScript(self, name)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class TestSharedRedisService(unittest.IsolatedAsyncioTestCase):
+    def test_services_share_the_process_wide_instance(self):
+        self.assertIs(get_redis_service(), redis_service)
+        self.assertIs(LeaderboardService().redis_service, redis_service)
+        self.assertIs(PermissionCache().redis_service, redis_service)
+
+    async def test_concurrent_callers_create_one_pool(self):
+        service = RedisService()
+        connects = []
+
+        async def connect():
+            connects.append(1)
+            await asyncio.sleep(0.01)
+            service.redis_client = FakeRedisClient()
+
+        service.connect = connect
+        clients = await asyncio.gather(*(service.get_client() for _ in range(10)))
+
+        self.assertEqual(len(connects), 1)
+        self.assertTrue(all(client is clients[0] for client in clients))
+
+    async def test_quota_check_and_increment_is_one_round_trip(self):
+        client = FakeRedisClient()
+        service = RedisService(client=client)
+
+        results = [await service.consume_quota("ai_queries:u1:2026-01-01", 2, 3600) for _ in range(3)]
+
+        self.assertEqual(results, [(True, 1), (True, 2), (False, 2)])
+        self.assertEqual(client.round_trips, 3)
+        self.assertEqual(client.registered, ["consume_quota"])  # loaded once, then EVALSHA
+        self.assertEqual(client.ttls["ai_queries:u1:2026-01-01"], 3600)
+
+    async def test_extend_session_rewrites_expiration_in_one_round_trip(self):
+        client = FakeRedisClient()
+        client.data["session:s1"] = json.dumps({"userID": "did:1", "expiration_time": "old"})
+        service = RedisService(client=client)
+
+        previous = await service.extend_session("s1", 600, "new")
+
+        self.assertEqual(previous["expiration_time"], "old")
+        self.assertEqual(json.loads(client.data["session:s1"])["expiration_time"], "new")
+        self.assertEqual(client.ttls["session:s1"], 600)
+        self.assertEqual(client.round_trips, 1)
+        self.assertIsNone(await service.extend_session("missing", 600, "new"))
+
+    async def test_nonce_is_consumed_once(self):
+        client = FakeRedisClient()
+        client.data["siwe_nonce:n1"] = json.dumps({"wallet_address": "0xabc"})
+        service = RedisService(client=client)
+
+        self.assertEqual((await service.consume_nonce("n1"))["wallet_address"], "0xabc")
+        self.assertIsNone(await service.consume_nonce("n1"))
+
+    async def test_ai_query_usage_increment_is_pipelined(self):
+        from digital_twin.services import subscription_service as module
+
+        client = FakeRedisClient()
+        original = module.redis_service
+        module.redis_service = RedisService(client=client)
+        try:
+            self.assertTrue(await module.SubscriptionService().increment_ai_query_usage("did:1"))
+        finally:
+            module.redis_service = original
+
+        self.assertEqual(client.executed, [["incr", "expire"]])
+        self.assertEqual(list(client.data.values()), [1])
+
+
+@unittest.skipUnless(REDIS_TEST_URL, "set REDIS_TEST_URL to run the scripts against a Redis server")
+class TestRedisScripts(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = RedisService()
+        self.service.redis_url = REDIS_TEST_URL
+        self.client = await self.service.get_client()
+        await self.client.delete("test:quota", "session:test-session", "siwe_nonce:test-nonce")
+
+    async def asyncTearDown(self):
+        await self.client.delete("test:quota", "session:test-session", "siwe_nonce:test-nonce")
+        await self.service.disconnect()
+
+    async def test_concurrent_quota_never_exceeds_limit(self):
+        results = await asyncio.gather(*(self.service.consume_quota("test:quota", 5, 60) for _ in range(20)))
+
+        self.assertEqual(sum(allowed for allowed, _ in results), 5)
+        self.assertEqual(int(await self.client.get("test:quota")), 5)
+        self.assertGreater(await self.client.ttl("test:quota"), 0)
+
+    async def test_session_extend_and_nonce_consume(self):
+        await self.service.set_session("test-session", {"userID": "did:1", "expiration_time": "old"}, 60)
+        previous = await self.service.extend_session("test-session", 600, "new")
+
+        self.assertEqual(previous["expiration_time"], "old")
+        self.assertEqual((await self.service.get_session("test-session"))["expiration_time"], "new")
+        self.assertGreater(await self.client.ttl("session:test-session"), 60)
+
+        await self.service.set_nonce("test-nonce", "0xabc", 60)
+        consumed = await asyncio.gather(*(self.service.consume_nonce("test-nonce") for _ in range(5)))
+        self.assertEqual(sum(1 for data in consumed if data), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.search_index import SearchIndex, BM25Index
+
+def make_course(course_id, title, description="", tags=None, difficulty="beginner", status="published", is_public=True):
+    return SimpleNamespace(
+        course_id=course_id, title=title, description=description, status=status, is_public=is_public,
+        metadata=SimpleNamespace(tags=tags or [], difficulty_level=difficulty, estimated_hours=2),
+        institution="UIT", enrollment_count=0, average_rating=0.0, total_ratings=0
+    )
+
+def make_module(module_id, course_id, title, description=""):
+    return SimpleNamespace(
+        module_id=module_id, course_id=course_id, title=title, description=description,
+        learning_objectives=[], estimated_duration=30, order=1, is_mandatory=True, completion_criteria={}
+    )
+
+def make_lesson(lesson_id, module_id, course_id, title, description="", status="published"):
+    return SimpleNamespace(
+        lesson_id=lesson_id, module_id=module_id, course_id=course_id, title=title, description=description,
+        status=status, keywords=[], duration_minutes=15, content_type="video", order=1,
+        is_mandatory=True, learning_objectives=[]
+    )
+
+
+class TestBM25Index(unittest.TestCase):
+    def test_title_match_outranks_description_and_terms_are_anded(self):
+        index = BM25Index()
+        index.add("a", {"title": "Python Basics", "description": "Start programming"})
+        index.add("b", {"title": "Data Science", "description": "Uses python for analysis"})
+        index.add("c", {"title": "Rust", "description": "Systems programming"})
+
+        scores = index.search("python")
+        self.assertEqual(set(scores), {"a", "b"})
+        self.assertGreater(scores["a"], scores["b"])
+        self.assertEqual(set(index.search("python programming")), {"a"})
+
+    def test_last_term_matches_as_prefix_and_remove_cleans_vocabulary(self):
+        index = BM25Index()
+        index.add("a", {"title": "Blockchain Fundamentals"})
+        self.assertEqual(set(index.search("block")), {"a"})
+        self.assertEqual(index.search("block", prefix_last=False), {})
+
+        index.remove("a")
+        self.assertEqual(index.vocabulary, [])
+        self.assertEqual(len(index), 0)
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex(refresh_seconds=600)
+        self.index.index_course(make_course("c1", "Intro to Blockchain", "Ledgers and consensus", ["web3", "blockchain"]))
+        self.index.index_course(make_course("c2", "Advanced Blockchain", "Rollups", ["web3"], difficulty="advanced"))
+        self.index.index_module(make_module("m1", "c1", "Blockchain Basics"))
+        self.index.index_lesson(make_lesson("l1", "m1", "c1", "What is a blockchain"))
+
+    def test_filters_pagination_and_type_counts(self):
+        result = self.index.search("blockchain")
+        self.assertEqual(result["total"], 4)
+        self.assertEqual(result["type_counts"], {"course": 2, "module": 1, "lesson": 1})
+
+        advanced = self.index.search("blockchain", difficulty_level="advanced")
+        self.assertEqual(advanced["type_counts"], {"course": 1, "module": 1, "lesson": 1})
+
+        in_other_course = self.index.search("blockchain", course_id="c2")
+        self.assertEqual(in_other_course["type_counts"], {"course": 2})
+
+        page = self.index.search("blockchain", skip=1, limit=2)
+        self.assertEqual(len(page["results"]), 2)
+        self.assertEqual(page["total"], 4)
+
+    def test_rename_and_unpublish_update_existing_entries(self):
+        self.index.index_course(make_course("c1", "Blockchain Engineering", tags=["web3"]))
+        lesson = self.index.search("what is", doc_type="lesson")["results"][0]
+        self.assertEqual(lesson["course_name"], "Blockchain Engineering")
+        self.assertEqual(lesson["module_name"], "Blockchain Basics")
+        self.assertEqual(self.index.search("intro")["total"], 0)
+
+        self.index.index_course(make_course("c2", "Advanced Blockchain", status="draft"))
+        self.index.index_lesson(make_lesson("l1", "m1", "c1", "What is a blockchain", status="archived"))
+        self.assertEqual(self.index.search("blockchain")["type_counts"], {"course": 1, "module": 1})
+
+    def test_suggestions_include_titles_then_course_tags(self):
+        # Courses tagged web3 match through their tags field before the tag itself
+        suggestions = self.index.suggest("web")
+        self.assertEqual(suggestions[-1], "web3")
+        self.assertEqual(set(suggestions[:-1]), {"Intro to Blockchain", "Advanced Blockchain"})
+        self.assertIn("Intro to Blockchain", self.index.suggest("block"))
+
+        self.index.remove("course", "c1")
+        self.index.remove("course", "c2")
+        self.assertEqual(self.index.suggest("web"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
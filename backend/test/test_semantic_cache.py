@@ -0,0 +1,69 @@
+import sys
+import time
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.semantic_cache import SemanticResponseCache, SemanticCacheConfig, normalize_question
+
+def answer(text):
+    return {"answer": text, "source_documents": [{"content": "ctx", "source": "lesson.pdf"}], "success": True}
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticResponseCache(SemanticCacheConfig(similarity_threshold=0.9, ttl_seconds=60, max_entries=2))
+
+    def test_similar_questions_hit_within_the_same_partition(self):
+        self.cache.put("What is a hash?", [1.0, 0.0, 0.0], "learning", 5, answer("A digest"))
+
+        self.assertEqual(self.cache.get([0.95, 0.1, 0.0], "learning", 5)["answer"], "A digest")
+        self.assertIsNone(self.cache.get([0.2, 1.0, 0.0], "learning", 5))
+        self.assertIsNone(self.cache.get([1.0, 0.0, 0.0], "exercise", 5))
+        self.assertIsNone(self.cache.get([1.0, 0.0, 0.0], "learning", 3))
+
+        self.assertEqual(self.cache.get_exact("  what is a HASH", "learning", 5)["answer"], "A digest")
+        self.assertIsNone(self.cache.get_exact("what is a hash", "learning", 3))
+        info = self.cache.info()
+        self.assertEqual((info["hits"], info["exact_hits"], info["misses"]), (2, 1, 3))
+
+    def test_lru_eviction_ttl_and_invalidation(self):
+        self.cache.put("a", [1.0, 0.0], "learning", 5, answer("a"))
+        self.cache.put("b", [0.0, 1.0], "learning", 5, answer("b"))
+        self.cache.get_exact("a", "learning", 5)
+        self.cache.put("c", [-1.0, 0.0], "learning", 5, answer("c"))
+        self.assertIsNone(self.cache.get_exact("b", "learning", 5))
+        self.assertIsNotNone(self.cache.get_exact("a", "learning", 5))
+        self.assertEqual(self.cache.info()["evictions"], 1)
+
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get([1.0, 0.0], "learning", 5))
+        self.assertEqual(self.cache.info()["kb_version"], 1)
+
+        self.cache.config.ttl_seconds = 0.01
+        self.cache.put("d", [1.0, 0.0], "learning", 5, answer("d"))
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get([1.0, 0.0], "learning", 5))
+        self.assertEqual(self.cache.info()["entries"], 0)
+
+    def test_answer_generated_before_invalidation_is_not_stored(self):
+        kb_version = self.cache.kb_version
+        self.cache.invalidate()
+        self.cache.put("a", [1.0, 0.0], "learning", 5, answer("stale"), kb_version)
+
+        self.assertIsNone(self.cache.get_exact("a", "learning", 5))
+        self.assertEqual(self.cache.info()["stale_puts"], 1)
+
+        self.cache.put("a", [1.0, 0.0], "learning", 5, answer("fresh"), self.cache.kb_version)
+        self.assertEqual(self.cache.get_exact("a", "learning", 5)["answer"], "fresh")
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question(" What  is\nRAG?? "), "what is rag")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+import sys
+import json
+import time
+import hashlib
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.twin_anchor_worker import MerkleTree, TwinAnchorWorker, verify_anchor_proof
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        results = [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+class FakeRedisClient:
+    """Minimal in-memory stand-in for the redis.asyncio commands the worker uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    async def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(f) for f in fields]
+
+    async def hdel(self, key, *fields):
+        for f in fields:
+            self.data.get(key, {}).pop(f, None)
+
+    async def zadd(self, key, mapping, nx=False):
+        zset = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            if not (nx and member in zset):
+                zset[member] = score
+
+    def _ordered(self, key):
+        return [m for m, _ in sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]))]
+
+    async def zrange(self, key, start, end):
+        return self._ordered(key)[start:end + 1]
+
+    async def zrangebyscore(self, key, low, high):
+        return [m for m in self._ordered(key) if self.data[key][m] <= high]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.client = FakeRedisClient()
+
+    async def get_client(self):
+        return self.client
+
+    async def release_lock(self, key, token):
+        if self.client.data.get(key) != token:
+            return False
+        del self.client.data[key]
+        return True
+
+    def queue(self, twin_id, version, cid, payload, data_hash=True, age=0):
+        member = f"{twin_id}:{cid}"
+        self.client.data.setdefault("anchor_queue", {})[member] = time.time() - age + version / 1000
+        self.client.data.setdefault("anchor_queue:entries", {})[member] = json.dumps({
+            "twin_id": twin_id,
+            "cid": cid,
+            "version": version,
+            "data_hash": hashlib.sha256(json.dumps(payload).encode()).hexdigest() if data_hash else None,
+            "operation": "update",
+            "status": "scheduled"
+        })
+
+    def queued(self):
+        return sorted(self.client.data.get("anchor_queue", {}))
+
+
+class FakeChain:
+    """Stands in for a local Anvil/Hardhat node behind BlockchainService"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.anchors = []
+
+    def is_available(self):
+        return True
+
+    def anchor_merkle_root(self, batch_did, batch_number, merkle_root_hex, manifest_cid):
+        if self.fail:
+            return {"success": False, "error": "nonce too low"}
+        self.anchors.append((batch_did, batch_number, merkle_root_hex, manifest_cid))
+        return {"success": True, "tx_hash": f"{len(self.anchors):064x}", "block_number": 100 + len(self.anchors),
+                "registry_address": "0x0000000000000000000000000000000000000001"}
+
+
+class FakeIPFS:
+    async def pin_json(self, data, name=None, metadata=None):
+        return "bafymanifest" + str(data["batch_number"])
+
+    async def get_json(self, cid):
+        return None
+
+
+class RecordingWorker(TwinAnchorWorker):
+    async def _store_proofs(self, proofs):
+        self.stored = proofs
+
+
+class TestMerkleTree(unittest.TestCase):
+    def test_every_leaf_proves_against_root(self):
+        for size in (1, 2, 3, 5, 8, 13):
+            leaves = [MerkleTree.leaf_hash(f"did:learntwin:s{i}", i, f"bafy{i}", "ab" * 32) for i in range(size)]
+            tree = MerkleTree(leaves)
+            for i, leaf in enumerate(leaves):
+                self.assertTrue(MerkleTree.verify(leaf, tree.proof(i), tree.root))
+            other = MerkleTree.leaf_hash("did:learntwin:other", 1, "bafyx", "cd" * 32)
+            self.assertFalse(MerkleTree.verify(other, tree.proof(0), tree.root))
+
+    def test_empty_tree_rejected(self):
+        with self.assertRaises(ValueError):
+            MerkleTree([])
+
+
+class TestTwinAnchorWorker(unittest.IsolatedAsyncioTestCase):
+    async def test_batch_anchors_one_root_with_proofs(self):
+        redis = FakeRedisService()
+        for i in range(7):
+            redis.queue(f"did:learntwin:student{i:03d}", i + 1, f"bafytwin{i}", {"i": i})
+        chain = FakeChain()
+        worker = RecordingWorker(redis_service=redis, blockchain_service=chain, ipfs_service=FakeIPFS(), batch_size=5)
+
+        result = await worker.run_once()
+
+        self.assertEqual(result["anchored"], 5)
+        self.assertEqual(len(chain.anchors), 1)
+        self.assertEqual(chain.anchors[0][2], result["merkle_root"])
+        self.assertEqual(chain.anchors[0][3], "bafymanifest1")
+        self.assertTrue(all(p["merkle_root"] == result["merkle_root"] for p in worker.stored))
+        self.assertTrue(all(verify_anchor_proof(p) for p in worker.stored))
+        self.assertTrue(worker.stored[0]["tx_hash"].startswith("0x"))
+        # Oldest five drained, the rest wait for the next batch
+        self.assertEqual(redis.queued(), ["did:learntwin:student005:bafytwin5", "did:learntwin:student006:bafytwin6"])
+        self.assertEqual(len(redis.client.data["anchor_queue:entries"]), 2)
+        self.assertNotIn("anchor_worker:lock", redis.client.data)
+
+        result = await worker.run_once()
+        self.assertEqual(result["anchored"], 2)
+        self.assertEqual(result["batch_number"], 2)
+
+    async def test_failed_anchor_keeps_queue(self):
+        redis = FakeRedisService()
+        redis.queue("did:learntwin:student001", 5, "bafytwin", {"v": 5})
+        worker = RecordingWorker(redis_service=redis, blockchain_service=FakeChain(fail=True), ipfs_service=FakeIPFS())
+
+        result = await worker.run_once()
+
+        self.assertEqual(result["anchored"], 0)
+        self.assertIn("nonce too low", result["error"])
+        self.assertEqual(redis.queued(), ["did:learntwin:student001:bafytwin"])
+        self.assertEqual(worker.stats["failures"], 1)
+
+        # The failed attempt does not use up a batch number
+        worker.blockchain_service.fail = False
+        result = await worker.run_once()
+        self.assertEqual(result["batch_number"], 1)
+
+    async def test_unresolvable_requests_are_dropped(self):
+        redis = FakeRedisService()
+        redis.queue("did:learntwin:student001", 5, "bafygone", {}, data_hash=False)
+        redis.queue("did:learntwin:student002", 1, "bafyold", {"v": 1}, age=2 * 86400)
+        worker = RecordingWorker(redis_service=redis, blockchain_service=FakeChain(), ipfs_service=FakeIPFS())
+        worker.max_resolve_attempts = 2
+
+        await worker.run_once()
+        self.assertEqual(redis.queued(), ["did:learntwin:student001:bafygone"])
+        await worker.run_once()
+        self.assertEqual(redis.queued(), [])
+        self.assertEqual(redis.client.data["anchor_queue:entries"], {})
+
+    async def test_lock_taken_over_by_another_worker_is_kept(self):
+        redis = FakeRedisService()
+        redis.queue("did:learntwin:a", 1, "bafya", {"a": 1})
+        chain = FakeChain()
+        worker = RecordingWorker(redis_service=redis, blockchain_service=chain, ipfs_service=FakeIPFS())
+
+        def slow_anchor(*args):
+            # Our lock expired mid-transaction and another worker took it
+            redis.client.data["anchor_worker:lock"] = "other-worker"
+            return FakeChain.anchor_merkle_root(chain, *args)
+
+        chain.anchor_merkle_root = slow_anchor
+        await worker.run_once()
+        self.assertEqual(redis.client.data["anchor_worker:lock"], "other-worker")
+
+    async def test_tampered_proof_rejected(self):
+        redis = FakeRedisService()
+        redis.queue("did:learntwin:a", 1, "bafya", {"a": 1})
+        redis.queue("did:learntwin:b", 1, "bafyb", {"b": 1})
+        worker = RecordingWorker(redis_service=redis, blockchain_service=FakeChain(), ipfs_service=FakeIPFS())
+        await worker.run_once()
+
+        proof = dict(worker.stored[0], cid="bafyforged")
+        self.assertFalse(verify_anchor_proof(proof))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services import twin_update_buffer as buffer_module
+from digital_twin.services.twin_update_buffer import TwinUpdateBuffer
+
+
+class FakeTwin:
+    def __init__(self, twin_id, version=3, completed_modules=None, unpinned_since=None):
+        self.twin_id = twin_id
+        self.owner_did = "did:learntwin:student001"
+        self.version = version
+        self.completed_modules = list(completed_modules or [])
+        self.unpinned_since = unpinned_since
+
+    def update_timestamp(self):
+        pass
+
+    def model_dump(self, exclude=None):
+        return {
+            "twin_id": self.twin_id,
+            "owner_did": self.owner_did,
+            "version": self.version,
+            "completed_modules": list(self.completed_modules),
+            "unpinned_since": self.unpinned_since
+        }
+
+
+class FakeResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    """Stores twin documents and honours the version condition of update_one"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.before_write = None
+
+    async def update_one(self, query, update):
+        if self.before_write:
+            hook, self.before_write = self.before_write, None
+            hook()
+        doc = self.docs.get(query["twin_id"])
+        if doc is None or doc["version"] != query["version"]:
+            return FakeResult(0)
+        doc.update(update["$set"])
+        return FakeResult(1)
+
+
+class TestTwinUpdateBuffer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.docs = {"twin-1": FakeTwin("twin-1").model_dump()}
+        self.collection = FakeCollection(self.docs)
+        self.persisted = []
+
+        async def fake_find_one(query):
+            doc = self.docs.get(query["twin_id"])
+            if doc is None:
+                return None
+            return FakeTwin(doc["twin_id"], doc["version"], doc["completed_modules"], doc["unpinned_since"])
+
+        for name, value in (("find_one", fake_find_one), ("get_pymongo_collection", lambda: self.collection)):
+            patcher = patch.object(buffer_module.DigitalTwin, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def persist(self, pending):
+        self.persisted.append((pending.twin.version, pending.update_count, list(pending.change_descriptions)))
+
+    async def test_burst_is_coalesced_into_one_persist(self):
+        buffer = TwinUpdateBuffer(window_seconds=0.05)
+        versions = []
+        for i in range(5):
+            twin = await buffer.apply(
+                "twin-1",
+                lambda t, i=i: t.completed_modules.append(f"m{i}"),
+                None,
+                f"update {i}",
+                persist=self.persist
+            )
+            versions.append(twin.version)
+
+        # Every update is written through; only the pin waits for the window
+        self.assertEqual(versions, [4, 5, 6, 7, 8])
+        self.assertEqual(self.docs["twin-1"]["completed_modules"], ["m0", "m1", "m2", "m3", "m4"])
+        self.assertIsNotNone(self.docs["twin-1"]["unpinned_since"])
+        self.assertEqual(self.persisted, [])
+        self.assertIsNotNone(buffer.peek("twin-1"))
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.persisted), 1)
+        self.assertEqual(self.persisted[0][:2], (8, 5))
+        self.assertIsNone(buffer.peek("twin-1"))
+
+    async def test_zero_window_flushes_every_update(self):
+        buffer = TwinUpdateBuffer(window_seconds=0)
+        await buffer.apply("twin-1", lambda t: None, "did:x", "a", persist=self.persist)
+        await buffer.apply("twin-1", lambda t: None, "did:x", "b", persist=self.persist)
+        self.assertEqual([p[1] for p in self.persisted], [1, 1])
+
+    async def test_max_updates_flushes_early(self):
+        buffer = TwinUpdateBuffer(window_seconds=60, max_updates=3)
+        for i in range(3):
+            await buffer.apply("twin-1", lambda t: None, None, str(i), persist=self.persist)
+        self.assertEqual(len(self.persisted), 1)
+
+    async def test_missing_twin_raises(self):
+        buffer = TwinUpdateBuffer(window_seconds=0.05)
+        with self.assertRaises(ValueError):
+            await buffer.apply("missing", lambda t: None, None, "x", persist=self.persist)
+
+    async def test_failed_flush_keeps_updates_pending_without_raising(self):
+        buffer = TwinUpdateBuffer(window_seconds=60)
+
+        async def failing_persist(pending):
+            raise RuntimeError("ipfs down")
+
+        await buffer.apply("twin-1", lambda t: None, None, "x", persist=failing_persist)
+        await buffer.flush("twin-1")
+        self.assertIsNotNone(buffer.peek("twin-1"))
+        self.assertEqual(buffer.stats["flush_failures"], 1)
+        buffer._pending["twin-1"].flush_task.cancel()
+
+    async def test_concurrent_writer_is_rebased_not_overwritten(self):
+        buffer = TwinUpdateBuffer(window_seconds=60)
+
+        def other_worker_writes():
+            self.docs["twin-1"]["version"] = 4
+            self.docs["twin-1"]["completed_modules"] = ["from-other-worker"]
+
+        self.collection.before_write = other_worker_writes
+        twin = await buffer.apply(
+            "twin-1", lambda t: t.completed_modules.append("mine"), None, "x", persist=self.persist
+        )
+
+        self.assertEqual(twin.version, 5)
+        self.assertEqual(self.docs["twin-1"]["version"], 5)
+        self.assertEqual(self.docs["twin-1"]["completed_modules"], ["from-other-worker", "mine"])
+        self.assertEqual(buffer.stats["conflicts"], 1)
+        buffer._pending["twin-1"].flush_task.cancel()
+
+if __name__ == "__main__":
+    unittest.main()
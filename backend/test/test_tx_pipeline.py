@@ -0,0 +1,233 @@
+import sys
+import time
+import threading
+import unittest
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_account import Account
+from eth_account.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound, TimeExhausted
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.tx_pipeline import TransactionPipeline, NonceManager, GasPriceOracle
+
+
+class FakeEth:
+    """In-process chain: transactions mine in nonce order `latency` seconds after broadcast"""
+
+    chain_id = 1337
+    max_priority_fee = 1_000_000_000
+    gas_price = 2_000_000_000
+    account = Account
+
+    def __init__(self, latency=0.05, never_mine_first=False):
+        self.latency = latency
+        self.never_mine_first = never_mine_first
+        self.mined_nonce = 0
+        self.broadcasts = {}  # tx_hash -> (nonce, fees, time)
+        self.by_nonce = {}
+        self.block_calls = 0
+        self.count_calls = 0
+        self.lock = threading.Lock()
+
+    def get_block(self, block):
+        self.block_calls += 1
+        return {'baseFeePerGas': 10_000_000_000, 'number': 1}
+
+    def get_transaction_count(self, address, block='latest'):
+        self.count_calls += 1
+        with self.lock:
+            # Like a node's pending count: stops at the first gap in the mempool
+            nonce = self.mined_nonce
+            while nonce in self.by_nonce:
+                nonce += 1
+            return nonce
+
+    def drop(self, nonce):
+        """Evict a pending transaction from the mempool, as a node does under pressure"""
+        with self.lock:
+            self.by_nonce.pop(nonce, None)
+
+    def send_raw_transaction(self, raw):
+        tx = TypedTransaction.from_bytes(raw).as_dict()
+        tx_hash = HexBytes(Web3.keccak(raw))
+        with self.lock:
+            nonce = tx['nonce']
+            if nonce < self.mined_nonce:
+                raise ValueError("nonce too low")
+            previous = self.by_nonce.get(nonce)
+            if previous and self.broadcasts[previous][1] >= tx['maxFeePerGas']:
+                raise ValueError("replacement transaction underpriced")
+            self.broadcasts[tx_hash] = (nonce, tx['maxFeePerGas'], time.monotonic())
+            self.by_nonce[nonce] = tx_hash
+        return tx_hash
+
+    def get_transaction_receipt(self, tx_hash):
+        with self.lock:
+            nonce, fee, sent_at = self.broadcasts[tx_hash]
+            first = next(h for h, b in self.broadcasts.items() if b[0] == nonce)
+            if self.by_nonce.get(nonce) != tx_hash or time.monotonic() - sent_at < self.latency:
+                raise TransactionNotFound(tx_hash)
+            if nonce > self.mined_nonce:
+                raise TransactionNotFound(tx_hash)
+            if self.never_mine_first and tx_hash == first:
+                raise TransactionNotFound(tx_hash)
+            self.mined_nonce = max(self.mined_nonce, nonce + 1)
+            return AttributeDict({'status': 1, 'blockNumber': 1, 'transactionHash': tx_hash,
+                                  'gasUsed': 21000, 'effectiveGasPrice': fee, 'logs': []})
+
+
+class FakeW3:
+    def __init__(self, eth):
+        self.eth = eth
+
+    @staticmethod
+    def to_wei(value, unit):
+        return Web3.to_wei(value, unit)
+
+
+class FakeCall:
+    def __init__(self, *args):
+        self.args = args
+
+    def estimate_gas(self, params):
+        return 30000
+
+    def build_transaction(self, params):
+        tx = dict(params)
+        tx.pop('from', None)
+        tx.update({'to': '0x' + '22' * 20, 'data': '0x'})
+        return tx
+
+
+class TestTransactionPipeline(unittest.TestCase):
+    def setUp(self):
+        self.account = Account.create()
+
+    def make_pipeline(self, eth):
+        pipeline = TransactionPipeline(FakeW3(eth), self.account, self.account.key)
+        pipeline.poll_interval = 0.01
+        return pipeline
+
+    def test_concurrent_sends_get_unique_nonces_and_overlap(self):
+        eth = FakeEth(latency=0.2)
+        pipeline = self.make_pipeline(eth)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(lambda i: pipeline.send(FakeCall, i), range(20)))
+        elapsed = time.monotonic() - start
+
+        nonces = sorted(eth.broadcasts[tx_hash][0] for _, tx_hash in results)
+        self.assertEqual(nonces, list(range(20)))
+        self.assertTrue(all(receipt.status == 1 for receipt, _ in results))
+        # Receipt waits overlap instead of serializing 20 x 0.2 s
+        self.assertLess(elapsed, 2.0)
+        # One sync with the node, not one nonce query per transaction
+        self.assertEqual(eth.count_calls, 1)
+        self.assertEqual(pipeline.stats["confirmed"], 20)
+
+    def test_nonce_too_low_resyncs_with_chain(self):
+        eth = FakeEth(latency=0)
+        pipeline = self.make_pipeline(eth)
+        pipeline.send(FakeCall)
+        # Another process spent nonces 1..4 behind our back
+        eth.mined_nonce = 5
+
+        receipt, tx_hash = pipeline.send(FakeCall)
+
+        self.assertEqual(eth.broadcasts[tx_hash][0], 5)
+        self.assertEqual(pipeline.stats["nonce_resyncs"], 1)
+
+    def test_stuck_transaction_is_replaced_with_higher_fees(self):
+        eth = FakeEth(latency=0, never_mine_first=True)
+        pipeline = self.make_pipeline(eth)
+        pipeline.stuck_seconds = 0.05
+
+        pending = pipeline.submit(FakeCall)
+        receipt = pipeline.wait(pending, timeout=5)
+
+        self.assertEqual(pipeline.stats["replaced"], 1)
+        self.assertEqual(len(pending.tx_hashes), 2)
+        self.assertEqual(receipt.transactionHash, pending.tx_hashes[1])
+        self.assertGreater(eth.broadcasts[pending.tx_hashes[1]][1], eth.broadcasts[pending.tx_hashes[0]][1])
+
+    def test_rpc_errors_do_not_skip_the_receipt_deadline(self):
+        eth = FakeEth(latency=0)
+        pipeline = self.make_pipeline(eth)
+
+        def unreachable(tx_hash):
+            raise ConnectionError("502 Bad Gateway")
+
+        eth.get_transaction_receipt = unreachable
+        pending = pipeline.submit(FakeCall, timeout=0.1)
+
+        with self.assertRaises(TimeExhausted):
+            pipeline.wait(pending, timeout=5)
+        self.assertEqual(pipeline.in_flight(), 0)
+
+    def test_dropped_transaction_gap_is_filled_for_later_nonces(self):
+        eth = FakeEth(latency=0)
+        pipeline = self.make_pipeline(eth)
+        pipeline.max_replacements = 0
+
+        dropped = pipeline.submit(FakeCall, timeout=0.1)
+        eth.drop(dropped.nonce)
+        later = pipeline.submit(FakeCall)
+
+        with self.assertRaises(TimeExhausted):
+            pipeline.wait(dropped, timeout=5)
+        # The later nonce is no longer stuck behind the gap
+        receipt = pipeline.wait(later, timeout=5)
+
+        self.assertEqual(receipt.status, 1)
+        self.assertEqual(pipeline.stats["gap_fills"], 1)
+        filler = eth.by_nonce[dropped.nonce]
+        self.assertNotIn(filler, dropped.tx_hashes)
+        self.assertEqual(eth.mined_nonce, 2)
+
+    def test_dropped_transaction_nonce_is_reused(self):
+        eth = FakeEth(latency=0)
+        pipeline = self.make_pipeline(eth)
+        pipeline.max_replacements = 0
+
+        dropped = pipeline.submit(FakeCall, timeout=0.1)
+        eth.drop(dropped.nonce)
+        with self.assertRaises(TimeExhausted):
+            pipeline.wait(dropped, timeout=5)
+
+        receipt, tx_hash = pipeline.send(FakeCall)
+
+        self.assertEqual(receipt.status, 1)
+        self.assertEqual(eth.broadcasts[tx_hash][0], dropped.nonce)
+        self.assertEqual(pipeline.stats["nonces_released"], 1)
+
+    def test_failed_broadcast_releases_nonce(self):
+        eth = FakeEth()
+        manager = NonceManager(FakeW3(eth), self.account.address)
+        first = manager.allocate()
+        second = manager.allocate()
+        manager.release(first)
+        self.assertEqual(manager.allocate(), first)
+        self.assertEqual(manager.allocate(), second + 1)
+
+    def test_gas_price_cached(self):
+        eth = FakeEth()
+        oracle = GasPriceOracle(FakeW3(eth), ttl_seconds=60)
+        fees = [oracle.fees() for _ in range(10)]
+        self.assertEqual(eth.block_calls, 1)
+        self.assertEqual(fees[0]['maxPriorityFeePerGas'], 2 * FakeEth.max_priority_fee)
+        bumped = GasPriceOracle.bump(fees[0], 25)
+        self.assertGreater(bumped['maxFeePerGas'], fees[0]['maxFeePerGas'] * 1.24)
+
+
+if __name__ == "__main__":
+    unittest.main()
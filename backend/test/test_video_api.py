@@ -0,0 +1,77 @@
+import sys
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+try:
+    import boto3  # noqa: F401  (video_api builds its S3 client at import)
+except ImportError:
+    boto3 = None
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def _session(user_id):
+    return SimpleNamespace(
+        session_id="session-1",
+        user_id=user_id,
+        status="uploading",
+        multipart_upload_id="upload-1",
+        lesson_id="lesson-1",
+        filename="intro.mp4",
+        uploaded_chunks=[],
+        temp_storage_path="uploads/temp/session-1/intro.mp4",
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        updated_at=None,
+        save=AsyncMock()
+    )
+
+
+@unittest.skipUnless(boto3 is not None, "boto3 is required to import the video API")
+class TestCancelVideoUpload(unittest.TestCase):
+    def setUp(self):
+        from digital_twin.api import video_api
+        from digital_twin.dependencies import get_current_user
+
+        self.video_api = video_api
+        app = FastAPI()
+        app.include_router(video_api.router)
+        # Users are identified by their DID; the model has no user_id attribute
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(did="did:learntwin:owner")
+        self.client = TestClient(app)
+
+        patcher = patch.object(video_api.upload_storage, "abort")
+        self.abort = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cancel(self, session):
+        with patch.object(self.video_api.VideoUploadSession, "find_one", AsyncMock(return_value=session)):
+            return self.client.delete("/videos/upload/session-1")
+
+    def test_owner_can_cancel(self):
+        session = _session("did:learntwin:owner")
+        response = self._cancel(session)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.status, "cancelled")
+        self.abort.assert_called_once_with("videos/lesson-1/intro.mp4", "upload-1")
+
+    def test_other_user_is_denied(self):
+        session = _session("did:learntwin:someone-else")
+        response = self._cancel(session)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(session.status, "uploading")
+        self.abort.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+try:
+    import boto3  # noqa: F401  (the processing service builds an S3 client)
+except ImportError:
+    boto3 = None
+
+
+@unittest.skipUnless(boto3 is not None, "boto3 is required for the video processing service")
+class TestVideoProcessingStorage(unittest.TestCase):
+    def test_uses_the_configured_s3_endpoint(self):
+        from digital_twin.services.video_processing_service import VideoProcessingService
+
+        env = {
+            "S3_ENDPOINT_URL": "http://minio.local:9000",
+            "S3_REGION": "eu-west-1",
+            "AWS_ACCESS_KEY_ID": "minio",
+            "AWS_SECRET_ACCESS_KEY": "minio-secret"
+        }
+        with patch.dict(os.environ, env):
+            service = VideoProcessingService()
+
+        self.assertEqual(service.s3_client.meta.endpoint_url, "http://minio.local:9000")
+        self.assertEqual(service.s3_client.meta.region_name, "eu-west-1")
+
+
+class FakeVideoCollection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+
+
+def _ffmpeg_playlist(start, durations):
+    """Playlist ffmpeg has written so far in a pass that started at segment `start`"""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", f"#EXT-X-MEDIA-SEQUENCE:{start}"]
+    for offset, duration in enumerate(durations):
+        lines += [f"#EXTINF:{duration:.6f},", f"segment_{start + offset:05d}.ts"]
+    return "\n".join(lines) + "\n"
+
+
+def _video():
+    return SimpleNamespace(
+        video_id="video-1",
+        lesson_id="lesson-1",
+        storage_path="videos/lesson-1/intro.mp4",
+        file_extension=".mp4",
+        processing_status=SimpleNamespace(started_at=None, status="queued", progress=0.0, error_message=None),
+        qualities=[],
+        hls_segments={},
+        default_quality="720p",
+        thumbnails=["kept"],
+        thumbnail_url=None,
+        subtitles=["kept"],
+        has_auto_subtitles=False
+    )
+
+
+@unittest.skipUnless(boto3 is not None, "boto3 is required for the video processing service")
+class TestTranscodeCheckpoints(unittest.IsolatedAsyncioTestCase):
+    SEGMENTS = 5
+
+    def setUp(self):
+        from digital_twin.services import video_processing_service as module
+        from digital_twin.services.hls_transcoder import segment_filename
+
+        self.service = module.VideoProcessingService()
+        self.service.segment_poll_interval = 0.01
+        self.collection = FakeVideoCollection()
+        patcher = patch.object(module.VideoContent, "get_pymongo_collection", lambda: self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.uploads = []
+        self.passes = []
+        self.crash_after = None
+
+        async def download(key, path):
+            Path(path).write_bytes(b"source")
+
+        async def upload(path, key):
+            self.uploads.append(key)
+
+        async def metadata(path):
+            return {"duration": 30.0, "height": 480, "has_audio": True}
+
+        async def transcode(input_path, output_dir, renditions, has_audio, duration, threads=0, on_progress=None, start_segment=0):
+            self.passes.append(start_segment)
+            durations = {}
+            for index in range(start_segment, self.SEGMENTS):
+                if index == self.crash_after:
+                    raise Exception("worker killed")
+                for name, _ in renditions:
+                    rendition_dir = Path(output_dir, name)
+                    rendition_dir.mkdir(parents=True, exist_ok=True)
+                    (rendition_dir / segment_filename(index)).write_bytes(b"x" * 10)
+                    durations.setdefault(name, []).append(6.0)
+                    (rendition_dir / "index.m3u8").write_text(_ffmpeg_playlist(start_segment, durations[name]))
+                await asyncio.sleep(0.03)
+
+        self.service._download_from_s3 = download
+        self.service._upload_to_s3 = upload
+        self.service._get_video_metadata = metadata
+        self.service._transcode_video = transcode
+
+    async def test_crash_mid_encode_resumes_at_uploaded_segments(self):
+        video = _video()
+        self.crash_after = 3
+        with self.assertRaises(Exception):
+            await self.service.process_video(video)
+
+        # Segments finished before the crash were uploaded and checkpointed
+        self.assertEqual(sorted(video.hls_segments), ["360p", "480p"])
+        self.assertEqual([len(v) for v in video.hls_segments.values()], [3, 3])
+        self.assertEqual(video.qualities, [])
+        first_run = set(self.uploads)
+
+        self.crash_after = None
+        self.uploads.clear()
+        await self.service.process_video(video)
+
+        self.assertEqual(self.passes, [0, 3])
+        self.assertFalse(first_run & set(self.uploads))
+        self.assertIn("videos/lesson-1/video-1/hls/480p/segment_00004.ts", self.uploads)
+        self.assertEqual(sorted(q.quality for q in video.qualities), ["360p", "480p"])
+        self.assertEqual(video.hls_segments, {})
+        self.assertEqual(video.processing_status.status, "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
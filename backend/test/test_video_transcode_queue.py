@@ -0,0 +1,310 @@
+import sys
+import asyncio
+import unittest
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from digital_twin.services.hls_transcoder import (
+    select_renditions, build_hls_command, build_master_playlist, build_media_playlist,
+    parse_media_playlist, bitrate_to_bps, parse_progress_seconds, ThrottledProgress, run_ffmpeg
+)
+from digital_twin.services.video_transcode_queue import VideoTranscodeQueue
+
+QUALITY_CONFIGS = {
+    "1080p": {"resolution": "1920x1080", "bitrate": "5000k", "max_bitrate": "6000k", "bufsize": "10000k"},
+    "720p": {"resolution": "1280x720", "bitrate": "2500k", "max_bitrate": "3000k", "bufsize": "5000k"},
+    "480p": {"resolution": "854x480", "bitrate": "1000k", "max_bitrate": "1200k", "bufsize": "2000k"},
+    "360p": {"resolution": "640x360", "bitrate": "500k", "max_bitrate": "600k", "bufsize": "1000k"}
+}
+
+
+class TestHLSTranscoder(unittest.TestCase):
+    def test_ladder_never_upscales(self):
+        self.assertEqual([n for n, _ in select_renditions(QUALITY_CONFIGS, 720)], ["720p", "480p", "360p"])
+        self.assertEqual([n for n, _ in select_renditions(QUALITY_CONFIGS, 240)], ["360p"])
+        self.assertEqual(len(select_renditions(QUALITY_CONFIGS, 0)), 4)
+
+    def test_all_renditions_come_from_one_decode_pass(self):
+        renditions = select_renditions(QUALITY_CONFIGS, 1080)
+        cmd = build_hls_command("ffmpeg", "in.mp4", "out", renditions, threads=4)
+
+        self.assertEqual(cmd.count("-i"), 1)
+        filter_graph = cmd[cmd.index("-filter_complex") + 1]
+        self.assertTrue(filter_graph.startswith("[0:v]split=4[s0][s1][s2][s3]"))
+        self.assertEqual(cmd.count("-map"), 8)
+        self.assertEqual(
+            cmd[cmd.index("-var_stream_map") + 1],
+            "v:0,a:0,name:1080p v:1,a:1,name:720p v:2,a:2,name:480p v:3,a:3,name:360p"
+        )
+        self.assertEqual(cmd[cmd.index("-f") + 1], "hls")
+        self.assertEqual(cmd[-1], "out/%v/index.m3u8")
+
+    def test_command_without_audio_maps_video_only(self):
+        cmd = build_hls_command("ffmpeg", "in.mp4", "out", select_renditions(QUALITY_CONFIGS, 480), has_audio=False)
+
+        self.assertNotIn("0:a:0", cmd)
+        self.assertNotIn("-c:a", cmd)
+        self.assertEqual(cmd[cmd.index("-var_stream_map") + 1], "v:0,name:480p v:1,name:360p")
+
+    def test_resumed_pass_starts_at_a_segment_boundary(self):
+        cmd = build_hls_command("ffmpeg", "in.mp4", "out", select_renditions(QUALITY_CONFIGS, 480), start_segment=3)
+
+        self.assertEqual(cmd[cmd.index("-ss") + 1], "18")
+        self.assertLess(cmd.index("-ss"), cmd.index("-i"))
+        self.assertEqual(cmd[cmd.index("-output_ts_offset") + 1], "18")
+        self.assertEqual(cmd[cmd.index("-start_number") + 1], "3")
+        self.assertNotIn("-ss", build_hls_command("ffmpeg", "in.mp4", "out", select_renditions(QUALITY_CONFIGS, 480)))
+
+    def test_media_playlist_round_trip(self):
+        playlist = build_media_playlist([6.0, 6.0, 2.5])
+
+        self.assertEqual(
+            parse_media_playlist(playlist),
+            [("segment_00000.ts", 6.0), ("segment_00001.ts", 6.0), ("segment_00002.ts", 2.5)]
+        )
+        self.assertIn("#EXT-X-TARGETDURATION:6", playlist)
+        self.assertTrue(playlist.endswith("#EXT-X-ENDLIST\n"))
+
+    def test_master_playlist_lists_renditions_by_bandwidth(self):
+        playlist = build_master_playlist([
+            {"quality": "360p", "resolution": "640x360", "bandwidth": 728000},
+            {"quality": "720p", "resolution": "1280x720", "bandwidth": 3128000}
+        ])
+        lines = playlist.splitlines()
+
+        self.assertEqual(lines[0], "#EXTM3U")
+        self.assertEqual(lines[3], "#EXT-X-STREAM-INF:BANDWIDTH=3128000,RESOLUTION=1280x720")
+        self.assertEqual(lines[4], "720p/index.m3u8")
+        self.assertEqual(lines[6], "360p/index.m3u8")
+        self.assertEqual(bitrate_to_bps("2500k"), 2500000)
+
+    def test_progress_parsing(self):
+        self.assertEqual(parse_progress_seconds("out_time_us=1500000\n"), 1.5)
+        self.assertEqual(parse_progress_seconds("out_time_ms=2000000"), 2.0)
+        self.assertIsNone(parse_progress_seconds("out_time_us=N/A"))
+        self.assertIsNone(parse_progress_seconds("progress=continue"))
+
+
+class TestThrottledProgress(unittest.IsolatedAsyncioTestCase):
+    async def test_updates_are_throttled(self):
+        now = [0.0]
+        reported = []
+
+        async def record(value):
+            reported.append(value)
+
+        progress = ThrottledProgress(record, min_interval=5.0, min_delta=1.0, clock=lambda: now[0])
+        await progress.update(1.0)
+        await progress.update(30.0)          # too soon
+        now[0] = 6.0
+        await progress.update(1.5)           # too small a step
+        await progress.update(40.0)
+        now[0] = 7.0
+        await progress.update(100.0, force=True)
+
+        self.assertEqual(reported, [1.0, 40.0, 100.0])
+
+    async def test_run_ffmpeg_reports_fraction_of_duration(self):
+        script = "print('out_time_us=500000'); print('progress=continue'); print('out_time_us=1000000'); print('progress=end')"
+        fractions = []
+
+        async def record(fraction):
+            fractions.append(fraction)
+
+        await run_ffmpeg([sys.executable, "-c", script], duration=1.0, on_progress=record)
+        self.assertEqual(fractions, [0.5, 1.0])
+
+        with self.assertRaises(Exception) as ctx:
+            await run_ffmpeg([sys.executable, "-c", "import sys; sys.stderr.write('Invalid data found'); sys.exit(1)"])
+        self.assertIn("Invalid data found", str(ctx.exception))
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _set(doc, path, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, option) for option in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict):
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeVideoCollection:
+    """In-memory stand-in for the video_content collection operations the queue uses"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def _apply(self, doc, update):
+        for path, value in update.get("$set", {}).items():
+            _set(doc, path, value)
+        for path, amount in update.get("$inc", {}).items():
+            _set(doc, path, (_get(doc, path) or 0) + amount)
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        await asyncio.sleep(0)
+        for doc in sorted(self.docs, key=lambda d: d["uploaded_at"]):
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return doc
+        return None
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return
+
+
+class FakeProcessor:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.running = 0
+        self.max_running = 0
+        self.processed = []
+
+    async def process_video(self, video, threads=0):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.02)
+            if video["video_id"] in self.fail:
+                video["processing_status"]["status"] = "failed"
+                raise Exception("ffmpeg exited with 1")
+            video["processing_status"]["status"] = "completed"
+            self.processed.append((video["video_id"], threads))
+        finally:
+            self.running -= 1
+
+
+def _video(video_id, minutes_ago, status="pending", **processing):
+    return {
+        "video_id": video_id,
+        "uploaded_at": datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+        "processing_status": {"status": status, "progress": 0.0, **processing}
+    }
+
+
+class TestVideoTranscodeQueue(unittest.IsolatedAsyncioTestCase):
+    def make_queue(self, docs, processor, workers=2):
+        collection = FakeVideoCollection(docs)
+
+        async def load(video_id):
+            return next(d for d in docs if d["video_id"] == video_id)
+
+        return VideoTranscodeQueue(
+            processor=processor, collection=collection, loader=load,
+            workers=workers, threads_per_job=2, poll_interval=0.05, lease_seconds=60, max_attempts=2
+        )
+
+    async def _drain(self, queue, docs):
+        for _ in range(200):
+            if all(d["processing_status"]["status"] in ("completed", "failed") for d in docs):
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_jobs_run_in_parallel_on_the_worker_pool(self):
+        docs = [_video(f"v{i}", 10 - i) for i in range(4)]
+        processor = FakeProcessor()
+        queue = self.make_queue(docs, processor, workers=2)
+        try:
+            for doc in docs:
+                await queue.enqueue(doc["video_id"])
+            await self._drain(queue, docs)
+        finally:
+            await queue.stop()
+
+        self.assertEqual(sorted(v for v, _ in processor.processed), ["v0", "v1", "v2", "v3"])
+        self.assertEqual(processor.max_running, 2)
+        self.assertTrue(all(threads == 2 for _, threads in processor.processed))
+
+    async def test_job_with_stale_heartbeat_is_resumed(self):
+        stale = datetime.now(timezone.utc) - timedelta(minutes=10)
+        docs = [
+            _video("crashed", 5, status="processing", worker_id="dead-1", heartbeat_at=stale, attempts=1),
+            _video("busy", 4, status="processing", worker_id="live-1", heartbeat_at=datetime.now(timezone.utc), attempts=1)
+        ]
+        processor = FakeProcessor()
+        queue = self.make_queue(docs, processor)
+
+        self.assertTrue(await queue.run_job("w-0"))
+        self.assertFalse(await queue.run_job("w-1"))
+
+        self.assertEqual(processor.processed, [("crashed", 2)])
+        self.assertEqual(docs[0]["processing_status"]["attempts"], 2)
+        self.assertEqual(queue.stats["resumed"], 1)
+        self.assertEqual(docs[1]["processing_status"]["worker_id"], "live-1")
+
+    async def test_job_interrupted_too_often_is_failed(self):
+        stale = datetime.now(timezone.utc) - timedelta(minutes=10)
+        docs = [_video("flaky", 5, status="processing", worker_id="dead-2", heartbeat_at=stale, attempts=2)]
+        processor = FakeProcessor()
+        queue = self.make_queue(docs, processor)
+
+        await queue.run_job("w-0")
+
+        self.assertEqual(docs[0]["processing_status"]["status"], "failed")
+        self.assertEqual(processor.processed, [])
+
+    async def test_failed_transcode_does_not_stop_the_worker(self):
+        docs = [_video("broken", 2), _video("fine", 1)]
+        processor = FakeProcessor(fail={"broken"})
+        queue = self.make_queue(docs, processor, workers=1)
+        try:
+            for doc in docs:
+                await queue.enqueue(doc["video_id"])
+            await self._drain(queue, docs)
+        finally:
+            await queue.stop()
+
+        self.assertEqual(docs[0]["processing_status"]["status"], "failed")
+        self.assertEqual(processor.processed, [("fine", 2)])
+        self.assertEqual(queue.stats, {"completed": 1, "failed": 1, "resumed": 0})
+
+    async def test_heartbeat_survives_a_failed_write(self):
+        docs = [_video("long", 1, status="processing", worker_id="w-0")]
+        queue = self.make_queue(docs, FakeProcessor())
+        queue.lease_seconds = 0.03
+        writes = []
+
+        async def flaky_update_one(query, update):
+            writes.append(update)
+            if len(writes) == 1:
+                raise ConnectionError("primary stepped down")
+
+        queue.collection.update_one = flaky_update_one
+        heartbeat = asyncio.create_task(queue._heartbeat("long", "w-0"))
+        await asyncio.sleep(0.06)
+
+        self.assertFalse(heartbeat.done())
+        self.assertGreaterEqual(len(writes), 2)
+        heartbeat.cancel()
+
+
+if __name__ == "__main__":
+    unittest.main()
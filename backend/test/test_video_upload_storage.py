@@ -0,0 +1,103 @@
+import io
+import sys
+import hashlib
+import unittest
+from pathlib import Path
+
+# Ensure backend path
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:  # S3 stand-in not installed
+    boto3 = None
+    mock_aws = None
+
+MIB = 1024 * 1024
+BUCKET = "learn-twin-videos-test"
+
+
+def _chunk(number: int, size: int) -> bytes:
+    return bytes([number % 251]) * size
+
+
+@unittest.skipUnless(mock_aws is not None, "boto3 and moto are required for the S3 stand-in")
+class TestVideoUploadStorage(unittest.TestCase):
+    def setUp(self):
+        from digital_twin.services.video_upload_storage import VideoUploadStorage
+
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.storage = VideoUploadStorage(self.s3, BUCKET)
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def _read(self, key: str) -> bytes:
+        return self.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+    def test_chunks_are_assembled_from_multipart_parts(self):
+        key = "videos/lesson-1/intro.mp4"
+        sizes = [5 * MIB, 5 * MIB, 1 * MIB + 17]
+        upload_id = self.storage.start(key)
+
+        # Parts may arrive in any order
+        parts = {}
+        for number in (3, 1, 2):
+            parts[number] = self.storage.put_part(key, upload_id, number, io.BytesIO(_chunk(number, sizes[number - 1])))
+        self.storage.complete(key, upload_id, parts)
+
+        expected = b"".join(_chunk(n, size) for n, size in enumerate(sizes, start=1))
+        data = self._read(key)
+        self.assertEqual(len(data), sum(sizes))
+        self.assertEqual(hashlib.sha256(data).digest(), hashlib.sha256(expected).digest())
+        self.assertEqual(self.s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []), [])
+
+    def test_abort_discards_parts(self):
+        key = "videos/lesson-1/cancelled.mp4"
+        upload_id = self.storage.start(key)
+        self.storage.put_part(key, upload_id, 1, io.BytesIO(_chunk(1, 5 * MIB)))
+
+        self.storage.abort(key, upload_id)
+
+        self.assertEqual(self.s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []), [])
+        self.assertNotIn("Contents", self.s3.list_objects_v2(Bucket=BUCKET, Prefix=key))
+
+    def test_legacy_chunk_objects_are_copied_server_side_and_removed(self):
+        key = "videos/lesson-2/legacy.mp4"
+        chunk_keys = []
+        for number, size in enumerate([5 * MIB, 2 * MIB]):
+            chunk_key = f"uploads/temp/session/legacy.mp4.chunk_{number}"
+            self.s3.put_object(Bucket=BUCKET, Key=chunk_key, Body=_chunk(number, size))
+            chunk_keys.append(chunk_key)
+
+        parts = self.storage.assemble_from_objects(chunk_keys, key)
+
+        self.assertEqual(parts, 2)
+        self.assertEqual(self._read(key), _chunk(0, 5 * MIB) + _chunk(1, 2 * MIB))
+        self.assertNotIn("Contents", self.s3.list_objects_v2(Bucket=BUCKET, Prefix="uploads/temp/"))
+
+    def test_legacy_chunks_below_part_size_are_concatenated(self):
+        key = "videos/lesson-3/small-chunks.mp4"
+        sizes = [2 * MIB, 2 * MIB, 2 * MIB, 1 * MIB + 5]
+        chunk_keys = []
+        for number, size in enumerate(sizes):
+            chunk_key = f"uploads/temp/small/small-chunks.mp4.chunk_{number}"
+            self.s3.put_object(Bucket=BUCKET, Key=chunk_key, Body=_chunk(number, size))
+            chunk_keys.append(chunk_key)
+
+        parts = self.storage.assemble_from_objects(chunk_keys, key)
+
+        # Regrouped into parts S3 accepts: 6 MiB, then the remainder
+        self.assertEqual(parts, 2)
+        self.assertEqual(self._read(key), b"".join(_chunk(n, size) for n, size in enumerate(sizes)))
+        self.assertNotIn("Contents", self.s3.list_objects_v2(Bucket=BUCKET, Prefix="uploads/temp/"))
+
+
+if __name__ == "__main__":
+    unittest.main()